@@ -30,6 +30,8 @@ class Connection {
 		long		tableSize(const std::string& table);
 	private:
 		void		raiseError(const char *operation, const char *reason,...);
+		int		transaction(const std::string& table, const rapidjson::Value& payloads,
+					int (Connection::*operation)(const std::string&, const std::string&));
 		PGconn		*dbConnection;
 		void		mapResultSet(PGresult *res, std::string& resultSet);
 		bool		jsonWhereClause(const rapidjson::Value& whereClause, SQLBuffer&);
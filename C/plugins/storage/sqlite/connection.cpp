@@ -818,6 +818,10 @@ int		col = 0;
 		raiseError("insert", "Failed to parse JSON payload\n");
 		return -1;
 	}
+	if (document.IsArray())
+	{
+		return transaction(table, document, &Connection::insert);
+	}
  	sql.append("INSERT INTO foglamp.");
 	sql.append(table);
 	sql.append(" (");
@@ -912,6 +916,10 @@ int		col = 0;
 		raiseError("update", "Failed to parse JSON payload");
 		return -1;
 	}
+	else if (document.IsArray())
+	{
+		return transaction(table, document, &Connection::update);
+	}
 	else
 	{
 		sql.append("UPDATE foglamp.");
@@ -1214,6 +1222,52 @@ int		col = 0;
 	return -1;
 }
 
+/**
+ * Run the insert or update of each element of a JSON array payload in a
+ * single transaction: either all of them are applied or none is, so that
+ * a failed batch can be sent again as a whole.
+ *
+ * @param table		The table the rows are inserted in or updated
+ * @param payloads	The JSON array of the insert or update payloads
+ * @param operation	Connection::insert or Connection::update
+ * @return		The total number of rows affected, or -1 on failure
+ */
+int Connection::transaction(const string& table, const Value& payloads,
+			    int (Connection::*operation)(const string&, const string&))
+{
+int	rows = 0;
+char	*zErrMsg = NULL;
+
+	if (sqlite3_exec(dbHandle, "BEGIN TRANSACTION;", NULL, NULL, &zErrMsg) != SQLITE_OK)
+	{
+		raiseError("transaction", zErrMsg);
+		sqlite3_free(zErrMsg);
+		return -1;
+	}
+	for (Value::ConstValueIterator itr = payloads.Begin(); itr != payloads.End(); ++itr)
+	{
+		StringBuffer buffer;
+		Writer<StringBuffer> writer(buffer);
+		itr->Accept(writer);
+		int affected = (this->*operation)(table, buffer.GetString());
+		if (affected == -1)
+		{
+			// The error of the failed statement is kept, for the caller
+			sqlite3_exec(dbHandle, "ROLLBACK TRANSACTION;", NULL, NULL, NULL);
+			return -1;
+		}
+		rows += affected;
+	}
+	if (sqlite3_exec(dbHandle, "COMMIT TRANSACTION;", NULL, NULL, &zErrMsg) != SQLITE_OK)
+	{
+		raiseError("transaction", zErrMsg);
+		sqlite3_free(zErrMsg);
+		sqlite3_exec(dbHandle, "ROLLBACK TRANSACTION;", NULL, NULL, NULL);
+		return -1;
+	}
+	return rows;
+}
+
 /**
  * Perform a delete against a common table
  *
@@ -32,6 +32,8 @@ class Connection {
 		long		tableSize(const std::string& table);
 	private:
 		void		raiseError(const char *operation, const char *reason,...);
+		int		transaction(const std::string& table, const rapidjson::Value& payloads,
+					int (Connection::*operation)(const std::string&, const std::string&));
 		sqlite3		*dbHandle;
 		int		mapResultSet(void *res, std::string& resultSet);
 		bool		jsonWhereClause(const rapidjson::Value& whereClause, SQLBuffer&);
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Memory used by the readings buffered by Ingest, per form of a buffered reading
+
+The readings are the ones of a few assets, with a uuid key and a small readings dict, as sent by the South plugins.
+The forms are the dict the buffers held before and the serialized row, which the buffers hold.
+
+ Example:
+
+     $ cd $FOGLAMP_ROOT
+     $ PYTHONPATH=python python3 extras/python/benchmarks/ingest_buffer_memory.py -n 100000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+import uuid
+
+from foglamp.services.south.reading import reading_row
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_ASSETS = ('TI Sensortag CC2650/gyroscope', 'TI Sensortag CC2650/accelerometer', 'TI Sensortag CC2650/magnetometer')
+
+
+def _plugin_reading(i):
+    """ Returns the arguments of Ingest.add_readings for reading i, built as a plugin does """
+    asset = ''.join(['TI Sensortag CC2650/', _ASSETS[i % len(_ASSETS)].split('/')[1]])
+    return asset, '2018-03-01 10:12:{:02d}.{:06d}+00:00'.format(i % 60, i % 1000000), str(uuid.uuid4()), \
+        {"x": i * 0.5, "y": -i * 0.25, "z": i % 360}
+
+
+def _as_dict(asset, timestamp, key, readings):
+    return {'asset_code': asset, 'read_key': str(uuid.UUID(key)), 'reading': readings, 'user_ts': timestamp}
+
+
+def _as_row(asset, timestamp, key, readings):
+    return reading_row(asset, uuid.UUID(key), readings, timestamp)
+
+
+def _measure(form, count):
+    """ Returns the bytes per reading held by count buffered readings and the readings buffered per second """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    buffered = [form(*_plugin_reading(i)) for i in range(count)]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del buffered
+    return size / count, count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--readings', type=int, default=100000, help='number of buffered readings')
+    args = parser.parse_args()
+
+    print('readings: {}'.format(args.readings))
+    print('{:<10}{:>16}{:>16}'.format('form', 'bytes/reading', 'readings/s'))
+    baseline = None
+    for name, form in (('dict', _as_dict), ('row', _as_row)):
+        per_reading, rate = _measure(form, args.readings)
+        baseline = baseline or per_reading
+        print('{:<10}{:>16.0f}{:>16.0f}    x{:.2f}'.format(name, per_reading, rate, per_reading / baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Readings/sec inserted by Ingest, for a number of readings lists inserted concurrently
+
+A local aiohttp server stands in for the storage service and answers each readings append after a given latency,
+so that the measure is dominated by the storage round trips. With a single list, there is at most one insert in
+flight, as when all the lists were inserted one after the other.
+
+ Example:
+
+     $ cd $FOGLAMP_ROOT
+     $ PYTHONPATH=python python3 extras/python/benchmarks/ingest_concurrent_inserts.py -n 20000 -l 20
+"""
+
+import argparse
+import asyncio
+import collections
+import logging
+import time
+import uuid
+
+from aiohttp import web
+
+from foglamp.common.service_record import ServiceRecord
+from foglamp.common.storage_client.storage_client import ReadingsStorageClientAsync
+from foglamp.services.south import ingest
+from foglamp.services.south.ingest import Ingest
+from foglamp.services.south.ring_buffer import RingBuffer
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+async def _storage_server(latency):
+    """ Starts the stand-in storage service, returns its runner and port """
+    async def append(request):
+        await request.read()
+        await asyncio.sleep(latency)
+        return web.json_response({"response": "appended"})
+
+    app = web.Application()
+    app.router.add_post('/storage/reading', append)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+async def _run(storage, lists, batch_size, count):
+    """ Returns the readings inserted per second by Ingest with the given number of lists """
+    Ingest.readings_storage_async = storage
+    Ingest._max_concurrent_readings_inserts = lists
+    Ingest._readings_insert_batch_size = batch_size
+    Ingest._readings_list_size = batch_size
+    Ingest._readings_lists = [RingBuffer(batch_size) for _ in range(lists)]
+    Ingest._readings_lists_not_full_waiters = collections.deque()
+    Ingest._current_readings_list_index = 0
+    Ingest._readings_stats = 0
+    Ingest._stop = False
+    Ingest._started = True
+    tasks = [asyncio.ensure_future(Ingest._insert_readings(list_index)) for list_index in range(lists)]
+
+    start = time.perf_counter()
+    for i in range(count):
+        await Ingest.add_readings(asset='TI Sensortag CC2650/gyroscope', timestamp='2018-03-01 10:12:00.000000+00:00',
+                                  key=uuid.uuid4(), readings={"x": i * 0.5, "y": -i * 0.25, "z": i % 360})
+    while Ingest._readings_stats < count:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    Ingest._stop = True
+    for readings_list in Ingest._readings_lists:
+        readings_list.release()
+    await asyncio.gather(*tasks)
+    Ingest._started = False
+    return count / elapsed
+
+
+async def _main(args):
+    # add_readings warns each time the lists are full
+    ingest._LOGGER.setLevel(logging.ERROR)
+    runner, port = await _storage_server(args.latency / 1000)
+    svc = ServiceRecord('bench', 'storage', 'Storage', 'http', '127.0.0.1', port, port)
+    storage = ReadingsStorageClientAsync(None, None, svc=svc)
+    try:
+        before = await _run(storage, 1, args.batch_size, args.readings)
+        after = await _run(storage, args.lists, args.batch_size, args.readings)
+    finally:
+        await storage.close()
+        await runner.cleanup()
+
+    print('readings: {}, batch size: {}, storage latency: {} ms'.format(args.readings, args.batch_size,
+                                                                         args.latency))
+    print('{:<26}{:>10.0f} readings/s'.format('1 insert in flight', before))
+    print('{:<26}{:>10.0f} readings/s'.format('{} inserts in flight'.format(args.lists), after))
+    print('{:<26}{:>10.2f}x'.format('speedup', after / before))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--readings', type=int, default=20000, help='number of readings per run')
+    parser.add_argument('-b', '--batch-size', type=int, default=256, help='readings insert batch size')
+    parser.add_argument('-l', '--latency', type=float, default=20, help='storage latency in milliseconds')
+    parser.add_argument('-c', '--lists', type=int, default=4, help='number of readings lists inserted concurrently')
+    args = parser.parse_args()
+    asyncio.get_event_loop().run_until_complete(_main(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Encode / decode throughput of the json_codec backends on blocks of readings
+
+Each block is what Ingest sends to the storage service and what the sending process fetches back from it.
+
+ Example:
+
+     $ cd $FOGLAMP_ROOT
+     $ PYTHONPATH=python python3 extras/python/benchmarks/json_codec.py -b 500 -r 200
+"""
+
+import argparse
+import datetime
+import random
+import time
+import uuid
+
+from foglamp.common import json_codec
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def _readings_block(size):
+    start = datetime.datetime(2018, 3, 8, 15, 0, 0)
+    readings = []
+    for i in range(size):
+        user_ts = str(start + datetime.timedelta(milliseconds=10 * i)) + '+00'
+        readings.append({"id": i + 1,
+                         "asset_code": "TI sensorTag/{}".format(random.choice(['luxometer', 'pressure', 'humidity'])),
+                         "read_key": str(uuid.uuid4()),
+                         "reading": {"x": random.uniform(-2, 2), "y": random.uniform(-2, 2),
+                                     "z": random.uniform(-2, 2), "temperature": random.randint(-10, 40)},
+                         "user_ts": user_ts,
+                         "ts": user_ts})
+    return {"readings": readings}
+
+
+def _measure(func, arg, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(arg)
+    return rounds / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-b', '--block-size', type=int, default=500, help='number of readings in a block')
+    parser.add_argument('-r', '--rounds', type=int, default=200, help='number of blocks encoded / decoded')
+    args = parser.parse_args()
+
+    block = _readings_block(args.block_size)
+    default = json_codec.backend()
+
+    print('readings per block: {}, rounds: {}'.format(args.block_size, args.rounds))
+    print('{:<10}{:>16}{:>16}'.format('backend', 'dumpb blocks/s', 'loads blocks/s'))
+    baseline = None
+    try:
+        for name in reversed(json_codec.available_backends()):
+            json_codec.set_backend(name)
+            body = json_codec.dumpb(block)
+            encode = _measure(json_codec.dumpb, block, args.rounds)
+            decode = _measure(json_codec.loads, body, args.rounds)
+            if baseline is None:
+                baseline = encode, decode
+            print('{:<10}{:>16.0f}{:>16.0f}    x{:.1f} / x{:.1f}'.format(name, encode, decode, encode / baseline[0],
+                                                                       decode / baseline[1]))
+    finally:
+        json_codec.set_backend(default)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Per call cost of building a storage payload versus binding a compiled one
+
+The queries are the ones the statistics and the sending process send on each update.
+
+ Example:
+
+     $ cd $FOGLAMP_ROOT
+     $ PYTHONPATH=python python3 extras/python/benchmarks/payload_builder.py -r 100000
+"""
+
+import argparse
+import time
+
+from foglamp.common.storage_client.payload_builder import PayloadBuilder, Param
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def _statistics_update(i):
+    return PayloadBuilder().WHERE(["key", "=", "READINGS"]).EXPR(["value", "+", i]).payload()
+
+
+def _last_object_update(i):
+    return PayloadBuilder().SET(last_object=i, ts='now()').WHERE(['id', '=', 1]).payload()
+
+
+_STATISTICS_UPDATE = PayloadBuilder().WHERE(["key", "=", Param("key")]).EXPR(["value", "+", Param("value")]).compile()
+
+_LAST_OBJECT_UPDATE = PayloadBuilder().SET(last_object=Param("last_object"), ts='now()')\
+    .WHERE(['id', '=', Param("stream_id")]).compile()
+
+
+def _measure(func, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        func(i)
+    return rounds / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-r', '--rounds', type=int, default=100000, help='number of payloads per query')
+    args = parser.parse_args()
+
+    queries = [
+        ('statistics', _statistics_update, lambda i: _STATISTICS_UPDATE.bind(key="READINGS", value=i)),
+        ('last_object', _last_object_update, lambda i: _LAST_OBJECT_UPDATE.bind(last_object=i, stream_id=1))
+    ]
+
+    print('rounds: {}'.format(args.rounds))
+    print('{:<14}{:>16}{:>16}'.format('query', 'built calls/s', 'bound calls/s'))
+    for name, build, bind in queries:
+        assert build(7) == bind(7)
+        built = _measure(build, args.rounds)
+        bound = _measure(bind, args.rounds)
+        print('{:<14}{:>16.0f}{:>16.0f}    x{:.1f}'.format(name, built, bound, bound / built))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Requests/sec of the synchronous storage client, with and without the keep-alive connection pool
+
+A local HTTP/1.1 server stands in for the storage service and answers every request with a small
+JSON document, so that the measure is dominated by the connection handling.
+
+ Example:
+
+     $ cd $FOGLAMP_ROOT
+     $ PYTHONPATH=python python3 extras/python/benchmarks/storage_client_pool.py -n 5000 -t 4
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from foglamp.common.storage_client.connection_pool import HTTPConnectionPool
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_RESPONSE = json.dumps({"count": 1, "rows": [{"key": "READINGS", "value": 1024}]}).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(_RESPONSE)
+
+    do_GET = do_PUT = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def _per_call_connection(base_url):
+    """ What the storage client did before: a new connection for every call """
+    conn = http.client.HTTPConnection(base_url)
+    conn.request('PUT', url='/storage/table/statistics/query', body='{"where": {}}')
+    r = conn.getresponse()
+    res = r.read().decode()
+    conn.close()
+    return r.status, res
+
+
+def _pooled_connection(base_url):
+    r, res = HTTPConnectionPool.get(base_url).request('PUT', '/storage/table/statistics/query',
+                                                       body='{"where": {}}')
+    return r.status, res
+
+
+def _run(func, base_url, requests, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for status, _ in executor.map(lambda _: func(base_url), range(requests)):
+            assert 200 == status
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--requests', type=int, default=5000, help='number of requests per run')
+    parser.add_argument('-t', '--threads', type=int, default=4, help='number of concurrent client threads')
+    args = parser.parse_args()
+
+    server = _Server(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = '{}:{}'.format(*server.server_address)
+    HTTPConnectionPool.get(base_url, pool_size=args.threads)
+
+    try:
+        before = _run(_per_call_connection, base_url, args.requests, args.threads)
+        after = _run(_pooled_connection, base_url, args.requests, args.threads)
+    finally:
+        HTTPConnectionPool.close_all()
+        server.shutdown()
+        server.server_close()
+
+    print('requests: {}, threads: {}'.format(args.requests, args.threads))
+    print('{:<26}{:>10.0f} req/s'.format('connection per call', before))
+    print('{:<26}{:>10.0f} req/s'.format('keep-alive pool', after))
+    print('{:<26}{:>10.2f}x'.format('speedup', after / before))
+
+
+if __name__ == '__main__':
+    main()
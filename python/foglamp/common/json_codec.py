@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" JSON encoding / decoding for the FogLAMP hot paths
+
+The fastest backend installed among orjson, ujson and the standard library json module is used; all of them
+produce the same documents, only the whitespace may differ. As with orjson, datetime, date and time values are
+serialized in ISO 8601 format, e.g. "2018-03-08T15:00:09.025655+00:00", and UUIDs as their str.
+
+ Example:
+
+    from foglamp.common import json_codec
+
+    body = json_codec.dumpb({"readings": readings})  # bytes, ready to be sent
+    doc = json_codec.loads(body)                      # accepts bytes or str
+"""
+
+import datetime
+import importlib
+import json
+import uuid
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('dumps', 'dumpb', 'loads', 'backend', 'available_backends', 'set_backend')
+
+_BACKENDS = ('orjson', 'ujson', 'json')
+"""Supported backends, in order of preference"""
+
+_FALLBACK_ERRORS = (TypeError, OverflowError)
+"""Raised by orjson / ujson for values they can not encode, e.g. integers larger than 64 bits, or ujson for
+datetimes, that json can"""
+
+_backend = None
+_dumps = None
+_dumpb = None
+_loads = None
+
+
+def _default(obj):
+    """ Serializes the values json can not, the way orjson does """
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, default=_default)
+
+
+def _stdlib_dumpb(obj):
+    return json.dumps(obj, default=_default).encode()
+
+
+def _stdlib_loads(data):
+    return json.loads(data)
+
+
+def _orjson_codec(orjson):
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+    return dumps, orjson.dumps, orjson.loads
+
+
+def _ujson_codec(ujson):
+    def dumps(obj):
+        return ujson.dumps(obj, escape_forward_slashes=False)
+
+    def dumpb(obj):
+        return ujson.dumps(obj, escape_forward_slashes=False).encode()
+
+    def loads(data):
+        return ujson.loads(data.decode() if isinstance(data, (bytes, bytearray)) else data)
+    return dumps, dumpb, loads
+
+
+def available_backends():
+    """ Returns the names of the installed backends, the fastest first """
+    names = []
+    for name in _BACKENDS:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def backend():
+    """ Returns the name of the backend in use """
+    return _backend
+
+
+def set_backend(name=None):
+    """ Selects the backend
+
+    :param name: one of 'orjson', 'ujson' or 'json'; the fastest installed backend when None
+    :raises ValueError: if name is not a supported backend
+    :raises ImportError: if the backend is not installed
+    """
+    global _backend, _dumps, _dumpb, _loads
+
+    if name is None:
+        name = available_backends()[0]
+    if name not in _BACKENDS:
+        raise ValueError("JSON backend must be one of {}".format(', '.join(_BACKENDS)))
+
+    if name == 'orjson':
+        _dumps, _dumpb, _loads = _orjson_codec(importlib.import_module(name))
+    elif name == 'ujson':
+        _dumps, _dumpb, _loads = _ujson_codec(importlib.import_module(name))
+    else:
+        _dumps, _dumpb, _loads = _stdlib_dumps, _stdlib_dumpb, _stdlib_loads
+    _backend = name
+
+
+def dumps(obj):
+    """ Serializes obj to a JSON str """
+    try:
+        return _dumps(obj)
+    except _FALLBACK_ERRORS:
+        return _stdlib_dumps(obj)
+
+
+def dumpb(obj):
+    """ Serializes obj to JSON UTF-8 encoded bytes """
+    try:
+        return _dumpb(obj)
+    except _FALLBACK_ERRORS:
+        return _stdlib_dumpb(obj)
+
+
+def loads(data, strict=True):
+    """ Deserializes a JSON document given as bytes, bytearray or str
+
+    :param strict: when False, control characters are allowed inside strings, as with json.loads(strict=False)
+    :raises ValueError: if data is not a valid JSON document
+    """
+    try:
+        return _loads(data)
+    except ValueError:
+        if strict:
+            raise
+    return json.loads(data.decode() if isinstance(data, (bytes, bytearray)) else data, strict=False)
+
+
+set_backend()
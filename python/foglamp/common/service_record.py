@@ -41,9 +41,9 @@ class ServiceRecord(object):
         # TODO: tell allowed service status?
         pass
 
-    __slots__ = ['_id', '_name', '_type', '_protocol', '_address', '_port', '_management_port', '_status']
+    __slots__ = ['_id', '_name', '_type', '_protocol', '_address', '_port', '_management_port', '_status', '_socket']
 
-    def __init__(self, s_id, s_name, s_type, s_protocol, s_address, s_port, m_port):
+    def __init__(self, s_id, s_name, s_type, s_protocol, s_address, s_port, m_port, s_socket=None):
         self._id = s_id
         self._name = s_name
         self._type = self.valid_type(s_type)  # check with ServiceRecord.Type, if not a valid type raise error
@@ -54,11 +54,13 @@ class ServiceRecord(object):
             self._port = int(s_port)
         self._management_port = int(m_port)
         self._status = ServiceRecord.Status.Running
+        self._socket = s_socket  # unix domain socket path the service API also listens on, if any
 
     def __repr__(self):
         template = 'service instance id={s._id}: <{s._name}, type={s._type}, protocol={s._protocol}, ' \
-                   'address={s._address}, service port={s._port}, management port={s._management_port}, status={s._status}>'
-        return template.format(s=self)
+                   'address={s._address}, service port={s._port}, management port={s._management_port}, status={s._status}' \
+                   '{socket}>'
+        return template.format(s=self, socket=', socket={}'.format(self._socket) if self._socket else '')
 
     def __str__(self):
         return self.__repr__()
@@ -5,7 +5,7 @@
 # FOGLAMP_END
 
 from foglamp.common import logger
-from foglamp.common.storage_client.payload_builder import PayloadBuilder
+from foglamp.common.storage_client.payload_builder import Param, PayloadBuilder
 from foglamp.common.storage_client.storage_client import StorageClientAsync
 
 
@@ -17,6 +17,11 @@ __version__ = "${VERSION}"
 
 _logger = logger.setup(__name__)
 
+_INCREMENT_VALUE = PayloadBuilder().WHERE(["key", "=", Param("key")])\
+    .EXPR(["value", "+", Param("value_increment")]).compile()
+
+_SET_VALUE = PayloadBuilder().SET(value=Param("value")).WHERE(["key", "=", Param("key")]).compile()
+
 async def create_statistics(storage=None):
     stat = Statistics(storage)
     await stat._init()
@@ -64,10 +69,7 @@ class Statistics(object):
             raise ValueError('value must be an integer')
 
         try:
-            payload = PayloadBuilder()\
-                .WHERE(["key", "=", key])\
-                .EXPR(["value", "+", value_increment])\
-                .payload()
+            payload = _INCREMENT_VALUE.bind(key=key, value_increment=value_increment)
             await self._storage.update_tbl("statistics", payload)
         except Exception as ex:
             _logger.exception(
@@ -75,6 +77,32 @@ class Statistics(object):
                 , key, value_increment, str(ex))
             raise
 
+    async def set(self, key, value):
+        """ UPDATE the value column only of a statistics row based on key, to a value rather than by an increment
+
+        Used for statistics which are current values, e.g. of a setting tuned at run time, instead of counters.
+
+        Args:
+            key: statistics key value (required)
+            value: the new value
+
+        Returns:
+            None
+        """
+        if not isinstance(key, str):
+            raise TypeError('key must be a string')
+
+        if not isinstance(value, int):
+            raise ValueError('value must be an integer')
+
+        try:
+            payload = _SET_VALUE.bind(key=key, value=value)
+            await self._storage.update_tbl("statistics", payload)
+        except Exception as ex:
+            _logger.exception('Unable to set statistics value based on statistics_key %s and value %d, error %s',
+                              key, value, str(ex))
+            raise
+
     async def add_update(self, sensor_stat_dict):
         """UPDATE the value column of a statistics based on key, if key is not present, ADD the new key
 
@@ -84,25 +112,22 @@ class Statistics(object):
         Returns:
             None
         """
-        for key, value_increment in sensor_stat_dict.items():
-            # Try updating the statistics value for given key
-            try:
-                payload = PayloadBuilder() \
-                    .WHERE(["key", "=", key]) \
-                    .EXPR(["value", "+", value_increment]) \
-                    .payload()
-                result = await self._storage.update_tbl("statistics", payload)
-                if result["response"] != "updated":
-                    raise KeyError
-            # If key was not present, add the key and with value = value_increment
-            except KeyError:
-                _logger.exception('Statistics key %s has not been registered', key)
-                raise
-            except Exception as ex:
-                _logger.exception(
-                    'Unable to update statistics value based on statistics_key %s and value_increment %s, error %s'
-                    , key, value_increment, str(ex))
-                raise
+        if not sensor_stat_dict:
+            return
+        # All the keys are updated with a single request
+        try:
+            payloads = [_INCREMENT_VALUE.bind(key=key, value_increment=value_increment)
+                        for key, value_increment in sensor_stat_dict.items()]
+            result = await self._storage.update_many("statistics", payloads)
+            if result["response"] != "updated":
+                raise KeyError
+        # If a key was not present, add the key and with value = value_increment
+        except KeyError:
+            _logger.exception('Statistics keys %s have not all been registered', list(sensor_stat_dict))
+            raise
+        except Exception as ex:
+            _logger.exception('Unable to update statistics values %s, error %s', sensor_stat_dict, str(ex))
+            raise
 
     async def register(self, key, description):
         if key in self._registered_keys:
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Read-through cache of the queries on small, rarely changing storage tables
+
+Caching is enabled per table, with a time to live and a maximum number of cached queries, and is shared by all the
+storage clients, synchronous and asynchronous, of the same storage service:
+
+    StorageCache.get(storage_client.base_url).configure('log_codes', ttl=3600, max_entries=16)
+
+Any insert, update or delete sent by one of these clients drops the cached queries of the table. Writes made by other
+processes are only seen once the cached queries expire.
+"""
+
+import collections
+import copy
+import threading
+import time
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('StorageCache',)
+
+
+class _TableCache(object):
+    """ LRU of the results of the queries on a table """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()  # key -> (expiry time, result)
+        self.generation = 0
+        """incremented on each invalidation, so that a query sent before a write does not cache its result"""
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+
+class StorageCache(object):
+    """ Thread-safe TTL / LRU cache of query results for the tables of a storage service
+
+    Use :meth:`get` to obtain the cache shared for a storage base url. No table is cached until it is configured.
+    """
+
+    _caches = {}
+    """base url -> StorageCache"""
+
+    _caches_lock = threading.Lock()
+
+    def __init__(self):
+        self._tables = {}  # table name -> _TableCache
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, base_url):
+        """ Returns the cache shared for base_url, creating it on first use """
+        with cls._caches_lock:
+            cache = cls._caches.get(base_url)
+            if cache is None:
+                cache = cls()
+                cls._caches[base_url] = cache
+        return cache
+
+    def configure(self, tbl_name, ttl, max_entries=64):
+        """ Caches the queries on tbl_name
+
+        :param ttl: seconds a result is served from the cache
+        :param max_entries: maximum number of distinct queries cached, the least recently used is dropped first
+        """
+        if ttl <= 0 or max_entries <= 0:
+            raise ValueError("ttl and max_entries must be greater than 0")
+        with self._lock:
+            table = self._tables.get(tbl_name)
+            if table is None:
+                self._tables[tbl_name] = _TableCache(ttl, max_entries)
+            else:
+                table.ttl, table.max_entries = ttl, max_entries
+                table.entries.clear()
+                table.generation += 1
+
+    def disable(self, tbl_name):
+        """ Stops caching the queries on tbl_name """
+        with self._lock:
+            self._tables.pop(tbl_name, None)
+
+    def is_cached(self, tbl_name):
+        return tbl_name in self._tables
+
+    @staticmethod
+    def key(*parts):
+        """ Returns a hashable key for a query, e.g. from its url and payload """
+        return tuple(bytes(p) if isinstance(p, bytearray) else p for p in parts)
+
+    def lookup(self, tbl_name, key):
+        """ Returns (a copy of the cached result or None on a miss, generation of the table)
+
+        The generation is to be given back to :meth:`put` with the result of the query.
+        """
+        with self._lock:
+            table = self._tables.get(tbl_name)
+            if table is None:
+                return None, None
+            entry = table.entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    table.entries.move_to_end(key)
+                    table.hits += 1
+                    result = entry[1]
+                else:
+                    del table.entries[key]
+                    entry = None
+            if entry is None:
+                table.misses += 1
+                return None, table.generation
+        return copy.deepcopy(result), table.generation
+
+    def put(self, tbl_name, key, result, generation):
+        """ Caches the result of a query, unless the table has been written since the query was sent """
+        result = copy.deepcopy(result)
+        with self._lock:
+            table = self._tables.get(tbl_name)
+            if table is None or table.generation != generation:
+                return
+            table.entries[key] = (time.monotonic() + table.ttl, result)
+            table.entries.move_to_end(key)
+            while len(table.entries) > table.max_entries:
+                table.entries.popitem(last=False)
+
+    def invalidate(self, tbl_name):
+        """ Drops the cached queries on tbl_name, after it has been written """
+        with self._lock:
+            table = self._tables.get(tbl_name)
+            if table is None:
+                return
+            table.entries.clear()
+            table.generation += 1
+            table.invalidations += 1
+
+    def clear(self):
+        """ Drops all the cached queries """
+        with self._lock:
+            for table in self._tables.values():
+                table.entries.clear()
+                table.generation += 1
+
+    @classmethod
+    def stats_all(cls):
+        """ Returns the counters of the cached tables of each storage service, by base url """
+        with cls._caches_lock:
+            caches = list(cls._caches.items())
+        return {base_url: cache.stats() for base_url, cache in caches if cache._tables}
+
+    def stats(self):
+        """ Returns the counters of each cached table
+
+        :return: {table name: {"hits": ..., "misses": ..., "invalidations": ..., "entries": ..., "ttl": ...,
+                  "max_entries": ...}}
+        """
+        with self._lock:
+            return {name: {"hits": t.hits, "misses": t.misses, "invalidations": t.invalidations,
+                           "entries": len(t.entries), "ttl": t.ttl, "max_entries": t.max_entries}
+                    for name, t in self._tables.items()}
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Circuit breaker of the calls made to a storage service
+
+The breaker is shared by all the storage clients, synchronous and asynchronous, of the same storage service:
+
+    closed     calls go through; after failure_threshold consecutive retryable failures the breaker opens
+    open       calls fail fast with CircuitBreakerOpen, without being sent, until the reset timeout elapses
+    half-open  a single probe call goes through: it closes the breaker on success or opens it again on failure,
+               for an exponentially longer, jittered, time
+
+Only retryable failures count, i.e. the storage service could not be reached, timed out or returned an error with
+retryable set; an error such as a bad payload shows the storage service is up.
+"""
+
+import random
+import threading
+import time
+
+from foglamp.common import logger
+from foglamp.common.storage_client.exceptions import CircuitBreakerOpen
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('CircuitBreaker', 'backoff')
+
+_LOGGER = logger.setup(__name__)
+
+
+def backoff(attempt, base=0.5, cap=30.0):
+    """ Returns the seconds to wait before retry number attempt + 1
+
+    The delay doubles on each attempt, up to cap, and half of it is random so that the clients waiting for the
+    storage service to recover do not all retry at the same time.
+
+    :param attempt: number of attempts made so far, from 0
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitBreaker(object):
+    """ Thread-safe circuit breaker of a storage service
+
+    Use :meth:`get` to obtain the breaker shared for a storage base url. A call is guarded with :meth:`allow`
+    before it is sent and its outcome given to :meth:`success`, :meth:`failure` or :meth:`release`.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    _breakers = {}
+    """base url -> CircuitBreaker"""
+
+    _breakers_lock = threading.Lock()
+
+    def __init__(self, failure_threshold=5, reset_timeout=1.0, max_reset_timeout=60.0):
+        """
+        :param failure_threshold: consecutive retryable failures that open the breaker
+        :param reset_timeout: seconds the breaker stays open the first time, doubled each time the probe fails
+        :param max_reset_timeout: maximum seconds the breaker stays open
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0  # consecutive retryable failures
+        self._openings = 0  # consecutive openings, without a successful call in between
+        self._open_until = 0.0
+        self._probing = False
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, base_url):
+        """ Returns the breaker shared for base_url, creating it on first use """
+        with cls._breakers_lock:
+            breaker = cls._breakers.get(base_url)
+            if breaker is None:
+                breaker = cls()
+                cls._breakers[base_url] = breaker
+        return breaker
+
+    @classmethod
+    def stats_all(cls):
+        """ Returns the state of the breaker of each storage service, by base url """
+        with cls._breakers_lock:
+            breakers = list(cls._breakers.items())
+        return {base_url: breaker.stats() for base_url, breaker in breakers}
+
+    @property
+    def state(self):
+        return self._state
+
+    def retry_after(self):
+        """ Seconds before a call is let through again, 0 if it would be now """
+        with self._lock:
+            if self._state == self.OPEN:
+                return max(0.0, self._open_until - time.monotonic())
+            return 0.0
+
+    def allow(self):
+        """ Lets a call through
+
+        :raises CircuitBreakerOpen: if the breaker is open, or half-open with its probe call in flight
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN:
+                retry_after = self._open_until - time.monotonic()
+                if retry_after <= 0:
+                    self._state = self.HALF_OPEN
+                    self._probing = True
+                    return
+            else:
+                if not self._probing:
+                    self._probing = True
+                    return
+                retry_after = 0.0
+            self._rejected += 1
+        raise CircuitBreakerOpen(retry_after=max(0.0, retry_after))
+
+    def success(self):
+        """ Records a call answered by the storage service, closing the breaker """
+        with self._lock:
+            self._failures = 0
+            if self._state == self.CLOSED:
+                return
+            self._state = self.CLOSED
+            self._openings = 0
+            self._probing = False
+        _LOGGER.info("Storage service is reachable again, circuit breaker closed")
+
+    def failure(self):
+        """ Records a retryable failure of a call, opening the breaker after failure_threshold of them """
+        with self._lock:
+            self._failures += 1
+            if self._state == self.OPEN:
+                return
+            if self._state == self.CLOSED and self._failures < self.failure_threshold:
+                return
+            timeout = backoff(self._openings, self.reset_timeout, self.max_reset_timeout)
+            self._state = self.OPEN
+            self._openings += 1
+            self._open_until = time.monotonic() + timeout
+            self._probing = False
+            failures = self._failures
+        _LOGGER.warning("Storage service failed %d consecutive calls, circuit breaker open for %.1f seconds",
+                        failures, timeout)
+
+    def release(self):
+        """ Records a call without outcome, e.g. cancelled, so that another probe call can be let through """
+        with self._lock:
+            self._probing = False
+
+    def reset(self):
+        """ Closes the breaker and clears its counters """
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = self._openings = self._rejected = 0
+            self._probing = False
+
+    def stats(self):
+        """ Returns {"state": ..., "failures": ..., "rejected": ..., "retry_after": ...} """
+        retry_after = self.retry_after()
+        with self._lock:
+            return {"state": self._state, "failures": self._failures, "rejected": self._rejected,
+                    "retry_after": retry_after}
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Pool of persistent HTTP/1.1 connections used by the synchronous storage clients
+
+The connections are made over the unix domain socket of the storage service when it advertises one, i.e. the
+http+unix:// transport, and over TCP otherwise.
+"""
+
+import collections
+import http.client
+import select
+import socket
+import threading
+import time
+
+from foglamp.common import logger
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('HTTPConnectionPool', 'UnixHTTPConnection')
+
+_LOGGER = logger.setup(__name__)
+
+_DEFAULT_POOL_SIZE = 8
+"""Maximum number of idle connections kept open for each storage base url"""
+
+_DEFAULT_IDLE_TIMEOUT = 60
+"""Seconds after which an idle pooled connection is discarded instead of being reused"""
+
+_DEFAULT_TIMEOUT = 30
+"""Seconds a request waits on the storage service to connect or to send data before failing with socket.timeout"""
+
+_RECONNECT_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest, http.client.BadStatusLine,
+                     BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+"""Errors raised when sending over a pooled connection which has been closed by the server while idle"""
+
+_UNIX_SOCKET_ERRORS = (FileNotFoundError, ConnectionRefusedError, PermissionError)
+"""Errors raised when the unix domain socket of the storage service can not be connected to"""
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """ HTTPConnection over a unix domain socket
+
+    host is only sent in the Host header of the requests.
+    """
+
+    def __init__(self, socket_path, host='localhost', timeout=socket._GLOBAL_DEFAULT_TIMEOUT):
+        super().__init__(host, timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            if self.timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def _is_dropped(conn):
+    """ Whether an idle connection was closed by the server: with no request pending, it can only be readable then """
+    if conn.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+class HTTPConnectionPool(object):
+    """ Thread-safe pool of keep-alive http.client.HTTPConnection for a single base url
+
+    Use :meth:`get` to obtain the pool shared by all the clients of a base url.
+    """
+
+    _pools = {}
+    """base url -> HTTPConnectionPool"""
+
+    _pools_lock = threading.Lock()
+
+    def __init__(self, base_url, pool_size=_DEFAULT_POOL_SIZE, idle_timeout=_DEFAULT_IDLE_TIMEOUT, socket_path=None,
+                 timeout=_DEFAULT_TIMEOUT):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.socket_path = socket_path
+        """unix domain socket of the storage service, None to connect over TCP to base_url"""
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._idle = collections.deque()  # (connection, time it was released)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, base_url, pool_size=None, idle_timeout=None, socket_path=None):
+        """ Returns the pool shared for base_url, creating it on first use
+
+        pool_size, idle_timeout and socket_path, when given, override the settings of an existing pool
+        """
+        with cls._pools_lock:
+            pool = cls._pools.get(base_url)
+            if pool is None:
+                pool = cls(base_url)
+                cls._pools[base_url] = pool
+            if pool_size is not None:
+                pool.pool_size = int(pool_size)
+            if idle_timeout is not None:
+                pool.idle_timeout = idle_timeout
+            if socket_path is not None:
+                pool.socket_path = socket_path
+        return pool
+
+    @classmethod
+    def close_all(cls):
+        """ Closes the idle connections of every pool """
+        with cls._pools_lock:
+            pools = list(cls._pools.values())
+        for pool in pools:
+            pool.close()
+
+    def _acquire(self):
+        """ Returns (connection, reused) """
+        now = time.time()
+        with self._lock:
+            while self._idle:
+                conn, released_at = self._idle.pop()
+                if now - released_at < self.idle_timeout and not _is_dropped(conn):
+                    return conn, True
+                conn.close()
+        return self._connection(), False
+
+    def _connection(self):
+        """ Returns a new connection """
+        if self.socket_path:
+            host = self.base_url.rsplit(':', 1)[0]
+            return UnixHTTPConnection(self.socket_path, host, timeout=self.timeout)
+        return http.client.HTTPConnection(self.base_url, timeout=self.timeout)
+
+    def _fall_back_to_tcp(self, ex):
+        """ Stops using the unix domain socket, which can not be connected to """
+        _LOGGER.warning("Unable to connect to the storage service over %s, %s; falling back to TCP on %s",
+                        self.socket_path, str(ex), self.base_url)
+        self.socket_path = None
+        self.close()
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append((conn, time.time()))
+                return
+        conn.close()
+
+    def close(self):
+        """ Closes all the idle connections """
+        with self._lock:
+            idle, self._idle = self._idle, collections.deque()
+        for conn, _ in idle:
+            conn.close()
+
+    def request(self, method, url, body=None, headers=None):
+        """ Sends a request over a pooled connection
+
+        Idle connections closed by the server are discarded. A reused connection that fails while the request is
+        sent is discarded as well and the request is sent again, once, over a new connection. Once the request has
+        been sent, an error is raised: the storage service may have applied it. If the unix domain socket can not be
+        connected to, the request is sent again over TCP, which is used from then on.
+
+        :return: (http.client.HTTPResponse, decoded response body)
+        """
+        headers = headers or {}
+        conn, reused = self._acquire()
+        while True:
+            try:
+                conn.request(method, url=url, body=body, headers=headers)
+                break
+            except _RECONNECT_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+            except _UNIX_SOCKET_ERRORS as ex:
+                conn.close()
+                if reused or not isinstance(conn, UnixHTTPConnection):
+                    raise
+                self._fall_back_to_tcp(ex)
+            except Exception:
+                conn.close()
+                raise
+            conn, reused = self._connection(), False
+
+        try:
+            r = conn.getresponse()
+            res = r.read().decode()
+        except Exception:
+            conn.close()
+            raise
+
+        if r.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return r, res
+
+    def __len__(self):
+        """ Number of idle connections """
+        return len(self._idle)
@@ -18,8 +18,9 @@ __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
 __license__ = "Apache 2.0"
 __version__ = "${VERSION}"
 
-__all__ = ('BadRequest', 'StorageServiceUnavailable', 'InvalidServiceInstance', 'InvalidReadingsPurgeFlagParameters',
-           'PurgeOneOfAgeAndSize', 'PurgeOnlyOneOfAgeAndSize', 'StorageServerError')
+__all__ = ('BadRequest', 'StorageServiceUnavailable', 'CircuitBreakerOpen', 'InvalidServiceInstance',
+           'InvalidReadingsPurgeFlagParameters', 'PurgeOneOfAgeAndSize', 'PurgeOnlyOneOfAgeAndSize',
+           'StorageServerError')
 
 
 class StorageClientException(Exception):
@@ -52,6 +53,15 @@ class StorageServiceUnavailable(StorageClientException):
         self.message = "Storage service is unavailable"
 
 
+class CircuitBreakerOpen(StorageServiceUnavailable):
+    """ 503 - Service Unavailable, the call was not sent as the storage service keeps failing
+    """
+    def __init__(self, retry_after=0.0):
+        self.code = 503
+        self.message = "Storage service is unavailable, circuit breaker is open"
+        self.retry_after = retry_after
+
+
 class InvalidServiceInstance(StorageClientException):
     """ 502 - Invalid Storage Service
     """
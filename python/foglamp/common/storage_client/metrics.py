@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" In-process profile of the calls made by the storage clients to the storage service
+
+The calls are aggregated per storage service endpoint and table:
+
+    with StorageMetrics.timer('PUT /storage/table/query', tbl_name, payload) as timer:
+        r, res = ...
+        timer.response(r.status, body_length(res, r.getheader('Content-Length')), jdoc)
+
+StorageMetrics.snapshot() returns, for each endpoint and table, the number of calls, errors and retryable errors,
+the request and response bytes, str bodies being counted as the UTF-8 bytes sent, and the latency histogram.
+
+When given the CircuitBreaker of the storage service, the timer also guards the call with it.
+"""
+
+import asyncio
+import bisect
+import threading
+import time
+
+from foglamp.common.storage_client.cache import StorageCache
+from foglamp.common.storage_client.circuit_breaker import CircuitBreaker
+from foglamp.common.storage_client.exceptions import StorageServerError
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('StorageMetrics',)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+"""Upper bounds, in seconds, of the latency histogram buckets; slower calls are counted in a last, unbounded one"""
+
+
+def cumulative_buckets(bounds, counts):
+    """ Returns the buckets of a histogram keyed by their upper bound, as Prometheus "le" buckets: the count of each
+    includes those of the buckets before it, the "+Inf" one is the count of all the values
+
+    :param bounds: upper bounds of the buckets
+    :param counts: count of the values of each bucket alone, and of those above the last bound
+    """
+    buckets = {}
+    total = 0
+    for bound, count in zip(bounds, counts):
+        total += count
+        buckets[str(bound)] = total
+    buckets['+Inf'] = total + counts[-1]
+    return buckets
+
+
+_RETRYABLE_ERRORS = (OSError, asyncio.TimeoutError)
+"""Failures to reach the storage service, e.g. connection refused or reset, that are worth a retry"""
+
+
+class _EndpointMetrics(object):
+    __slots__ = ('calls', 'errors', 'retryable', 'request_bytes', 'response_bytes', 'latency_total', 'latency_max',
+                 'latency_buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retryable = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def to_dict(self):
+        return {"calls": self.calls, "errors": self.errors, "retryable": self.retryable,
+                "request_bytes": self.request_bytes, "response_bytes": self.response_bytes,
+                "latency": {"total": self.latency_total, "max": self.latency_max,
+                            "buckets": cumulative_buckets(LATENCY_BUCKETS, self.latency_buckets)}}
+
+
+def body_length(body, content_length=None):
+    """ Returns the length in bytes of a request or response body
+
+    :param body: the body, a str is counted as its UTF-8 encoding, as it is sent; None when there is none
+    :param content_length: Content-Length header of the response, counted rather than the body when not None
+    """
+    if content_length is not None:
+        return int(content_length)
+    if not body:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    return len(body)
+
+
+class _Timer(object):
+    """ Measures a call; the call is recorded as an error if it raises or the storage service returns an error """
+
+    __slots__ = ('endpoint', 'tbl_name', 'breaker', 'request_bytes', 'response_bytes', 'status', 'retryable',
+                 'started')
+
+    def __init__(self, endpoint, tbl_name, payload, breaker):
+        self.endpoint = endpoint
+        self.tbl_name = tbl_name
+        self.breaker = breaker
+        self.request_bytes = body_length(payload)
+        self.response_bytes = 0
+        self.status = None
+        self.retryable = False
+
+    def response(self, status, size, jdoc=None):
+        """ Records the response of the storage service
+
+        :param size: response body length in bytes, see body_length, None when unknown
+        :param jdoc: decoded response, whose retryable flag is read on an error status
+        """
+        self.status = status
+        self.response_bytes = size or 0
+        if status >= 400 and isinstance(jdoc, dict):
+            self.retryable = bool(jdoc.get('retryable', False))
+
+    def __enter__(self):
+        if self.breaker is not None:
+            self.breaker.allow()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        error = exc_type is not None or (self.status is not None and self.status >= 400)
+        retryable = self.retryable or isinstance(exc, _RETRYABLE_ERRORS)
+        if not retryable and isinstance(exc, StorageServerError) and isinstance(exc.error, dict):
+            retryable = bool(exc.error.get('retryable', False))
+        StorageMetrics.record(self.endpoint, self.tbl_name, elapsed, self.request_bytes, self.response_bytes,
+                              error, retryable)
+        if self.breaker is not None:
+            if isinstance(exc, asyncio.CancelledError):
+                self.breaker.release()
+            elif error and retryable:
+                self.breaker.failure()
+            else:
+                self.breaker.success()
+
+
+class StorageMetrics(object):
+    """ Thread-safe aggregation of the storage calls of the process """
+
+    _endpoints = {}
+    """(endpoint, table) -> _EndpointMetrics"""
+
+    _lock = threading.Lock()
+
+    @classmethod
+    def timer(cls, endpoint, tbl_name, payload=None, breaker=None):
+        """ Returns a context manager measuring a call
+
+        :param endpoint: method and path of the storage service endpoint, e.g. 'PUT /storage/table/query'
+        :param tbl_name: table the call is made on
+        :param payload: request body, to count its length
+        :param breaker: CircuitBreaker of the storage service, refusing the call with CircuitBreakerOpen while it
+                        is open and told the outcome of the call
+        """
+        return _Timer(endpoint, tbl_name, payload, breaker)
+
+    @classmethod
+    def record(cls, endpoint, tbl_name, latency, request_bytes=0, response_bytes=0, error=False, retryable=False):
+        """ Adds a call to the profile """
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, latency)
+        with cls._lock:
+            metrics = cls._endpoints.get((endpoint, tbl_name))
+            if metrics is None:
+                metrics = cls._endpoints[(endpoint, tbl_name)] = _EndpointMetrics()
+            metrics.calls += 1
+            metrics.request_bytes += request_bytes
+            metrics.response_bytes += response_bytes
+            metrics.latency_total += latency
+            if latency > metrics.latency_max:
+                metrics.latency_max = latency
+            metrics.latency_buckets[bucket] += 1
+            if error:
+                metrics.errors += 1
+                if retryable:
+                    metrics.retryable += 1
+
+    @classmethod
+    def snapshot(cls):
+        """ Returns the profile, as a list of dict sorted by endpoint and table """
+        with cls._lock:
+            items = sorted(cls._endpoints.items(), key=lambda item: item[0])
+            return [dict(endpoint=endpoint, table=tbl_name, **metrics.to_dict())
+                    for (endpoint, tbl_name), metrics in items]
+
+    @classmethod
+    def report(cls):
+        """ Returns the profile of the calls, the counters of the cached tables and the state of the circuit
+        breakers, as served by the APIs """
+        return {"calls": cls.snapshot(), "cache": StorageCache.stats_all(), "breakers": CircuitBreaker.stats_all()}
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._endpoints = {}
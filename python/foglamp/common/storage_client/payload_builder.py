@@ -5,6 +5,16 @@
 # FOGLAMP_END
 
 """ Storage layer python client payload builder
+
+Each PayloadBuilder holds its own query, so that payloads can be built concurrently, e.g. by interleaved coroutines.
+
+A query run again and again with different values is compiled once, with named parameters in place of the values:
+
+    _UPDATE_VALUE = PayloadBuilder().WHERE(["key", "=", Param("key")]).EXPR(["value", "+", Param("increment")]).compile()
+    ...
+    payload = _UPDATE_VALUE.bind(key=key, increment=value_increment)
+
+bind() only encodes the values; the rest of the payload has been serialized by compile().
 """
 
 __author__ = "Amarendra K Sinha"
@@ -14,14 +24,79 @@ __version__ = "${VERSION}"
 
 from collections import OrderedDict
 import json
+import re
 import urllib.parse
 import numbers
 
 from foglamp.common import logger
+from foglamp.common.storage_client.utils import Utils
 
 
 _LOGGER = logger.setup(__name__)
 
+_PARAM_SLOT = re.compile(r'"\\u0000(\w+)\\u0000"')
+"""A Param, as serialized by CompiledPayload: the name of the parameter between NUL characters"""
+
+
+class Param(object):
+    """ Named parameter of a query, in place of a value, bound by CompiledPayload.bind() """
+
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        if not re.match(r'^\w+$', name):
+            raise ValueError("Parameter name must be made of letters, digits and underscores only")
+        self.name = name
+
+    def __repr__(self):
+        return 'Param({!r})'.format(self.name)
+
+
+def _encode_value(value):
+    """ Returns the JSON of a parameter value, as json.dumps() does, with shortcuts for str and int """
+    value_type = type(value)
+    if value_type is str:
+        return json.encoder.encode_basestring_ascii(value)
+    if value_type is int:
+        return int.__repr__(value)
+    return json.dumps(value, sort_keys=False)
+
+
+class CompiledPayload(object):
+    """ Payload of a query serialized once, with the values of its Param bound on each use """
+
+    __slots__ = ('_literals', '_names', 'params')
+
+    def __init__(self, query_payload):
+        text = json.dumps(query_payload, sort_keys=False, default=self._placeholder)
+        parts = _PARAM_SLOT.split(text)
+        self._literals = parts[0::2]
+        self._names = parts[1::2]
+        self.params = frozenset(self._names)
+        """names of the parameters to be bound"""
+
+    @staticmethod
+    def _placeholder(obj):
+        if isinstance(obj, Param):
+            return '\x00{}\x00'.format(obj.name)
+        raise TypeError("{!r} is not JSON serializable".format(obj))
+
+    def bind(self, **values):
+        """ Returns the payload with the given value for each parameter, as PayloadBuilder.payload() would
+
+        :raises ValueError: if a parameter has no value, or a value is given for an unknown parameter
+        """
+        if len(values) != len(self.params) or not self.params.issuperset(values):
+            missing = self.params.difference(values)
+            unknown = set(values).difference(self.params)
+            raise ValueError("Payload parameters missing: {}, unknown: {}".format(sorted(missing), sorted(unknown)))
+        literals = self._literals
+        chunks = [literals[0]]
+        for name, literal in zip(self._names, literals[1:]):
+            chunks.append(_encode_value(values[name]))
+            chunks.append(literal)
+        return ''.join(chunks)
+
 
 class PayloadBuilder(object):
     """ Payload Builder to be used in Python client  for Storage Service
@@ -35,11 +110,11 @@ class PayloadBuilder(object):
     '''
     # TODO: Add tests
 
-    query_payload = None
-
-    def __init__(self, initial_payload=OrderedDict()):
-        # TODO: Investigate why simple "self.__class__.query_payload = initial_payload" is not working
-        self.__class__.query_payload = initial_payload if len(initial_payload) else OrderedDict()
+    def __init__(self, initial_payload=None):
+        """
+        :param initial_payload: query, e.g. returned by chain_payload(), to be extended in place
+        """
+        self.query_payload = initial_payload if initial_payload else OrderedDict()
 
     @staticmethod
     def verify_select(arg):
@@ -157,8 +232,7 @@ class PayloadBuilder(object):
                 my_item[clause] = clause_value
             qp['group'] = my_item
 
-    @classmethod
-    def _add_clause(cls, clause, main_key, args):
+    def _add_clause(self, clause, main_key, args):
         """
         Adds "alias" and "format" clauses to columns in payload info. Currently, adding clauses is supported at two
         actions only - SELECT and AGGREGATE.
@@ -171,29 +245,28 @@ class PayloadBuilder(object):
         :return:
         """
         if clause not in ['alias', 'format', 'group']:
-            return cls
+            return self
 
         if main_key in ['return', 'aggregate', 'group']:
             for arg in args:
-                if cls.verify_alias(arg):
+                if self.verify_alias(arg):
                     if main_key == 'return':
                         col = arg[0]
                         alias = arg[1]
-                        cls.add_clause_to_select(clause, cls.query_payload[main_key], col, alias)
+                        self.add_clause_to_select(clause, self.query_payload[main_key], col, alias)
                     if main_key == 'aggregate':
                         col = arg[0]
                         opr = arg[1]
                         alias = arg[2]
-                        cls.add_clause_to_aggregate(clause, cls.query_payload[main_key], col, opr, alias)
+                        self.add_clause_to_aggregate(clause, self.query_payload[main_key], col, opr, alias)
                     if main_key == 'group':
                         col = arg[0]
                         alias = arg[1]
-                        cls.add_clause_to_group(clause, cls.query_payload, col, alias)
+                        self.add_clause_to_group(clause, self.query_payload, col, alias)
 
-        return cls
+        return self
 
-    @classmethod
-    def ALIAS(cls, main_key, *args):
+    def ALIAS(self, main_key, *args):
         """
         Adds "alias" to columns in payload info. Currently, adding clauses is supported at two
         actions only - SELECT and AGGREGATE.
@@ -259,10 +332,9 @@ class PayloadBuilder(object):
               ]
             }
         """
-        return cls._add_clause('alias', main_key, args)
+        return self._add_clause('alias', main_key, args)
 
-    @classmethod
-    def FORMAT(cls, main_key, *args):
+    def FORMAT(self, main_key, *args):
         """
         Adds "format" to columns in payload info. Currently, adding clauses is supported at two
         actions only - SELECT and AGGREGATE.
@@ -277,10 +349,9 @@ class PayloadBuilder(object):
             FORMAT('return', ('user_ts', "YYYY-MM-DD HH24:MI:SS.MS")).payload() returns
             {"return": ["reading", {"format": "YYYY-MM-DD HH24:MI:SS.MS", "column": "user_ts", "alias": "timestamp"}]}
         """
-        return cls._add_clause('format', main_key, args)
+        return self._add_clause('format', main_key, args)
 
-    @classmethod
-    def SELECT(cls, *args):
+    def SELECT(self, *args):
         """
         Forms a json to return a list of columns.
 
@@ -288,48 +359,45 @@ class PayloadBuilder(object):
         :return:
         """
         for arg in args:
-            if cls.verify_select(arg):
-                if 'return' not in cls.query_payload:
-                    cls.query_payload["return"] = list()
+            if self.verify_select(arg):
+                if 'return' not in self.query_payload:
+                    self.query_payload["return"] = list()
                 if isinstance(arg, tuple):
                     for a in arg:
                         if isinstance(a, list):
                             select = {"json": {'column': a[0], 'properties': a[1]}}
                         elif isinstance(a, str):
-                            select = json.loads(a) if cls.is_json(a) else a
+                            select = json.loads(a) if self.is_json(a) else a
                         else:
                             continue
-                        cls.query_payload["return"].append(select)
+                        self.query_payload["return"].append(select)
                 else:
                     if isinstance(arg, list):
                         select = {"json": {'column': arg[0], 'properties': arg[1]}}
                     elif isinstance(arg, str):
-                        select = json.loads(arg) if cls.is_json(arg) else arg
+                        select = json.loads(arg) if self.is_json(arg) else arg
                     else:
                         continue
-                    cls.query_payload["return"].append(select)
-        return cls
+                    self.query_payload["return"].append(select)
+        return self
 
-    @classmethod
-    def FROM(cls, tbl_name):
-        cls.query_payload["table"] = tbl_name
-        return cls
+    def FROM(self, tbl_name):
+        self.query_payload["table"] = tbl_name
+        return self
 
-    @classmethod
-    def DISTINCT(cls, cols):
+    def DISTINCT(self, cols):
         if cols is None:
-            return cls
+            return self
         if not isinstance(cols, list):
-            return cls
+            return self
         if len(cols) == 0:
-            return cls
-        cls.query_payload["modifier"] = "distinct"
-        cls.query_payload["return"] = cols
-        return cls
+            return self
+        self.query_payload["modifier"] = "distinct"
+        self.query_payload["return"] = cols
+        return self
 
-    @classmethod
-    def UPDATE_TABLE(cls, tbl_name):
-        return cls.FROM(tbl_name)
+    def UPDATE_TABLE(self, tbl_name):
+        return self.FROM(tbl_name)
 
     @classmethod
     def COLS(cls, kwargs):
@@ -338,36 +406,32 @@ class PayloadBuilder(object):
             values[key] = value
         return values
 
-    @classmethod
-    def SET(cls, **kwargs):
-        if 'values' in cls.query_payload:
-            cls.query_payload["values"].update(cls.COLS(kwargs))
+    def SET(self, **kwargs):
+        if 'values' in self.query_payload:
+            self.query_payload["values"].update(self.COLS(kwargs))
         else:
-            cls.query_payload["values"] = cls.COLS(kwargs)
-        return cls
+            self.query_payload["values"] = self.COLS(kwargs)
+        return self
 
-    @classmethod
-    def INSERT(cls, **kwargs):
-        cls.query_payload.update(cls.COLS(kwargs))
-        return cls
+    def INSERT(self, **kwargs):
+        self.query_payload.update(self.COLS(kwargs))
+        return self
 
-    @classmethod
-    def INSERT_INTO(cls, tbl_name):
-        return cls.FROM(tbl_name)
+    def INSERT_INTO(self, tbl_name):
+        return self.FROM(tbl_name)
 
-    @classmethod
-    def DELETE(cls, tbl_name):
-        return cls.FROM(tbl_name)
+    def DELETE(self, tbl_name):
+        return self.FROM(tbl_name)
 
     @classmethod
     def add_new_clause(cls, and_or, main, new):
         """
-        Recursively searches for the innermost and/or block, or cls.query_payload["where"] if none, in "main" to add
+        Recursively searches for the innermost and/or block, or query_payload["where"] if none, in "main" to add
         the 'new' condition block under "and_or" key.
 
         Args:
             and_or: one of 'and', 'or'
-            main: Dict (cls.query_payload["where"] or the innermost and/or subset of it) where
+            main: Dict (query_payload["where"] or the innermost and/or subset of it) where
                   the new condition block is to be added
             new: condition block to be added
 
@@ -381,62 +445,57 @@ class PayloadBuilder(object):
         else:
             cls.add_new_clause(and_or, main['and'], new)
 
-    @classmethod
-    def WHERE(cls, arg, *args):
+    def WHERE(self, arg, *args):
         # Pass multiple arguments in a single tuple also. Useful when called from external process i.e. api, test.
         args = (arg,) + args if not isinstance(arg, tuple) else arg
         for arg in args:
             condition = OrderedDict()
-            if cls.verify_condition(arg):
+            if self.verify_condition(arg):
                 condition["column"] = arg[0]
                 condition["condition"] = arg[1]
                 condition["value"] = arg[2]
-                if 'where' not in cls.query_payload:
-                    cls.query_payload["where"] = condition
+                if 'where' not in self.query_payload:
+                    self.query_payload["where"] = condition
                 else:
-                    cls.add_new_clause('and', cls.query_payload['where'], condition)
-        return cls
+                    self.add_new_clause('and', self.query_payload['where'], condition)
+        return self
 
-    @classmethod
-    def AND_WHERE(cls, arg, *args):
+    def AND_WHERE(self, arg, *args):
         # Pass multiple arguments in a single tuple also. Useful when called from external process i.e. api, test.
         args = (arg,) + args if not isinstance(arg, tuple) else arg
         for arg in args:
             condition = OrderedDict()
-            if cls.verify_condition(arg):
+            if self.verify_condition(arg):
                 condition["column"] = arg[0]
                 condition["condition"] = arg[1]
                 condition["value"] = arg[2]
-                if 'where' not in cls.query_payload:
-                    cls.query_payload["where"] = condition
+                if 'where' not in self.query_payload:
+                    self.query_payload["where"] = condition
                 else:
-                    cls.add_new_clause('and', cls.query_payload['where'], condition)
-        return cls
+                    self.add_new_clause('and', self.query_payload['where'], condition)
+        return self
 
-    @classmethod
-    def OR_WHERE(cls, arg, *args):
+    def OR_WHERE(self, arg, *args):
         # Pass multiple arguments in a single tuple also. Useful when called from external process i.e. api, test.
         args = (arg,) + args if not isinstance(arg, tuple) else arg
         for arg in args:
             condition = OrderedDict()
-            if cls.verify_condition(arg):
+            if self.verify_condition(arg):
                 condition["column"] = arg[0]
                 condition["condition"] = arg[1]
                 condition["value"] = arg[2]
-                if 'where' not in cls.query_payload:
-                    cls.query_payload["where"] = condition
+                if 'where' not in self.query_payload:
+                    self.query_payload["where"] = condition
                 else:
-                    cls.add_new_clause('or', cls.query_payload['where'], condition)
-        return cls
+                    self.add_new_clause('or', self.query_payload['where'], condition)
+        return self
 
-    @classmethod
-    def GROUP_BY(cls, *args):
+    def GROUP_BY(self, *args):
         # TODO: Add dict format for args
-        cls.query_payload["group"] = ', '.join(args)
-        return cls
+        self.query_payload["group"] = ', '.join(args)
+        return self
 
-    @classmethod
-    def AGGREGATE(cls, arg, *args):
+    def AGGREGATE(self, arg, *args):
         """
         Forms a json to return a dict (for a single col) or a list of dicts required in an aggregate clause.
 
@@ -457,7 +516,7 @@ class PayloadBuilder(object):
         args = (arg,) + args if not isinstance(arg, tuple) else arg
         for arg in args:
             aggregate = OrderedDict()
-            if cls.verify_aggregation(arg):
+            if self.verify_aggregation(arg):
                 aggregate["operation"] = arg[0]
                 if isinstance(arg[1], list):
                     aggregate["json"] = {'column': arg[1][0], 'properties': arg[1][1]}
@@ -465,51 +524,106 @@ class PayloadBuilder(object):
                     aggregate["column"] = arg[1]
                 else:
                     continue
-                if 'aggregate' in cls.query_payload:
-                    if not isinstance(cls.query_payload['aggregate'], list):
-                        cls.query_payload['aggregate'] = [cls.query_payload.get('aggregate')]
-                    cls.query_payload['aggregate'].append(aggregate)
+                if 'aggregate' in self.query_payload:
+                    if not isinstance(self.query_payload['aggregate'], list):
+                        self.query_payload['aggregate'] = [self.query_payload.get('aggregate')]
+                    self.query_payload['aggregate'].append(aggregate)
                 else:
-                    cls.query_payload["aggregate"] = aggregate
-        return cls
+                    self.query_payload["aggregate"] = aggregate
+        return self
 
-    @classmethod
-    def HAVING(cls):
+    def HAVING(self):
         raise NotImplementedError("To be implemented")
 
-    @classmethod
-    def LIMIT(cls, arg):
-        if isinstance(arg, numbers.Real):
-            cls.query_payload["limit"] = arg
-        return cls
+    def LIMIT(self, arg):
+        if isinstance(arg, (numbers.Real, Param)):
+            self.query_payload["limit"] = arg
+        return self
 
-    @classmethod
-    def OFFSET(cls, arg):
-        if isinstance(arg, numbers.Real):
-            cls.query_payload["skip"] = arg
-        return cls
+    def OFFSET(self, arg):
+        if isinstance(arg, (numbers.Real, Param)):
+            self.query_payload["skip"] = arg
+        return self
 
     SKIP = OFFSET
 
-    @classmethod
-    def ORDER_BY(cls, arg, *args):
+    def ORDER_BY(self, arg, *args):
         # Pass multiple arguments in a single tuple also. Useful when called from external process i.e. api, test.
         args = (arg,) + args if not isinstance(arg, tuple) else arg
         for arg in args:
             sort = OrderedDict()
-            if cls.verify_orderby(arg):
+            if self.verify_orderby(arg):
                 sort["column"] = arg[0]
                 sort["direction"] = arg[1]
-                if 'sort' in cls.query_payload:
-                    if not isinstance(cls.query_payload['sort'], list):
-                        cls.query_payload['sort'] = [cls.query_payload.get('sort')]
-                    cls.query_payload['sort'].append(sort)
+                if 'sort' in self.query_payload:
+                    if not isinstance(self.query_payload['sort'], list):
+                        self.query_payload['sort'] = [self.query_payload.get('sort')]
+                    self.query_payload['sort'].append(sort)
                 else:
-                    cls.query_payload["sort"] = sort
-        return cls
+                    self.query_payload["sort"] = sort
+        return self
 
-    @classmethod
-    def EXPR(cls, arg, *args):
+    def KEYSET(self, cursor=None, asset_codes=None, conditions=(), keys=('user_ts', 'id'), descending=False):
+        """
+        Forms the where and sort clauses of a page of readings, ordered on keys, following the row at cursor.
+
+        Paging on the values of the last row returned, rather than with SKIP, costs the same for every page; the
+        last key must be unique, e.g. id.
+
+        The storage service joins the conditions of a where clause with AND and OR as they are, without grouping
+        them, hence the clause is made of one AND group for each asset code and key, joined with OR:
+
+            asset_code = 'A' AND user_ts > '<ts>' OR asset_code = 'A' AND user_ts = '<ts>' AND id > <id> OR ...
+
+        :param cursor: values of keys of the last row of the previous page, None for the first page
+        :param asset_codes: an asset code or a list of them, None for all the assets
+        :param conditions: further [col, condition, value] conditions, e.g. ['user_ts', 'newer', 3600]
+        :param keys: columns the readings are ordered on
+        :param descending: pages go backward from cursor, e.g. the latest readings first
+        :return:
+        :example:
+        PayloadBuilder().KEYSET(cursor=('2018-03-08 15:00:00.025+00', 23), asset_codes='fogbench/humidity')
+            .LIMIT(20).payload() returns the 20 readings of fogbench/humidity that follow reading 23 in user_ts order
+        """
+        if 'where' in self.query_payload or 'sort' in self.query_payload:
+            raise ValueError("KEYSET cannot be combined with other where or sort clauses")
+        if cursor is not None and len(cursor) != len(keys):
+            raise ValueError("Keyset cursor must have a value for each of {}".format(list(keys)))
+        for condition in conditions:
+            if not self.verify_condition(condition):
+                raise ValueError("Invalid condition {}".format(condition))
+
+        if asset_codes is None:
+            filters = [list(conditions)]
+        else:
+            if isinstance(asset_codes, str):
+                asset_codes = [asset_codes]
+            if not asset_codes:
+                raise ValueError("Keyset asset codes must not be empty, None selects all the assets")
+            filters = [[["asset_code", "=", asset_code]] + list(conditions) for asset_code in asset_codes]
+
+        groups = []
+        for group in filters:
+            if cursor is None:
+                groups.append(group)
+                continue
+            for i, key in enumerate(keys):
+                equal = [[k, "=", v] for k, v in zip(keys[:i], cursor[:i])]
+                groups.append(group + equal + [[key, "<" if descending else ">", cursor[i]]])
+
+        for group_idx, group in enumerate(groups):
+            for idx, condition in enumerate(group):
+                if idx > 0:
+                    self.AND_WHERE(condition)
+                elif group_idx > 0:
+                    self.OR_WHERE(condition)
+                else:
+                    self.WHERE(condition)
+
+        direction = "desc" if descending else "asc"
+        return self.ORDER_BY(tuple([key, direction] for key in keys))
+
+    def EXPR(self, arg, *args):
         args = (arg,) + args if not isinstance(arg, tuple) else arg
 
         for arg in args:
@@ -518,14 +632,13 @@ class PayloadBuilder(object):
             expr["operator"] = arg[1]
             expr["value"] = arg[2]
 
-            if 'expressions' in cls.query_payload:
-                cls.query_payload['expressions'].append(expr)
+            if 'expressions' in self.query_payload:
+                self.query_payload['expressions'].append(expr)
             else:
-                cls.query_payload['expressions'] = [expr]
-        return cls
+                self.query_payload['expressions'] = [expr]
+        return self
 
-    @classmethod
-    def JSON_PROPERTY(cls, *args):
+    def JSON_PROPERTY(self, *args):
         """
         Forms a json to return a list of dicts required in a json_properties clause.
 
@@ -548,20 +661,19 @@ class PayloadBuilder(object):
         # Pass multiple arguments in a single tuple also. Useful when called from external process i.e. api, test.
         for arg in args:
             json_property = OrderedDict()
-            if cls.verify_json_property(arg):
+            if self.verify_json_property(arg):
                 json_property["column"] = arg[0]
                 json_property["path"] = arg[1]
                 json_property["value"] = arg[2]
-                if 'json_properties' in cls.query_payload:
-                    if not isinstance(cls.query_payload['json_properties'], list):
-                        cls.query_payload['json_properties'] = [cls.query_payload.get('json_properties')]
-                    cls.query_payload['json_properties'].append(json_property)
+                if 'json_properties' in self.query_payload:
+                    if not isinstance(self.query_payload['json_properties'], list):
+                        self.query_payload['json_properties'] = [self.query_payload.get('json_properties')]
+                    self.query_payload['json_properties'].append(json_property)
                 else:
-                    cls.query_payload["json_properties"] = [json_property]
-        return cls
+                    self.query_payload["json_properties"] = [json_property]
+        return self
 
-    @classmethod
-    def TIMEBUCKET(cls, timestamp, size="1", fmt=None, alias=None):
+    def TIMEBUCKET(self, timestamp, size="1", fmt=None, alias=None):
         """
         Forms a json to return a dict of timebucket col
 
@@ -600,27 +712,39 @@ class PayloadBuilder(object):
             timebucket["format"] = fmt
         if alias is not None:
             timebucket["alias"] = alias
-        cls.query_payload["timebucket"] = timebucket
+        self.query_payload["timebucket"] = timebucket
 
-        return cls
+        return self
 
-    @classmethod
-    def payload(cls):
-        return json.dumps(cls.query_payload, sort_keys=False)
+    def payload(self):
+        return json.dumps(self.query_payload, sort_keys=False)
 
-    @classmethod
-    def chain_payload(cls):
+    def compile(self):
+        """ Returns the query as a CompiledPayload, to be bound to the values of its Param on each use """
+        return CompiledPayload(self.query_payload)
+
+    def chain_payload(self):
         """
         Sometimes, we may want to create payload incremently, based upon some conditions, this method will come
         handy in such Use cases.
         """
-        return cls.query_payload
+        return self.query_payload
 
-    @classmethod
-    def query_params(cls):
-        where = cls.query_payload['where']
+    def query_params(self):
+        where = self.query_payload['where']
         query_params = OrderedDict({where['column']: where['value']})
         for key, value in where.items():
             if key == 'and':
                 query_params.update({value['column']: value['value']})
         return urllib.parse.urlencode(query_params)
+
+    @staticmethod
+    def batch(payloads):
+        """
+        Combines payloads, as returned by payload(), into the JSON array accepted by insert_many / update_many,
+        so that they are applied with a single request:
+
+            updates = [PayloadBuilder().SET(value=0).WHERE(['key', '=', key]).payload() for key in keys]
+            storage_client.update_many('statistics', PayloadBuilder.batch(updates))
+        """
+        return Utils.serialize_list(payloads).decode()
@@ -13,18 +13,85 @@ __license__ = "Apache 2.0"
 __version__ = "${VERSION}"
 
 import aiohttp
+import asyncio
+import copy
 import http.client
+import inspect
+import itertools
 import json
+import os
 from abc import ABC, abstractmethod
 
-from foglamp.common import logger
+from foglamp.common import json_codec, logger
 from foglamp.common.service_record import ServiceRecord
+from foglamp.common.storage_client.cache import StorageCache
+from foglamp.common.storage_client.circuit_breaker import CircuitBreaker
+from foglamp.common.storage_client.connection_pool import HTTPConnectionPool
 from foglamp.common.storage_client.exceptions import *
+from foglamp.common.storage_client.metrics import StorageMetrics, body_length
+from foglamp.common.storage_client.payload_builder import PayloadBuilder
+from foglamp.common.storage_client.streaming import AsyncRowIterator
 from foglamp.common.storage_client.utils import Utils
 
 _LOGGER = logger.setup(__name__)
 
 
+def _keyset_query(asset_codes, cursor, columns, limit, conditions, keys, descending):
+    """ Returns the query payload of a page of readings, see ReadingsStorageClient.fetch_page """
+    try:
+        limit = int(limit)
+        if limit <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ValueError("limit must be a positive integer")
+
+    if isinstance(cursor, str):
+        cursor = Utils.decode_cursor(cursor)
+
+    builder = PayloadBuilder()
+    if columns:
+        # the keys of the last row make the next cursor
+        builder.SELECT(tuple(columns) + tuple(key for key in keys if key not in columns))
+    return builder.KEYSET(cursor, asset_codes, conditions, keys, descending).LIMIT(limit).payload(), limit
+
+
+def _keyset_page(jdoc, limit, keys):
+    """ Adds "next", the cursor token of the page following the rows of jdoc, None if it is the last page """
+    rows = jdoc.get('rows', [])
+    jdoc['next'] = Utils.encode_cursor(rows[-1][key] for key in keys) if len(rows) >= limit else None
+    return jdoc
+
+
+class _UnixConnector(aiohttp.UnixConnector):
+    """ Connector over the unix domain socket of the storage service, which falls back to TCP, from then on, when the
+    socket can not be connected to, e.g. a stale socket file left behind by a storage service that is not running """
+
+    def __init__(self, path, base_url, **kwargs):
+        super().__init__(path=path, **kwargs)
+        self._base_url = base_url
+        self._tcp_kwargs = kwargs
+        self._tcp_connector = None
+
+    async def connect(self, req, *args, **kwargs):
+        if self._tcp_connector is None:
+            try:
+                return await super().connect(req, *args, **kwargs)
+            except (aiohttp.ClientConnectorError, OSError) as ex:
+                if self._tcp_connector is None:
+                    _LOGGER.warning("Unable to connect to the storage service over %s, %s; falling back to TCP on %s",
+                                    self.path, str(ex), self._base_url)
+                    self._tcp_connector = aiohttp.TCPConnector(**self._tcp_kwargs)
+        return await self._tcp_connector.connect(req, *args, **kwargs)
+
+    def close(self):
+        # aiohttp 3 connectors return an awaitable from close(), aiohttp 2 ones close at once
+        closing = [super().close()]
+        if self._tcp_connector is not None:
+            closing.append(self._tcp_connector.close())
+        closing = [result for result in closing if inspect.isawaitable(result)]
+        return asyncio.gather(*closing) if closing else None
+
+
 class AbstractStorage(ABC):
     """ abstract class for storage client """
 
@@ -48,7 +115,7 @@ class AbstractStorage(ABC):
 
 
 class StorageClient(AbstractStorage):
-    def __init__(self, core_management_host, core_management_port, svc=None):
+    def __init__(self, core_management_host, core_management_port, svc=None, pool_size=None, idle_timeout=None):
         try:
             if svc:
                 self.service = svc
@@ -60,6 +127,23 @@ class StorageClient(AbstractStorage):
         except Exception:
             raise InvalidServiceInstance
 
+        # Connections are shared by all the clients of the same storage service
+        HTTPConnectionPool.get(self.base_url, pool_size=pool_size, idle_timeout=idle_timeout,
+                               socket_path=self.service._socket)
+
+    @property
+    def _cache(self):
+        return StorageCache.get(self.base_url)
+
+    @property
+    def _breaker(self):
+        return CircuitBreaker.get(self.base_url)
+
+    @property
+    def _connection_pool(self):
+        # TODO: need to set http / https based on service protocol
+        return HTTPConnectionPool.get(self.base_url)
+
     @property
     def base_url(self):
         return self.__base_url
@@ -112,20 +196,21 @@ class StorageClient(AbstractStorage):
             raise InvalidServiceInstance
         self.service = ServiceRecord(s_id=svc["id"], s_name=svc["name"], s_type=svc["type"], s_port=svc["service_port"],
                                      m_port=svc["management_port"], s_address=svc["address"],
-                                     s_protocol=svc["protocol"])
+                                     s_protocol=svc["protocol"], s_socket=svc.get("socket"))
 
         return self
 
     def disconnect(self):
-        pass
+        self._connection_pool.close()
 
     # FIXME: As per JIRA-615 strict=false at python side (interim solution)
     # fix is required at storage layer (error message with escape sequence using a single quote)
-    def insert_into_tbl(self, tbl_name, data):
+    def insert_into_tbl(self, tbl_name, data, validate=False):
         """ insert json payload into given table
 
         :param tbl_name:
-        :param data: JSON payload
+        :param data: JSON payload, a dict or a list, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
 
         :Example:
@@ -144,19 +229,19 @@ class StorageClient(AbstractStorage):
         if not data:
             raise ValueError("Data to insert is missing")
 
-        if not Utils.is_json(data):
+        data = Utils.serialize(data)
+        if validate and not Utils.is_json(data):
             raise TypeError("Provided data to insert must be a valid JSON")
 
-        conn = http.client.HTTPConnection(self.base_url)
-        # TODO: need to set http / https based on service protocol
-
         post_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
 
-        conn.request('POST', url=post_url, body=data)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
-        jdoc = json.loads(res, strict=False)
+        try:
+            with StorageMetrics.timer('POST /storage/table', tbl_name, data, breaker=self._breaker) as timer:
+                r, res = self._connection_pool.request('POST', post_url, body=data)
+                jdoc = json_codec.loads(res, strict=False)
+                timer.response(r.status, body_length(res, r.getheader('Content-Length')), jdoc)
+        finally:
+            self._cache.invalidate(tbl_name)
 
         if r.status in range(400, 600):
             _LOGGER.info("POST %s, with payload: %s", post_url, data)
@@ -165,11 +250,12 @@ class StorageClient(AbstractStorage):
 
         return jdoc
 
-    def update_tbl(self, tbl_name, data):
+    def update_tbl(self, tbl_name, data, validate=False):
         """ update json payload for specified condition into given table
 
         :param tbl_name:
-        :param data: JSON payload
+        :param data: JSON payload, a dict or a list, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
 
         :Example:
@@ -192,18 +278,19 @@ class StorageClient(AbstractStorage):
         if not data:
             raise ValueError("Data to update is missing")
 
-        if not Utils.is_json(data):
+        data = Utils.serialize(data)
+        if validate and not Utils.is_json(data):
             raise TypeError("Provided data to update must be a valid JSON")
 
-        conn = http.client.HTTPConnection(self.base_url)
-        # TODO: need to set http / https based on service protocol
         put_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
 
-        conn.request('PUT', url=put_url, body=data)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
-        jdoc = json.loads(res, strict=False)
+        try:
+            with StorageMetrics.timer('PUT /storage/table', tbl_name, data, breaker=self._breaker) as timer:
+                r, res = self._connection_pool.request('PUT', put_url, body=data)
+                jdoc = json_codec.loads(res, strict=False)
+                timer.response(r.status, body_length(res, r.getheader('Content-Length')), jdoc)
+        finally:
+            self._cache.invalidate(tbl_name)
 
         if r.status in range(400, 600):
             _LOGGER.info("PUT %s, with payload: %s", put_url, data)
@@ -212,11 +299,93 @@ class StorageClient(AbstractStorage):
 
         return jdoc
 
-    def delete_from_tbl(self, tbl_name, condition=None):
+    def insert_many(self, tbl_name, rows):
+        """ insert several rows into given table with a single request
+
+        The storage service inserts the rows in a single transaction: when a row fails, none of them is inserted and
+        the request can be sent again as a whole.
+
+        :param tbl_name:
+        :param rows: list of the rows, each a dict or already serialized as str / bytes as given to insert_into_tbl,
+                     or their JSON array e.g. PayloadBuilder.batch(...)
+        :return: {"response": "inserted", "rows_affected": <number of rows inserted>}
+
+        :Example:
+            curl -X POST http://0.0.0.0:8080/storage/table/statistics_history -d @payload.json
+            @payload.json content:
+
+            [
+                {"key" : "SENT_1", "history_ts" : "now()", "value" : 1},
+                {"key" : "SENT_2", "history_ts" : "now()", "value" : 5}
+            ]
+        """
+        if not rows:
+            raise ValueError("Rows to insert are missing")
+
+        if not isinstance(rows, (str, bytes, bytearray)):
+            rows = Utils.serialize_list(rows)
+
+        return self.insert_into_tbl(tbl_name, rows)
+
+    def update_many(self, tbl_name, updates):
+        """ apply several updates to given table with a single request
+
+        The storage service applies the updates in order in a single transaction: when an update fails, none of them
+        is applied and the request can be sent again as a whole.
+
+        :param tbl_name:
+        :param updates: list of the updates, each a dict or already serialized as str / bytes as given to
+                        update_tbl, or their JSON array e.g. PayloadBuilder.batch(...)
+        :return: {"response": "updated", "rows_affected": <total number of rows updated>}
+
+        :Example:
+            curl -X PUT http://0.0.0.0:8080/storage/table/statistics -d @payload.json
+            @payload.json content:
+
+            [
+                {"where" : {"column" : "key", "condition" : "=", "value" : "SENT_1"},
+                  "expressions" : [{"column" : "value", "operator" : "+", "value" : 10}]},
+                {"where" : {"column" : "key", "condition" : "=", "value" : "SENT_2"},
+                  "expressions" : [{"column" : "value", "operator" : "+", "value" : 4}]}
+            ]
+        """
+        if not updates:
+            raise ValueError("Updates are missing")
+
+        if not isinstance(updates, (str, bytes, bytearray)):
+            updates = Utils.serialize_list(updates)
+
+        return self.update_tbl(tbl_name, updates)
+
+    def execute_batch(self, operations):
+        """ run a sequence of inserts and updates, with as few requests as possible
+
+        Consecutive operations of the same kind on the same table are sent with a single insert_many / update_many
+        request, so that the order of the operations is kept.
+
+        :param operations: list of (tbl_name, 'insert' or 'update', payload)
+        :return: list of the responses, one for each request sent
+        """
+        operations = list(operations)
+        for tbl_name, operation, payload in operations:
+            if operation not in ('insert', 'update'):
+                raise ValueError("Batch operation must be one of insert, update")
+
+        responses = []
+        for (tbl_name, operation), group in itertools.groupby(operations, key=lambda op: (op[0], op[1])):
+            payloads = [payload for _, _, payload in group]
+            if operation == 'insert':
+                responses.append(self.insert_many(tbl_name, payloads))
+            else:
+                responses.append(self.update_many(tbl_name, payloads))
+        return responses
+
+    def delete_from_tbl(self, tbl_name, condition=None, validate=False):
         """ Delete for specified condition from given table
 
         :param tbl_name:
-        :param condition: JSON payload
+        :param condition: JSON payload, a dict, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
 
         :Example:
@@ -232,18 +401,20 @@ class StorageClient(AbstractStorage):
         if not tbl_name:
             raise ValueError("Table name is missing")
 
-        conn = http.client.HTTPConnection(self.base_url)
-        # TODO: need to set http / https based on service protocol
         del_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
 
-        if condition and (not Utils.is_json(condition)):
-            raise TypeError("condition payload must be a valid JSON")
+        if condition:
+            condition = Utils.serialize(condition)
+            if validate and not Utils.is_json(condition):
+                raise TypeError("condition payload must be a valid JSON")
 
-        conn.request('DELETE', url=del_url, body=condition)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
-        jdoc = json.loads(res, strict=False)
+        try:
+            with StorageMetrics.timer('DELETE /storage/table', tbl_name, condition, breaker=self._breaker) as timer:
+                r, res = self._connection_pool.request('DELETE', del_url, body=condition)
+                jdoc = json_codec.loads(res, strict=False)
+                timer.response(r.status, body_length(res, r.getheader('Content-Length')), jdoc)
+        finally:
+            self._cache.invalidate(tbl_name)
 
         if r.status in range(400, 600):
             _LOGGER.info("DELETE %s, with payload: %s", del_url, condition if condition else '')
@@ -266,32 +437,35 @@ class StorageClient(AbstractStorage):
         if not tbl_name:
             raise ValueError("Table name is missing")
 
-        conn = http.client.HTTPConnection(self.base_url)
-        # TODO: need to set http / https based on service protocol
-
         get_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
 
         if query:  # else SELECT * FROM <tbl_name>
             get_url += '?{}'.format(query)
 
-        conn.request('GET', url=get_url)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
-        jdoc = json.loads(res, strict=False)
+        cache_key = StorageCache.key(get_url)
+        cached, generation = self._cache.lookup(tbl_name, cache_key)
+        if cached is not None:
+            return cached
+
+        with StorageMetrics.timer('GET /storage/table', tbl_name, breaker=self._breaker) as timer:
+            r, res = self._connection_pool.request('GET', get_url)
+            jdoc = json_codec.loads(res, strict=False)
+            timer.response(r.status, body_length(res, r.getheader('Content-Length')), jdoc)
 
         if r.status in range(400, 600):
             _LOGGER.info("GET %s", get_url)
             _LOGGER.error("Error code: %d, reason: %s, details: %s", r.status, r.reason, jdoc)
             raise StorageServerError(code=r.status, reason=r.reason, error=jdoc)
 
+        self._cache.put(tbl_name, cache_key, jdoc, generation)
         return jdoc
 
-    def query_tbl_with_payload(self, tbl_name, query_payload):
+    def query_tbl_with_payload(self, tbl_name, query_payload, validate=False):
         """ Complex SELECT query for the specified table with a payload
 
         :param tbl_name:
-        :param query_payload: payload in valid JSON format
+        :param query_payload: payload in valid JSON format, a dict, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
 
         :Example:
@@ -309,24 +483,28 @@ class StorageClient(AbstractStorage):
         if not query_payload:
             raise ValueError("Query payload is missing")
 
-        if not Utils.is_json(query_payload):
+        query_payload = Utils.serialize(query_payload)
+        if validate and not Utils.is_json(query_payload):
             raise TypeError("Query payload must be a valid JSON")
 
-        conn = http.client.HTTPConnection(self.base_url)
-        # TODO: need to set http / https based on service protocol
         put_url = '/storage/table/{tbl_name}/query'.format(tbl_name=tbl_name)
 
-        conn.request('PUT', url=put_url, body=query_payload)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
-        jdoc = json.loads(res, strict=False)
+        cache_key = StorageCache.key(put_url, query_payload)
+        cached, generation = self._cache.lookup(tbl_name, cache_key)
+        if cached is not None:
+            return cached
+
+        with StorageMetrics.timer('PUT /storage/table/query', tbl_name, query_payload, breaker=self._breaker) as timer:
+            r, res = self._connection_pool.request('PUT', put_url, body=query_payload)
+            jdoc = json_codec.loads(res, strict=False)
+            timer.response(r.status, body_length(res, r.getheader('Content-Length')), jdoc)
 
         if r.status in range(400, 600):
             _LOGGER.info("PUT %s, with query payload: %s", put_url, query_payload)
             _LOGGER.error("Error code: %d, reason: %s, details: %s", r.status, r.reason, jdoc)
             raise StorageServerError(code=r.status, reason=r.reason, error=jdoc)
 
+        self._cache.put(tbl_name, cache_key, jdoc, generation)
         return jdoc
 
 
@@ -335,14 +513,15 @@ class ReadingsStorageClient(StorageClient):
 
     _base_url = ""
 
-    def __init__(self, core_mgt_host, core_mgt_port, svc=None):
-        super().__init__(core_management_host=core_mgt_host, core_management_port=core_mgt_port, svc=svc)
+    def __init__(self, core_mgt_host, core_mgt_port, svc=None, **kwargs):
+        super().__init__(core_management_host=core_mgt_host, core_management_port=core_mgt_port, svc=svc, **kwargs)
         self.__class__._base_url = self.base_url
 
     @classmethod
-    def append(cls, readings):
+    def append(cls, readings, validate=False):
         """
-        :param readings:
+        :param readings: a dict with the "readings" list, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
 
         :Example:
@@ -367,20 +546,18 @@ class ReadingsStorageClient(StorageClient):
 
         """
 
-        conn = http.client.HTTPConnection(cls._base_url)
-        # TODO: need to set http / https based on service protocol
-
         if not readings:
             raise ValueError("Readings payload is missing")
 
-        if not Utils.is_json(readings):
+        readings = Utils.serialize(readings)
+        if validate and not Utils.is_json(readings):
             raise TypeError("Readings payload must be a valid JSON")
 
-        conn.request('POST', url='/storage/reading', body=readings)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
-        jdoc = json.loads(res, strict=False)
+        with StorageMetrics.timer('POST /storage/reading', 'readings', readings,
+                                  breaker=CircuitBreaker.get(cls._base_url)) as timer:
+            r, res = HTTPConnectionPool.get(cls._base_url).request('POST', '/storage/reading', body=readings)
+            jdoc = json_codec.loads(res, strict=False)
+            timer.response(r.status, body_length(res, r.getheader('Content-Length')), jdoc)
 
         if r.status in range(400, 600):
             _LOGGER.error("POST url %s with payload: %s, Error code: %d, reason: %s, details: %s",
@@ -401,9 +578,6 @@ class ReadingsStorageClient(StorageClient):
 
         """
 
-        conn = http.client.HTTPConnection(cls._base_url)
-        # TODO: need to set http / https based on service protocol
-
         if reading_id is None:
             raise ValueError("first reading id to retrieve the readings block is required")
 
@@ -416,11 +590,11 @@ class ReadingsStorageClient(StorageClient):
             raise
 
         get_url = '/storage/reading?id={}&count={}'.format(reading_id, count)
-        conn.request('GET', url=get_url)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
-        jdoc = json.loads(res, strict=False)
+        with StorageMetrics.timer('GET /storage/reading', 'readings',
+                                  breaker=CircuitBreaker.get(cls._base_url)) as timer:
+            r, res = HTTPConnectionPool.get(cls._base_url).request('GET', get_url)
+            jdoc = json_codec.loads(res, strict=False)
+            timer.response(r.status, body_length(res, r.getheader('Content-Length')), jdoc)
 
         if r.status in range(400, 600):
             _LOGGER.error("GET url: %s, Error code: %d, reason: %s, details: %s", get_url, r.status, r.reason, jdoc)
@@ -429,10 +603,11 @@ class ReadingsStorageClient(StorageClient):
         return jdoc
 
     @classmethod
-    def query(cls, query_payload):
+    def query(cls, query_payload, validate=False):
         """
 
-        :param query_payload:
+        :param query_payload: a dict, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
         :Example:
             curl -X PUT http://0.0.0.0:8080/storage/reading/query -d @payload.json
@@ -450,17 +625,15 @@ class ReadingsStorageClient(StorageClient):
         if not query_payload:
             raise ValueError("Query payload is missing")
 
-        if not Utils.is_json(query_payload):
+        query_payload = Utils.serialize(query_payload)
+        if validate and not Utils.is_json(query_payload):
             raise TypeError("Query payload must be a valid JSON")
 
-        conn = http.client.HTTPConnection(cls._base_url)
-        # TODO: need to set http / https based on service protocol
-
-        conn.request('PUT', url='/storage/reading/query', body=query_payload)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
-        jdoc = json.loads(res, strict=False)
+        with StorageMetrics.timer('PUT /storage/reading/query', 'readings', query_payload,
+                                  breaker=CircuitBreaker.get(cls._base_url)) as timer:
+            r, res = HTTPConnectionPool.get(cls._base_url).request('PUT', '/storage/reading/query', body=query_payload)
+            jdoc = json_codec.loads(res, strict=False)
+            timer.response(r.status, body_length(res, r.getheader('Content-Length')), jdoc)
 
         if r.status in range(400, 600):
             _LOGGER.error("PUT url %s with query payload: %s, Error code: %d, reason: %s, details: %s",
@@ -469,6 +642,29 @@ class ReadingsStorageClient(StorageClient):
 
         return jdoc
 
+    @classmethod
+    def fetch_page(cls, asset_codes=None, cursor=None, columns=None, limit=100, conditions=(),
+                   keys=('user_ts', 'id'), descending=False):
+        """ Returns a page of readings, in keys order, following cursor
+
+        Unlike query with SKIP, the cost of a page does not grow with the readings before it.
+
+        :param asset_codes: an asset code or a list of them, None for all the assets
+        :param cursor: "next" of the previous page, or the values of keys to start after, None for the first page
+        :param columns: columns to return, all if None; keys are always returned
+        :param limit: maximum number of readings in the page
+        :param conditions: further [col, condition, value] conditions, e.g. ['user_ts', '<', '2018-03-09']
+        :param keys: columns the readings are ordered on, the last one must be unique
+        :param descending: page backward, e.g. from the latest readings
+        :return: {"count": .., "rows": [..], "next": cursor of the following page, None if there is none}
+        :Example:
+            page = ReadingsStorageClient.fetch_page('fogbench/humidity', columns=['reading'], limit=500)
+            while page['next']:
+                page = ReadingsStorageClient.fetch_page('fogbench/humidity', page['next'], ['reading'], 500)
+        """
+        query_payload, limit = _keyset_query(asset_codes, cursor, columns, limit, conditions, keys, descending)
+        return _keyset_page(cls.query(query_payload), limit, keys)
+
     @classmethod
     def purge(cls, age=None, sent_id=0, size=None, flag=None):
         """ Purge readings based on the age of the readings
@@ -510,9 +706,6 @@ class ReadingsStorageClient(StorageClient):
         except ValueError:
             raise
 
-        conn = http.client.HTTPConnection(cls._base_url)
-        # TODO: need to set http / https based on service protocol
-
         if age:
             put_url = '/storage/reading/purge?age={}&sent={}'.format(_age, _sent_id)
         if size:
@@ -520,11 +713,11 @@ class ReadingsStorageClient(StorageClient):
         if flag:
             put_url += "&flags={}".format(flag.lower())
 
-        conn.request('PUT', url=put_url, body=None)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
-        jdoc = json.loads(res, strict=False)
+        with StorageMetrics.timer('PUT /storage/reading/purge', 'readings',
+                                  breaker=CircuitBreaker.get(cls._base_url)) as timer:
+            r, res = HTTPConnectionPool.get(cls._base_url).request('PUT', put_url, body=None)
+            jdoc = json_codec.loads(res, strict=False)
+            timer.response(r.status, body_length(res, r.getheader('Content-Length')), jdoc)
 
         # NOTE: If the data could not be deleted because of a conflict, then the error “409 Conflict” will be returned.
         if r.status in range(400, 600):
@@ -535,7 +728,24 @@ class ReadingsStorageClient(StorageClient):
 
 
 class StorageClientAsync(AbstractStorage):
-    def __init__(self, core_management_host, core_management_port, svc=None):
+
+    _pool_size = 16
+    """Maximum number of simultaneous connections kept open to the storage service"""
+
+    _keepalive_timeout = 60
+    """Seconds an idle keep-alive connection is kept in the pool before being closed"""
+
+    _session = None
+    """aiohttp.ClientSession shared by all the requests of this client"""
+
+    _in_flight = None
+    """(table name, request) -> asyncio.Future of the read in flight, shared by identical concurrent reads"""
+
+    def __init__(self, core_management_host, core_management_port, svc=None, pool_size=None, keepalive_timeout=None):
+        if pool_size is not None:
+            self._pool_size = int(pool_size)
+        if keepalive_timeout is not None:
+            self._keepalive_timeout = keepalive_timeout
         try:
             if svc:
                 self.service = svc
@@ -599,20 +809,95 @@ class StorageClientAsync(AbstractStorage):
             raise InvalidServiceInstance
         self.service = ServiceRecord(s_id=svc["id"], s_name=svc["name"], s_type=svc["type"], s_port=svc["service_port"],
                                      m_port=svc["management_port"], s_address=svc["address"],
-                                     s_protocol=svc["protocol"])
+                                     s_protocol=svc["protocol"], s_socket=svc.get("socket"))
 
         return self
 
     def disconnect(self):
         pass
 
+    @property
+    def _cache(self):
+        return StorageCache.get(self.base_url)
+
+    @property
+    def _breaker(self):
+        return CircuitBreaker.get(self.base_url)
+
+    def _get_session(self):
+        """ Returns the client session shared by all the requests of this client
+
+        The session, and its pool of keep-alive connections, is created lazily on first use so that it is
+        bound to the running event loop; it is re-created if it has been closed.
+
+        The connections are made over the unix domain socket of the storage service, i.e. the http+unix://
+        transport, when it advertises one that exists, and over TCP to base_url otherwise, or once the socket can
+        not be connected to.
+        """
+        if self._session is None or self._session.closed:
+            socket_path = self.service._socket
+            if socket_path and os.path.exists(socket_path):
+                connector = _UnixConnector(socket_path, self.base_url, limit=self._pool_size,
+                                           keepalive_timeout=self._keepalive_timeout)
+            else:
+                if socket_path:
+                    _LOGGER.warning("Storage service socket %s does not exist, falling back to TCP on %s",
+                                    socket_path, self.base_url)
+                connector = aiohttp.TCPConnector(limit=self._pool_size, keepalive_timeout=self._keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """ Closes the shared client session and all the pooled connections """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _single_flight(self, tbl_name, key, request):
+        """ Returns the result of await request(), sharing it with the identical reads sent meanwhile
+
+        While a read is in flight, an identical read waits for it instead of sending another request to the
+        storage service. Each caller gets its own copy of a shared result. A write to the table ends the sharing:
+        the reads that follow it send a new request.
+
+        :param key: hashable identification of the request, e.g. its url and payload
+        :param request: coroutine function sending the request
+        """
+        if self._in_flight is None:
+            self._in_flight = {}
+        key = (tbl_name, key)
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            flight[1] += 1
+            return copy.deepcopy(await asyncio.shield(flight[0]))
+
+        future = asyncio.ensure_future(request())
+        flight = [future, 0]  # future, number of callers waiting for it besides this one
+        self._in_flight[key] = flight
+
+        def landed(f):
+            if self._in_flight.get(key) is flight:
+                del self._in_flight[key]
+        future.add_done_callback(landed)
+
+        result = await asyncio.shield(future)
+        return copy.deepcopy(result) if flight[1] else result
+
+    def _invalidate(self, tbl_name):
+        """ Called after a write to tbl_name: drops its cached queries and stops sharing its reads in flight """
+        self._cache.invalidate(tbl_name)
+        if self._in_flight:
+            for key in [k for k in self._in_flight if k[0] == tbl_name]:
+                del self._in_flight[key]
+
     # FIXME: As per JIRA-615 strict=false at python side (interim solution)
     # fix is required at storage layer (error message with escape sequence using a single quote)
-    async def insert_into_tbl(self, tbl_name, data):
+    async def insert_into_tbl(self, tbl_name, data, validate=False):
         """ insert json payload into given table
 
         :param tbl_name:
-        :param data: JSON payload
+        :param data: JSON payload, a dict or a list, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
 
         :Example:
@@ -631,27 +916,34 @@ class StorageClientAsync(AbstractStorage):
         if not data:
             raise ValueError("Data to insert is missing")
 
-        if not Utils.is_json(data):
+        data = Utils.serialize(data)
+        if validate and not Utils.is_json(data):
             raise TypeError("Provided data to insert must be a valid JSON")
 
         post_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
         url = 'http://' + self.base_url + post_url
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, data=data) as resp:
-                status_code = resp.status
-                jdoc = await resp.json()
-                if status_code not in range(200, 209):
-                    _LOGGER.info("POST %s, with payload: %s", post_url, data)
-                    _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
-                    raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+        session = self._get_session()
+        try:
+            with StorageMetrics.timer('POST /storage/table', tbl_name, data, breaker=self._breaker) as timer:
+                async with session.post(url, data=data) as resp:
+                    status_code = resp.status
+                    jdoc = await resp.json(loads=json_codec.loads)
+                    timer.response(status_code, body_length(await resp.read(), resp.content_length), jdoc)
+                    if status_code not in range(200, 209):
+                        _LOGGER.info("POST %s, with payload: %s", post_url, data)
+                        _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
+                        raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+        finally:
+            self._invalidate(tbl_name)
 
         return jdoc
 
-    async def update_tbl(self, tbl_name, data):
+    async def update_tbl(self, tbl_name, data, validate=False):
         """ update json payload for specified condition into given table
 
         :param tbl_name:
-        :param data: JSON payload
+        :param data: JSON payload, a dict or a list, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
 
         :Example:
@@ -674,28 +966,116 @@ class StorageClientAsync(AbstractStorage):
         if not data:
             raise ValueError("Data to update is missing")
 
-        if not Utils.is_json(data):
+        data = Utils.serialize(data)
+        if validate and not Utils.is_json(data):
             raise TypeError("Provided data to update must be a valid JSON")
 
         put_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
 
         url = 'http://' + self.base_url + put_url
-        async with aiohttp.ClientSession() as session:
-            async with session.put(url, data=data) as resp:
-                status_code = resp.status
-                jdoc = await resp.json()
-                if status_code not in range(200, 209):
-                    _LOGGER.info("PUT %s, with payload: %s", put_url, data)
-                    _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
-                    raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+        session = self._get_session()
+        try:
+            with StorageMetrics.timer('PUT /storage/table', tbl_name, data, breaker=self._breaker) as timer:
+                async with session.put(url, data=data) as resp:
+                    status_code = resp.status
+                    jdoc = await resp.json(loads=json_codec.loads)
+                    timer.response(status_code, body_length(await resp.read(), resp.content_length), jdoc)
+                    if status_code not in range(200, 209):
+                        _LOGGER.info("PUT %s, with payload: %s", put_url, data)
+                        _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
+                        raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+        finally:
+            self._invalidate(tbl_name)
 
         return jdoc
 
-    async def delete_from_tbl(self, tbl_name, condition=None):
+    async def insert_many(self, tbl_name, rows):
+        """ insert several rows into given table with a single request
+
+        The storage service inserts the rows in a single transaction: when a row fails, none of them is inserted and
+        the request can be sent again as a whole.
+
+        :param tbl_name:
+        :param rows: list of the rows, each a dict or already serialized as str / bytes as given to insert_into_tbl,
+                     or their JSON array e.g. PayloadBuilder.batch(...)
+        :return: {"response": "inserted", "rows_affected": <number of rows inserted>}
+
+        :Example:
+            curl -X POST http://0.0.0.0:8080/storage/table/statistics_history -d @payload.json
+            @payload.json content:
+
+            [
+                {"key" : "SENT_1", "history_ts" : "now()", "value" : 1},
+                {"key" : "SENT_2", "history_ts" : "now()", "value" : 5}
+            ]
+        """
+        if not rows:
+            raise ValueError("Rows to insert are missing")
+
+        if not isinstance(rows, (str, bytes, bytearray)):
+            rows = Utils.serialize_list(rows)
+
+        return await self.insert_into_tbl(tbl_name, rows)
+
+    async def update_many(self, tbl_name, updates):
+        """ apply several updates to given table with a single request
+
+        The storage service applies the updates in order in a single transaction: when an update fails, none of them
+        is applied and the request can be sent again as a whole.
+
+        :param tbl_name:
+        :param updates: list of the updates, each a dict or already serialized as str / bytes as given to
+                        update_tbl, or their JSON array e.g. PayloadBuilder.batch(...)
+        :return: {"response": "updated", "rows_affected": <total number of rows updated>}
+
+        :Example:
+            curl -X PUT http://0.0.0.0:8080/storage/table/statistics -d @payload.json
+            @payload.json content:
+
+            [
+                {"where" : {"column" : "key", "condition" : "=", "value" : "SENT_1"},
+                  "expressions" : [{"column" : "value", "operator" : "+", "value" : 10}]},
+                {"where" : {"column" : "key", "condition" : "=", "value" : "SENT_2"},
+                  "expressions" : [{"column" : "value", "operator" : "+", "value" : 4}]}
+            ]
+        """
+        if not updates:
+            raise ValueError("Updates are missing")
+
+        if not isinstance(updates, (str, bytes, bytearray)):
+            updates = Utils.serialize_list(updates)
+
+        return await self.update_tbl(tbl_name, updates)
+
+    async def execute_batch(self, operations):
+        """ run a sequence of inserts and updates, with as few requests as possible
+
+        Consecutive operations of the same kind on the same table are sent with a single insert_many / update_many
+        request, so that the order of the operations is kept.
+
+        :param operations: list of (tbl_name, 'insert' or 'update', payload)
+        :return: list of the responses, one for each request sent
+        """
+        operations = list(operations)
+        for tbl_name, operation, payload in operations:
+            if operation not in ('insert', 'update'):
+                raise ValueError("Batch operation must be one of insert, update")
+
+        responses = []
+        for (tbl_name, operation), group in itertools.groupby(operations, key=lambda op: (op[0], op[1])):
+            payloads = [payload for _, _, payload in group]
+            if operation == 'insert':
+                responses.append(await self.insert_many(tbl_name, payloads))
+            else:
+                responses.append(await self.update_many(tbl_name, payloads))
+        return responses
+
+    async def delete_from_tbl(self, tbl_name, condition=None, validate=False):
         """ Delete for specified condition from given table
 
         :param tbl_name:
-        :param condition: JSON payload
+        :param condition: JSON payload, a dict, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
 
         :Example:
@@ -713,18 +1093,25 @@ class StorageClientAsync(AbstractStorage):
 
         del_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
 
-        if condition and (not Utils.is_json(condition)):
-            raise TypeError("condition payload must be a valid JSON")
+        if condition:
+            condition = Utils.serialize(condition)
+            if validate and not Utils.is_json(condition):
+                raise TypeError("condition payload must be a valid JSON")
 
         url = 'http://' + self.base_url + del_url
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(url, data=condition) as resp:
-                status_code = resp.status
-                jdoc = await resp.json()
-                if status_code not in range(200, 209):
-                    _LOGGER.info("DELETE %s, with payload: %s", del_url, condition if condition else '')
-                    _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
-                    raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+        session = self._get_session()
+        try:
+            with StorageMetrics.timer('DELETE /storage/table', tbl_name, condition, breaker=self._breaker) as timer:
+                async with session.delete(url, data=condition) as resp:
+                    status_code = resp.status
+                    jdoc = await resp.json(loads=json_codec.loads)
+                    timer.response(status_code, body_length(await resp.read(), resp.content_length), jdoc)
+                    if status_code not in range(200, 209):
+                        _LOGGER.info("DELETE %s, with payload: %s", del_url, condition if condition else '')
+                        _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
+                        raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+        finally:
+            self._invalidate(tbl_name)
 
         return jdoc
 
@@ -747,23 +1134,35 @@ class StorageClientAsync(AbstractStorage):
         if query:  # else SELECT * FROM <tbl_name>
             get_url += '?{}'.format(query)
 
-        url = 'http://' + self.base_url + get_url
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                status_code = resp.status
-                jdoc = await resp.json()
-                if status_code not in range(200, 209):
-                    _LOGGER.info("GET %s", get_url)
-                    _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
-                    raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
-
+        cache_key = StorageCache.key(get_url)
+        cached, generation = self._cache.lookup(tbl_name, cache_key)
+        if cached is not None:
+            return cached
+
+        async def request():
+            url = 'http://' + self.base_url + get_url
+            session = self._get_session()
+            with StorageMetrics.timer('GET /storage/table', tbl_name, breaker=self._breaker) as timer:
+                async with session.get(url) as resp:
+                    status_code = resp.status
+                    jdoc = await resp.json(loads=json_codec.loads)
+                    timer.response(status_code, body_length(await resp.read(), resp.content_length), jdoc)
+                    if status_code not in range(200, 209):
+                        _LOGGER.info("GET %s", get_url)
+                        _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
+                        raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+            return jdoc
+
+        jdoc = await self._single_flight(tbl_name, cache_key, request)
+        self._cache.put(tbl_name, cache_key, jdoc, generation)
         return jdoc
 
-    async def query_tbl_with_payload(self, tbl_name, query_payload):
+    async def query_tbl_with_payload(self, tbl_name, query_payload, validate=False):
         """ Complex SELECT query for the specified table with a payload
 
         :param tbl_name:
-        :param query_payload: payload in valid JSON format
+        :param query_payload: payload in valid JSON format, a dict, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
 
         :Example:
@@ -781,21 +1180,34 @@ class StorageClientAsync(AbstractStorage):
         if not query_payload:
             raise ValueError("Query payload is missing")
 
-        if not Utils.is_json(query_payload):
+        query_payload = Utils.serialize(query_payload)
+        if validate and not Utils.is_json(query_payload):
             raise TypeError("Query payload must be a valid JSON")
 
         put_url = '/storage/table/{tbl_name}/query'.format(tbl_name=tbl_name)
 
-        url = 'http://' + self.base_url + put_url
-        async with aiohttp.ClientSession() as session:
-            async with session.put(url, data=query_payload) as resp:
-                status_code = resp.status
-                jdoc = await resp.json()
-                if status_code not in range(200, 209):
-                    _LOGGER.info("PUT %s, with query payload: %s", put_url, query_payload)
-                    _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
-                    raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
-
+        cache_key = StorageCache.key(put_url, query_payload)
+        cached, generation = self._cache.lookup(tbl_name, cache_key)
+        if cached is not None:
+            return cached
+
+        async def request():
+            url = 'http://' + self.base_url + put_url
+            session = self._get_session()
+            with StorageMetrics.timer('PUT /storage/table/query', tbl_name, query_payload,
+                                      breaker=self._breaker) as timer:
+                async with session.put(url, data=query_payload) as resp:
+                    status_code = resp.status
+                    jdoc = await resp.json(loads=json_codec.loads)
+                    timer.response(status_code, body_length(await resp.read(), resp.content_length), jdoc)
+                    if status_code not in range(200, 209):
+                        _LOGGER.info("PUT %s, with query payload: %s", put_url, query_payload)
+                        _LOGGER.error("Error code: %d, reason: %s, details: %s", resp.status, resp.reason, jdoc)
+                        raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+            return jdoc
+
+        jdoc = await self._single_flight(tbl_name, cache_key, request)
+        self._cache.put(tbl_name, cache_key, jdoc, generation)
         return jdoc
 
 
@@ -803,13 +1215,14 @@ class ReadingsStorageClientAsync(StorageClientAsync):
     """ Readings table operations """
     _base_url = ""
 
-    def __init__(self, core_mgt_host, core_mgt_port, svc=None):
-        super().__init__(core_management_host=core_mgt_host, core_management_port=core_mgt_port, svc=svc)
+    def __init__(self, core_mgt_host, core_mgt_port, svc=None, **kwargs):
+        super().__init__(core_management_host=core_mgt_host, core_management_port=core_mgt_port, svc=svc, **kwargs)
         self.__class__._base_url = self.base_url
 
-    async def append(self, readings):
+    async def append(self, readings, validate=False):
         """
-        :param readings:
+        :param readings: a dict with the "readings" list, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
 
         :Example:
@@ -837,18 +1250,24 @@ class ReadingsStorageClientAsync(StorageClientAsync):
         if not readings:
             raise ValueError("Readings payload is missing")
 
-        if not Utils.is_json(readings):
+        readings = Utils.serialize(readings)
+        if validate and not Utils.is_json(readings):
             raise TypeError("Readings payload must be a valid JSON")
 
         url = 'http://' + self._base_url + '/storage/reading'
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, data=readings) as resp:
-                status_code = resp.status
-                jdoc = await resp.json()
-                if status_code not in range(200, 209):
-                    _LOGGER.error("POST url %s with payload: %s, Error code: %d, reason: %s, details: %s",
-                                  '/storage/reading', readings, resp.status, resp.reason, jdoc)
-                    raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+        session = self._get_session()
+        try:
+            with StorageMetrics.timer('POST /storage/reading', 'readings', readings, breaker=self._breaker) as timer:
+                async with session.post(url, data=readings) as resp:
+                    status_code = resp.status
+                    jdoc = await resp.json(loads=json_codec.loads)
+                    timer.response(status_code, body_length(await resp.read(), resp.content_length), jdoc)
+                    if status_code not in range(200, 209):
+                        _LOGGER.error("POST url %s with payload: %s, Error code: %d, reason: %s, details: %s",
+                                      '/storage/reading', readings, resp.status, resp.reason, jdoc)
+                        raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+        finally:
+            self._invalidate('readings')
 
         return jdoc
 
@@ -875,22 +1294,28 @@ class ReadingsStorageClientAsync(StorageClientAsync):
             raise
 
         get_url = '/storage/reading?id={}&count={}'.format(reading_id, count)
-        url = 'http://' + self._base_url + get_url
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
-                status_code = resp.status
-                jdoc = await resp.json()
-                if status_code not in range(200, 209):
-                    _LOGGER.error("GET url: %s, Error code: %d, reason: %s, details: %s", url, resp.status,
-                                  resp.reason, jdoc)
-                    raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
 
-        return jdoc
-
-    async def query(self, query_payload):
+        async def request():
+            url = 'http://' + self._base_url + get_url
+            session = self._get_session()
+            with StorageMetrics.timer('GET /storage/reading', 'readings', breaker=self._breaker) as timer:
+                async with session.get(url) as resp:
+                    status_code = resp.status
+                    jdoc = await resp.json(loads=json_codec.loads)
+                    timer.response(status_code, body_length(await resp.read(), resp.content_length), jdoc)
+                    if status_code not in range(200, 209):
+                        _LOGGER.error("GET url: %s, Error code: %d, reason: %s, details: %s", url, resp.status,
+                                      resp.reason, jdoc)
+                        raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+            return jdoc
+
+        return await self._single_flight('readings', StorageCache.key(get_url), request)
+
+    async def query(self, query_payload, validate=False):
         """
 
-        :param query_payload:
+        :param query_payload: a dict, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
         :return:
         :Example:
             curl -X PUT http://0.0.0.0:8080/storage/reading/query -d @payload.json
@@ -908,20 +1333,91 @@ class ReadingsStorageClientAsync(StorageClientAsync):
         if not query_payload:
             raise ValueError("Query payload is missing")
 
-        if not Utils.is_json(query_payload):
+        query_payload = Utils.serialize(query_payload)
+        if validate and not Utils.is_json(query_payload):
             raise TypeError("Query payload must be a valid JSON")
 
-        url = 'http://' + self._base_url + '/storage/reading/query'
-        async with aiohttp.ClientSession() as session:
-            async with session.put(url, data=query_payload) as resp:
-                status_code = resp.status
-                jdoc = await resp.json()
-                if status_code not in range(200, 209):
-                    _LOGGER.error("PUT url %s with query payload: %s, Error code: %d, reason: %s, details: %s",
-                                  '/storage/reading/query', query_payload, resp.status, resp.reason, jdoc)
-                    raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+        async def request():
+            url = 'http://' + self._base_url + '/storage/reading/query'
+            session = self._get_session()
+            with StorageMetrics.timer('PUT /storage/reading/query', 'readings', query_payload,
+                                      breaker=self._breaker) as timer:
+                async with session.put(url, data=query_payload) as resp:
+                    status_code = resp.status
+                    jdoc = await resp.json(loads=json_codec.loads)
+                    timer.response(status_code, body_length(await resp.read(), resp.content_length), jdoc)
+                    if status_code not in range(200, 209):
+                        _LOGGER.error("PUT url %s with query payload: %s, Error code: %d, reason: %s, details: %s",
+                                      '/storage/reading/query', query_payload, resp.status, resp.reason, jdoc)
+                        raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+            return jdoc
+
+        return await self._single_flight('readings', StorageCache.key('/storage/reading/query', query_payload),
+                                         request)
+
+    async def fetch_page(self, asset_codes=None, cursor=None, columns=None, limit=100, conditions=(),
+                         keys=('user_ts', 'id'), descending=False):
+        """ Returns a page of readings, in keys order, following cursor
+
+        Unlike query with SKIP, the cost of a page does not grow with the readings before it.
+
+        :param asset_codes: an asset code or a list of them, None for all the assets
+        :param cursor: "next" of the previous page, or the values of keys to start after, None for the first page
+        :param columns: columns to return, all if None; keys are always returned
+        :param limit: maximum number of readings in the page
+        :param conditions: further [col, condition, value] conditions, e.g. ['user_ts', '<', '2018-03-09']
+        :param keys: columns the readings are ordered on, the last one must be unique
+        :param descending: page backward, e.g. from the latest readings
+        :return: {"count": .., "rows": [..], "next": cursor of the following page, None if there is none}
+        """
+        query_payload, limit = _keyset_query(asset_codes, cursor, columns, limit, conditions, keys, descending)
+        return _keyset_page(await self.query(query_payload), limit, keys)
 
-        return jdoc
+    def fetch_iter(self, reading_id, count):
+        """ Same as fetch, but the rows are parsed and yielded while the response is received
+
+        :param reading_id: the first reading ID in the block that is retrieved
+        :param count: the number of readings to return, if available
+        :return: AsyncRowIterator over the rows
+        :Example:
+            async with readings_storage_async.fetch_iter(1, 10000) as rows:
+                async for row in rows:
+                    ...
+        """
+
+        if reading_id is None:
+            raise ValueError("first reading id to retrieve the readings block is required")
+
+        if count is None:
+            raise ValueError("count is required to retrieve the readings block")
+
+        try:
+            count = int(count)
+        except ValueError:
+            raise
+
+        get_url = '/storage/reading?id={}&count={}'.format(reading_id, count)
+        url = 'http://' + self._base_url + get_url
+        return AsyncRowIterator(self._get_session().get(url), url)
+
+    def query_iter(self, query_payload, validate=False):
+        """ Same as query, but the rows are parsed and yielded while the response is received
+
+        :param query_payload: a dict, or already serialized as str / bytes
+        :param validate: parse the payload to check it is valid JSON before sending it
+        :return: AsyncRowIterator over the rows
+        """
+
+        if not query_payload:
+            raise ValueError("Query payload is missing")
+
+        query_payload = Utils.serialize(query_payload)
+        if validate and not Utils.is_json(query_payload):
+            raise TypeError("Query payload must be a valid JSON")
+
+        url = 'http://' + self._base_url + '/storage/reading/query'
+        return AsyncRowIterator(self._get_session().put(url, data=query_payload), '/storage/reading/query',
+                                payload=query_payload)
 
     async def purge(self, age=None, sent_id=0, size=None, flag=None):
         """ Purge readings based on the age of the readings
@@ -971,13 +1467,18 @@ class ReadingsStorageClientAsync(StorageClientAsync):
             put_url += "&flags={}".format(flag.lower())
 
         url = 'http://' + self._base_url + put_url
-        async with aiohttp.ClientSession() as session:
-            async with session.put(url, data=None) as resp:
-                status_code = resp.status
-                jdoc = await resp.json()
-                if status_code not in range(200, 209):
-                    _LOGGER.error("PUT url %s, Error code: %d, reason: %s, details: %s", put_url, resp.status,
-                                  resp.reason, jdoc)
-                    raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+        session = self._get_session()
+        try:
+            with StorageMetrics.timer('PUT /storage/reading/purge', 'readings', breaker=self._breaker) as timer:
+                async with session.put(url, data=None) as resp:
+                    status_code = resp.status
+                    jdoc = await resp.json(loads=json_codec.loads)
+                    timer.response(status_code, body_length(await resp.read(), resp.content_length), jdoc)
+                    if status_code not in range(200, 209):
+                        _LOGGER.error("PUT url %s, Error code: %d, reason: %s, details: %s", put_url, resp.status,
+                                      resp.reason, jdoc)
+                        raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+        finally:
+            self._invalidate('readings')
 
         return jdoc
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Incremental parsing of the rows returned by the storage service
+
+A response such as {"count": 2, "rows": [{...}, {...}]} is parsed while it is received: each row is decoded as soon
+as it is complete, so that the whole response text is never held in memory.
+"""
+
+import codecs
+import collections
+import json
+import re
+
+from foglamp.common import json_codec, logger
+from foglamp.common.storage_client.exceptions import StorageServerError
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('RowsParser', 'AsyncRowIterator')
+
+_LOGGER = logger.setup(__name__)
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Parser states, i.e. what is expected next
+_OBJECT_START = 0    # '{'
+_FIRST_KEY = 1       # a key or '}'
+_KEY = 2             # a key
+_COLON = 3           # ':'
+_VALUE = 4           # the value of a member
+_MEMBER_END = 5      # ',' or '}'
+_ROWS_START = 6      # '['
+_FIRST_ROW = 7       # a row or ']'
+_ROW = 8             # a row
+_ROW_END = 9         # ',' or ']'
+_DONE = 10
+
+
+class RowsParser(object):
+    """ Incremental parser of a JSON object holding an array of rows
+
+    Data is given to :meth:`feed` in chunks, as received, and the rows completed by each chunk are returned.
+    The other members of the object, e.g. count, are collected in :attr:`members`.
+    """
+
+    def __init__(self, rows_key='rows'):
+        self.rows_key = rows_key
+        self.members = {}
+        """members of the object other than rows"""
+
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder(strict=False)
+        self._buffer = ''
+        self._state = _OBJECT_START
+        self._key = None
+
+    @property
+    def done(self):
+        """ True once the whole object has been parsed """
+        return self._state == _DONE
+
+    def _decode(self, pos):
+        """ Returns (value, end) or None if the value at pos is not complete yet
+
+        A value is only taken as complete when it is followed by something, so that a number split across two
+        chunks is not decoded from its first digits only.
+        """
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, pos)
+        except ValueError:
+            return None
+        if end >= len(self._buffer):
+            return None
+        return value, end
+
+    def _expect(self, pos, char):
+        if self._buffer[pos] != char:
+            raise ValueError("Expecting '{}' at position {} of the rows document, found '{}'".format(
+                char, pos, self._buffer[pos]))
+
+    def feed(self, data):
+        """ Parses the next chunk
+
+        :param data: next chunk of the document, as bytes or str
+        :return: list of the rows completed by this chunk
+        :raises ValueError: if the document is not an object holding an array of rows
+        """
+        if isinstance(data, (bytes, bytearray)):
+            data = self._utf8.decode(data)
+        self._buffer += data
+
+        rows = []
+        pos = 0
+        size = len(self._buffer)
+        while self._state != _DONE:
+            pos = _WHITESPACE.match(self._buffer, pos).end()
+            if pos >= size:
+                break
+            char = self._buffer[pos]
+            state = self._state
+
+            if state in (_ROW, _FIRST_ROW) and not (state == _FIRST_ROW and char == ']'):
+                decoded = self._decode(pos)
+                if decoded is None:
+                    break
+                row, pos = decoded
+                rows.append(row)
+                self._state = _ROW_END
+            elif state in (_ROW_END, _FIRST_ROW):
+                if char not in ',]':
+                    self._expect(pos, ']')
+                pos += 1
+                self._state = _ROW if char == ',' else _MEMBER_END
+            elif state in (_KEY, _FIRST_KEY) and not (state == _FIRST_KEY and char == '}'):
+                self._expect(pos, '"')
+                decoded = self._decode(pos)
+                if decoded is None:
+                    break
+                self._key, pos = decoded
+                self._state = _COLON
+            elif state in (_MEMBER_END, _FIRST_KEY):
+                if char not in ',}':
+                    self._expect(pos, '}')
+                pos += 1
+                self._state = _KEY if char == ',' else _DONE
+            elif state == _OBJECT_START:
+                self._expect(pos, '{')
+                pos += 1
+                self._state = _FIRST_KEY
+            elif state == _COLON:
+                self._expect(pos, ':')
+                pos += 1
+                self._state = _ROWS_START if self._key == self.rows_key else _VALUE
+            elif state == _ROWS_START:
+                if char != '[':
+                    # rows is not an array, e.g. null: keep it as a member
+                    self._state = _VALUE
+                    continue
+                pos += 1
+                self._state = _FIRST_ROW
+            elif state == _VALUE:
+                decoded = self._decode(pos)
+                if decoded is None:
+                    break
+                self.members[self._key], pos = decoded
+                self._state = _MEMBER_END
+
+        self._buffer = self._buffer[pos:]
+        return rows
+
+    def close(self):
+        """ Checks that the whole document has been parsed
+
+        :raises ValueError: if the document is incomplete
+        """
+        if self._state != _DONE or self._buffer.strip() or self._utf8.decode(b'', final=True):
+            raise ValueError("Incomplete rows document")
+
+
+class AsyncRowIterator(object):
+    """ Async iterator over the rows of a storage service response, yielding them while the response is received
+
+    The request is only sent on first iteration. Use it as an async context manager so that the response is
+    released even when the iteration is interrupted:
+
+        async with readings_storage_async.fetch_iter(1, 10000) as rows:
+            async for row in rows:
+                ...
+
+    Once the iteration is complete, the other members of the response, e.g. count, are in :attr:`members`.
+    """
+
+    def __init__(self, request, url, payload=None):
+        """
+        :param request: awaitable returning the aiohttp.ClientResponse, e.g. session.get(url)
+        :param url: path of the request, for logging
+        :param payload: payload of the request, for logging
+        """
+        self._request = request
+        self._url = url
+        self._payload = payload
+        self._resp = None
+        self._closed = False
+        self._parser = RowsParser()
+        self._rows = collections.deque()
+
+    @property
+    def members(self):
+        return self._parser.members
+
+    async def _open(self):
+        resp = await self._request
+        self._resp = resp
+        if resp.status not in range(200, 209):
+            jdoc = await resp.json(loads=json_codec.loads)
+            self.close()
+            if self._payload is not None:
+                _LOGGER.error("PUT url %s with query payload: %s, Error code: %d, reason: %s, details: %s",
+                              self._url, self._payload, resp.status, resp.reason, jdoc)
+            else:
+                _LOGGER.error("GET url: %s, Error code: %d, reason: %s, details: %s", self._url, resp.status,
+                              resp.reason, jdoc)
+            raise StorageServerError(code=resp.status, reason=resp.reason, error=jdoc)
+
+    def close(self):
+        """ Releases the response; its connection is closed if the rows have not all been read """
+        if self._closed:
+            return
+        self._closed = True
+        if self._resp is None:
+            # never iterated: the request has not been sent
+            if hasattr(self._request, 'close'):
+                self._request.close()
+            return
+        if self._parser.done:
+            self._resp.release()
+        else:
+            self._resp.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._closed and not self._rows:
+            raise StopAsyncIteration
+        if self._resp is None:
+            await self._open()
+        while not self._rows:
+            if self._parser.done:
+                self.close()
+                raise StopAsyncIteration
+            chunk = await self._resp.content.readany()
+            if not chunk:
+                self._parser.close()
+            self._rows.extend(self._parser.feed(chunk))
+        return self._rows.popleft()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
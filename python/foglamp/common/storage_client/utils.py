@@ -15,8 +15,12 @@ __version__ = "${VERSION}"
 
 # TODO: add utils method here to keep stuff DRY
 
+import base64
+import binascii
 import json
 
+from foglamp.common import json_codec
+
 
 class Utils(object):
 
@@ -27,3 +31,54 @@ class Utils(object):
         except (TypeError, ValueError):  # JSONDecodeError is a subclass of ValueError
             return False
         return True
+
+    @staticmethod
+    def serialize(payload):
+        """ Returns the request body for payload, serializing it at most once
+
+        str and bytes are taken as already serialized JSON, e.g. PayloadBuilder().payload(), and are returned as
+        they are; any other object, e.g. a dict or a list, is serialized to bytes with json_codec.
+
+        :raises TypeError: if payload is not JSON serializable
+        """
+        if isinstance(payload, (str, bytes, bytearray)):
+            return payload
+        return json_codec.dumpb(payload)
+
+    @staticmethod
+    def serialize_list(payloads):
+        """ Returns the JSON array of payloads, as bytes
+
+        Each payload is either already serialized JSON, str or bytes, e.g. PayloadBuilder().payload(), which is
+        copied as it is, or an object which is serialized with json_codec.
+
+        :raises TypeError: if a payload is not JSON serializable
+        """
+        items = []
+        for payload in payloads:
+            if isinstance(payload, str):
+                items.append(payload.encode())
+            elif isinstance(payload, (bytes, bytearray)):
+                items.append(bytes(payload))
+            else:
+                items.append(json_codec.dumpb(payload))
+        return b'[' + b','.join(items) + b']'
+
+    @staticmethod
+    def encode_cursor(values):
+        """ Returns the opaque, url safe, token of a keyset cursor, i.e. the key values of the last row of a page """
+        return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(token):
+        """ Returns the tuple of key values of a keyset cursor token returned by encode_cursor
+
+        :raises ValueError: if token is not a cursor token
+        """
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+        except (TypeError, ValueError, binascii.Error):
+            raise ValueError("Invalid cursor {}".format(token))
+        if not isinstance(values, list) or not values:
+            raise ValueError("Invalid cursor {}".format(token))
+        return tuple(values)
@@ -23,7 +23,7 @@ import logging
 import urllib3
 import foglamp.plugins.north.common.common as plugin_common
 import foglamp.plugins.north.common.exceptions as plugin_exceptions
-from foglamp.common import logger
+from foglamp.common import json_codec, logger
 from foglamp.common.storage_client import payload_builder
 
 # Module information
@@ -735,12 +735,12 @@ class OmfNorthPlugin(object):
                       'action': 'create',
                       'messageformat': 'JSON',
                       'omfversion': '1.0'}
-        omf_data_json = json.dumps(omf_data)
+        omf_data_json = json_codec.dumpb(omf_data)
 
         self._logger.debug("OMF message length |{0}| ".format(len(omf_data_json)))
 
         if _log_debug_level == 3:
-            self._logger.debug("OMF message : |{0}| |{1}| " .format(message_type, omf_data_json))
+            self._logger.debug("OMF message : |{0}| |{1}| " .format(message_type, omf_data_json.decode()))
 
         while num_retry <= self._config['OMFMaxRetry']:
             _error = False
@@ -162,6 +162,8 @@ def plugin_start(handle):
             # debug_cnt = 0  # Used only for debugging. debug_cnt should be set to 0 in production.
             cnt = 0
             while tag.is_connected:
+                # Stop reading notifications while the South service buffers are drained
+                await Ingest.wait_capacity()
                 time_stamp = utils.local_timestamp()
                 try:
                     pattern_index = tag.con.expect('Notification handle = .*? \r', timeout=4)
@@ -284,17 +286,13 @@ def plugin_start(handle):
                             "z": mag_z
                         },
                     }
-                    # Dedicated add_readings for movement
-                    for reading_key in movement:
-                        data = {
-                            'asset': reading_key,
-                            'timestamp': time_stamp,
-                            'key': str(uuid.uuid4()),
-                            'readings': movement[reading_key]
-                        }
-                        await Ingest.add_readings(asset='TI Sensortag CC2650/{}'.format(data['asset']),
-                                                  timestamp=data['timestamp'], key=data['key'],
-                                                  readings=data['readings'])
+                    # Dedicated add_readings_batch for movement
+                    await Ingest.add_readings_batch([{
+                        'asset': 'TI Sensortag CC2650/{}'.format(reading_key),
+                        'timestamp': time_stamp,
+                        'key': str(uuid.uuid4()),
+                        'readings': movement[reading_key]
+                    } for reading_key in movement])
 
                 # Get battery
                 # FIXME: Investigate why no battery input in async mode?
@@ -10,6 +10,7 @@ from aiohttp import web
 from foglamp.services.common.microservice_management import routes
 from foglamp.common import logger
 from foglamp.common.process import FoglampProcess
+from foglamp.common.storage_client.metrics import StorageMetrics
 from foglamp.common.web import middleware
 from abc import abstractmethod
 import time
@@ -118,3 +119,9 @@ class FoglampMicroservice(FoglampProcess):
         """
         since_started = time.time() - self._start_time
         return web.json_response({'uptime': since_started})
+
+    async def get_storage_metrics(self, request):
+        """ profile of the calls made by this service to the storage service
+
+        """
+        return web.json_response(StorageMetrics.report())
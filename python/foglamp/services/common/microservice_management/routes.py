@@ -21,6 +21,11 @@ def setup(app, obj, is_core=False):
     app.router.add_route('GET', '/foglamp/service/ping', obj.ping)
     app.router.add_route('POST', '/foglamp/service/shutdown', obj.shutdown)
     app.router.add_route('POST', '/foglamp/change', obj.change)
+    app.router.add_route('GET', '/foglamp/service/storage/metrics', obj.get_storage_metrics)
+
+    # Ingest metrics, of the services which ingest readings
+    if hasattr(obj, 'get_ingest_metrics'):
+        app.router.add_route('GET', '/foglamp/service/ingest/metrics', obj.get_ingest_metrics)
 
     if is_core:
         # Configuration
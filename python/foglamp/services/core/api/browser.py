@@ -25,6 +25,9 @@ Supports a number of REST API:
   All but the /foglamp/asset API call take a set of optional query parameters
     limit=x     Return the first x rows only
     skip=x      skip first n entries and used with limit to implemented paged interfaces
+    cursor=x    the /foglamp/asset/{asset_code} and /foglamp/asset/{asset_code}/{reading} pages follow the
+                cursor given in the X-Next-Cursor header of the previous page, rather than skip them; cursor=
+                (empty) asks for the first page. A page costs the same however deep it is, unlike with skip
     seconds=x   Limit the data return to be less than x seconds old
     minutes=x   Limit the data returned to be less than x minutes old
     hours=x     Limit the data returned to be less than x hours old
@@ -35,7 +38,8 @@ Supports a number of REST API:
 
 from aiohttp import web
 
-from foglamp.common.storage_client.payload_builder import PayloadBuilder
+from foglamp.common.storage_client.payload_builder import Param, PayloadBuilder
+from foglamp.common.storage_client.utils import Utils
 from foglamp.services.core import connect
 
 
@@ -49,6 +53,10 @@ __DEFAULT_LIMIT = 20
 __DEFAULT_OFFSET = 0
 __TIMESTAMP_FMT = 'YYYY-MM-DD HH24:MI:SS.MS'
 
+_readings_queries = {}
+"""(endpoint, with time units, with skip, with cursor) -> CompiledPayload of the readings query of asset and
+asset_reading"""
+
 
 def setup(app):
     """ Add the routes for the API endpoints supported by the data browser """
@@ -68,6 +76,17 @@ def prepare_limit_skip_payload(request, _dict):
     Returns:
         chain payload dict
     """
+    limit, offset = limit_skip(request)
+
+    payload = PayloadBuilder(_dict).LIMIT(limit)
+    if offset:
+        payload = PayloadBuilder(_dict).SKIP(offset)
+
+    return payload.chain_payload()
+
+
+def limit_skip(request):
+    """ Returns the validated (limit, skip) query params, or their defaults """
     limit = __DEFAULT_LIMIT
     if 'limit' in request.query and request.query['limit'] != '':
         try:
@@ -86,11 +105,98 @@ def prepare_limit_skip_payload(request, _dict):
         except ValueError:
             raise web.HTTPBadRequest(reason="Skip/Offset must be a positive integer")
 
-    payload = PayloadBuilder(_dict).LIMIT(limit)
+    return limit, offset
+
+
+def readings_cursor(request):
+    """ Returns the (user_ts, id) of the cursor query param, None for the first page, or False if there is none """
+    if 'cursor' not in request.query:
+        return False
+    if 'skip' in request.query and request.query['skip'] != '':
+        raise web.HTTPBadRequest(reason="Only one of skip and cursor can be given")
+    if request.query['cursor'] == '':
+        return None
+    try:
+        cursor = Utils.decode_cursor(request.query['cursor'])
+        if len(cursor) != 2:
+            raise ValueError
+    except ValueError:
+        raise web.HTTPBadRequest(reason="Invalid cursor")
+    return cursor
+
+
+def readings_query(endpoint, request, **values):
+    """ Returns the payload of the readings query of the asset or asset_reading endpoint
+
+    The query is compiled once for each combination of the optional time units, skip and cursor query params, the
+    asset_code, reading, time, limit, skip and cursor values are bound to it.
+    """
+    newer = time_units(request)
+    limit, offset = limit_skip(request)
+    cursor = readings_cursor(request)
+    values['limit'] = limit
+    if newer:
+        values['newer'] = newer
     if offset:
-        payload = PayloadBuilder(_dict).SKIP(offset)
+        values['skip'] = offset
+    if cursor:
+        values['user_ts'], values['id'] = cursor
+
+    key = (endpoint, bool(newer), bool(offset), None if cursor is None else bool(cursor))
+    compiled = _readings_queries.get(key)
+    if compiled is None:
+        if endpoint == 'asset':
+            builder = PayloadBuilder().SELECT(("reading", "user_ts")).ALIAS("return", ("user_ts", "timestamp"))\
+                .FORMAT("return", ("user_ts", __TIMESTAMP_FMT))
+        else:
+            builder = PayloadBuilder().SELECT(("user_ts", ["reading", Param("reading")]))\
+                .ALIAS("return", ("user_ts", "timestamp"), ("reading", Param("reading")))\
+                .FORMAT("return", ("user_ts", __TIMESTAMP_FMT))
+        if cursor is not False:
+            # the unformatted user_ts and the id of the last reading make the next cursor
+            builder.SELECT(("user_ts", "id"))
+            conditions = [['user_ts', 'newer', Param("newer")]] if newer else []
+            keyset = (Param("user_ts"), Param("id")) if cursor else None
+            compiled = builder.KEYSET(keyset, [Param("asset_code")], conditions, descending=True)\
+                .LIMIT(Param("limit")).compile()
+        else:
+            builder.WHERE(["asset_code", "=", Param("asset_code")])
+            if newer:
+                builder.AND_WHERE(['user_ts', 'newer', Param("newer")])
+            builder.LIMIT(Param("limit"))
+            if offset:
+                builder.SKIP(Param("skip"))
+            compiled = builder.ORDER_BY(["timestamp", "desc"]).compile()
+        _readings_queries[key] = compiled
+    return compiled.bind(**values)
+
+
+async def browse_readings(endpoint, request, **values):
+    """ Returns the response of the asset or asset_reading endpoint, with the X-Next-Cursor header if paged with
+    cursor """
+    payload = readings_query(endpoint, request, **values)
 
-    return payload.chain_payload()
+    results = {}
+    try:
+        _readings = connect.get_readings_async()
+        results = await _readings.query(payload)
+        response = results['rows']
+    except KeyError:
+        raise web.HTTPBadRequest(reason=results['message'])
+    except Exception as ex:
+        raise web.HTTPException(reason=str(ex))
+
+    if 'cursor' not in request.query:
+        return web.json_response(response)
+
+    headers = {}
+    limit = limit_skip(request)[0]
+    if response and len(response) == limit:
+        headers['X-Next-Cursor'] = Utils.encode_cursor((response[-1]['user_ts'], response[-1]['id']))
+    for row in response:
+        row.pop('user_ts', None)
+        row.pop('id', None)
+    return web.json_response(response, headers=headers)
 
 
 async def asset_counts(request):
@@ -108,8 +214,8 @@ async def asset_counts(request):
 
     results = {}
     try:
-        _readings = connect.get_readings()
-        results = _readings.query(payload)
+        _readings = connect.get_readings_async()
+        results = await _readings.query(payload)
         response = results['rows']
         asset_json = [{"count": r['count'], "assetCode": r['asset_code']} for r in response]
     except KeyError:
@@ -133,28 +239,10 @@ async def asset(request):
             curl -X GET http://localhost:8081/foglamp/asset/fogbench%2Fhumidity
             curl -X GET http://localhost:8081/foglamp/asset/fogbench%2Fhumidity?limit=1
             curl -X GET "http://localhost:8081/foglamp/asset/fogbench%2Fhumidity?limit=1&skip=1"
+            curl -X GET "http://localhost:8081/foglamp/asset/fogbench%2Fhumidity?limit=1&cursor="
     """
     asset_code = request.match_info.get('asset_code', '')
-    _select = PayloadBuilder().SELECT(("reading", "user_ts")).ALIAS("return", ("user_ts", "timestamp")). \
-        FORMAT("return", ("user_ts", __TIMESTAMP_FMT)).chain_payload()
-    _where = PayloadBuilder(_select).WHERE(["asset_code", "=", asset_code]).chain_payload()
-    _and_where = where_clause(request, _where)
-
-    # Add the order by and limit, offset clause
-    _limit_skip_payload = prepare_limit_skip_payload(request, _and_where)
-    payload = PayloadBuilder(_limit_skip_payload).ORDER_BY(["timestamp", "desc"]).payload()
-
-    results = {}
-    try:
-        _readings = connect.get_readings()
-        results = _readings.query(payload)
-        response = results['rows']
-    except KeyError:
-        raise web.HTTPBadRequest(reason=results['message'])
-    except Exception as ex:
-        raise web.HTTPException(reason=str(ex))
-
-    return web.json_response(response)
+    return await browse_readings('asset', request, asset_code=asset_code)
 
 
 async def asset_reading(request):
@@ -185,31 +273,11 @@ async def asset_reading(request):
             curl -X GET http://localhost:8081/foglamp/asset/fogbench%2Fhumidity/temperature?limit=1
             curl -X GET http://localhost:8081/foglamp/asset/fogbench%2Fhumidity/temperature?skip=10
             curl -X GET "http://localhost:8081/foglamp/asset/fogbench%2Fhumidity/temperature?limit=1&skip=10"
+            curl -X GET "http://localhost:8081/foglamp/asset/fogbench%2Fhumidity/temperature?limit=1&cursor="
     """
     asset_code = request.match_info.get('asset_code', '')
     reading = request.match_info.get('reading', '')
-
-    _select = PayloadBuilder().SELECT(("user_ts", ["reading", reading]))\
-        .ALIAS("return", ("user_ts", "timestamp"), ("reading", reading))\
-        .FORMAT("return", ("user_ts", __TIMESTAMP_FMT)).chain_payload()
-    _where = PayloadBuilder(_select).WHERE(["asset_code", "=", asset_code]).chain_payload()
-    _and_where = where_clause(request, _where)
-
-    # Add the order by and limit, offset clause
-    _limit_skip_payload = prepare_limit_skip_payload(request, _and_where)
-    payload = PayloadBuilder(_limit_skip_payload).ORDER_BY(["timestamp", "desc"]).payload()
-
-    results = {}
-    try:
-        _readings = connect.get_readings()
-        results = _readings.query(payload)
-        response = results['rows']
-    except KeyError:
-        raise web.HTTPBadRequest(reason=results['message'])
-    except Exception as ex:
-        raise web.HTTPException(reason=str(ex))
-
-    return web.json_response(response)
+    return await browse_readings('asset_reading', request, asset_code=asset_code, reading=reading)
 
 
 async def asset_summary(request):
@@ -249,8 +317,8 @@ async def asset_summary(request):
 
     results = {}
     try:
-        _readings = connect.get_readings()
-        results = _readings.query(payload)
+        _readings = connect.get_readings_async()
+        results = await _readings.query(payload)
         # for aggregates, so there can only ever be one row
         response = results['rows'][0]
     except KeyError:
@@ -337,8 +405,8 @@ async def asset_averages(request):
 
     results = {}
     try:
-        _readings = connect.get_readings()
-        results = _readings.query(payload)
+        _readings = connect.get_readings_async()
+        results = await _readings.query(payload)
         response = results['rows']
     except KeyError:
         raise web.HTTPBadRequest(reason=results['message'])
@@ -349,6 +417,18 @@ async def asset_averages(request):
 
 
 def where_clause(request, where):
+    val = time_units(request)
+
+    # if no time units then NO AND_WHERE condition applied
+    if val == 0:
+        return where
+
+    payload = PayloadBuilder(where).AND_WHERE(['user_ts', 'newer', val]).chain_payload()
+    return payload
+
+
+def time_units(request):
+    """ Returns the seconds of the seconds, minutes or hours query param, 0 if none """
     val = 0
     try:
         if 'seconds' in request.query and request.query['seconds'] != '':
@@ -363,9 +443,4 @@ def where_clause(request, where):
     except ValueError:
         raise web.HTTPBadRequest(reason="Time must be a positive integer")
 
-    # if no time units then NO AND_WHERE condition applied
-    if val == 0:
-        return where
-
-    payload = PayloadBuilder(where).AND_WHERE(['user_ts', 'newer', val]).chain_payload()
-    return payload
+    return val
@@ -8,6 +8,7 @@
 from foglamp.services.core.service_registry.service_registry import ServiceRegistry
 from foglamp.common.storage_client.storage_client import StorageClient
 from foglamp.common.storage_client.storage_client import ReadingsStorageClient
+from foglamp.common.storage_client.storage_client import StorageClientAsync, ReadingsStorageClientAsync
 from foglamp.common import logger
 
 __author__ = "Ashish Jabble"
@@ -19,6 +20,9 @@ __version__ = "${VERSION}"
 # _logger = logger.setup(__name__, level=20)
 _logger = logger.setup(__name__)
 
+_storage_async = None
+_readings_async = None
+
 
 # TODO: Needs refactoring or better way to allow global discovery in core process
 def get_storage():
@@ -47,3 +51,46 @@ def get_readings():
         _logger.exception(str(ex))
         raise
     return _readings
+
+
+def _same_service(client, svc):
+    return client is not None and client.base_url == '{}:{}'.format(svc._address, svc._port)
+
+
+def get_storage_async():
+    """ Async Storage Object, shared by the API handlers so that their identical concurrent reads are coalesced """
+    global _storage_async
+    try:
+        services = ServiceRegistry.get(name="FogLAMP Storage")
+        storage_svc = services[0]
+        if not _same_service(_storage_async, storage_svc):
+            _storage_async = StorageClientAsync(core_management_host=None, core_management_port=None,
+                                                svc=storage_svc)
+    except Exception as ex:
+        _logger.exception(str(ex))
+        raise
+    return _storage_async
+
+
+def get_readings_async():
+    """ Async Readings Storage Object, shared by the API handlers so that their identical concurrent reads are
+    coalesced """
+    global _readings_async
+    try:
+        services = ServiceRegistry.get(name="FogLAMP Storage")
+        storage_svc = services[0]
+        if not _same_service(_readings_async, storage_svc):
+            _readings_async = ReadingsStorageClientAsync(core_mgt_host=None, core_mgt_port=None, svc=storage_svc)
+    except Exception as ex:
+        _logger.exception(str(ex))
+        raise
+    return _readings_async
+
+
+async def close_async():
+    """ Closes the connections of the shared async storage clients """
+    global _storage_async, _readings_async
+    for client in (_storage_async, _readings_async):
+        if client is not None:
+            await client.close()
+    _storage_async = _readings_async = None
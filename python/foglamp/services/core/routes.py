@@ -88,6 +88,7 @@ def setup(app):
     # Statistics - As per doc
     app.router.add_route('GET', '/foglamp/statistics', api_statistics.get_statistics)
     app.router.add_route('GET', '/foglamp/statistics/history', api_statistics.get_statistics_history)
+    app.router.add_route('GET', '/foglamp/statistics/storage', api_statistics.get_storage_metrics)
 
     # Audit trail - As per doc
     app.router.add_route('POST', '/foglamp/audit', api_audit.create_audit_entry)
@@ -25,7 +25,10 @@ from foglamp.common.configuration_manager import ConfigurationManager
 from foglamp.common.web import middleware
 from foglamp.common.storage_client.exceptions import *
 from foglamp.common.storage_client.storage_client import StorageClient
+from foglamp.common.storage_client.cache import StorageCache
+from foglamp.common.storage_client.metrics import StorageMetrics
 
+from foglamp.services.core import connect
 from foglamp.services.core import routes as admin_routes
 from foglamp.services.core.api import configuration as conf_api
 from foglamp.services.common.microservice_management import routes as management_routes
@@ -176,6 +179,15 @@ class Server:
     _storage_client = None
     """ Storage client to storage service """
 
+    _cached_tables = {
+        'log_codes': {'ttl': 3600, 'max_entries': 8},
+        'roles': {'ttl': 300, 'max_entries': 32}
+    }
+    """ Storage tables whose queries are cached by the storage clients of the core, with their time to live in
+    seconds and maximum number of cached queries. The core sees its own writes immediately, writes made by other
+    processes after at most ttl seconds: only tables the other processes do not write to are cached, the
+    configuration, which tasks and services register theirs in, is not. """
+
     _configuration_manager = None
     """ Instance of configuration manager (singleton) """
 
@@ -396,6 +408,9 @@ class Server:
                 found_services = ServiceRegistry.get(name="FogLAMP Storage")
                 storage_service = found_services[0]
                 cls._storage_client = StorageClient(cls._host, cls.core_management_port, svc=storage_service)
+                storage_cache = StorageCache.get(cls._storage_client.base_url)
+                for tbl_name, settings in cls._cached_tables.items():
+                    storage_cache.configure(tbl_name, **settings)
             except (service_registry_exceptions.DoesNotExist, InvalidServiceInstance, StorageServiceUnavailable, Exception) as ex:
                 await asyncio.sleep(5)
 
@@ -636,6 +651,7 @@ class Server:
         await cls.service_app.shutdown()
         await cls.service_server_handler.shutdown(60.0)
         await cls.service_app.cleanup()
+        await connect.close_async()
         _logger.info("Rest server stopped.")
 
     @classmethod
@@ -723,6 +739,15 @@ class Server:
         since_started = time.time() - cls._start_time
         return web.json_response({'uptime': since_started})
 
+    @classmethod
+    async def get_storage_metrics(cls, request):
+        """ profile of the calls made by the core to the storage service
+
+        :Example:
+            curl -X GET http://localhost:<core mgt port>/foglamp/service/storage/metrics
+        """
+        return web.json_response(StorageMetrics.report())
+
     @classmethod
     async def register(cls, request):
         """ Register a service
@@ -732,6 +757,7 @@ class Server:
                 "management_port": 1090, "protocol": "https"}' -X POST http://localhost:<core mgt port>/foglamp/service
 
             service_port in payload is optional
+            socket in payload is optional, the path of a unix domain socket the service API also listens on
         """
 
         try:
@@ -743,6 +769,7 @@ class Server:
             service_port = data.get('service_port', None)
             service_management_port = data.get('management_port', None)
             service_protocol = data.get('protocol', 'http')
+            service_socket = data.get('socket', None)
 
             if not (service_name.strip() or service_type.strip() or service_address.strip()
                     or service_management_port.strip() or not service_management_port.isdigit()):
@@ -752,12 +779,16 @@ class Server:
                 if not (isinstance(service_port, int)):
                     raise web.HTTPBadRequest(reason="Service's service port can be a positive integer only")
 
+            if service_socket is not None and not isinstance(service_socket, str):
+                raise web.HTTPBadRequest(reason="Service's socket can be a path only")
+
             if not isinstance(service_management_port, int):
                 raise web.HTTPBadRequest(reason='Service management port can be a positive integer only')
 
             try:
                 registered_service_id = ServiceRegistry.register(service_name, service_type, service_address,
-                                                                   service_port, service_management_port, service_protocol)
+                                                                   service_port, service_management_port, service_protocol,
+                                                                   socket=service_socket)
                 try:
                     if not cls._storage_client is None:
                         cls._audit = AuditLogger(cls._storage_client)
@@ -863,6 +894,8 @@ class Server:
             svc["status"] = ServiceRecord.Status(int(service._status)).name.lower()
             if service._port:
                 svc["service_port"] = service._port
+            if service._socket:
+                svc["socket"] = service._socket
             services.append(svc)
 
         return web.json_response({"services": services})
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Adaptive size and flush timeout of the readings insert batches of Ingest
+
+The batch size follows AIMD toward a target insert latency: it grows by a step after each full batch inserted within
+the target and is halved when an insert takes longer, or fails, but not below the configured batch size. The flush
+timeout is the time the batch takes to fill at the observed arrival rate, but no longer than the target latency, or
+the insert latency when it is higher: the readings of a low rate sensor are not kept waiting for a batch which is not
+filling up.
+"""
+
+import time
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('BatchTuner',)
+
+_MIN_TIMEOUT_SECONDS = 0.01
+"""Shortest flush timeout, so that a readings list is not polled in a busy loop"""
+
+_SMOOTHING = 0.2
+"""Weight of a new sample in the moving averages of the insert latency and arrival rate"""
+
+
+class BatchTuner(object):
+    """ Tunes batch_size and timeout from the inserts made and the readings arrived, not thread-safe """
+
+    __slots__ = ('batch_size', 'timeout', '_min_batch_size', '_max_batch_size', '_step', '_max_timeout',
+                 '_target_latency', '_latency', '_rate', '_arrived', '_since')
+
+    def __init__(self, batch_size, max_batch_size, max_timeout, target_latency):
+        """
+        :param batch_size: initial and smallest batch size, the step of the additive increase is an eighth of it
+        :param max_batch_size: largest batch size, e.g. the capacity of a readings list
+        :param max_timeout: longest flush timeout in seconds, the initial one
+        :param target_latency: insert latency in seconds above which the batch size is decreased
+        """
+        if not 0 < batch_size <= max_batch_size:
+            raise ValueError("Batch size must be between 1 and the maximum batch size {}".format(max_batch_size))
+        self.batch_size = batch_size
+        self.timeout = max_timeout
+        self._min_batch_size = batch_size
+        self._max_batch_size = max_batch_size
+        self._step = max(1, batch_size // 8)
+        self._max_timeout = max_timeout
+        self._target_latency = target_latency
+        self._latency = None  # moving average, seconds
+        self._rate = None  # moving average, readings per second
+        self._arrived = 0
+        self._since = time.monotonic()
+
+    def arrived(self, count):
+        """ Counts readings added to the buffers """
+        self._arrived += count
+
+    def inserted(self, count, latency):
+        """ Tunes the batch size and timeout after a batch of count readings was inserted in latency seconds """
+        self._sample(latency)
+        if latency > self._target_latency:
+            self.batch_size = max(self._min_batch_size, self.batch_size // 2)
+        elif count >= self.batch_size:
+            self.batch_size = min(self._max_batch_size, self.batch_size + self._step)
+        self._tune_timeout()
+
+    def failed(self):
+        """ Backs off after an insert failed """
+        self.batch_size = max(self._min_batch_size, self.batch_size // 2)
+        self._tune_timeout()
+
+    def _sample(self, latency):
+        now = time.monotonic()
+        elapsed = now - self._since
+        if elapsed > 0:
+            rate = self._arrived / elapsed
+            self._rate = rate if self._rate is None else self._rate + _SMOOTHING * (rate - self._rate)
+            self._arrived = 0
+            self._since = now
+        self._latency = latency if self._latency is None else self._latency + _SMOOTHING * (latency - self._latency)
+
+    def _tune_timeout(self):
+        if self._latency is None:
+            return
+        timeout = max(self._latency, self._target_latency)
+        if self._rate:
+            timeout = min(timeout, self.batch_size / self._rate)
+        self.timeout = min(self._max_timeout, max(_MIN_TIMEOUT_SECONDS, timeout))
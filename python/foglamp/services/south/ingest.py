@@ -7,14 +7,26 @@
 """FogLAMP Sensor Readings Ingest API"""
 
 import asyncio
+import collections
 import datetime
+import os
 import time
 import uuid
 from typing import List, Union
 import json
 from foglamp.common import logger
 from foglamp.common import statistics
-from foglamp.common.storage_client.exceptions import StorageServerError
+from foglamp.common.storage_client.circuit_breaker import backoff
+from foglamp.common.storage_client.exceptions import CircuitBreakerOpen, StorageServerError
+from foglamp.common.storage_client.utils import Utils
+from foglamp.services.south.batch_tuner import BatchTuner
+from foglamp.services.south.ingest_metrics import IngestMetrics
+from foglamp.services.south.read_key_window import ReadKeyWindow
+from foglamp.services.south.reading import reading_row
+from foglamp.services.south.reading_aggregator import ReadingAggregator
+from foglamp.services.south.reading_filter import ReadingFilter
+from foglamp.services.south.ring_buffer import RingBuffer
+from foglamp.services.south.spill_journal import SpillJournal
 
 __author__ = "Terris Linenbach, Amarendra K Sinha"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -23,6 +35,15 @@ __version__ = "${VERSION}"
 
 _LOGGER = logger.setup(__name__)  # type: logging.Logger
 _MAX_ATTEMPTS = 2
+_MAX_OUTAGE_WAIT_SECONDS = 1
+"""Longest wait, while the storage service is unavailable, before checking again whether to stop"""
+
+_FOGLAMP_ROOT = os.getenv("FOGLAMP_ROOT", default='/usr/local/foglamp')
+_FOGLAMP_DATA = os.getenv("FOGLAMP_DATA", default=None)
+_SPILL_JOURNAL_DIR = "/spill"
+
+_STATISTICS_KEY_LENGTH = 56
+"""Maximum length of the key of a statistics row"""
 
 # _LOGGER = logger.setup(__name__, level=logging.DEBUG)  # type: logging.Logger
 # _LOGGER = logger.setup(__name__, destination=logger.CONSOLE, level=logging.DEBUG)
@@ -48,6 +69,33 @@ class Ingest(object):
     _discarded_readings_stats = 0  # type: int
     """Number of readings rejected before statistics were written to storage"""
 
+    _duplicate_readings_stats = 0  # type: int
+    """Number of readings rejected as duplicates before statistics were written to storage"""
+
+    _read_keys = None  # type: ReadKeyWindow
+    """Keys of the readings added within the deduplication window, None when readings are not deduplicated"""
+
+    _filtered_readings_stats = 0  # type: int
+    """Number of readings dropped by the readings filter before statistics were written to storage"""
+
+    _readings_filter = None  # type: ReadingFilter
+    """Filter of the readings of slow-changing assets, None when no asset is filtered"""
+
+    _readings_filter_config = None
+    """Configuration of _readings_filter, as last set"""
+
+    _readings_aggregator = None  # type: ReadingAggregator
+    """Aggregator of the readings of high-frequency assets, None when no asset is aggregated"""
+
+    _readings_aggregation_config = None
+    """Configuration of _readings_aggregator, as last set"""
+
+    _emit_aggregates_task = None  # type: asyncio.Task
+    """asyncio task for :meth:`_emit_aggregates`"""
+
+    _emit_aggregates_sleep_task = None  # type: asyncio.Task
+    """asyncio task for asyncio.sleep"""
+
     _sensor_stats = {}  # type: dict
     """Number of sensor readings accepted before statistics were written to storage"""
 
@@ -63,8 +111,8 @@ class Ingest(object):
     _started = False
     """True when the server has been started"""
 
-    _readings_lists = None  # type: List
-    """A list of readings lists. Each list contains the inputs to :meth:`add_readings`."""
+    _readings_lists = None  # type: List[RingBuffer]
+    """A list of readings buffers. Each buffer contains the inputs to :meth:`add_readings`, serialized to JSON bytes."""
 
     _current_readings_list_index = 0
     """Which readings list to insert into next"""
@@ -72,17 +120,13 @@ class Ingest(object):
     _insert_readings_tasks = None  # type: List[asyncio.Task]
     """asyncio tasks for :meth:`_insert_readings`"""
 
-    _readings_list_batch_size_reached = None  # type: List[asyncio.Event]
-    """Fired when a readings list has reached _readings_insert_batch_size entries"""
+    _readings_lists_not_full_waiters = None  # type: collections.deque
+    """Futures of the :meth:`add_readings` calls waiting for room in the full readings buffers, resolved
+    in order, one for each reading removed from the buffers"""
 
-    _readings_list_not_empty = None  # type: List[asyncio.Event]
-    """Fired when a readings list transitions from empty to not empty"""
-
-    _readings_lists_not_full = None  # type: asyncio.Event
-    """Fired when items are removed from any readings list"""
-
-    _insert_readings_wait_tasks = None  # type: List[asyncio.Task]
-    """asyncio tasks blocking :meth:`_insert_readings` that can be canceled"""
+    _capacity_waiters = None  # type: collections.deque
+    """Futures of the :meth:`wait_capacity` calls, resolved together once the buffers drained to the low watermark.
+    Acquisition is paused while there are some."""
 
     _last_insert_time = 0  # type: int
     """epoch time of last insert"""
@@ -90,6 +134,24 @@ class Ingest(object):
     _readings_list_size = 0  # type: int
     """Maximum number of readings items in each buffer"""
 
+    _spill_journal = None  # type: SpillJournal
+    """Readings kept on disk when the buffers are full or could not be inserted, None when disabled"""
+
+    _spill_journal_not_empty = None  # type: asyncio.Event
+    """Set when readings are spilled to the journal"""
+
+    _drain_spill_journal_task = None  # type: asyncio.Task
+    """asyncio task for :meth:`_drain_spill_journal`"""
+
+    _drain_spill_journal_sleep_task = None  # type: asyncio.Task
+    """asyncio task for asyncio.sleep"""
+
+    _metrics = IngestMetrics()  # type: IngestMetrics
+    """Live counters of the readings buffered and inserted, served by :meth:`metrics`"""
+
+    _batch_tuner = None  # type: BatchTuner
+    """Tunes _readings_insert_batch_size and _readings_insert_batch_timeout_seconds, None when not adaptive"""
+
     # Configuration (begin)
     _write_statistics_frequency_seconds = 5
     """The number of seconds to wait before writing readings-related statistics to storage"""
@@ -100,18 +162,42 @@ class Ingest(object):
     _max_concurrent_readings_inserts = 4
     """Maximum number of concurrent processes that send batches of readings to storage. Preferably in multiples of 2."""
 
+    _readings_buffer_high_watermark_percent = 90
+    """Fill percentage of the buffers at which :meth:`wait_capacity` pauses acquisition"""
+
+    _readings_buffer_low_watermark_percent = 50
+    """Fill percentage of the buffers down to which they are drained before acquisition resumes"""
+
     _readings_insert_batch_size = 1024
     """Maximum number of readings in a batch of inserts. Preferably in multiples of 2."""
 
-    _readings_insert_batch_timeout_seconds = 1
+    _readings_insert_batch_timeout_seconds = 1  # type: float
     """Number of seconds to wait for a readings list to reach the minimum batch size"""
 
+    _adaptive_readings_insert = False
+    """Whether to tune the batch size and timeout, up to the configured ones, from insert latency and readings rate"""
+
+    _readings_insert_target_latency_ms = 100
+    """Insert latency the adaptive batch size is tuned toward"""
+
     _max_readings_insert_batch_connection_idle_seconds = 60
     """Close connections used to insert readings when idle for this number of seconds"""
 
     _max_readings_insert_batch_reconnect_wait_seconds = 10
     """The maximum number of seconds to wait before reconnecting to storage when inserting readings"""
 
+    _read_key_dedup_window_seconds = 0
+    """Number of seconds a reading with the key of a reading added before is rejected, 0 disables deduplication"""
+
+    _read_key_dedup_memory_kb = 4096
+    """Maximum memory in KB holding the keys of the deduplication window"""
+
+    _read_key_dedup_expected_rate = 1000
+    """Expected number of readings per second with a key, to size the deduplication window for"""
+
+    _readings_spill_journal_size_mb = 64
+    """Maximum size in MB of the journal on disk of the readings which can not be buffered or inserted, 0 disables it"""
+
     # Configuration (end)
 
     @classmethod
@@ -133,6 +219,18 @@ class Ingest(object):
                 "type": "integer",
                 "default": str(cls._readings_buffer_size)
             },
+            "readings_buffer_high_watermark_percent": {
+                "description": "Fill percentage of the readings buffers at which the South plugin pauses "
+                               "acquiring readings",
+                "type": "integer",
+                "default": str(cls._readings_buffer_high_watermark_percent)
+            },
+            "readings_buffer_low_watermark_percent": {
+                "description": "Fill percentage down to which the readings buffers are drained before the South "
+                               "plugin resumes acquiring readings",
+                "type": "integer",
+                "default": str(cls._readings_buffer_low_watermark_percent)
+            },
             "max_concurrent_readings_inserts": {
                 "description": "Maximum number of concurrent processes that send batches of "
                                "readings to storage",
@@ -145,9 +243,9 @@ class Ingest(object):
                 "default": str(cls._readings_insert_batch_size)
             },
             "readings_insert_batch_timeout_seconds": {
-                "description": "Number of seconds to wait for a readings list to reach the "
-                               "minimum batch size",
-                "type": "integer",
+                "description": "Number of seconds, possibly a fraction, e.g. 0.25, to wait for a readings list to "
+                               "reach the minimum batch size",
+                "type": "string",
                 "default": str(cls._readings_insert_batch_timeout_seconds)
             },
             "max_readings_insert_batch_connection_idle_seconds": {
@@ -162,6 +260,43 @@ class Ingest(object):
                 "type": "integer",
                 "default": str(cls._max_readings_insert_batch_reconnect_wait_seconds)
             },
+            "adaptive_readings_insert": {
+                "description": "Tune the readings insert batch size, from the configured batch size up to the "
+                               "buffer size, and the timeout, up to the configured timeout, from the insert latency "
+                               "and the readings rate",
+                "type": "boolean",
+                "default": str(cls._adaptive_readings_insert).lower()
+            },
+            "readings_insert_target_latency_ms": {
+                "description": "Milliseconds a readings insert should take, above which the adaptive batch "
+                               "size is decreased",
+                "type": "integer",
+                "default": str(cls._readings_insert_target_latency_ms)
+            },
+            "read_key_dedup_window_seconds": {
+                "description": "Number of seconds during which a reading with the same key as a reading received "
+                               "before is rejected as a duplicate, 0 to accept all the readings",
+                "type": "integer",
+                "default": str(cls._read_key_dedup_window_seconds)
+            },
+            "read_key_dedup_memory_kb": {
+                "description": "Maximum memory in KB holding the keys of the readings received within the "
+                               "deduplication window",
+                "type": "integer",
+                "default": str(cls._read_key_dedup_memory_kb)
+            },
+            "read_key_dedup_expected_rate": {
+                "description": "Expected number of readings with a key received per second, to size the "
+                               "deduplication window for",
+                "type": "integer",
+                "default": str(cls._read_key_dedup_expected_rate)
+            },
+            "readings_spill_journal_size_mb": {
+                "description": "Maximum size in MB of the journal on disk of the readings which can not be "
+                               "buffered or inserted, 0 to discard them instead",
+                "type": "integer",
+                "default": str(cls._readings_spill_journal_size_mb)
+            },
         }
 
         # Create configuration category and any new keys within it
@@ -179,17 +314,40 @@ class Ingest(object):
         cls._write_statistics_frequency_seconds = int(config['write_statistics_frequency_seconds']
                                                       ['value'])
         cls._readings_buffer_size = int(config['readings_buffer_size']['value'])
+        cls._readings_buffer_high_watermark_percent = int(config['readings_buffer_high_watermark_percent']['value'])
+        cls._readings_buffer_low_watermark_percent = int(config['readings_buffer_low_watermark_percent']['value'])
         cls._max_concurrent_readings_inserts = int(config['max_concurrent_readings_inserts']
                                                    ['value'])
         cls._readings_insert_batch_size = int(config['readings_insert_batch_size']['value'])
-        cls._readings_insert_batch_timeout_seconds = int(config
-                                                         ['readings_insert_batch_timeout_seconds']
-                                                         ['value'])
+        timeout = config['readings_insert_batch_timeout_seconds']['value']
+        try:
+            cls._readings_insert_batch_timeout_seconds = cls._positive_float(timeout)
+        except ValueError:
+            _LOGGER.error('Invalid readings_insert_batch_timeout_seconds %s, it must be a positive number of seconds; '
+                          'using %s', timeout, cls._readings_insert_batch_timeout_seconds)
         cls._max_readings_insert_batch_connection_idle_seconds = int(
             config['max_readings_insert_batch_connection_idle_seconds']
             ['value'])
         cls._max_readings_insert_batch_reconnect_wait_seconds = int(
             config['max_readings_insert_batch_reconnect_wait_seconds']['value'])
+        cls._adaptive_readings_insert = config['adaptive_readings_insert']['value'].lower() == 'true'
+        cls._readings_insert_target_latency_ms = int(config['readings_insert_target_latency_ms']['value'])
+        cls._read_key_dedup_window_seconds = int(config['read_key_dedup_window_seconds']['value'])
+        cls._read_key_dedup_memory_kb = int(config['read_key_dedup_memory_kb']['value'])
+        cls._read_key_dedup_expected_rate = int(config['read_key_dedup_expected_rate']['value'])
+        cls._readings_spill_journal_size_mb = int(config['readings_spill_journal_size_mb']['value'])
+
+    @staticmethod
+    def _positive_float(value) -> float:
+        """Parses a configuration item of a positive number, possibly a fraction
+
+        Raises:
+            ValueError: The value is not a positive number
+        """
+        number = float(value)
+        if not number > 0:
+            raise ValueError('{} is not a positive number'.format(value))
+        return number
 
     @classmethod
     async def start(cls, parent):
@@ -217,54 +375,89 @@ class Ingest(object):
                             'to %s', cls._readings_buffer_size,
                             cls._readings_list_size * cls._max_concurrent_readings_inserts)
 
+        cls._read_keys = None
+        if cls._read_key_dedup_window_seconds > 0:
+            cls._read_keys = ReadKeyWindow(cls._read_key_dedup_window_seconds, cls._read_key_dedup_memory_kb * 1024,
+                                           cls._read_key_dedup_expected_rate)
+
+        cls._batch_tuner = None
+        if cls._adaptive_readings_insert:
+            cls._batch_tuner = BatchTuner(cls._readings_insert_batch_size, cls._readings_list_size,
+                                          cls._readings_insert_batch_timeout_seconds,
+                                          cls._readings_insert_target_latency_ms / 1000)
+
+        cls._metrics = IngestMetrics()
+
         # Start asyncio tasks
         cls._write_statistics_task = asyncio.ensure_future(cls._write_statistics())
 
         cls._last_insert_time = 0
 
-        cls._insert_readings_wait_tasks = []
-        cls._readings_list_batch_size_reached = []
-        cls._readings_list_not_empty = []
-        cls._readings_lists = []
+        cls._current_readings_list_index = 0
+        cls._readings_lists = [RingBuffer(cls._readings_list_size)
+                               for _ in range(cls._max_concurrent_readings_inserts)]
+        cls._readings_lists_not_full_waiters = collections.deque()
+        cls._capacity_waiters = collections.deque()
 
-        for _ in range(cls._max_concurrent_readings_inserts):
-            cls._readings_lists.append([])
-            cls._insert_readings_wait_tasks.append(None)
-            cls._readings_list_batch_size_reached.append(asyncio.Event())
-            cls._readings_list_not_empty.append(asyncio.Event())
+        cls._insert_readings_tasks = [asyncio.ensure_future(cls._insert_readings(list_index))
+                                      for list_index in range(cls._max_concurrent_readings_inserts)]
 
-        cls._insert_readings_task = asyncio.ensure_future(cls._insert_readings())
-        cls._readings_lists_not_full = asyncio.Event()
+        cls._open_spill_journal()
 
         cls._stop = False
         cls._started = True
 
+        # The aggregation set before a restart
+        if cls._readings_aggregator is not None:
+            cls._emit_aggregates_task = asyncio.ensure_future(cls._emit_aggregates())
+
     @classmethod
     async def stop(cls):
         """Stops the server
 
-        Writes pending statistics and readings to storage
+        Waits for the readings inserts in progress, then writes the readings still buffered, held back by the
+        readings filter or folded into aggregation windows, partial, to the spill journal, to be inserted after the
+        next start. Those it has no room for, or all of them when it is disabled, are counted as discarded.
+        Writes pending statistics to storage last.
         """
         if cls._stop or not cls._started:
             return
 
         cls._stop = True
 
-        for task in cls._insert_readings_wait_tasks:
-            if task is not None:
-                task.cancel()
-        try:
-            await cls._insert_readings_task
-            cls._insert_readings_task = None
-        except Exception:
-            _LOGGER.exception('An exception was raised by Ingest._insert_readings')
+        for readings_list in cls._readings_lists:
+            readings_list.release()
+        cls._wake_add_readings(len(cls._readings_lists_not_full_waiters))
+        cls._wake_wait_capacity()
+        if cls._emit_aggregates_task is not None:
+            if cls._emit_aggregates_sleep_task is not None:
+                cls._emit_aggregates_sleep_task.cancel()
+                cls._emit_aggregates_sleep_task = None
+            try:
+                await cls._emit_aggregates_task
+            except Exception:
+                _LOGGER.exception('An exception was raised by Ingest._emit_aggregates')
+            cls._emit_aggregates_task = None
+        for insert_readings_task in cls._insert_readings_tasks:
+            try:
+                await insert_readings_task
+            except Exception:
+                _LOGGER.exception('An exception was raised by Ingest._insert_readings')
+
+        # Keep the readings still buffered, held back by the filter or aggregated, on disk, for the next start
+        for readings_list in cls._readings_lists:
+            cls._spill_or_discard(readings_list.pop(len(readings_list)))
+        if cls._readings_filter is not None:
+            cls._spill_or_discard(cls._readings_filter.flush())
+        if cls._readings_aggregator is not None:
+            cls._spill_or_discard([row for _, row in cls._readings_aggregator.flush()])
 
-        cls._insert_readings_wait_tasks = None
         cls._insert_readings_tasks = None
         cls._readings_lists = None
-        cls._readings_list_batch_size_reached = None
-        cls._readings_list_not_empty = None
-        cls._readings_lists_not_full = None
+        cls._readings_lists_not_full_waiters = None
+        cls._capacity_waiters = None
+
+        await cls._close_spill_journal()
 
         # Write statistics
         if cls._write_statistics_sleep_task is not None:
@@ -277,84 +470,320 @@ class Ingest(object):
         except Exception:
             _LOGGER.exception('An exception was raised by Ingest._write_statistics')
 
+        # Release the pooled connections used to insert readings
+        if cls.readings_storage_async is not None:
+            try:
+                await cls.readings_storage_async.close()
+            except Exception:
+                _LOGGER.exception('An exception was raised while closing the readings storage client')
+
         cls._started = False
 
+    @classmethod
+    def set_readings_filter(cls, config) -> None:
+        """Filters the readings of the assets as configured, see :mod:`foglamp.services.south.reading_filter`
+
+        Args:
+            config: The readingsFilter value of the South plugin's category, a JSON object or its string
+
+        The filter is kept as it was when the configuration is invalid or did not change. Otherwise the readings
+        held back by the previous filter are spilled to disk, or else dropped.
+        """
+        if config == cls._readings_filter_config:
+            return
+        try:
+            readings_filter = ReadingFilter(json.loads(config) if isinstance(config, str) else config)
+        except (ValueError, TypeError, AttributeError) as ex:
+            _LOGGER.error('Invalid readings filter %s, %s', config, str(ex))
+            return
+
+        if cls._readings_filter is not None:
+            held = cls._readings_filter.flush()
+            cls._filtered_readings_stats += cls._readings_filter.filtered + len(held) - cls._spill(held)
+        cls._readings_filter = readings_filter if readings_filter else None
+        cls._readings_filter_config = config
+
+    @classmethod
+    def set_readings_aggregation(cls, config) -> None:
+        """Aggregates the readings of the assets as configured, see :mod:`foglamp.services.south.reading_aggregator`
+
+        Args:
+            config: The readingsAggregation value of the South plugin's category, a JSON object or its string
+
+        The aggregation is kept as it was when the configuration is invalid or did not change. Otherwise the
+        aggregates of the windows of the previous one, partial, are spilled to disk, or else discarded.
+        """
+        if config == cls._readings_aggregation_config:
+            return
+        try:
+            aggregator = ReadingAggregator(json.loads(config) if isinstance(config, str) else config)
+        except (ValueError, TypeError, AttributeError) as ex:
+            _LOGGER.error('Invalid readings aggregation %s, %s', config, str(ex))
+            return
+
+        if cls._readings_aggregator is not None:
+            cls._spill_or_discard([row for _, row in cls._readings_aggregator.flush()])
+        cls._readings_aggregator = aggregator if aggregator else None
+        cls._readings_aggregation_config = config
+
+        if cls._readings_aggregator is not None and cls._started and (
+                cls._emit_aggregates_task is None or cls._emit_aggregates_task.done()):
+            cls._emit_aggregates_task = asyncio.ensure_future(cls._emit_aggregates())
+
+    @classmethod
+    async def _emit_aggregates(cls):
+        """Buffers the aggregates of the windows which ended, of the assets with no reading since, every shortest
+        window
+        """
+        while not cls._stop and cls._readings_aggregator is not None:
+            # stop() cancels _emit_aggregates_sleep_task, as for _write_statistics_sleep_task
+            cls._emit_aggregates_sleep_task = asyncio.ensure_future(
+                asyncio.sleep(cls._readings_aggregator.min_window))
+            try:
+                await cls._emit_aggregates_sleep_task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                cls._emit_aggregates_sleep_task = None
+
+            if cls._stop or cls._readings_aggregator is None:
+                break
+            try:
+                for aggregate_asset, row in cls._readings_aggregator.expired():
+                    await cls._buffer_rows(aggregate_asset, [row])
+            except RuntimeError:
+                break
+
     @classmethod
     def increment_discarded_readings(cls):
         """Increments the number of discarded sensor readings"""
         cls._discarded_readings_stats += 1
 
     @classmethod
-    async def _insert_readings(cls):
-        """Inserts rows into the readings table
+    def fill_ratio(cls) -> float:
+        """Returns the fraction, from 0 to 1, of the room of the readings buffers taken by readings not inserted yet"""
+        if not cls._readings_lists:
+            return 0.0
+        return sum(len(readings_list) for readings_list in cls._readings_lists) / sum(
+            readings_list.capacity for readings_list in cls._readings_lists)
+
+    @classmethod
+    async def wait_capacity(cls) -> None:
+        """Waits, once the buffers filled up to the high watermark, until they are drained to the low watermark
 
-        Use ReadingsStorageClientAsync().append(json_payload_of_readings)
+        A South plugin, or the poll loop of the service, awaits it before acquiring readings, so that it pauses
+        while storage does not keep up, instead of piling up readings, or tasks adding them, in memory. Acquisition
+        stays paused, for all the callers, until the buffers are drained to the low watermark. It returns at once
+        when the server is not running.
         """
-        _LOGGER.info('Insert readings loop started')
+        if cls._stop or not cls._started:
+            return
+        if not cls._capacity_waiters and cls.fill_ratio() * 100 < cls._readings_buffer_high_watermark_percent:
+            return
+        waiter = asyncio.get_event_loop().create_future()
+        cls._capacity_waiters.append(waiter)
+        wait_start = time.monotonic()
+        await waiter
+        cls._metrics.capacity_waits += 1
+        cls._metrics.capacity_seconds += time.monotonic() - wait_start
 
-        list_index = 0
+    @classmethod
+    def _wake_wait_capacity(cls):
+        """Resolves the futures of all the wait_capacity calls"""
+        waiters = cls._capacity_waiters
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
 
-        while list_index <= cls._max_concurrent_readings_inserts-1:
-            if cls._stop:
-                break  # Terminate this method
+    @classmethod
+    def _wake_add_readings(cls, count):
+        """Resolves the futures of the first count add_readings calls waiting for room in the buffers, and of the
+        wait_capacity calls once the buffers are drained to the low watermark
+        """
+        waiters = cls._readings_lists_not_full_waiters
+        while count > 0 and waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                count -= 1
+        if cls._capacity_waiters and cls.fill_ratio() * 100 <= cls._readings_buffer_low_watermark_percent:
+            cls._wake_wait_capacity()
 
-            list_index += 1
-            if list_index > cls._max_concurrent_readings_inserts-1:
-                list_index = 0
+    @classmethod
+    def _open_spill_journal(cls):
+        """Opens the spill journal of the service, with the readings left by its previous run, and starts draining it"""
+        cls._spill_journal = None
+        if cls._readings_spill_journal_size_mb <= 0:
+            return
 
-            # _LOGGER.debug('Insert readings for list_index: %s', list_index)
+        directory = (_FOGLAMP_DATA or _FOGLAMP_ROOT + "/data") + _SPILL_JOURNAL_DIR + "/" + cls._parent_service._name
+        try:
+            cls._spill_journal = SpillJournal(directory, cls._readings_spill_journal_size_mb * 1024 * 1024)
+        except Exception:
+            _LOGGER.exception('Unable to open the spill journal %s, readings which can not be buffered or inserted '
+                              'will be discarded', directory)
+            return
 
-            readings_list = cls._readings_lists[list_index]
-            min_readings_reached = cls._readings_list_batch_size_reached[list_index]
-            list_not_empty = cls._readings_list_not_empty[list_index]
-            lists_not_full = cls._readings_lists_not_full
+        cls._spill_journal_not_empty = asyncio.Event()
+        if len(cls._spill_journal):
+            cls._spill_journal_not_empty.set()
+        cls._drain_spill_journal_task = asyncio.ensure_future(cls._drain_spill_journal())
 
-            # Wait for enough items in the list to fill a batch
-            # for some minimum amount of time
-            while not cls._stop:
-                if len(readings_list) >= cls._readings_insert_batch_size:
-                    break
+    @classmethod
+    async def _close_spill_journal(cls):
+        """Stops draining the spill journal and writes it to disk"""
+        if cls._spill_journal is None:
+            return
+
+        cls._spill_journal_not_empty.set()
+        if cls._drain_spill_journal_sleep_task is not None:
+            cls._drain_spill_journal_sleep_task.cancel()
+            cls._drain_spill_journal_sleep_task = None
+
+        try:
+            await cls._drain_spill_journal_task
+        except Exception:
+            _LOGGER.exception('An exception was raised by Ingest._drain_spill_journal')
+        cls._drain_spill_journal_task = None
+
+        if len(cls._spill_journal):
+            _LOGGER.info('%s readings kept in the spill journal %s', len(cls._spill_journal),
+                         cls._spill_journal.directory)
+        cls._spill_journal.close()
+        cls._spill_journal = None
+
+    @classmethod
+    def _spill(cls, readings) -> int:
+        """Appends serialized readings to the spill journal, as many as it has room for
+
+        Returns:
+            The number of readings spilled, 0 when the journal is disabled
+        """
+        if cls._spill_journal is None or not readings:
+            return 0
+        try:
+            count = cls._spill_journal.append(readings)
+        except Exception:
+            _LOGGER.exception('Unable to spill %s readings to the journal', len(readings))
+            return 0
+        if count:
+            cls._spill_journal_not_empty.set()
+            cls._metrics.spilled += count
+        return count
+
+    @classmethod
+    def _spill_or_discard(cls, readings):
+        """Appends serialized readings to the spill journal, those it has no room for are discarded"""
+        discarded = len(readings) - cls._spill(readings)
+        if discarded:
+            cls._discarded_readings_stats += discarded
+            _LOGGER.warning('%s readings discarded, the spill journal is disabled or full', discarded)
+
+    @classmethod
+    async def _drain_spill_journal(cls):
+        """Inserts the readings of the spill journal into the readings table, a full batch at a time
+
+        The readings are removed from the journal once inserted, so that they are retried, while storage is
+        unavailable, until it recovers, even across restarts.
+        """
+        _LOGGER.info('Spill journal drain started')
 
-                min_readings_reached.clear()
-                waiter = asyncio.ensure_future(min_readings_reached.wait())
-                cls._insert_readings_wait_tasks[list_index] = waiter
+        journal = cls._spill_journal
+        attempt = 0
+        while not cls._stop:
+            if not len(journal):
+                cls._spill_journal_not_empty.clear()
+                await cls._spill_journal_not_empty.wait()
+                continue
 
-                # _LOGGER.debug('Waiting for entire batch: Queue index: %s Size: %s', list_index, len(readings_list))
+            readings = journal.peek(cls._readings_insert_batch_size)
+            batch_size = len(readings)
+            delay = None
+            try:
+                await cls.readings_storage_async.append(b'{"readings":' + Utils.serialize_list(readings) + b'}')
+                cls._readings_stats += batch_size
+                journal.drop(batch_size)
+                attempt = 0
+            except CircuitBreakerOpen as ex:
+                delay = min(ex.retry_after or backoff(0), _MAX_OUTAGE_WAIT_SECONDS)
+            except StorageServerError as ex:
+                if ex.error.get("retryable"):
+                    delay = backoff(attempt)
+                    attempt += 1
+                else:
+                    _LOGGER.error("%s, %s", ex.error.get("source"), ex.error.get("message"))
+                    cls._discarded_readings_stats += journal.drop(batch_size)
+            except Exception as ex:
+                _LOGGER.warning('Insert of spilled readings failed on attempt #%s | %s', attempt + 1, str(ex))
+                delay = backoff(attempt)
+                attempt += 1
 
+            if delay is not None and not cls._stop:
+                # stop() cancels _drain_spill_journal_sleep_task, as for _write_statistics_sleep_task
+                cls._drain_spill_journal_sleep_task = asyncio.ensure_future(asyncio.sleep(delay))
                 try:
-                    await asyncio.wait_for(waiter, cls._readings_insert_batch_timeout_seconds)
-                    # _LOGGER.debug('Released: Queue index: %s Size: %s', list_index, len(readings_list))
+                    await cls._drain_spill_journal_sleep_task
                 except asyncio.CancelledError:
-                    # _LOGGER.debug('Cancelled: Queue index: %s Size: %s', list_index, len(readings_list))
-                    break
-                except asyncio.TimeoutError:
-                    # _LOGGER.debug('Timed out: Queue index: %s Size: %s', list_index, len(readings_list))
-                    break
+                    pass
                 finally:
-                    cls._insert_readings_wait_tasks[list_index] = None
+                    cls._drain_spill_journal_sleep_task = None
+
+        _LOGGER.info('Spill journal drain stopped')
+
+    @classmethod
+    async def _insert_readings(cls, list_index):
+        """Inserts the rows of a readings list into the readings table
 
-            # If list is still empty, then proceed to next list
+        Use ReadingsStorageClientAsync().append(payload_of_readings). The readings are buffered already serialized,
+        by :meth:`add_readings`, so that the payload of a batch is only a join of bytes. A task runs this method for
+        each list, so that up to _max_concurrent_readings_inserts batches are inserted at the same time.
+        """
+        _LOGGER.info('Insert readings loop started for list index: %s', list_index)
+
+        readings_list = cls._readings_lists[list_index]
+        last_insert_time = 0
+
+        while not cls._stop:
+            # Wait for enough items in the list to fill a batch
+            # for some minimum amount of time
+            if len(readings_list) < cls._readings_insert_batch_size:
+                try:
+                    await asyncio.wait_for(readings_list.level_reached(cls._readings_insert_batch_size),
+                                           cls._readings_insert_batch_timeout_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+            # If list is still empty, then wait again
             if not len(readings_list):
                 continue
 
-            # If batch size still not reached and if there is time then let this list wait and move to next list
+            # If batch size still not reached and if there is time then let this list wait
             if (not cls._stop) and (len(readings_list) < cls._readings_insert_batch_size) and ((
-                    time.time() - cls._last_insert_time) < cls._readings_insert_batch_timeout_seconds):
+                    time.time() - last_insert_time) < cls._readings_insert_batch_timeout_seconds):
                 continue
 
             attempt = 0
-            cls._last_insert_time = time.time()
+            last_insert_time = cls._last_insert_time = time.time()
 
             # Perform insert. Retry when fails.
             while True:
                 try:
-                    payload = dict()
-                    payload['readings'] = readings_list
-                    batch_size = len(payload['readings'])
+                    # The whole list, unless the batch size is tuned: then at most a batch
+                    readings = readings_list.peek(readings_list.capacity if cls._batch_tuner is None
+                                                  else cls._readings_insert_batch_size)
+                    batch_size = len(readings)
+                    payload = b'{"readings":' + Utils.serialize_list(readings) + b'}'
                     # _LOGGER.debug('Begin insert: Queue index: %s Batch size: %s', list_index, batch_size)
                     try:
-                        await cls.readings_storage_async.append(json.dumps(payload))
+                        insert_start = time.monotonic()
+                        await cls.readings_storage_async.append(payload)
+                        insert_latency = time.monotonic() - insert_start
                         cls._readings_stats += batch_size
+                        cls._metrics.record_insert(batch_size, insert_latency)
+                        if cls._batch_tuner is not None:
+                            cls._batch_tuner.inserted(batch_size, insert_latency)
+                            cls._tune_batch()
                     except StorageServerError as ex:
                         err_response = ex.error
                         # if key error in next, it will be automatically in parent except block
@@ -365,29 +794,63 @@ class Ingest(object):
                         else:
                             # not retryable
                             _LOGGER.error("%s, %s", err_response["source"], err_response["message"])
-                            batch_size = len(readings_list)
                             cls._discarded_readings_stats += batch_size
                     # _LOGGER.debug('End insert: Queue index: %s Batch size: %s', list_index, batch_size)
                     break
+                except CircuitBreakerOpen as ex:
+                    # The storage service is unavailable: spill the batch to disk, where it is drained from once
+                    # storage recovers, or else keep it, without counting an attempt, until it recovers. Meanwhile
+                    # the lists fill up and add_readings() waits for room.
+                    spilled = cls._spill(readings)
+                    if spilled == batch_size:
+                        break
+                    if cls._stop:
+                        cls._discarded_readings_stats += batch_size - spilled
+                        _LOGGER.warning('Insert failed: Queue index: %s Batch size: %s', list_index, batch_size)
+                        break
+                    cls._wake_add_readings(readings_list.drop(spilled))
+                    cls._metrics.outage_waits += 1
+                    await asyncio.sleep(min(ex.retry_after or backoff(0), _MAX_OUTAGE_WAIT_SECONDS))
                 except Exception as ex:
                     attempt += 1
 
                     # TODO logging each time is overkill
                     _LOGGER.exception('Insert failed on attempt #%s, list index: %s | %s', attempt, list_index, str(ex))
 
+                    if cls._batch_tuner is not None:
+                        cls._batch_tuner.failed()
+                        cls._tune_batch()
+
                     if cls._stop or attempt >= _MAX_ATTEMPTS:
-                        # Stopping. Discard the entire list upon failure.
-                        batch_size = len(readings_list)
-                        cls._discarded_readings_stats += batch_size
-                        _LOGGER.warning('Insert failed: Queue index: %s Batch size: %s', list_index, batch_size)
+                        # Stopping. Spill the entire batch to disk upon failure, discard what does not fit.
+                        cls._metrics.failed_inserts += 1
+                        spilled = cls._spill(readings)
+                        cls._discarded_readings_stats += batch_size - spilled
+                        if spilled < batch_size:
+                            _LOGGER.warning('Insert failed: Queue index: %s Batch size: %s', list_index,
+                                            batch_size - spilled)
                         break
 
-            del readings_list[:batch_size]
+                    cls._metrics.retries += 1
+                    await asyncio.sleep(backoff(attempt - 1))
 
-            if not lists_not_full.is_set():
-                lists_not_full.set()
+            # Wake as many waiting add_readings calls as readings were removed, at once for the batch
+            cls._wake_add_readings(readings_list.drop(batch_size))
 
-        _LOGGER.info('Insert readings loop stopped')
+        _LOGGER.info('Insert readings loop stopped for list index: %s', list_index)
+
+    @classmethod
+    def _tune_batch(cls):
+        """Applies the batch size and timeout tuned by _batch_tuner"""
+        cls._readings_insert_batch_size = cls._batch_tuner.batch_size
+        cls._readings_insert_batch_timeout_seconds = cls._batch_tuner.timeout
+
+    @classmethod
+    def _batch_statistics_keys(cls):
+        """Returns the keys of the statistics of the tuned batch size and timeout of the service"""
+        suffixes = ('_INSERT_BATCH_SIZE', '_INSERT_TIMEOUT_MS')
+        name = cls._parent_service._name.upper()[:_STATISTICS_KEY_LENGTH - max(len(s) for s in suffixes)]
+        return tuple(name + suffix for suffix in suffixes)
 
     @classmethod
     async def _write_statistics(cls):
@@ -401,6 +864,16 @@ class Ingest(object):
         await stats.register('DISCARDED', 'Readings discarded at the input side by FogLAMP, i.e. '
                                           'discarded before being  placed in the buffer. This may be due to some '
                                           'error in the readings themselves.')
+        await stats.register('DUPLICATE', 'Readings rejected by the South Service as they have the key of a reading '
+                                          'received shortly before')
+        await stats.register('FILTERED', 'Readings dropped by the readings filter of the South Service as they '
+                                         'changed too little from the readings stored')
+        if cls._batch_tuner is not None:
+            batch_size_key, timeout_key = cls._batch_statistics_keys()
+            await stats.register(batch_size_key, 'Current readings insert batch size of the South service {}'.format(
+                cls._parent_service._name))
+            await stats.register(timeout_key, 'Current readings insert batch timeout in milliseconds of the South '
+                                              'service {}'.format(cls._parent_service._name))
 
         while not cls._stop:
             # stop() calls _write_statistics_sleep_task.cancel().
@@ -435,6 +908,34 @@ class Ingest(object):
                 cls._discarded_readings_stats += readings
                 _LOGGER.exception('An error occurred while writing discarded statistics, Error: %s', str(ex))
 
+            readings = cls._duplicate_readings_stats
+            cls._duplicate_readings_stats = 0
+
+            try:
+                asyncio.ensure_future(stats.update('DUPLICATE', readings))
+            except Exception as ex:
+                cls._duplicate_readings_stats += readings
+                _LOGGER.exception('An error occurred while writing duplicate statistics, Error: %s', str(ex))
+
+            readings = cls._filtered_readings_stats
+            cls._filtered_readings_stats = 0
+            if cls._readings_filter is not None:
+                readings += cls._readings_filter.filtered
+                cls._readings_filter.filtered = 0
+
+            try:
+                asyncio.ensure_future(stats.update('FILTERED', readings))
+            except Exception as ex:
+                cls._filtered_readings_stats += readings
+                _LOGGER.exception('An error occurred while writing filtered statistics, Error: %s', str(ex))
+
+            if cls._batch_tuner is not None:
+                try:
+                    await stats.set(batch_size_key, cls._readings_insert_batch_size)
+                    await stats.set(timeout_key, int(cls._readings_insert_batch_timeout_seconds * 1000))
+                except Exception as ex:
+                    _LOGGER.exception('An error occurred while writing batch statistics, Error: %s', str(ex))
+
             """ Register the statistics keys as this may be the first time the key has come into existence """
             for key in cls._sensor_stats:
                 description = 'Readings received by FogLAMP since startup for sensor {}'.format(key)
@@ -447,6 +948,22 @@ class Ingest(object):
 
         _LOGGER.info('South statistics writer stopped')
 
+    @classmethod
+    def metrics(cls) -> dict:
+        """Returns the live metrics of the hot path: the readings rate, the inserts, their batch sizes, latency and
+        retries, the time spent waiting for room in the buffers, and the fill of each buffer
+        """
+        metrics = cls._metrics.to_dict()
+        lists = cls._readings_lists or []
+        metrics["buffers"] = {
+            "lists": [{"readings": len(readings_list), "capacity": readings_list.capacity} for readings_list in lists],
+            "fill_ratio": cls.fill_ratio(),
+            "spill_journal": len(cls._spill_journal) if cls._spill_journal is not None else 0,
+        }
+        metrics["inserts"]["batch_size"]["current"] = cls._readings_insert_batch_size
+        metrics["inserts"]["timeout_seconds"] = cls._readings_insert_batch_timeout_seconds
+        return metrics
+
     @classmethod
     def is_available(cls) -> bool:
         """Indicates whether all lists are currently full
@@ -459,18 +976,84 @@ class Ingest(object):
             return False
 
         list_index = cls._current_readings_list_index
-        if len(cls._readings_lists[list_index]) < cls._readings_list_size:
+        if not cls._readings_lists[list_index].is_full():
             return True
 
+        # The current list is full: look for another one, once for each list filled up
         if cls._max_concurrent_readings_inserts > 1:
             for list_index in range(cls._max_concurrent_readings_inserts):
-                if len(cls._readings_lists[list_index]) < cls._readings_list_size:
+                if not cls._readings_lists[list_index].is_full():
                     cls._current_readings_list_index = list_index
                     return True
 
         _LOGGER.warning('The ingest service is unavailable %s', list_index)
         return False
 
+    @staticmethod
+    def _reading_row(asset, timestamp, key, readings) -> bytes:
+        """Validates the arguments of :meth:`add_readings` and returns the readings row buffered for them
+
+        The row is serialized here, reading by reading as they are added, instead of in one go for a whole batch
+        when it is sent to storage, which would block the event loop while new readings are arriving.
+
+        Raises:
+            ValueError, TypeError:
+                An invalid value was provided, e.g. readings which can not be serialized to JSON
+        """
+        if asset is None:
+            raise ValueError('asset can not be None')
+
+        if not isinstance(asset, str):
+            raise TypeError('asset must be a string')
+
+        if timestamp is None:
+            raise ValueError('timestamp can not be None')
+
+        # if not isinstance(timestamp, datetime.datetime):
+        #     # validate
+        #     timestamp = dateutil.parser.parse(timestamp)
+
+        if key is not None and not isinstance(key, uuid.UUID):
+            # Validate
+            if not isinstance(key, str):
+                raise TypeError('key must be a uuid.UUID or a string')
+            # If key is not a string, uuid.UUID throws an Exception that appears to
+            # be a TypeError but can not be caught as a TypeError
+            key = uuid.UUID(key)
+
+        if readings is None:
+            readings = dict()
+        elif not isinstance(readings, dict):
+            # Postgres allows values like 5 be converted to JSON
+            # Downstream processors can not handle this
+            raise TypeError('readings must be a dictionary')
+
+        # Comment out to test IntegrityError
+        # key = '123e4567-e89b-12d3-a456-426655440000'
+
+        return reading_row(asset, key, readings, timestamp)
+
+    @classmethod
+    def _is_duplicate(cls, key) -> bool:
+        """Checks whether a reading with key was added within the deduplication window, counts it if it was"""
+        if key is None or cls._read_keys is None or not cls._read_keys.seen(key):
+            return False
+        cls._duplicate_readings_stats += 1
+        return True
+
+    @classmethod
+    def _next_readings_list(cls, list_size):
+        """Moves on to the next list when the current one, holding list_size readings, reached the batch size"""
+        if cls._max_concurrent_readings_inserts > 1 and (
+                    list_size >= cls._readings_insert_batch_size):
+            # Start at the beginning to reduce the number of connections
+            for list_index in range(cls._max_concurrent_readings_inserts):
+                if len(cls._readings_lists[list_index]) < cls._readings_insert_batch_size:
+                    cls._current_readings_list_index = list_index
+                    # _LOGGER.debug('Change Ingest Queue: from #%s (len %s) to #%s', cls._current_readings_list_index,
+                    #               len(cls._readings_lists[list_index]), list_index)
+                    break
+
     @classmethod
     async def add_readings(cls, asset: str, timestamp: Union[str, datetime.datetime],
                            key: Union[str, uuid.UUID] = None, readings: dict = None) -> None:
@@ -481,15 +1064,17 @@ class Ingest(object):
             timestamp: When the readings were taken
             key:
                 Unique key for these readings. If this method is called multiple with the same
-                key, the readings are only written to storage once
+                key within read_key_dedup_window_seconds, the readings are only written to storage once
             readings: A dictionary of sensor readings
 
+        The reading is not added, with a warning, when the server is stopping or has been stopped.
+
         Raises:
             If this method raises an Exception, the discarded readings counter is
             also incremented.
 
             RuntimeError:
-                The server is stopping or has been stopped
+                The server has not been started, or stopped while waiting for room in the readings lists
 
             ValueError, TypeError:
                 An invalid value was provided
@@ -503,82 +1088,193 @@ class Ingest(object):
             # cls._logger = logger.setup(__name__, destination=logger.CONSOLE, level=logging.DEBUG)
 
         try:
-            if asset is None:
-                raise ValueError('asset can not be None')
-
-            if not isinstance(asset, str):
-                raise TypeError('asset must be a string')
-
-            if timestamp is None:
-                raise ValueError('timestamp can not be None')
-
-            # if not isinstance(timestamp, datetime.datetime):
-            #     # validate
-            #     timestamp = dateutil.parser.parse(timestamp)
-
-            if key is not None and not isinstance(key, uuid.UUID):
-                # Validate
-                if not isinstance(key, str):
-                    raise TypeError('key must be a uuid.UUID or a string')
-                # If key is not a string, uuid.UUID throws an Exception that appears to
-                # be a TypeError but can not be caught as a TypeError
-                key = uuid.UUID(key)
-
-            if readings is None:
-                readings = dict()
-            elif not isinstance(readings, dict):
-                # Postgres allows values like 5 be converted to JSON
-                # Downstream processors can not handle this
-                raise TypeError('readings must be a dictionary')
+            read = cls._reading_row(asset, timestamp, key, readings)
         except Exception:
             cls.increment_discarded_readings()
             raise
 
-        # Comment out to test IntegrityError
-        # key = '123e4567-e89b-12d3-a456-426655440000'
+        # Reject a reading sent again, e.g. by a sender retrying, before it takes a slot in the lists
+        if cls._is_duplicate(key):
+            return
 
-        # Wait for an empty slot in the list
-        while not cls.is_available():
-            cls._readings_lists_not_full.clear()
-            await cls._readings_lists_not_full.wait()
-            if cls._stop:
-                raise RuntimeError('The South Service is stopping')
+        # Fold the reading into the window of its asset, the aggregate of the window before is buffered first
+        if cls._readings_aggregator is not None:
+            for aggregate_asset, row in cls._readings_aggregator.add(asset, readings):
+                await cls._buffer_rows(aggregate_asset, [row])
+            if not cls._readings_aggregator.keeps_original(asset):
+                return
 
-        # Increment the count of received readings to be used for statistics update
-        if asset.upper() in cls._sensor_stats:
-            cls._sensor_stats[asset.upper()] += 1
-        else:
-            cls._sensor_stats[asset.upper()] = 1
+        # The filter lets the reading through, or the one it held back before it, both of them, or neither
+        rows = [read] if cls._readings_filter is None else cls._readings_filter.filter(asset, readings, read)
+        await cls._buffer_rows(asset, rows)
 
-        list_index = cls._current_readings_list_index
-        readings_list = cls._readings_lists[list_index]
+    @classmethod
+    async def _buffer_rows(cls, asset, rows):
+        """Buffers the rows of readings of asset, one at a time, waiting for room in the lists when they are full
 
-        read = dict()
-        read['asset_code'] = asset
-        read['read_key'] = str(key)
-        read['reading'] = readings
-        read['user_ts'] = timestamp
+        Raises:
+            RuntimeError:
+                The server stopped while waiting for room
+        """
+        for read in rows:
+            # Wait for an empty slot in the list, unless the reading can be spilled to disk
+            spilled = False
+            while not cls.is_available():
+                if cls._spill([read]):
+                    spilled = True
+                    break
+                waiter = asyncio.get_event_loop().create_future()
+                cls._readings_lists_not_full_waiters.append(waiter)
+                wait_start = time.monotonic()
+                await waiter
+                cls._metrics.blocked_waits += 1
+                cls._metrics.blocked_seconds += time.monotonic() - wait_start
+                if cls._stop:
+                    raise RuntimeError('The South Service is stopping')
+
+            cls._metrics.added += 1
+
+            # Increment the count of received readings to be used for statistics update
+            if asset.upper() in cls._sensor_stats:
+                cls._sensor_stats[asset.upper()] += 1
+            else:
+                cls._sensor_stats[asset.upper()] = 1
+
+            if spilled:
+                continue
 
-        readings_list.append(read)
+            if cls._batch_tuner is not None:
+                cls._batch_tuner.arrived(1)
 
-        list_size = len(readings_list)
+            list_index = cls._current_readings_list_index
+            readings_list = cls._readings_lists[list_index]
 
-        # _LOGGER.debug('Add readings list index: %s size: %s', cls._current_readings_list_index, list_size)
+            # wakes _insert_readings when the batch size is reached
+            readings_list.push(read)
 
-        if list_size == 1:
-            cls._readings_list_not_empty[list_index].set()
+            # _LOGGER.debug('Add readings list index: %s size: %s', cls._current_readings_list_index,
+            #               len(readings_list))
 
-        if list_size == cls._readings_insert_batch_size:
-            cls._readings_list_batch_size_reached[list_index].set()
-            # _LOGGER.debug('Set event list index: %s size: %s', cls._current_readings_list_index, len(readings_list))
+            # When the current list is full, move on to the next list
+            cls._next_readings_list(len(readings_list))
 
-        # When the current list is full, move on to the next list
-        if cls._max_concurrent_readings_inserts > 1 and (
-                    list_size >= cls._readings_insert_batch_size):
-            # Start at the beginning to reduce the number of connections
-            for list_index in range(cls._max_concurrent_readings_inserts):
-                if len(cls._readings_lists[list_index]) < cls._readings_insert_batch_size:
-                    cls._current_readings_list_index = list_index
-                    # _LOGGER.debug('Change Ingest Queue: from #%s (len %s) to #%s', cls._current_readings_list_index,
-                    #               len(cls._readings_lists[list_index]), list_index)
+    @classmethod
+    async def add_readings_batch(cls, readings_batch: List[dict]) -> dict:
+        """Adds a batch of asset readings records to FogLAMP
+
+        Each item holds the asset, timestamp, key and readings arguments of :meth:`add_readings`. All the items are
+        validated first, an invalid one is discarded instead of raising, and the valid ones are buffered in order,
+        filling the room left in a list at once instead of waiting for it reading by reading.
+
+        Args:
+            readings_batch: A list of dictionaries with the 'asset', 'timestamp', 'key' and 'readings' keys
+
+        Returns:
+            A dictionary with the number of readings of the batch 'accepted' and 'discarded'. The readings left
+            when the server stops are discarded, but not counted in the discarded readings statistics, and the
+            duplicates are discarded, but counted in the duplicate readings statistics. The readings dropped or
+            held back by the readings filter, or only aggregated, are accepted, and so are the readings folded into
+            an aggregate left when the server stops.
+
+        Raises:
+            RuntimeError:
+                The server has not been started
+        """
+        if cls._stop:
+            _LOGGER.warning('The South Service is stopping')
+            return {'accepted': 0, 'discarded': len(readings_batch)}
+
+        if not cls._started:
+            raise RuntimeError('The South Service was not started')
+
+        reads = []
+        assets = []
+        items = []  # index in readings_batch of the item of each row, None for the aggregates and the held rows
+        error = None
+        invalid = 0
+        duplicates = 0
+        aggregated = collections.OrderedDict()  # asset -> its readings to fold into its window
+        for index, item in enumerate(readings_batch):
+            try:
+                read = cls._reading_row(item['asset'], item['timestamp'], item.get('key'), item.get('readings'))
+            except Exception as ex:
+                error = ex
+                invalid += 1
+                continue
+            if cls._is_duplicate(item.get('key')):
+                duplicates += 1
+                continue
+            if cls._readings_aggregator is not None:
+                # Folded below, all the readings of an asset at once
+                aggregated.setdefault(item['asset'], []).append(item.get('readings'))
+                if not cls._readings_aggregator.keeps_original(item['asset']):
+                    continue
+            if cls._readings_filter is None:
+                reads.append(read)
+                assets.append(item['asset'])
+                items.append(index)
+            else:
+                # The reading, and the one held back before it, which was accepted then
+                rows = cls._readings_filter.filter(item['asset'], item.get('readings'), read)
+                reads.extend(rows)
+                assets.extend([item['asset']] * len(rows))
+                items.extend([index if row is read else None for row in rows])
+        for asset, asset_readings in aggregated.items():
+            for aggregate_asset, row in cls._readings_aggregator.add_many(asset, asset_readings):
+                reads.append(row)
+                assets.append(aggregate_asset)
+                items.append(None)
+        discarded = invalid + duplicates
+        if invalid:
+            cls._discarded_readings_stats += invalid
+            _LOGGER.warning('%s of %s readings discarded, last error: %s', invalid, len(readings_batch), repr(error))
+
+        buffered = 0
+        while buffered < len(reads):
+            # Wait for an empty slot in the lists, unless the readings can be spilled to disk
+            if not cls.is_available():
+                spilled = cls._spill(reads[buffered:])
+                if spilled:
+                    cls._count_sensor_readings(assets[buffered:buffered + spilled])
+                    cls._metrics.added += spilled
+                    buffered += spilled
+                    continue
+                waiter = asyncio.get_event_loop().create_future()
+                cls._readings_lists_not_full_waiters.append(waiter)
+                wait_start = time.monotonic()
+                await waiter
+                cls._metrics.blocked_waits += 1
+                cls._metrics.blocked_seconds += time.monotonic() - wait_start
+                if cls._stop:
+                    unbuffered = len({index for index in items[buffered:] if index is not None})
+                    _LOGGER.warning('The South Service is stopping, %s readings discarded', unbuffered)
+                    discarded += unbuffered
                     break
+                continue
+
+            readings_list = cls._readings_lists[cls._current_readings_list_index]
+
+            # Fill the list up to the batch size, like add_readings, or up to its capacity once all lists reached it
+            count = cls._readings_insert_batch_size - len(readings_list)
+            if count <= 0 or count > readings_list.free:
+                count = readings_list.free
+            chunk = reads[buffered:buffered + count]
+            cls._count_sensor_readings(assets[buffered:buffered + count])
+            if cls._batch_tuner is not None:
+                cls._batch_tuner.arrived(len(chunk))
+
+            # wakes _insert_readings when the batch size is reached
+            readings_list.extend(chunk)
+            buffered += len(chunk)
+            cls._metrics.added += len(chunk)
+
+            cls._next_readings_list(len(readings_list))
+
+        return {'accepted': len(readings_batch) - discarded, 'discarded': discarded}
+
+    @classmethod
+    def _count_sensor_readings(cls, assets):
+        """Increments the count of received readings of each asset, to be used for statistics update"""
+        for asset, sensor_count in collections.Counter(assets).items():
+            asset = asset.upper()
+            cls._sensor_stats[asset] = cls._sensor_stats.get(asset, 0) + sensor_count
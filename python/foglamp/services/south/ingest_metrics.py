@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Live counters of the hot path of Ingest, served by the management API of the South service
+
+The counters are plain attributes incremented by Ingest as readings are buffered and inserted, the histograms add a
+bisect per insert, and the clock is only read around an insert or a wait for room in the buffers: what is derived,
+e.g. the readings rate, is computed when the metrics are read. It is not thread-safe, to be used from the event loop.
+"""
+
+import bisect
+import time
+
+from foglamp.common.storage_client.metrics import LATENCY_BUCKETS, cumulative_buckets
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('IngestMetrics',)
+
+BATCH_SIZE_BUCKETS = (1, 4, 16, 64, 256, 1024, 4096, 16384)
+"""Upper bounds of the batch size histogram buckets; larger batches are counted in a last, unbounded one"""
+
+_MIN_RATE_SECONDS = 1
+"""Shortest interval the recent readings rate is measured over"""
+
+
+class IngestMetrics(object):
+    """ Counters of the readings buffered, the batches inserted and the time spent waiting for room """
+
+    __slots__ = ('added', 'inserted', 'inserts', 'batch_size_last', 'batch_size_max', 'batch_size_buckets',
+                 'latency_total', 'latency_max', 'latency_buckets', 'retries', 'failed_inserts', 'outage_waits',
+                 'spilled', 'blocked_waits', 'blocked_seconds', 'capacity_waits', 'capacity_seconds',
+                 '_started', '_rate', '_rate_added', '_rate_since')
+
+    def __init__(self):
+        self.added = 0  # readings buffered, or spilled as the buffers were full
+        self.inserted = 0
+        self.inserts = 0
+        self.batch_size_last = 0
+        self.batch_size_max = 0
+        self.batch_size_buckets = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.retries = 0  # inserts attempted again after they failed
+        self.failed_inserts = 0  # batches given up on after the last attempt
+        self.outage_waits = 0  # waits for the storage service to recover, while its circuit breaker is open
+        self.spilled = 0
+        self.blocked_waits = 0  # waits of add_readings or add_readings_batch for room in the buffers
+        self.blocked_seconds = 0.0
+        self.capacity_waits = 0  # waits of wait_capacity for the buffers to drain to the low watermark
+        self.capacity_seconds = 0.0
+        self._started = self._rate_since = time.monotonic()
+        self._rate = 0.0
+        self._rate_added = 0
+
+    def record_insert(self, count, latency):
+        """ Counts a batch of count readings inserted in latency seconds """
+        self.inserts += 1
+        self.inserted += count
+        self.batch_size_last = count
+        if count > self.batch_size_max:
+            self.batch_size_max = count
+        self.batch_size_buckets[bisect.bisect_left(BATCH_SIZE_BUCKETS, count)] += 1
+        self.latency_total += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+        self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def to_dict(self):
+        """ Returns the counters, with the readings rate since start and since the previous call, a second ago
+        at least """
+        now = time.monotonic()
+        if now - self._rate_since >= _MIN_RATE_SECONDS:
+            self._rate = (self.added - self._rate_added) / (now - self._rate_since)
+            self._rate_added = self.added
+            self._rate_since = now
+        uptime = now - self._started
+        return {
+            "readings": {"added": self.added, "inserted": self.inserted, "spilled": self.spilled,
+                         "per_second": self._rate,
+                         "per_second_since_start": self.added / uptime if uptime > 0 else 0.0},
+            "inserts": {"count": self.inserts, "retries": self.retries, "failed": self.failed_inserts,
+                        "outage_waits": self.outage_waits,
+                        "batch_size": {"last": self.batch_size_last, "max": self.batch_size_max,
+                                       "mean": self.inserted / self.inserts if self.inserts else 0.0,
+                                       "buckets": cumulative_buckets(BATCH_SIZE_BUCKETS, self.batch_size_buckets)},
+                        "latency": {"total": self.latency_total, "max": self.latency_max,
+                                    "buckets": cumulative_buckets(LATENCY_BUCKETS, self.latency_buckets)}},
+            "blocked": {"waits": self.blocked_waits, "seconds": self.blocked_seconds,
+                        "capacity_waits": self.capacity_waits, "capacity_seconds": self.capacity_seconds},
+        }
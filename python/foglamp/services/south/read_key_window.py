@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Read keys of the readings added to Ingest in the last seconds, to reject the readings added again
+
+Half of the memory holds the most recent keys exactly, in the order they were seen, so that the expired ones are
+removed from the oldest end. When there are more keys than fit, the oldest are moved to a Bloom filter in two
+generations rotated at each window: a key is remembered for at least the window. The filter is sized for the keys of
+a window at the expected rate, within the other half of the memory. A reading with a key never seen may be rejected
+as a false positive of the filter, but only while a generation holds few enough keys for the false positive rate to
+stay below a target: past them, a key found only in that generation is taken as new, letting a duplicate through
+rather than rejecting unique readings. It is not thread-safe, to be used from the event loop.
+"""
+
+import collections
+import math
+import time
+import uuid
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('ReadKeyWindow',)
+
+_KEY_BYTES = 160
+"""Approximate memory held by a key kept exactly: its int and its entry in the ordered dict"""
+
+_BLOOM_HASHES = 4
+"""Number of bits set by a key in a Bloom filter"""
+
+_BLOOM_FALSE_POSITIVES = 0.001
+"""Target false positive rate of a Bloom filter generation, above which its hits are not trusted"""
+
+
+def _bloom_keys_per_bit():
+    """ Keys per bit of a Bloom filter of _BLOOM_HASHES hashes at the target false positive rate """
+    return -math.log(1 - _BLOOM_FALSE_POSITIVES ** (1 / _BLOOM_HASHES)) / _BLOOM_HASHES
+
+
+class ReadKeyWindow(object):
+    """ Read keys seen within the last window seconds, in at most memory bytes """
+
+    __slots__ = ('_window', '_keys', '_max_keys', '_bloom_bits', '_bloom_max_keys', '_blooms', '_bloom_keys',
+                 '_rotated')
+
+    def __init__(self, window, memory, rate):
+        """
+        :param window: seconds a key is remembered for
+        :param memory: approximate bytes used at most
+        :param rate: expected number of keys per second, the Bloom filter is sized for a window of them
+        """
+        if window <= 0:
+            raise ValueError("Read key window must be a positive number of seconds")
+        if rate <= 0:
+            raise ValueError("Read key rate must be a positive number of keys per second")
+        self._window = window
+        self._keys = collections.OrderedDict()  # key -> monotonic time it was seen
+        self._max_keys = max(1, memory // 2 // _KEY_BYTES)
+        # the keys of a window at the target false positive rate, within one half of the memory for two generations
+        bloom_bytes = math.ceil(window * rate / _bloom_keys_per_bit() / 8)
+        self._bloom_bits = min(bloom_bytes, memory // 2 // 2) * 8
+        # keys a generation holds at most before its false positive rate exceeds the target
+        self._bloom_max_keys = int(self._bloom_bits * _bloom_keys_per_bit())
+        self._blooms = None
+        self._bloom_keys = [0, 0]  # number of keys added to each generation, the lookup skips the empty ones
+        if self._bloom_bits >= 64:
+            self._blooms = [bytearray(self._bloom_bits // 8), bytearray(self._bloom_bits // 8)]
+        self._rotated = time.monotonic()
+
+    def __len__(self):
+        """ Number of keys kept exactly """
+        return len(self._keys)
+
+    def seen(self, key):
+        """ Returns whether key was seen within the window, and remembers it if it was not
+
+        :param key: a uuid.UUID or its string
+        """
+        key = key.int if isinstance(key, uuid.UUID) else uuid.UUID(key).int
+        now = time.monotonic()
+        self._expire(now)
+
+        if key in self._keys or self._bloom_contains(key):
+            return True
+
+        self._keys[key] = now
+        if len(self._keys) > self._max_keys:
+            oldest, _ = self._keys.popitem(last=False)
+            self._bloom_add(oldest)
+        return False
+
+    def _expire(self, now):
+        cutoff = now - self._window
+        keys = self._keys
+        while keys and next(iter(keys.values())) <= cutoff:
+            keys.popitem(last=False)
+        if self._blooms is not None and now - self._rotated >= self._window:
+            self._blooms = [bytearray(self._bloom_bits // 8), self._blooms[0]]
+            self._bloom_keys = [0, self._bloom_keys[0]]
+            self._rotated = now
+
+    def _bloom_positions(self, key):
+        h = hash(key)
+        step = (h >> 32) | 1
+        return [(h + i * step) % self._bloom_bits for i in range(_BLOOM_HASHES)]
+
+    def _bloom_add(self, key):
+        if self._blooms is None:
+            return
+        bloom = self._blooms[0]
+        self._bloom_keys[0] += 1
+        for position in self._bloom_positions(key):
+            bloom[position >> 3] |= 1 << (position & 7)
+
+    def _bloom_contains(self, key):
+        if self._blooms is None or not any(self._bloom_keys):
+            return False
+        positions = self._bloom_positions(key)
+        for bloom, keys in zip(self._blooms, self._bloom_keys):
+            if 0 < keys <= self._bloom_max_keys and all(
+                    bloom[position >> 3] & (1 << (position & 7)) for position in positions):
+                return True
+        return False
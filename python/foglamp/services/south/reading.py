@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Serialization of a reading added to Ingest to the row buffered for it
+
+The row is the JSON document of the reading appended to the readings table by the storage service. It is formatted
+directly, without building an intermediate dict, and the JSON of the asset codes, few for many readings, is cached.
+"""
+
+import functools
+
+from foglamp.common import json_codec
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('reading_row',)
+
+
+@functools.lru_cache(maxsize=1024)
+def _asset_code_json(asset_code):
+    return json_codec.dumpb(asset_code)
+
+
+def reading_row(asset_code, read_key, reading, user_ts):
+    """ Returns the JSON row of a reading, as bytes, in the format of the storage service readings
+
+    :param asset_code: asset of the reading
+    :param read_key: uuid.UUID, or None, of the reading
+    :param reading: datapoints of the reading
+    :param user_ts: timestamp of the reading
+    :raises TypeError: if the reading or the timestamp is not JSON serializable
+    """
+    return b'{"asset_code":%s,"read_key":"%s","reading":%s,"user_ts":%s}' % (
+        _asset_code_json(asset_code), str(read_key).encode(), json_codec.dumpb(reading), json_codec.dumpb(user_ts))
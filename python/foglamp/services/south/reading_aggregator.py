@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Tumbling window aggregation of the readings of high-frequency assets, run by Ingest before they are buffered
+
+Each asset is aggregated as configured, by its name or else by the "*" entry, e.g.
+{"TI Sensortag CC2650/movement": {"window": 1, "keepOriginal": false}}. The windows of an asset are aligned on
+multiples of window seconds of the time the readings arrive at. Once a window ended, a reading of the asset suffixed
+with "/aggregate" is emitted, timestamped at the end of the window, with the min, max, mean, count and last value of
+each numeric datapoint, e.g. x_min, and the count and last value of the other ones. A window flushed before it ended,
+e.g. when Ingest stops, is timestamped at the time it is flushed, with a "partial" datapoint set to true, and the rest
+of the window after a restart is aggregated separately. The readings themselves are only kept with keepOriginal. Each
+reading is folded into running accumulators, and the readings of a poll are folded a datapoint at a time, with NumPy
+when it is installed. It is not thread-safe, to be used from the event loop.
+"""
+
+import collections
+import datetime
+import math
+import numbers
+import time
+import uuid
+
+from foglamp.services.south.reading import reading_row
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('ReadingAggregator',)
+
+_DEFAULT_ASSET = '*'
+
+_ASSET_SUFFIX = '/aggregate'
+
+_PARTIAL = 'partial'
+"""Datapoint of the aggregate reading of a window flushed before it ended"""
+
+_NUMPY_MIN_VALUES = 64
+"""Number of values of a datapoint in a poll from which they are folded with NumPy"""
+
+_Spec = collections.namedtuple('_Spec', ('window', 'keep_original'))
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+class _Accumulator(object):
+    """ Running aggregates of a datapoint in a window """
+
+    __slots__ = ('count', 'total', 'min', 'max', 'last', 'numeric')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.last = None
+        self.numeric = True
+
+    def add(self, value):
+        self.count += 1
+        self.last = value
+        if not self.numeric or not _is_number(value):
+            self.numeric = False
+            return
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def add_many(self, values):
+        """ Folds the values of a datapoint, in the order they were read """
+        if not self.numeric or not all(_is_number(value) for value in values):
+            self.count += len(values)
+            self.last = values[-1]
+            self.numeric = False
+            return
+        if numpy is not None and len(values) >= _NUMPY_MIN_VALUES:
+            array = numpy.fromiter(values, dtype=float, count=len(values))
+            total, low, high = float(array.sum()), float(array.min()), float(array.max())
+        else:
+            total, low, high = sum(values), min(values), max(values)
+        self.count += len(values)
+        self.last = values[-1]
+        self.total += total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def aggregates(self, datapoint, readings):
+        if self.numeric:
+            readings[datapoint + '_min'] = self.min
+            readings[datapoint + '_max'] = self.max
+            readings[datapoint + '_mean'] = self.total / self.count
+        readings[datapoint + '_count'] = self.count
+        readings[datapoint + '_last'] = self.last
+
+
+class _Window(object):
+    """ Accumulators of the datapoints of an asset in a window """
+
+    __slots__ = ('end', 'accumulators')
+
+    def __init__(self, end):
+        self.end = end
+        self.accumulators = {}  # datapoint -> _Accumulator
+
+    def row(self, asset, now=None):
+        """ Returns the row of the aggregate reading of the window, partial and timestamped at now when it has not
+        ended by now
+        """
+        readings = {}
+        for datapoint, accumulator in self.accumulators.items():
+            accumulator.aggregates(datapoint, readings)
+        end = self.end
+        if now is not None and now < end:
+            end = now
+            readings[_PARTIAL] = True
+        timestamp = str(datetime.datetime.fromtimestamp(end, datetime.timezone.utc).astimezone())
+        return reading_row(asset + _ASSET_SUFFIX, uuid.uuid4(), readings, timestamp)
+
+
+class ReadingAggregator(object):
+    """ Aggregates the readings of the configured assets """
+
+    __slots__ = ('_specs', '_windows', 'min_window')
+
+    def __init__(self, config):
+        """
+        :param config: dict, or its JSON string, of the aggregation of each asset, see the module
+        :raises ValueError: if the configuration is not valid
+        """
+        self._specs = {asset: self._spec(asset, value) for asset, value in config.items()}
+        self._windows = {}  # asset -> _Window
+        self.min_window = min((spec.window for spec in self._specs.values()), default=None)
+        """Shortest window, in seconds, None when no asset is aggregated"""
+
+    def __bool__(self):
+        """ Whether any asset is aggregated """
+        return bool(self._specs)
+
+    @staticmethod
+    def _spec(asset, value):
+        if not isinstance(value, dict):
+            raise ValueError('The readings aggregation of asset {} must be an object'.format(asset))
+        unknown = set(value) - {'window', 'keepOriginal'}
+        if unknown:
+            raise ValueError('Unknown readings aggregation parameters {} for asset {}'.format(sorted(unknown), asset))
+        window = value.get('window')
+        if not _is_number(window) or window <= 0:
+            raise ValueError('The readings aggregation window of asset {} must be a positive number of '
+                             'seconds'.format(asset))
+        keep_original = value.get('keepOriginal', False)
+        if not isinstance(keep_original, bool):
+            raise ValueError('The readings aggregation keepOriginal of asset {} must be true or false'.format(asset))
+        return _Spec(window, keep_original)
+
+    def _asset_spec(self, asset):
+        if asset.endswith(_ASSET_SUFFIX):
+            return None
+        return self._specs.get(asset) or self._specs.get(_DEFAULT_ASSET)
+
+    def keeps_original(self, asset):
+        """ Whether the readings of asset are buffered, as well as aggregated if they are """
+        spec = self._asset_spec(asset)
+        return spec is None or spec.keep_original
+
+    def add(self, asset, readings, now=None):
+        """ Folds a reading into the window of its asset
+
+        :param asset: asset of the reading
+        :param readings: datapoints of the reading
+        :param now: time the reading arrived at, time.time() when None
+        :return: a list of the (asset, row) of the aggregate reading of the previous window when it ended
+        """
+        return self.add_many(asset, [readings], now)
+
+    def add_many(self, asset, readings_list, now=None):
+        """ Folds the readings of an asset arrived at the same time, e.g. polled at once, into its window
+
+        :param asset: asset of the readings
+        :param readings_list: a list of the datapoints of each reading
+        :param now: time the readings arrived at, time.time() when None
+        :return: a list of the (asset, row) of the aggregate reading of the previous window when it ended
+        """
+        spec = self._asset_spec(asset)
+        if spec is None:
+            return []
+        now = time.time() if now is None else now
+
+        emitted = []
+        window = self._windows.get(asset)
+        if window is not None and now >= window.end:
+            emitted.append((asset + _ASSET_SUFFIX, window.row(asset)))
+            window = None
+        if window is None:
+            window = self._windows[asset] = _Window((math.floor(now / spec.window) + 1) * spec.window)
+
+        accumulators = window.accumulators
+        if len(readings_list) == 1:
+            for datapoint, value in (readings_list[0] or {}).items():
+                accumulator = accumulators.get(datapoint)
+                if accumulator is None:
+                    accumulator = accumulators[datapoint] = _Accumulator()
+                accumulator.add(value)
+            return emitted
+
+        values = collections.OrderedDict()  # datapoint -> its values, in order
+        for readings in readings_list:
+            for datapoint, value in (readings or {}).items():
+                values.setdefault(datapoint, []).append(value)
+        for datapoint, datapoint_values in values.items():
+            accumulator = accumulators.get(datapoint)
+            if accumulator is None:
+                accumulator = accumulators[datapoint] = _Accumulator()
+            accumulator.add_many(datapoint_values)
+        return emitted
+
+    def expired(self, now=None):
+        """ Returns a list of the (asset, row) of the aggregate readings of the windows ended by now """
+        now = time.time() if now is None else now
+        ended = [asset for asset, window in self._windows.items() if now >= window.end]
+        return [(asset + _ASSET_SUFFIX, self._windows.pop(asset).row(asset)) for asset in ended]
+
+    def flush(self, now=None):
+        """ Returns a list of the (asset, row) of the aggregate readings of all the windows, those not ended by now
+        partial, see the module
+
+        :param now: time of the flush, time.time() when None
+        """
+        now = time.time() if now is None else now
+        rows = [(asset + _ASSET_SUFFIX, window.row(asset, now)) for asset, window in self._windows.items()]
+        self._windows = {}
+        return rows
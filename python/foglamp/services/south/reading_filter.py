@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Filter of the readings of slow-changing assets, run by Ingest before they are buffered
+
+Each asset is filtered as configured, by its name or else by the "*" entry, e.g.
+{"*": {"deadband": 0.5}, "pump": {"deadband": 0.1, "compression": 0.2, "maxInterval": 60}}. A reading whose numeric
+datapoints all changed less than the deadband, from the last reading let through, is dropped. With a compression
+deviation, the readings let through by the deadband go through a swinging door: a reading is held back until the
+next one shows that the datapoints can no longer be interpolated, within the deviation, from the last reading
+stored, and is then stored, otherwise it is dropped. A reading is always stored when maxInterval seconds passed since
+the last reading stored, or when its datapoints or non-numeric values differ, together with the reading held back.
+The times are those the readings arrive at. It is not thread-safe, to be used from the event loop.
+"""
+
+import collections
+import math
+import numbers
+import time
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('ReadingFilter',)
+
+_DEFAULT_ASSET = '*'
+
+_Spec = collections.namedtuple('_Spec', ('deadband', 'compression', 'max_interval'))
+
+
+class _AssetState(object):
+    """ Readings of an asset the next ones are compared with """
+
+    __slots__ = ('stored', 'stored_time', 'last', 'held', 'held_time', 'held_row', 'upper', 'lower')
+
+    def __init__(self, readings, now):
+        self.stored = readings  # the last reading stored, the hinge of the door
+        self.stored_time = now
+        self.last = readings  # the last reading let through by the deadband
+        self.held = None
+        self.held_time = None
+        self.held_row = None
+        self.upper = {}  # datapoint -> slope of the upper side of the door
+        self.lower = {}
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+class ReadingFilter(object):
+    """ Filters the readings of the configured assets """
+
+    __slots__ = ('_specs', '_states', 'filtered')
+
+    def __init__(self, config):
+        """
+        :param config: dict, or its JSON string, of the filter of each asset, see the module
+        :raises ValueError: if the configuration is not valid
+        """
+        self._specs = {asset: self._spec(asset, value) for asset, value in config.items()}
+        self._states = {}
+        self.filtered = 0
+        """Number of readings dropped"""
+
+    def __bool__(self):
+        """ Whether any asset is filtered """
+        return bool(self._specs)
+
+    @staticmethod
+    def _spec(asset, value):
+        if not isinstance(value, dict):
+            raise ValueError('The readings filter of asset {} must be an object'.format(asset))
+        unknown = set(value) - {'deadband', 'compression', 'maxInterval'}
+        if unknown:
+            raise ValueError('Unknown readings filter parameters {} for asset {}'.format(sorted(unknown), asset))
+        spec = []
+        for name in ('deadband', 'compression', 'maxInterval'):
+            parameter = value.get(name, 0)
+            if not _is_number(parameter) or parameter < 0:
+                raise ValueError('The readings filter parameter {} of asset {} must be a positive number'.format(
+                    name, asset))
+            spec.append(parameter)
+        return _Spec(spec[0], spec[1], spec[2] or math.inf)
+
+    def filter(self, asset, readings, row):
+        """ Returns a list of the rows to buffer for a reading, the one held back before it and itself, or neither
+
+        :param asset: asset of the reading
+        :param readings: datapoints of the reading
+        :param row: the reading serialized to be buffered
+        """
+        spec = self._specs.get(asset) or self._specs.get(_DEFAULT_ASSET)
+        if spec is None:
+            return [row]
+        readings = readings or {}
+        now = time.monotonic()
+
+        state = self._states.get(asset)
+        if state is None or now - state.stored_time >= spec.max_interval or not self._comparable(state.stored,
+                                                                                                   readings):
+            rows = [row] if state is None or state.held_row is None else [state.held_row, row]
+            self._states[asset] = _AssetState(readings, now)
+            return rows
+
+        if all(abs(value - state.last[datapoint]) < spec.deadband
+               for datapoint, value in readings.items() if _is_number(value)):
+            self.filtered += 1
+            return []
+        state.last = readings
+
+        if not spec.compression:
+            self._states[asset] = _AssetState(readings, now)
+            return [row]
+
+        # Narrow the door, from the last reading stored, to let the new reading through
+        elapsed = max(now - state.stored_time, 1e-9)
+        closed = False
+        for datapoint, value in readings.items():
+            if not _is_number(value):
+                continue
+            origin = state.stored[datapoint]
+            upper = min(state.upper.get(datapoint, math.inf), (value + spec.compression - origin) / elapsed)
+            lower = max(state.lower.get(datapoint, -math.inf), (value - spec.compression - origin) / elapsed)
+            state.upper[datapoint] = upper
+            state.lower[datapoint] = lower
+            closed = closed or lower > upper
+
+        if not closed:
+            # The held reading can be interpolated, only the new one is kept
+            if state.held_row is not None:
+                self.filtered += 1
+            state.held, state.held_time, state.held_row = readings, now, row
+            return []
+
+        # The new reading falls outside the door: store the held one, the door is hinged on it from now on
+        stored_row = state.held_row
+        new_state = _AssetState(state.held, state.held_time)
+        new_state.last = readings
+        self._states[asset] = new_state
+        self._narrow(new_state, spec, readings, now)
+        new_state.held, new_state.held_time, new_state.held_row = readings, now, row
+        return [stored_row]
+
+    def flush(self):
+        """ Returns a list of the rows held back, which are not anymore """
+        rows = []
+        for state in self._states.values():
+            if state.held_row is not None:
+                rows.append(state.held_row)
+                state.held = state.held_time = state.held_row = None
+        return rows
+
+    @staticmethod
+    def _narrow(state, spec, readings, now):
+        elapsed = max(now - state.stored_time, 1e-9)
+        for datapoint, value in readings.items():
+            if _is_number(value):
+                origin = state.stored[datapoint]
+                state.upper[datapoint] = (value + spec.compression - origin) / elapsed
+                state.lower[datapoint] = (value - spec.compression - origin) / elapsed
+
+    @staticmethod
+    def _comparable(stored, readings):
+        """ Whether readings has the datapoints of stored, with numbers for its numbers and its other values """
+        if stored.keys() != readings.keys():
+            return False
+        for datapoint, value in readings.items():
+            origin = stored[datapoint]
+            if _is_number(origin) != _is_number(value) or (not _is_number(value) and value != origin):
+                return False
+        return True
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Fixed capacity FIFO of the readings buffered by Ingest
+
+The slots are allocated once: a push writes the next free slot and a batch is removed by moving the head past it,
+instead of shifting all the remaining items of a list. The consumer waits for the buffer to reach a level, e.g. the
+insert batch size, on a single future which is only resolved when the level is reached.
+"""
+
+import asyncio
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('RingBuffer',)
+
+
+class RingBuffer(object):
+    """ FIFO of at most capacity items, not thread-safe, to be used from the event loop """
+
+    __slots__ = ('_slots', '_capacity', '_head', '_size', '_level', '_level_reached')
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("Ring buffer capacity must be at least 1")
+        self._slots = [None] * capacity
+        self._capacity = capacity
+        self._head = 0  # slot of the oldest item
+        self._size = 0
+        self._level = 0
+        self._level_reached = None  # type: asyncio.Future
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def free(self):
+        """ Number of items that can be pushed before the buffer is full """
+        return self._capacity - self._size
+
+    def __len__(self):
+        return self._size
+
+    def is_full(self):
+        return self._size == self._capacity
+
+    def push(self, item):
+        """ Appends item
+
+        :raises IndexError: if the buffer is full
+        """
+        size = self._size
+        if size == self._capacity:
+            raise IndexError("push to a full ring buffer")
+        index = self._head + size
+        if index >= self._capacity:
+            index -= self._capacity
+        self._slots[index] = item
+        self._size = size + 1
+        if self._level_reached is not None and self._size >= self._level:
+            self._resolve()
+
+    def extend(self, items):
+        """ Appends the items of a list, at once
+
+        :raises IndexError: if there is not room for all of them, none is appended then
+        """
+        count = len(items)
+        if count > self._capacity - self._size:
+            raise IndexError("extend beyond the free room of a ring buffer")
+        start = self._head + self._size
+        if start >= self._capacity:
+            start -= self._capacity
+        end = start + count
+        if end <= self._capacity:
+            self._slots[start:end] = items
+        else:
+            split = self._capacity - start
+            self._slots[start:] = items[:split]
+            self._slots[:count - split] = items[split:]
+        self._size += count
+        if self._level_reached is not None and self._size >= self._level:
+            self._resolve()
+
+    def peek(self, count):
+        """ Returns a list of the count oldest items, fewer if there are not as many, leaving them in the buffer """
+        count = min(count, self._size)
+        start = self._head
+        end = start + count
+        if end <= self._capacity:
+            return self._slots[start:end]
+        return self._slots[start:] + self._slots[:end - self._capacity]
+
+    def drop(self, count):
+        """ Removes the count oldest items, all of them if there are not as many
+
+        :return: number of items removed
+        """
+        count = min(count, self._size)
+        start = self._head
+        end = start + count
+        # release the items, without moving the others
+        if end <= self._capacity:
+            self._slots[start:end] = [None] * count
+        else:
+            self._slots[start:] = [None] * (self._capacity - start)
+            self._slots[:end - self._capacity] = [None] * (end - self._capacity)
+        self._head = end % self._capacity
+        self._size -= count
+        return count
+
+    def pop(self, count):
+        """ Removes and returns a list of the count oldest items, fewer if there are not as many """
+        items = self.peek(count)
+        self.drop(len(items))
+        return items
+
+    def level_reached(self, level):
+        """ Returns a future resolved when the buffer holds at least level items, or on :meth:`release`
+
+        There is a single level future at a time: it replaces the pending one, if any, which is released.
+        """
+        if self._level_reached is not None:
+            self._resolve()
+        future = asyncio.get_event_loop().create_future()
+        if self._size >= level:
+            future.set_result(None)
+        else:
+            self._level = level
+            self._level_reached = future
+        return future
+
+    def release(self):
+        """ Resolves the pending level future, e.g. to let the consumer stop """
+        if self._level_reached is not None:
+            self._resolve()
+
+    def _resolve(self):
+        future, self._level_reached = self._level_reached, None
+        if not future.done():
+            future.set_result(None)
@@ -34,6 +34,20 @@ class Server(FoglampMicroservice):
             'description': 'Management host',
             'type': 'string',
             'default': '127.0.0.1',
+        },
+        'readingsFilter': {
+            'description': 'Deadband, compression deviation and maximum interval in seconds of the readings '
+                           'filter of each asset, or "*" for all, e.g. '
+                           '{"*": {"deadband": 0.5, "compression": 0.2, "maxInterval": 60}}',
+            'type': 'JSON',
+            'default': '{}',
+        },
+        'readingsAggregation': {
+            'description': 'Tumbling window in seconds, and whether to keep the readings as well, of the min, max, '
+                           'mean, count and last value aggregation of each asset, or "*" for all, e.g. '
+                           '{"*": {"window": 1, "keepOriginal": false}}',
+            'type': 'JSON',
+            'default': '{}',
         }
     }
 
@@ -132,6 +146,8 @@ class Server(FoglampMicroservice):
             self._plugin_handle = self._plugin.plugin_init(config)
 
             await Ingest.start(self)
+            Ingest.set_readings_filter(config['readingsFilter']['value'])
+            Ingest.set_readings_aggregation(config['readingsAggregation']['value'])
 
             # Executes the requested plugin type
             if self._plugin_info['mode'] == 'async':
@@ -161,19 +177,16 @@ class Server(FoglampMicroservice):
         try_count = 1
         while self._plugin and try_count <= _MAX_RETRY_POLL:
             try:
+                # Pause polling while the readings buffers are drained, rather than polling readings for which
+                # there is no room
+                await Ingest.wait_capacity()
                 data = self._plugin.plugin_poll(self._plugin_handle)
                 if len(data) > 0:
+                    # One batch for all the readings of the poll, waiting for room in the buffers when full
                     if isinstance(data, list):
-                        for reading in data:
-                            asyncio.ensure_future(Ingest.add_readings(asset=reading['asset'],
-                                                                        timestamp=reading['timestamp'],
-                                                                        key=reading['key'],
-                                                                        readings=reading['readings']))
+                        await Ingest.add_readings_batch(data)
                     elif isinstance(data, dict):
-                        asyncio.ensure_future(Ingest.add_readings(asset=data['asset'],
-                                                                  timestamp=data['timestamp'],
-                                                                  key=data['key'],
-                                                                  readings=data['readings']))
+                        await Ingest.add_readings_batch([data])
                 # pollInterval is expressed in milliseconds
                 sleep_seconds = int(self._plugin_handle['pollInterval']['value']) / 1000.0
                 await asyncio.sleep(sleep_seconds)
@@ -225,6 +238,12 @@ class Server(FoglampMicroservice):
         except (asyncio.CancelledError, exceptions.DataRetrievalError):
             pass
 
+        if self._storage_async is not None:
+            try:
+                await self._storage_async.close()
+            except Exception as ex:
+                _LOGGER.exception('Unable to close the storage client. %s', str(ex))
+
         # This deactivates event loop and
         # helps aiohttp microservice server instance in graceful shutdown
         _LOGGER.info('Stopping South service event loop, for plugin {}.'.format(self._name))
@@ -244,6 +263,14 @@ class Server(FoglampMicroservice):
         return web.json_response({"message": "Successfully shutdown microservice id {} at "
                                              "url http://{}:{}/foglamp/service/shutdown".format(self._microservice_id, self._microservice_management_host, self._microservice_management_port)})
 
+    async def get_ingest_metrics(self, request):
+        """ live metrics of the readings ingested by this service
+
+        :Example:
+            curl -X GET http://localhost:<south mgt port>/foglamp/service/ingest/metrics
+        """
+        return web.json_response(Ingest.metrics())
+
     async def change(self, request):
         """implementation of abstract method form foglamp.common.microservice.
         """
@@ -256,6 +283,8 @@ class Server(FoglampMicroservice):
             # plugin_reconfigure and assign new handle
             new_handle = self._plugin.plugin_reconfigure(self._plugin_handle, new_config)
             self._plugin_handle = new_handle
+            Ingest.set_readings_filter(new_config['readingsFilter']['value'])
+            Ingest.set_readings_aggregation(new_config['readingsAggregation']['value'])
 
             _LOGGER.info('Reconfiguration done for South plugin {}'.format(self._name))
             if new_handle['restart'] == 'yes':
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Append-only journal on disk of the readings Ingest could not keep in memory or send to storage
+
+The journal is a directory of segment files of a fixed size, allocated and memory-mapped when they are created, so
+that appending a row is a copy into the map. A segment starts with a header holding the offsets where the next row
+is read and written, followed by the serialized readings rows, each terminated by a new line, which JSON rows can
+not contain. A new segment is created when the last one is full, as long as the journal stays within its maximum
+size, and a segment is removed once all its rows are read. The rows not yet read are found again when the journal is
+opened, e.g. after the South service restarted. It is not thread-safe, to be used from the event loop.
+"""
+
+import mmap
+import os
+import struct
+from typing import List
+
+from foglamp.common import logger
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+__all__ = ('SpillJournal',)
+
+_LOGGER = logger.setup(__name__)
+
+_MAGIC = b'FLSJ0001'
+_HEADER = struct.Struct('<8sQQ')
+"""magic, offset of the next row to read, offset of the next row to write"""
+
+_SUFFIX = '.seg'
+
+
+class _Segment(object):
+    """ A memory-mapped segment file of the journal """
+
+    __slots__ = ('path', 'size', '_map', 'read_offset', 'write_offset')
+
+    def __init__(self, path, size=None):
+        """ Opens the segment file path, or creates it with size bytes when size is given
+
+        :raises ValueError: if the file is not a segment
+        """
+        self.path = path
+        with open(path, 'r+b' if size is None else 'x+b') as f:
+            if size is not None:
+                f.truncate(size)
+            self._map = mmap.mmap(f.fileno(), 0)
+        self.size = len(self._map)
+        if size is not None:
+            self.read_offset = self.write_offset = _HEADER.size
+            self._write_header()
+            return
+        if self.size < _HEADER.size:
+            self._map.close()
+            raise ValueError('{} is too small to be a spill journal segment'.format(path))
+        magic, self.read_offset, self.write_offset = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC or not _HEADER.size <= self.read_offset <= self.write_offset <= self.size:
+            self._map.close()
+            raise ValueError('{} is not a spill journal segment'.format(path))
+
+    def __len__(self):
+        """ Number of rows not read yet """
+        return self._map[self.read_offset:self.write_offset].count(b'\n')
+
+    def append(self, rows):
+        """ Copies the rows which fit in the segment, in order
+
+        :return: number of rows appended
+        """
+        offset = self.write_offset
+        count = 0
+        for row in rows:
+            end = offset + len(row) + 1
+            if end > self.size:
+                break
+            self._map[offset:end - 1] = row
+            self._map[end - 1] = 0x0a
+            offset = end
+            count += 1
+        if count:
+            self.write_offset = offset
+            self._write_header()
+        return count
+
+    def peek(self, count):
+        """ Returns a list of the count next rows, fewer if there are not as many, and the offset after them """
+        rows = []
+        offset = self.read_offset
+        while len(rows) < count and offset < self.write_offset:
+            end = self._map.find(b'\n', offset, self.write_offset)
+            rows.append(self._map[offset:end])
+            offset = end + 1
+        return rows, offset
+
+    def drop(self, offset):
+        """ Marks the rows up to offset as read, the segment is reused from its start when all of them are """
+        if offset >= self.write_offset:
+            self.read_offset = self.write_offset = _HEADER.size
+        else:
+            self.read_offset = offset
+        self._write_header()
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        self._map.flush()
+        self._map.close()
+
+    def _write_header(self):
+        _HEADER.pack_into(self._map, 0, _MAGIC, self.read_offset, self.write_offset)
+
+
+class SpillJournal(object):
+    """ FIFO of serialized readings rows kept on disk, of at most max_size bytes """
+
+    def __init__(self, directory, max_size, segment_size=4 * 1024 * 1024):
+        """ Opens the journal in directory, created if needed, with the segments left by a previous run
+
+        A segment is no larger than max_size, the journal then has a single segment.
+
+        :raises ValueError: if max_size or segment_size is too small for a segment
+        :raises OSError: if the directory can not be created or a segment not be opened
+        """
+        segment_size = min(segment_size, max_size)
+        if segment_size <= _HEADER.size:
+            raise ValueError('Spill journal segment size must be larger than {} bytes'.format(_HEADER.size))
+        self._directory = directory
+        self._max_segments = max_size // segment_size
+        self._segment_size = segment_size
+        self._segments = []  # type: List[_Segment]
+        self._rows = 0
+        self._next_sequence = 0
+
+        os.makedirs(directory, exist_ok=True)
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(_SUFFIX):
+                continue
+            try:
+                self._next_sequence = max(self._next_sequence, int(name[:-len(_SUFFIX)]) + 1)
+            except ValueError:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                segment = _Segment(path)
+            except ValueError as ex:
+                _LOGGER.warning('Ignoring %s', str(ex))
+                continue
+            self._segments.append(segment)
+            self._rows += len(segment)
+        if self._rows:
+            _LOGGER.info('%s readings found in the spill journal %s', self._rows, directory)
+
+    def __len__(self):
+        """ Number of rows not read yet """
+        return self._rows
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def append(self, rows):
+        """ Appends the rows of a list, in order, as long as the journal stays within its maximum size
+
+        A row larger than a segment is not appended, nor the ones after it.
+
+        :return: number of rows appended
+        """
+        count = 0
+        while count < len(rows):
+            if self._segments:
+                count += self._segments[-1].append(rows[count:] if count else rows)
+                if count == len(rows):
+                    break
+            if len(rows[count]) + 1 > self._segment_size - _HEADER.size or len(self._segments) >= self._max_segments:
+                break
+            self._segments.append(self._new_segment())
+        self._rows += count
+        return count
+
+    def peek(self, count):
+        """ Returns a list of the count oldest rows, fewer if there are not as many, leaving them in the journal """
+        rows = []
+        for segment in self._segments:
+            segment_rows, _ = segment.peek(count - len(rows))
+            rows.extend(segment_rows)
+            if len(rows) >= count:
+                break
+        return rows
+
+    def drop(self, count):
+        """ Removes the count oldest rows, all of them if there are not as many, and the segments read
+
+        :return: number of rows removed
+        """
+        dropped = 0
+        while dropped < count and self._segments:
+            segment = self._segments[0]
+            rows, offset = segment.peek(count - dropped)
+            dropped += len(rows)
+            segment.drop(offset)
+            if segment.write_offset != _HEADER.size or len(self._segments) == 1:
+                break
+            self._segments.pop(0)
+            segment.close()
+            os.remove(segment.path)
+        self._rows -= dropped
+        return dropped
+
+    def flush(self):
+        """ Writes the changes to the mapped segments to disk """
+        for segment in self._segments:
+            segment.flush()
+
+    def close(self):
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+        self._rows = 0
+
+    def _new_segment(self):
+        path = os.path.join(self._directory, '{:016d}{}'.format(self._next_sequence, _SUFFIX))
+        self._next_sequence += 1
+        return _Segment(path, self._segment_size)
@@ -24,13 +24,12 @@ import importlib
 import logging
 import datetime
 import signal
-import json
 
 import foglamp.plugins.north.common.common as plugin_common
 
 from foglamp.common.parser import Parser
 from foglamp.common.storage_client.storage_client import StorageClient, ReadingsStorageClient, StorageClientAsync, ReadingsStorageClientAsync
-from foglamp.common import logger
+from foglamp.common import json_codec, logger
 from foglamp.common.configuration_manager import ConfigurationManager
 from foglamp.common.storage_client import payload_builder
 from foglamp.common import statistics
@@ -85,6 +84,7 @@ _MESSAGES_LIST = {
     "e000027": "Required argument '--address' is missing - command line |{0}|",
     "e000028": "cannot complete the fetch operation - error details |{0}|",
     "e000029": "an error occurred  during the teardown operation - error details |{0}|",
+    "e000030": "cannot close the connections to the Storage layer - error details |{0}|",
 
 }
 """ Messages used for Information, Warning and Error notice """
@@ -103,6 +103,13 @@ _event_loop = ""
 _log_performance = False
 """ Enable/Disable performance logging, enabled using a command line parameter"""
 
+# TODO : FOGL-623 - avoid the update of the field ts when it will be managed by the DB itself
+_UPDATE_LAST_OBJECT = payload_builder.PayloadBuilder() \
+    .SET(last_object=payload_builder.Param('last_object'), ts='now()') \
+    .WHERE(['id', '=', payload_builder.Param('stream_id')]) \
+    .compile()
+""" Update of the position reached by a stream, compiled once as it is sent after each block """
+
 
 class PluginInitialiseFailed(RuntimeError):
     """ PluginInitializeFailed """
@@ -334,6 +341,12 @@ class SendingProcess:
             "description": "Stream ID",
             "type": "integer",
             "default": "1"
+        },
+        "assets": {
+            "description": "Comma separated asset codes of the readings to send on the stream, "
+                           "all the assets if empty",
+            "type": "string",
+            "default": ""
         }
 
     }
@@ -361,6 +374,7 @@ class SendingProcess:
             'memory_buffer_size': int(self._CONFIG_DEFAULT['memory_buffer_size']['default']),
             'sleepInterval': float(self._CONFIG_DEFAULT['sleepInterval']['default']),
             'north': self._CONFIG_DEFAULT['north']['default'],
+            'assets': self._asset_codes(self._CONFIG_DEFAULT['assets']['default']),
         }
         self._config_from_manager = ""
         # Plugin handling - loading an empty plugin
@@ -514,15 +528,19 @@ class SendingProcess:
         Raises:
         """
         SendingProcess._logger.debug("{0} - position {1} ".format("_load_data_into_memory_readings", last_object_id))
-        raw_data = None
-
         converted_data = []
         try:
-            # Loads data, +1 as > is needed
-            readings = await self._readings.fetch(last_object_id + 1, self._config['blockSize'])
-
-            raw_data = readings['rows']
-            converted_data = self._transform_in_memory_data_readings(raw_data)
+            if self._config['assets']:
+                # the readings of the assets only, keyset paged on id from the position reached
+                page = await self._readings.fetch_page(self._config['assets'], cursor=(last_object_id,),
+                                                       limit=self._config['blockSize'], keys=('id',))
+                converted_data = self._transform_in_memory_data_readings(page['rows'])
+            else:
+                # Loads data, +1 as > is needed
+                # rows are converted while they are received, the whole block is never held twice in memory
+                async with self._readings.fetch_iter(last_object_id + 1, self._config['blockSize']) as rows:
+                    async for row in rows:
+                        converted_data.append(self._transform_in_memory_data_reading(row))
 
         except aiohttp.client_exceptions.ClientPayloadError as _ex:
 
@@ -535,6 +553,11 @@ class SendingProcess:
             raise
         return converted_data
 
+    @staticmethod
+    def _asset_codes(value):
+        """ Returns the list of asset codes of the comma separated assets configuration """
+        return [asset_code.strip() for asset_code in value.split(',') if asset_code.strip()]
+
     @staticmethod
     def _transform_in_memory_data_readings(raw_data):
         """ Transforms readings data retrieved form the DB layer to the proper format
@@ -549,35 +572,41 @@ class SendingProcess:
             converted_data: converted data
         Raises:
         """
-        converted_data = []
+        return [SendingProcess._transform_in_memory_data_reading(row) for row in raw_data]
 
+    @staticmethod
+    def _transform_in_memory_data_reading(row):
+        """ Transforms a reading retrieved form the DB layer to the proper format
+        Args:
+            row: dict having the structure described in _transform_in_memory_data_readings
+        Returns:
+            new_row: converted row
+        Raises:
+        """
         try:
-            for row in raw_data:
-
-                # Converts values to the proper types, for example "180.2" to float 180.2
-                payload = row['reading']
-                for key in list(payload.keys()):
-                    value = payload[key]
-                    payload[key] = plugin_common.convert_to_type(value)
-
-                # Adds timezone UTC
-                timestamp = apply_date_format(row['user_ts'])
-
-                new_row = {
-                    'id': row['id'],
-                    'asset_code': row['asset_code'],
-                    'read_key': row['read_key'],
-                    'reading': payload,
-                    'user_ts': timestamp
-                }
-                converted_data.append(new_row)
+            # Converts values to the proper types, for example "180.2" to float 180.2
+            payload = row['reading']
+            for key in list(payload.keys()):
+                value = payload[key]
+                payload[key] = plugin_common.convert_to_type(value)
+
+            # Adds timezone UTC
+            timestamp = apply_date_format(row['user_ts'])
+
+            new_row = {
+                'id': row['id'],
+                'asset_code': row['asset_code'],
+                'read_key': row['read_key'],
+                'reading': payload,
+                'user_ts': timestamp
+            }
 
         except Exception as e:
             _message = _MESSAGES_LIST["e000022"].format(str(e))
             SendingProcess._logger.error(_message)
             raise e
 
-        return converted_data
+        return new_row
 
     def _load_data_into_memory_statistics(self, last_object_id):
         """ Extracts statistics data from the DB Layer, converts it into the proper format
@@ -702,12 +731,7 @@ class SendingProcess:
         """
         try:
             SendingProcess._logger.debug("Last position, sent |{0}| ".format(str(new_last_object_id)))
-            # TODO : FOGL-623 - avoid the update of the field ts when it will be managed by the DB itself
-            #
-            payload = payload_builder.PayloadBuilder() \
-                .SET(last_object=new_last_object_id, ts='now()') \
-                .WHERE(['id', '=', stream_id]) \
-                .payload()
+            payload = _UPDATE_LAST_OBJECT.bind(last_object=new_last_object_id, stream_id=stream_id)
             await self._storage_async.update_tbl("streams", payload)
 
         except Exception as _ex:
@@ -829,7 +853,7 @@ class SendingProcess:
                                 # to the one expected by the SP
                                 data_to_send_2 = jqfilter.transform(data_to_send,
                                                                     self._config_from_manager['filterRule']["value"])
-                                data_to_send_3 = json.dumps(data_to_send_2)
+                                data_to_send_3 = json_codec.dumps(data_to_send_2)
                                 del data_to_send_2
 
                                 data_to_send_4 = eval(data_to_send_3)
@@ -1114,6 +1138,10 @@ class SendingProcess:
             self._config['sleepInterval'] = float(_config_from_manager['sleepInterval']['value'])
 
             self._config['north'] = _config_from_manager['plugin']['value']
+
+            # streams configured before assets was introduced send all the assets
+            if 'assets' in _config_from_manager:
+                self._config['assets'] = self._asset_codes(_config_from_manager['assets']['value'])
             _config_from_manager['_CONFIG_CATEGORY_NAME'] = config_category_name
             self._config_from_manager = _config_from_manager
         except Exception:
@@ -1252,6 +1280,23 @@ class SendingProcess:
             loop = asyncio.get_event_loop()
             loop.run_until_complete(self._audit.failure(self._AUDIT_CODE, {"error - on stop": _message}))
             raise
+        finally:
+            # Releases the pooled connections to the Storage layer
+            self._event_loop.run_until_complete(self._close_storage())
+
+    async def _close_storage(self):
+        """ Closes the async clients to the Storage layer
+        Args:
+        Returns:
+        Raises:
+        """
+        for storage_client in (self._readings, self._storage_async):
+            if storage_client is not None:
+                try:
+                    await storage_client.close()
+                except Exception as ex:
+                    _message = _MESSAGES_LIST["e000030"].format(ex)
+                    SendingProcess._logger.warning(_message)
 
 
 if __name__ == "__main__":
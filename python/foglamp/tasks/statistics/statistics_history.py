@@ -28,55 +28,37 @@ class StatisticsHistory(FoglampProcess):
         super().__init__()
         self._logger = logger.setup("StatisticsHistory")
 
-    def _stats_keys(self) -> list:
-        """ Generates a list of distinct keys from statistics table
-    
-        Returns:
-            list of distinct keys
-        """
-        payload = PayloadBuilder().SELECT().DISTINCT(["key"]).payload()
-        results = self._storage.query_tbl_with_payload('statistics', payload)
-    
-        key_list = [r['key'] for r in results['rows']]
-        return key_list
+    def _insert_into_stats_history(self, rows, history_ts):
+        """ INSERT values in statistics_history, with a single request
 
-    def _insert_into_stats_history(self, key='', value=0, history_ts=None):
-        """ INSERT values in statistics_history
-    
         Args:
-            key: corresponding stats_key_value 
-            value: delta between `value` and `prev_val`
+            rows: statistics rows, the delta between `value` and `previous_value` of each is inserted for its key
             history_ts: timestamp with timezone
-        Returns:
-            Return the number of rows inserted. Since each process inserts only 1 row, the expected count should always 
-            be 1. 
         """
         date_to_str = history_ts.strftime("%Y-%m-%d %H:%M:%S.%f")
-        payload = PayloadBuilder().INSERT(key=key, value=value, history_ts=date_to_str).payload()
-        self._storage.insert_into_tbl("statistics_history", payload)
+        payloads = [PayloadBuilder().INSERT(key=row["key"], value=row["value"] - row["previous_value"],
+                                            history_ts=date_to_str).payload() for row in rows]
+        self._storage.insert_many("statistics_history", payloads)
 
-    def _update_previous_value(self, key='', value=0):
-        """ UPDATE previous_value of column to have the same value as snapshot
+    def _update_previous_value(self, rows):
+        """ UPDATE previous_value of column to have the same value as snapshot, with a single request
     
         Query: 
-            UPDATE statistics_history SET previous_value = value WHERE key = key
+            UPDATE statistics SET previous_value = value WHERE key = key, for each row
         Args:
-            key: Key which previous_value gets update 
-            value: value at snapshot
+            rows: statistics rows at snapshot
         """
-        payload = PayloadBuilder().SET(previous_value=value).WHERE(["key", "=", key]).payload()
-        self._storage.update_tbl("statistics", payload)
+        payloads = [PayloadBuilder().SET(previous_value=row["value"]).WHERE(["key", "=", row["key"]]).payload()
+                    for row in rows]
+        self._storage.update_many("statistics", payloads)
 
-    def _select_from_statistics(self, key='') -> dict:
-        """ SELECT * from statistics for the statistics_history WHERE key = key
-    
-        Args:
-            key: The row name update is executed against (WHERE condition)
+    def _select_from_statistics(self) -> dict:
+        """ SELECT * from statistics for the statistics_history
     
         Returns:
-            row as dict
+            rows as dict
         """
-        payload = PayloadBuilder().WHERE(["key", "=", key]).payload()
+        payload = PayloadBuilder().SELECT("key", "value", "previous_value").payload()
         result = self._storage.query_tbl_with_payload("statistics", payload)
         return result
 
@@ -87,13 +69,10 @@ class StatisticsHistory(FoglampProcess):
             1. INSERT the delta between `value` and `previous_value` into  statistics_history
             2. UPDATE the previous_value in statistics table to be equal to statistics.value at snapshot 
         """
-        stats_key_value_list = self._stats_keys()
         current_time = datetime.now()
-    
-        for key in stats_key_value_list:
-            stats = self._select_from_statistics(key=key)
-            value = stats["rows"][0]["value"]
-            previous_value = stats["rows"][0]["previous_value"]
-            delta = value - previous_value
-            self._insert_into_stats_history(key=key, value=delta, history_ts=current_time)
-            self._update_previous_value(key=key, value=value)
+        rows = self._select_from_statistics()["rows"]
+        if not rows:
+            return
+
+        self._insert_into_stats_history(rows, history_ts=current_time)
+        self._update_previous_value(rows)
@@ -855,7 +855,9 @@ INSERT INTO foglamp.statistics ( key, description, value, previous_value )
             ( 'UNSENT',     'Readings filtered out in the send process', 0, 0 ),
             ( 'PURGED',     'Readings removed from the buffer by the purge process', 0, 0 ),
             ( 'UNSNPURGED', 'Readings that were purged from the buffer before being sent', 0, 0 ),
-            ( 'DISCARDED',  'Readings discarded by the South Service before being  placed in the buffer. This may be due to an error in the readings themselves.', 0, 0 );
+            ( 'DISCARDED',  'Readings discarded by the South Service before being  placed in the buffer. This may be due to an error in the readings themselves.', 0, 0 ),
+            ( 'DUPLICATE',  'Readings rejected by the South Service as they have the key of a reading received shortly before', 0, 0 ),
+            ( 'FILTERED',   'Readings dropped by the readings filter of the South Service as they changed too little from the readings stored', 0, 0 );
 
 
 --
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test foglamp/common/storage_client/cache.py """
+
+from unittest.mock import patch
+
+import pytest
+
+from foglamp.common.storage_client import cache
+from foglamp.common.storage_client.cache import StorageCache
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+RESULT = {"count": 1, "rows": [{"code": "PURGE", "description": "Data Purging Process"}]}
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "storage_client")
+class TestStorageCache:
+
+    def test_shared_by_base_url(self):
+        assert StorageCache.get('localhost:8080') is StorageCache.get('localhost:8080')
+        assert StorageCache.get('localhost:8080') is not StorageCache.get('localhost:8081')
+
+    def test_table_not_configured(self):
+        storage_cache = StorageCache()
+        storage_cache.put('log_codes', 'k', RESULT, None)
+        assert (None, None) == storage_cache.lookup('log_codes', 'k')
+        assert {} == storage_cache.stats()
+
+    @pytest.mark.parametrize("ttl, max_entries", [(0, 1), (1, 0), (-1, 1)])
+    def test_configure_invalid(self, ttl, max_entries):
+        with pytest.raises(ValueError) as excinfo:
+            StorageCache().configure('log_codes', ttl=ttl, max_entries=max_entries)
+        assert "ttl and max_entries must be greater than 0" == str(excinfo.value)
+
+    def test_hit_returns_a_copy(self):
+        storage_cache = StorageCache()
+        storage_cache.configure('log_codes', ttl=60)
+        result, generation = storage_cache.lookup('log_codes', 'k')
+        assert result is None
+        storage_cache.put('log_codes', 'k', RESULT, generation)
+        result, _ = storage_cache.lookup('log_codes', 'k')
+        assert RESULT == result
+        result["rows"].append({})
+        assert RESULT == storage_cache.lookup('log_codes', 'k')[0]
+        assert {"hits": 2, "misses": 1, "invalidations": 0, "entries": 1, "ttl": 60,
+                "max_entries": 64} == storage_cache.stats()['log_codes']
+
+    def test_expired(self):
+        storage_cache = StorageCache()
+        storage_cache.configure('log_codes', ttl=10)
+        with patch.object(cache.time, 'monotonic', return_value=100):
+            _, generation = storage_cache.lookup('log_codes', 'k')
+            storage_cache.put('log_codes', 'k', RESULT, generation)
+        with patch.object(cache.time, 'monotonic', return_value=109):
+            assert RESULT == storage_cache.lookup('log_codes', 'k')[0]
+        with patch.object(cache.time, 'monotonic', return_value=110):
+            assert storage_cache.lookup('log_codes', 'k')[0] is None
+        assert 0 == storage_cache.stats()['log_codes']['entries']
+
+    def test_least_recently_used_dropped(self):
+        storage_cache = StorageCache()
+        storage_cache.configure('configuration', ttl=60, max_entries=2)
+        for key in ('a', 'b'):
+            storage_cache.put('configuration', key, {key: 1}, 0)
+        storage_cache.lookup('configuration', 'a')
+        storage_cache.put('configuration', 'c', {'c': 1}, 0)
+        assert {'a': 1} == storage_cache.lookup('configuration', 'a')[0]
+        assert storage_cache.lookup('configuration', 'b')[0] is None
+        assert {'c': 1} == storage_cache.lookup('configuration', 'c')[0]
+
+    def test_invalidate(self):
+        storage_cache = StorageCache()
+        storage_cache.configure('roles', ttl=60)
+        storage_cache.configure('log_codes', ttl=60)
+        storage_cache.put('roles', 'k', RESULT, 0)
+        storage_cache.put('log_codes', 'k', RESULT, 0)
+        storage_cache.invalidate('roles')
+        storage_cache.invalidate('users')
+        assert storage_cache.lookup('roles', 'k')[0] is None
+        assert RESULT == storage_cache.lookup('log_codes', 'k')[0]
+        assert 1 == storage_cache.stats()['roles']['invalidations']
+
+    def test_result_of_query_sent_before_write_not_cached(self):
+        storage_cache = StorageCache()
+        storage_cache.configure('roles', ttl=60)
+        _, generation = storage_cache.lookup('roles', 'k')
+        storage_cache.invalidate('roles')
+        storage_cache.put('roles', 'k', RESULT, generation)
+        assert storage_cache.lookup('roles', 'k')[0] is None
+
+    def test_disable_and_clear(self):
+        storage_cache = StorageCache()
+        storage_cache.configure('roles', ttl=60)
+        storage_cache.configure('log_codes', ttl=60)
+        storage_cache.put('roles', 'k', RESULT, 0)
+        storage_cache.put('log_codes', 'k', RESULT, 0)
+        storage_cache.clear()
+        assert storage_cache.lookup('log_codes', 'k')[0] is None
+        storage_cache.disable('roles')
+        assert not storage_cache.is_cached('roles')
+        assert storage_cache.is_cached('log_codes')
+
+    def test_key(self):
+        assert ('/storage/table/roles/query', b'{"k": 1}') == StorageCache.key('/storage/table/roles/query',
+                                                                              bytearray(b'{"k": 1}'))
+        assert hash(StorageCache.key('/storage/table/roles'))
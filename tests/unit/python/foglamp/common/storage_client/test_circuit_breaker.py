@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test foglamp/common/storage_client/circuit_breaker.py """
+
+from unittest.mock import patch
+
+import pytest
+
+from foglamp.common.storage_client import circuit_breaker
+from foglamp.common.storage_client.circuit_breaker import CircuitBreaker, backoff
+from foglamp.common.storage_client.exceptions import CircuitBreakerOpen, StorageServiceUnavailable
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def _open(breaker, now=100):
+    with patch.object(circuit_breaker.time, 'monotonic', return_value=now):
+        for _ in range(breaker.failure_threshold):
+            breaker.allow()
+            breaker.failure()
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "storage_client")
+class TestBackoff:
+
+    @pytest.mark.parametrize("attempt, low, high", [(0, 0.25, 0.5), (1, 0.5, 1), (3, 2, 4), (10, 15, 30)])
+    def test_backoff(self, attempt, low, high):
+        for _ in range(20):
+            assert low <= backoff(attempt) <= high
+
+    def test_backoff_random(self):
+        with patch.object(circuit_breaker.random, 'uniform', return_value=0.1) as patch_uniform:
+            assert 1.1 == backoff(2, base=0.5, cap=30)
+        patch_uniform.assert_called_once_with(0, 1.0)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "storage_client")
+class TestCircuitBreaker:
+
+    def test_shared_by_base_url(self):
+        assert CircuitBreaker.get('localhost:8080') is CircuitBreaker.get('localhost:8080')
+        assert CircuitBreaker.get('localhost:8080') is not CircuitBreaker.get('localhost:8081')
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3)
+        breaker.failure()
+        breaker.failure()
+        breaker.success()
+        breaker.failure()
+        breaker.failure()
+        assert CircuitBreaker.CLOSED == breaker.state
+        with patch.object(circuit_breaker._LOGGER, 'warning') as log_w:
+            breaker.failure()
+        assert CircuitBreaker.OPEN == breaker.state
+        assert 1 == log_w.call_count
+
+    def test_open_fails_fast(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=2)
+        with patch.object(circuit_breaker.random, 'uniform', return_value=0.5):
+            _open(breaker, now=100)
+        with patch.object(circuit_breaker.time, 'monotonic', return_value=101):
+            with pytest.raises(CircuitBreakerOpen) as excinfo:
+                breaker.allow()
+            assert 0.5 == excinfo.value.retry_after
+            assert isinstance(excinfo.value, StorageServiceUnavailable)
+            assert {"state": "open", "failures": 2, "rejected": 1, "retry_after": 0.5} == breaker.stats()
+
+    def test_half_open_probe_closes(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=2)
+        _open(breaker, now=100)
+        with patch.object(circuit_breaker.time, 'monotonic', return_value=102):
+            breaker.allow()
+            assert CircuitBreaker.HALF_OPEN == breaker.state
+            # a single probe call at a time
+            with pytest.raises(CircuitBreakerOpen):
+                breaker.allow()
+        with patch.object(circuit_breaker._LOGGER, 'info') as log_i:
+            breaker.success()
+        log_i.assert_called_once_with("Storage service is reachable again, circuit breaker closed")
+        assert CircuitBreaker.CLOSED == breaker.state
+        breaker.allow()
+        breaker.allow()
+
+    def test_half_open_probe_failure_backs_off(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=2, max_reset_timeout=5)
+        _open(breaker, now=100)
+        timeouts = []
+        now = 100
+        for _ in range(4):
+            now += 10
+            with patch.object(circuit_breaker.time, 'monotonic', return_value=now):
+                breaker.allow()
+                breaker.failure()
+                timeouts.append(breaker.retry_after())
+        assert CircuitBreaker.OPEN == breaker.state
+        # 4, 8 then capped to 5, half of it jittered
+        assert 2 <= timeouts[0] <= 4
+        assert 2.5 <= timeouts[1] <= 5
+        assert 2.5 <= timeouts[3] <= 5
+
+    def test_release_lets_another_probe_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=2)
+        _open(breaker, now=100)
+        with patch.object(circuit_breaker.time, 'monotonic', return_value=110):
+            breaker.allow()
+            breaker.release()
+            breaker.allow()
+        assert CircuitBreaker.HALF_OPEN == breaker.state
+
+    def test_reset(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        _open(breaker)
+        breaker.reset()
+        assert {"state": "closed", "failures": 0, "rejected": 0, "retry_after": 0.0} == breaker.stats()
+        breaker.allow()
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test foglamp/common/storage_client/connection_pool.py """
+
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from unittest.mock import patch
+
+import pytest
+
+from foglamp.common.storage_client import connection_pool
+from foglamp.common.storage_client.connection_pool import HTTPConnectionPool, UnixHTTPConnection
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode() if length else None
+        # a unix domain socket client has no address, each of its connections is served by a handler
+        self.server.client_ports.append(self.client_address[1] if self.client_address else id(self))
+        if self.path.endswith('abort'):
+            # the request was read, the connection is closed before a response is sent
+            self.close_connection = True
+            return
+        res = json.dumps({"method": self.command, "path": self.path, "body": body}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(res)))
+        if self.path.endswith('close'):
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(res)
+        if self.path.endswith('drop'):
+            # keep-alive was advertised but the connection is dropped, as on a storage service restart
+            self.close_connection = True
+
+    do_GET = do_PUT = do_POST = do_DELETE = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class _FakeStorageServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _KeepAliveHandler)
+        self.client_ports = []
+
+    @property
+    def base_url(self):
+        return '{}:{}'.format(*self.server_address)
+
+
+class _UnixKeepAliveHandler(_KeepAliveHandler):
+    disable_nagle_algorithm = False  # TCP only
+
+
+class _FakeUnixStorageServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        super().__init__(socket_path, _UnixKeepAliveHandler)
+        self.client_ports = []
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def storage_server():
+    server = _serve(_FakeStorageServer())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def unix_storage_server():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server = _serve(_FakeUnixStorageServer(os.path.join(tmp_dir, 'storage.sock')))
+        yield server
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "storage_client")
+class TestHTTPConnectionPool:
+
+    def test_get_is_shared_per_base_url(self):
+        pool = HTTPConnectionPool.get('local:1000', pool_size=3, idle_timeout=5)
+        assert pool is HTTPConnectionPool.get('local:1000')
+        assert pool is not HTTPConnectionPool.get('local:2000')
+        assert 3 == pool.pool_size
+        assert 5 == pool.idle_timeout
+        assert pool.socket_path is None
+        HTTPConnectionPool.get('local:1000', socket_path='/tmp/storage.sock')
+        assert '/tmp/storage.sock' == pool.socket_path
+
+    def test_request_reuses_connection(self, storage_server):
+        pool = HTTPConnectionPool(storage_server.base_url)
+        r, res = pool.request('PUT', '/storage/table/aTable', body='{"k": "v"}')
+        assert 200 == r.status
+        assert {"method": "PUT", "path": "/storage/table/aTable", "body": '{"k": "v"}'} == json.loads(res)
+        assert 1 == len(pool)
+
+        r, res = pool.request('GET', '/storage/table/aTable')
+        assert 200 == r.status
+        assert 1 == len(pool)
+        assert 2 == len(storage_server.client_ports)
+        assert storage_server.client_ports[0] == storage_server.client_ports[1]
+        pool.close()
+        assert 0 == len(pool)
+
+    def test_server_closed_response_is_not_pooled(self, storage_server):
+        pool = HTTPConnectionPool(storage_server.base_url)
+        r, res = pool.request('GET', '/storage/table/close')
+        assert 200 == r.status
+        assert 0 == len(pool)
+
+    def test_idle_timeout(self, storage_server):
+        pool = HTTPConnectionPool(storage_server.base_url, idle_timeout=0)
+        pool.request('GET', '/storage/table/aTable')
+        pool.request('GET', '/storage/table/aTable')
+        assert 2 == len(storage_server.client_ports)
+        assert storage_server.client_ports[0] != storage_server.client_ports[1]
+        pool.close()
+
+    def test_pool_size(self, storage_server):
+        pool = HTTPConnectionPool(storage_server.base_url, pool_size=1)
+        conn1, reused1 = pool._acquire()
+        conn2, reused2 = pool._acquire()
+        assert reused1 is False and reused2 is False
+        pool._release(conn1)
+        with patch.object(conn2, 'close') as patch_close:
+            pool._release(conn2)
+        patch_close.assert_called_once_with()
+        assert 1 == len(pool)
+        pool.close()
+
+    def test_reconnect_on_stale_connection(self, storage_server):
+        pool = HTTPConnectionPool(storage_server.base_url)
+        pool.request('GET', '/storage/table/drop')
+        assert 1 == len(pool)
+        time.sleep(.1)
+
+        r, res = pool.request('POST', '/storage/table/aTable', body='{"k": "v"}')
+        assert 200 == r.status
+        assert "POST" == json.loads(res)["method"]
+        assert 2 == len(storage_server.client_ports)
+        pool.close()
+
+    def test_not_sent_again_once_read(self, storage_server):
+        pool = HTTPConnectionPool(storage_server.base_url)
+        pool.request('GET', '/storage/table/aTable')
+        assert 1 == len(pool)
+
+        with pytest.raises(http.client.RemoteDisconnected):
+            pool.request('POST', '/storage/reading/abort', body='{"readings": []}')
+        # the POST the server read is not applied a second time
+        assert 2 == len(storage_server.client_ports)
+        assert 0 == len(pool)
+
+    def test_reconnect_once_on_send_error(self, storage_server):
+        pool = HTTPConnectionPool(storage_server.base_url)
+        pool.request('GET', '/storage/table/aTable')
+        assert 1 == len(pool)
+
+        # the reused connection, then a single new one
+        with patch.object(http.client.HTTPConnection, 'request', side_effect=ConnectionResetError) as patch_request:
+            with pytest.raises(ConnectionResetError):
+                pool.request('POST', '/storage/table/aTable', body='{"k": "v"}')
+        assert 2 == patch_request.call_count
+        pool.close()
+
+    def test_fresh_connection_errors_are_raised(self):
+        pool = HTTPConnectionPool('127.0.0.1:1')
+        with pytest.raises(ConnectionRefusedError):
+            pool.request('GET', '/storage/table/aTable')
+        assert 0 == len(pool)
+
+    def test_unix_socket_transport(self, unix_storage_server):
+        # nothing listens on the TCP port: the requests can only go through the unix domain socket
+        pool = HTTPConnectionPool('127.0.0.1:1', socket_path=unix_storage_server.server_address)
+        r, res = pool.request('PUT', '/storage/table/aTable', body='{"k": "v"}')
+        assert 200 == r.status
+        assert {"method": "PUT", "path": "/storage/table/aTable", "body": '{"k": "v"}'} == json.loads(res)
+        conn, reused = pool._acquire()
+        assert isinstance(conn, UnixHTTPConnection) and reused
+        pool._release(conn)
+
+        r, res = pool.request('GET', '/storage/table/aTable')
+        assert 200 == r.status
+        assert 2 == len(unix_storage_server.client_ports)
+        assert unix_storage_server.client_ports[0] == unix_storage_server.client_ports[1]
+        assert unix_storage_server.server_address == pool.socket_path
+        pool.close()
+
+    def test_fall_back_to_tcp(self, storage_server):
+        pool = HTTPConnectionPool(storage_server.base_url, socket_path='/nonexistent/storage.sock')
+        with patch.object(connection_pool._LOGGER, 'warning') as log_w:
+            r, res = pool.request('GET', '/storage/table/aTable')
+            r, res = pool.request('GET', '/storage/table/aTable')
+        assert 200 == r.status
+        assert pool.socket_path is None
+        assert 1 == log_w.call_count
+        args = log_w.call_args[0]
+        assert "Unable to connect to the storage service over %s, %s; falling back to TCP on %s" == args[0]
+        assert '/nonexistent/storage.sock' == args[1]
+        assert storage_server.base_url == args[3]
+        assert 2 == len(storage_server.client_ports)
+        pool.close()
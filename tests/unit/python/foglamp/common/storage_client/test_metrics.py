@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test foglamp/common/storage_client/metrics.py """
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from foglamp.common.storage_client import metrics
+from foglamp.common.storage_client.cache import StorageCache
+from foglamp.common.storage_client.circuit_breaker import CircuitBreaker
+from foglamp.common.storage_client.exceptions import CircuitBreakerOpen, StorageServerError
+from foglamp.common.storage_client.metrics import StorageMetrics
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "storage_client")
+class TestStorageMetrics:
+
+    def setup_method(self):
+        StorageMetrics.reset()
+
+    def teardown_method(self):
+        StorageMetrics.reset()
+
+    def test_record(self):
+        StorageMetrics.record('PUT /storage/table/query', 'log', 0.003, 20, 100)
+        StorageMetrics.record('PUT /storage/table/query', 'log', 0.2, 30, 50, error=True)
+        StorageMetrics.record('PUT /storage/table/query', 'log', 20, error=True, retryable=True)
+        snapshot = StorageMetrics.snapshot()
+        assert 1 == len(snapshot)
+        call = snapshot[0]
+        assert 'PUT /storage/table/query' == call['endpoint']
+        assert 'log' == call['table']
+        assert (3, 2, 1) == (call['calls'], call['errors'], call['retryable'])
+        assert (50, 150) == (call['request_bytes'], call['response_bytes'])
+        assert 20 == call['latency']['max']
+        assert 20.203 == pytest.approx(call['latency']['total'])
+        buckets = call['latency']['buckets']
+        # cumulative, as Prometheus "le" buckets
+        assert (0, 1, 1, 2, 2, 3) == (buckets['0.0025'], buckets['0.005'], buckets['0.01'], buckets['0.25'],
+                                      buckets['10'], buckets['+Inf'])
+
+    def test_snapshot_sorted(self):
+        StorageMetrics.record('PUT /storage/table', 'users', 0.1)
+        StorageMetrics.record('POST /storage/reading', 'readings', 0.1)
+        StorageMetrics.record('PUT /storage/table', 'roles', 0.1)
+        assert [('POST /storage/reading', 'readings'), ('PUT /storage/table', 'roles'), ('PUT /storage/table', 'users')
+                ] == [(c['endpoint'], c['table']) for c in StorageMetrics.snapshot()]
+
+    def test_timer(self):
+        with patch.object(metrics.time, 'perf_counter', side_effect=[10, 10.5]):
+            with StorageMetrics.timer('GET /storage/table', 'roles', '{"k": 1}') as timer:
+                timer.response(200, 42, {"count": 0, "rows": []})
+        call = StorageMetrics.snapshot()[0]
+        assert (1, 0) == (call['calls'], call['errors'])
+        assert (8, 42) == (call['request_bytes'], call['response_bytes'])
+        assert 0.5 == call['latency']['total']
+
+    @pytest.mark.parametrize("body, content_length, length", [
+        (None, None, 0),
+        ('', None, 0),
+        ('{"value": "caf\u00e9"}', None, 18),
+        (b'{"value": 1}', None, 12),
+        ('{"value": 1}', '40', 40),
+        (None, 40, 40)
+    ])
+    def test_body_length(self, body, content_length, length):
+        assert length == metrics.body_length(body, content_length)
+
+    def test_timer_counts_encoded_bytes(self):
+        with StorageMetrics.timer('POST /storage/table', 'log', '{"message": "\u00e9t\u00e9"}') as timer:
+            timer.response(200, metrics.body_length('{"rows_affected": "\u00e9"}'), {"rows_affected": 1})
+        call = StorageMetrics.snapshot()[0]
+        assert (20, 23) == (call['request_bytes'], call['response_bytes'])
+
+    @pytest.mark.parametrize("jdoc, retryable", [
+        ({"message": "error", "retryable": True}, 1),
+        ({"message": "error", "retryable": False}, 0),
+        ({"message": "error"}, 0),
+        (None, 0)
+    ])
+    def test_timer_error_status(self, jdoc, retryable):
+        with StorageMetrics.timer('POST /storage/table', 'log') as timer:
+            timer.response(400, None, jdoc)
+        call = StorageMetrics.snapshot()[0]
+        assert (1, retryable, 0) == (call['errors'], call['retryable'], call['response_bytes'])
+
+    @pytest.mark.parametrize("exc, retryable", [
+        (ConnectionRefusedError(), 1),
+        (StorageServerError(400, 'bad data', {"retryable": True}), 1),
+        (StorageServerError(400, 'bad data', {"retryable": False}), 0),
+        (ValueError(), 0)
+    ])
+    def test_timer_raises(self, exc, retryable):
+        with pytest.raises(type(exc)):
+            with StorageMetrics.timer('DELETE /storage/table', 'log'):
+                raise exc
+        call = StorageMetrics.snapshot()[0]
+        assert (1, 1, retryable) == (call['calls'], call['errors'], call['retryable'])
+
+    @pytest.mark.parametrize("status, jdoc, outcome", [
+        (200, {"rows": []}, 'success'),
+        (400, {"message": "bad payload", "retryable": False}, 'success'),
+        (503, {"message": "busy", "retryable": True}, 'failure')
+    ])
+    def test_timer_breaker_response(self, status, jdoc, outcome):
+        breaker = CircuitBreaker()
+        with patch.object(breaker, 'allow') as patch_allow:
+            with patch.object(breaker, outcome) as patch_outcome:
+                with StorageMetrics.timer('PUT /storage/table/query', 'log', breaker=breaker) as timer:
+                    timer.response(status, 10, jdoc)
+        patch_allow.assert_called_once_with()
+        patch_outcome.assert_called_once_with()
+
+    @pytest.mark.parametrize("exc, outcome", [
+        (ConnectionResetError(), 'failure'),
+        (ValueError(), 'success'),
+        (asyncio.CancelledError(), 'release')
+    ])
+    def test_timer_breaker_raises(self, exc, outcome):
+        breaker = CircuitBreaker()
+        with patch.object(breaker, outcome) as patch_outcome:
+            with pytest.raises(type(exc)):
+                with StorageMetrics.timer('POST /storage/reading', 'readings', breaker=breaker):
+                    raise exc
+        patch_outcome.assert_called_once_with()
+
+    def test_timer_breaker_open(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.failure()
+        with pytest.raises(CircuitBreakerOpen):
+            with StorageMetrics.timer('POST /storage/reading', 'readings', breaker=breaker):
+                assert False, "call not refused"
+        # the refused call is not sent, nor recorded
+        assert [] == StorageMetrics.snapshot()
+
+    def test_report(self):
+        StorageMetrics.record('GET /storage/table', 'roles', 0.1)
+        with patch.object(StorageCache, 'stats_all', return_value={"localhost:8080": {}}):
+            with patch.object(CircuitBreaker, 'stats_all', return_value={"localhost:8080": {"state": "closed"}}):
+                report = StorageMetrics.report()
+        assert StorageMetrics.snapshot() == report['calls']
+        assert {"localhost:8080": {}} == report['cache']
+        assert {"localhost:8080": {"state": "closed"}} == report['breakers']
+
+    def test_reset(self):
+        StorageMetrics.record('GET /storage/table', 'roles', 0.1)
+        StorageMetrics.reset()
+        assert [] == StorageMetrics.snapshot()
@@ -8,7 +8,7 @@ import json
 import os
 import pytest
 import py
-from foglamp.common.storage_client.payload_builder import PayloadBuilder
+from foglamp.common.storage_client.payload_builder import PayloadBuilder, Param
 
 __author__ = "Vaibhav Singhal"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -447,3 +447,146 @@ class TestPayloadBuilderDelete:
     def test_delete_where_payload(self, input_where, input_table, expected):
         res = PayloadBuilder().DELETE(input_table).WHERE(input_where).payload()
         assert expected == json.loads(res)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("payload_builder")
+class TestPayloadBuilderBatch:
+    """
+    This class tests the batch of payloads of payload builder
+    """
+    def test_batch_payload(self):
+        updates = [PayloadBuilder().SET(value="test_update").WHERE(["name", "=", "test"]).payload(),
+                   PayloadBuilder().SET(value="test_update2").WHERE(["name", "=", "test2"]).payload()]
+        res = PayloadBuilder.batch(updates)
+        assert [json.loads(updates[0]), json.loads(updates[1])] == json.loads(res)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("payload_builder")
+class TestPayloadBuilderKeyset:
+    """
+    This class tests the where and sort clauses of keyset pages
+    """
+    def test_first_page(self):
+        res = PayloadBuilder().KEYSET(asset_codes="fogbench/humidity").LIMIT(20).chain_payload()
+        assert {"where": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity"},
+                "sort": [{"column": "user_ts", "direction": "asc"}, {"column": "id", "direction": "asc"}],
+                "limit": 20} == json.loads(json.dumps(res))
+
+    def test_all_assets_first_page(self):
+        res = PayloadBuilder().KEYSET().chain_payload()
+        assert "where" not in res
+
+    def test_page_after_cursor(self):
+        res = PayloadBuilder().KEYSET(("2018-03-08 15:00:00.025+00", 23), "fogbench/humidity").chain_payload()
+        assert {"column": "asset_code", "condition": "=", "value": "fogbench/humidity",
+                "and": {"column": "user_ts", "condition": ">", "value": "2018-03-08 15:00:00.025+00",
+                        "or": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity",
+                               "and": {"column": "user_ts", "condition": "=", "value": "2018-03-08 15:00:00.025+00",
+                                       "and": {"column": "id", "condition": ">", "value": 23}}}}} == \
+            json.loads(json.dumps(res["where"]))
+
+    def test_assets_conditions_descending(self):
+        res = PayloadBuilder().KEYSET((10,), ["A", "B"], [["user_ts", "newer", 60]], keys=("id",),
+                                      descending=True).payload()
+        # asset_code = 'A' AND user_ts newer 60 AND id < 10 OR asset_code = 'B' AND user_ts newer 60 AND id < 10
+        assert {"where": {"column": "asset_code", "condition": "=", "value": "A",
+                          "and": {"column": "user_ts", "condition": "newer", "value": 60,
+                                  "and": {"column": "id", "condition": "<", "value": 10,
+                                          "or": {"column": "asset_code", "condition": "=", "value": "B",
+                                                 "and": {"column": "user_ts", "condition": "newer", "value": 60,
+                                                         "and": {"column": "id", "condition": "<",
+                                                                 "value": 10}}}}}},
+                "sort": {"column": "id", "direction": "desc"}} == json.loads(res)
+
+    def test_compiled(self):
+        compiled = PayloadBuilder().KEYSET((Param("ts"), Param("id")), [Param("asset_code")]).compile()
+        assert PayloadBuilder().KEYSET(("2018-03-08", 2), "A").payload() == compiled.bind(ts="2018-03-08", id=2,
+                                                                                          asset_code="A")
+
+    @pytest.mark.parametrize("initial, kwargs, message", [
+        ({"where": {"column": "id", "condition": ">", "value": 1}}, {},
+         "KEYSET cannot be combined with other where or sort clauses"),
+        ({"sort": {"column": "id", "direction": "asc"}}, {},
+         "KEYSET cannot be combined with other where or sort clauses"),
+        (None, {"cursor": (1,)}, "Keyset cursor must have a value for each of ['user_ts', 'id']"),
+        (None, {"asset_codes": []}, "Keyset asset codes must not be empty, None selects all the assets"),
+        (None, {"conditions": [["id", "in", [1, 2]]]}, "Invalid condition ['id', 'in', [1, 2]]")
+    ])
+    def test_bad_keyset(self, initial, kwargs, message):
+        with pytest.raises(ValueError) as excinfo:
+            PayloadBuilder(initial).KEYSET(**kwargs)
+        assert message == str(excinfo.value)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("payload_builder")
+class TestPayloadBuilderInstance:
+    """
+    This class tests that each payload builder holds its own query
+    """
+    def test_interleaved_builders(self):
+        first = PayloadBuilder().SELECT("key")
+        second = PayloadBuilder().DELETE("test_tbl")
+        first.WHERE(["key", "=", "READINGS"])
+        assert {"return": ["key"], "where": {"column": "key", "condition": "=", "value": "READINGS"}} == \
+            json.loads(first.payload())
+        assert {"table": "test_tbl"} == json.loads(second.payload())
+
+    def test_initial_payload_extended_in_place(self):
+        _select = PayloadBuilder().SELECT("key").chain_payload()
+        PayloadBuilder(_select).LIMIT(5)
+        assert {"return": ["key"], "limit": 5} == _select
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("payload_builder")
+class TestPayloadBuilderCompiled:
+    """
+    This class tests the payloads compiled with named parameters
+    """
+    @pytest.mark.parametrize("key, value", [
+        ("READINGS", 1),
+        ("fogbench/température \"quoted\"", -12),
+        ("PURGED", 2.5),
+        ("SENT_1", None),
+        ("SENT_2", True),
+        ("SENT_3", {"x": [1, "a"]})
+    ])
+    def test_bind_same_as_payload(self, key, value):
+        compiled = PayloadBuilder().WHERE(["key", "=", Param("key")]).EXPR(["value", "+", Param("value")]).compile()
+        assert {"key", "value"} == compiled.params
+        expected = PayloadBuilder().WHERE(["key", "=", key]).EXPR(["value", "+", value]).payload()
+        assert expected == compiled.bind(key=key, value=value)
+
+    def test_bind_set_limit_skip(self):
+        compiled = PayloadBuilder().SET(last_object=Param("last_object"), ts="now()")\
+            .WHERE(["id", "=", Param("id")]).LIMIT(Param("limit")).SKIP(Param("skip")).compile()
+        assert {"values": {"last_object": 10, "ts": "now()"}, "where": {"column": "id", "condition": "=", "value": 1},
+                "limit": 20, "skip": 40} == json.loads(compiled.bind(last_object=10, id=1, limit=20, skip=40))
+
+    def test_compiled_is_reused(self):
+        compiled = PayloadBuilder().WHERE(["key", "=", Param("key")]).compile()
+        assert "READINGS" == json.loads(compiled.bind(key="READINGS"))["where"]["value"]
+        assert "PURGED" == json.loads(compiled.bind(key="PURGED"))["where"]["value"]
+
+    @pytest.mark.parametrize("values, message", [
+        ({}, "Payload parameters missing: ['key'], unknown: []"),
+        ({"key": 1, "other": 2}, "Payload parameters missing: [], unknown: ['other']"),
+        ({"other": 2}, "Payload parameters missing: ['key'], unknown: ['other']")
+    ])
+    def test_bind_bad_values(self, values, message):
+        compiled = PayloadBuilder().WHERE(["key", "=", Param("key")]).compile()
+        with pytest.raises(ValueError) as excinfo:
+            compiled.bind(**values)
+        assert message == str(excinfo.value)
+
+    def test_bad_param_name(self):
+        with pytest.raises(ValueError) as excinfo:
+            Param("a key")
+        assert "Parameter name must be made of letters, digits and underscores only" == str(excinfo.value)
+
+    def test_param_not_serializable_by_payload(self):
+        with pytest.raises(TypeError):
+            PayloadBuilder().WHERE(["key", "=", Param("key")]).payload()
@@ -87,6 +87,15 @@ class TestStorageClientExceptions:
             assert 503 == ex.code
             assert "Storage service is unavailable" == ex.message
 
+    def test_CircuitBreakerOpen(self):
+        try:
+            raise CircuitBreakerOpen(retry_after=1.5)
+        except StorageServiceUnavailable as ex:
+            assert ex.__class__ is CircuitBreakerOpen
+            assert 503 == ex.code
+            assert "Storage service is unavailable, circuit breaker is open" == ex.message
+            assert 1.5 == ex.retry_after
+
     def test_InvalidServiceInstance(self):
         with pytest.raises(Exception) as excinfo:
             raise InvalidServiceInstance()
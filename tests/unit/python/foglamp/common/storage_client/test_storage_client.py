@@ -13,12 +13,19 @@ import asyncio
 from aiohttp import web
 from aiohttp.test_utils import unused_port
 from functools import partial
+import os
+import socket
+import tempfile
 
 from foglamp.common.service_record import ServiceRecord
 from foglamp.common.storage_client.storage_client import _LOGGER, StorageClient, ReadingsStorageClient, \
                                                          StorageClientAsync, ReadingsStorageClientAsync
 
 from foglamp.common.storage_client.exceptions import *
+from foglamp.common.storage_client import streaming
+from foglamp.common.storage_client.cache import StorageCache
+from foglamp.common.storage_client.connection_pool import HTTPConnectionPool
+from foglamp.common.storage_client.utils import Utils
 
 __copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
 __license__ = "Apache 2.0"
@@ -50,10 +57,13 @@ class FakeFoglampStorageSrvr:
         self.handler = None
         self.server = None
 
-    async def start(self):
+    async def start(self, socket_path=None):
 
         self.handler = self.app.make_handler()
-        self.server = await self.loop.create_server(self.handler, HOST, PORT, ssl=None)
+        if socket_path:
+            self.server = await self.loop.create_unix_server(self.handler, socket_path)
+        else:
+            self.server = await self.loop.create_server(self.handler, HOST, PORT, ssl=None)
 
     async def stop(self):
         self.server.close()
@@ -65,6 +75,11 @@ class FakeFoglampStorageSrvr:
     async def query_with_payload_insert_into_or_update_tbl_handler(self, request):
         payload = await request.json()
 
+        if isinstance(payload, list):
+            return web.json_response({
+                "called": payload
+            })
+
         if payload.get("bad_request", None):
             return web.HTTPBadRequest(reason="bad data", text='{"key": "value"}')
 
@@ -137,6 +152,9 @@ class FakeFoglampStorageSrvr:
     async def readings_query(self, request):
         payload = await request.json()
 
+        if payload.get("rows", None):
+            return web.json_response({"count": len(payload["rows"]), "rows": payload["rows"]})
+
         if payload.get("bad_request", None):
             return web.HTTPBadRequest(reason="bad data", text='{"key": "value"}')
 
@@ -186,11 +204,20 @@ class TestStorageClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = 1000
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClient(1, 2, mockServiceRecord)
         assert "local:1000" == sc.base_url
         assert "local:2000" == sc.management_api_url
 
+    def test_init_with_socket(self):
+        svc = {"id": 1, "name": "foo", "address": "local", "service_port": 3000, "management_port": 2000,
+               "type": "Storage", "protocol": "http", "socket": "/tmp/storage.sock"}
+        with patch.object(StorageClient, '_get_storage_service', return_value=svc):
+            sc = StorageClient(1, 2)
+        assert "/tmp/storage.sock" == sc.service._socket
+        assert "/tmp/storage.sock" == HTTPConnectionPool.get("local:3000").socket_path
+
     def test_init_with_invalid_service_record(self):
         with pytest.raises(Exception) as excinfo:
             with patch.object(_LOGGER, "warning") as log:
@@ -204,6 +231,7 @@ class TestStorageClient:
         mockServiceRecord._type = "xStorage"
         mockServiceRecord._port = 1000
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         with pytest.raises(Exception) as excinfo:
             with patch.object(_LOGGER, "warning") as log:
@@ -223,6 +251,7 @@ class TestStorageClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClient(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == sc.base_url
@@ -244,13 +273,18 @@ class TestStorageClient:
         assert "Data to insert is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            args = "aTable", {"k": "v"}
+            args = "aTable", "blah", True
             futures = [event_loop.run_in_executor(None, sc.insert_into_tbl, *args)]
             for response in await asyncio.gather(*futures):
                 pass
         assert excinfo.type is TypeError
         assert "Provided data to insert must be a valid JSON" in str(excinfo.value)
 
+        args = "aTable", {"k": "v"}
+        futures = [event_loop.run_in_executor(None, sc.insert_into_tbl, *args)]
+        for response in await asyncio.gather(*futures):
+            assert {"k": "v"} == response["called"]
+
         args = "aTable", json.dumps({"k": "v"})
         futures = [event_loop.run_in_executor(None, sc.insert_into_tbl, *args)]
         for response in await asyncio.gather(*futures):
@@ -292,6 +326,7 @@ class TestStorageClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClient(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == sc.base_url
@@ -313,13 +348,18 @@ class TestStorageClient:
         assert "Data to update is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            args = "aTable", {"k": "v"}
+            args = "aTable", "blah", True
             futures = [event_loop.run_in_executor(None, sc.update_tbl, *args)]
             for response in await asyncio.gather(*futures):
                 pass
         assert excinfo.type is TypeError
         assert "Provided data to update must be a valid JSON" in str(excinfo.value)
 
+        args = "aTable", {"k": "v"}
+        futures = [event_loop.run_in_executor(None, sc.update_tbl, *args)]
+        for response in await asyncio.gather(*futures):
+            assert {"k": "v"} == response["called"]
+
         args = "aTable", json.dumps({"k": "v"})
         futures = [event_loop.run_in_executor(None, sc.update_tbl, *args)]
         for response in await asyncio.gather(*futures):
@@ -362,6 +402,7 @@ class TestStorageClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClient(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == sc.base_url
@@ -379,13 +420,18 @@ class TestStorageClient:
             assert 1 == response["called"]
 
         with pytest.raises(Exception) as excinfo:
-            args = "aTable", {"condition": "v"}
+            args = "aTable", "blah", True
             futures = [event_loop.run_in_executor(None, sc.delete_from_tbl, *args)]
             for response in await asyncio.gather(*futures):
                 pass
         assert excinfo.type is TypeError
         assert "condition payload must be a valid JSON" in str(excinfo.value)
 
+        args = "aTable", {"condition": "v"}
+        futures = [event_loop.run_in_executor(None, sc.delete_from_tbl, *args)]
+        for response in await asyncio.gather(*futures):
+            assert {"condition": "v"} == response["called"]
+
         args = "aTable", json.dumps({"condition": "v"})
         futures = [event_loop.run_in_executor(None, sc.delete_from_tbl, *args)]
         for response in await asyncio.gather(*futures):
@@ -428,6 +474,7 @@ class TestStorageClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClient(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == sc.base_url
@@ -485,6 +532,7 @@ class TestStorageClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClient(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == sc.base_url
@@ -506,13 +554,18 @@ class TestStorageClient:
         assert "Query payload is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            args = "aTable", {"k": "v"}
+            args = "aTable", "blah", True
             futures = [event_loop.run_in_executor(None, sc.query_tbl_with_payload, *args)]
             for response in await asyncio.gather(*futures):
                 pass
         assert excinfo.type is TypeError
         assert "Query payload must be a valid JSON" in str(excinfo.value)
 
+        args = "aTable", {"k": "v"}
+        futures = [event_loop.run_in_executor(None, sc.query_tbl_with_payload, *args)]
+        for response in await asyncio.gather(*futures):
+            assert {"k": "v"} == response["called"]
+
         args = "aTable", json.dumps({"k": "v"})
         futures = [event_loop.run_in_executor(None, sc.query_tbl_with_payload, *args)]
         for response in await asyncio.gather(*futures):
@@ -555,6 +608,7 @@ class TestReadingsStorageClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         rsc = ReadingsStorageClient(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == rsc.base_url
@@ -571,6 +625,7 @@ class TestReadingsStorageClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         rsc = ReadingsStorageClient(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == rsc.base_url
@@ -583,12 +638,16 @@ class TestReadingsStorageClient:
         assert "Readings payload is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            futures = [event_loop.run_in_executor(None, rsc.append, "blah")]
+            futures = [event_loop.run_in_executor(None, rsc.append, "blah", True)]
             for response in await asyncio.gather(*futures):
                 pass
         assert excinfo.type is TypeError
         assert "Readings payload must be a valid JSON" in str(excinfo.value)
 
+        futures = [event_loop.run_in_executor(None, rsc.append, {"readings": []})]
+        for response in await asyncio.gather(*futures):
+            assert {"readings": []} == response["appended"]
+
         with pytest.raises(Exception) as excinfo:
             with patch.object(_LOGGER, "error") as log_e:
                 readings_bad_payload = json.dumps({"Xreadings": []})
@@ -629,6 +688,7 @@ class TestReadingsStorageClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         rsc = ReadingsStorageClient(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == rsc.base_url
@@ -695,6 +755,7 @@ class TestReadingsStorageClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         rsc = ReadingsStorageClient(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == rsc.base_url
@@ -707,12 +768,16 @@ class TestReadingsStorageClient:
         assert "Query payload is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            futures = [event_loop.run_in_executor(None, rsc.query, "blah")]
+            futures = [event_loop.run_in_executor(None, rsc.query, "blah", True)]
             for response in await asyncio.gather(*futures):
                 pass
         assert excinfo.type is TypeError
         assert "Query payload must be a valid JSON" in str(excinfo.value)
 
+        futures = [event_loop.run_in_executor(None, rsc.query, {"k": "v"})]
+        for response in await asyncio.gather(*futures):
+            assert {"k": "v"} == response["called"]
+
         futures = [event_loop.run_in_executor(None, rsc.query, json.dumps({"k": "v"}))]
         for response in await asyncio.gather(*futures):
             assert {"k": "v"} == response["called"]
@@ -737,6 +802,45 @@ class TestReadingsStorageClient:
 
         await fake_storage_srvr.stop()
 
+    @pytest.mark.parametrize("limit, rows, expected_next", [
+        (2, [{"id": 3, "user_ts": "2018-03-08 15:00:00.1+00"}, {"id": 4, "user_ts": "2018-03-08 15:00:00.2+00"}],
+         ["2018-03-08 15:00:00.2+00", 4]),
+        (3, [{"id": 3, "user_ts": "2018-03-08 15:00:00.1+00"}], None),
+        (3, [], None)
+    ])
+    def test_fetch_page(self, limit, rows, expected_next):
+        with patch.object(ReadingsStorageClient, 'query', return_value={"count": len(rows), "rows": rows}) \
+                as patch_query:
+            page = ReadingsStorageClient.fetch_page("fogbench/humidity", columns=["reading"], limit=limit)
+        assert rows == page["rows"]
+        assert expected_next == (None if page["next"] is None else list(Utils.decode_cursor(page["next"])))
+        payload = json.loads(patch_query.call_args[0][0])
+        assert ["reading", "user_ts", "id"] == payload["return"]
+        assert {"column": "asset_code", "condition": "=", "value": "fogbench/humidity"} == payload["where"]
+        assert limit == payload["limit"]
+
+    def test_fetch_page_after_cursor(self):
+        with patch.object(ReadingsStorageClient, 'query', return_value={"count": 0, "rows": []}) as patch_query:
+            ReadingsStorageClient.fetch_page(cursor=Utils.encode_cursor(("2018-03-08 15:00:00.2+00", 4)))
+        payload = json.loads(patch_query.call_args[0][0])
+        assert {"column": "user_ts", "condition": ">", "value": "2018-03-08 15:00:00.2+00",
+                "or": {"column": "user_ts", "condition": "=", "value": "2018-03-08 15:00:00.2+00",
+                       "and": {"column": "id", "condition": ">", "value": 4}}} == payload["where"]
+        assert "return" not in payload
+        assert 100 == payload["limit"]
+
+    @pytest.mark.parametrize("kwargs, message", [
+        ({"limit": 0}, "limit must be a positive integer"),
+        ({"limit": "ten"}, "limit must be a positive integer"),
+        ({"cursor": "bad"}, "Invalid cursor bad")
+    ])
+    def test_fetch_page_bad_args(self, kwargs, message):
+        with patch.object(ReadingsStorageClient, 'query') as patch_query:
+            with pytest.raises(ValueError) as excinfo:
+                ReadingsStorageClient.fetch_page(**kwargs)
+        assert message == str(excinfo.value)
+        assert not patch_query.called
+
     @pytest.mark.asyncio
     async def test_purge(self, event_loop):
         # 'PUT', url=put_url, /storage/reading/purge?age=&sent=&flags
@@ -749,6 +853,7 @@ class TestReadingsStorageClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         rsc = ReadingsStorageClient(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == rsc.base_url
@@ -894,6 +999,7 @@ class TestStorageClientAsync:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = 1000
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClientAsync(1, 2, mockServiceRecord)
         assert "local:1000" == sc.base_url
@@ -912,6 +1018,7 @@ class TestStorageClientAsync:
         mockServiceRecord._type = "xStorage"
         mockServiceRecord._port = 1000
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         with pytest.raises(Exception) as excinfo:
             with patch.object(_LOGGER, "warning") as log:
@@ -919,6 +1026,51 @@ class TestStorageClientAsync:
         log.assert_called_once_with("Storage should be a valid *Storage* micro-service instance")
         assert excinfo.type is InvalidServiceInstance
 
+    def test_init_with_pool_settings(self):
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = "local"
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = 1000
+        mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
+
+        sc = StorageClientAsync(1, 2, mockServiceRecord, pool_size=4, keepalive_timeout=5)
+        assert 4 == sc._pool_size
+        assert 5 == sc._keepalive_timeout
+        assert sc._session is None
+
+    @pytest.mark.asyncio
+    async def test_session_is_shared_and_closed(self, event_loop):
+        fake_storage_srvr = FakeFoglampStorageSrvr(loop=event_loop)
+        await fake_storage_srvr.start()
+
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = HOST
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = PORT
+        mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
+
+        sc = StorageClientAsync(1, 2, mockServiceRecord, pool_size=2)
+        await sc.query_tbl("aTable")
+        session = sc._session
+        assert session is not None
+        await sc.query_tbl_with_payload("aTable", json.dumps({"k": "v"}))
+        assert session is sc._session
+        assert 2 == session.connector.limit
+
+        await sc.close()
+        assert session.closed
+        assert sc._session is None
+
+        # a closed client transparently opens a new session
+        response = await sc.query_tbl("aTable")
+        assert 1 == response["called"]
+        assert sc._session is not session
+        await sc.close()
+
+        await fake_storage_srvr.stop()
+
     @pytest.mark.asyncio
     async def test_insert_into_tbl(self, event_loop):
         # 'POST', '/storage/table/{tbl_name}', data
@@ -931,6 +1083,7 @@ class TestStorageClientAsync:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClientAsync(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == sc.base_url
@@ -948,11 +1101,15 @@ class TestStorageClientAsync:
         assert "Data to insert is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            args = "aTable", {"k": "v"}
+            args = "aTable", "blah", True
             await sc.insert_into_tbl(*args)
         assert excinfo.type is TypeError
         assert "Provided data to insert must be a valid JSON" in str(excinfo.value)
 
+        args = "aTable", {"k": "v"}
+        response = await sc.insert_into_tbl(*args)
+        assert {"k": "v"} == response["called"]
+
         args = "aTable", json.dumps({"k": "v"})
         response = await sc.insert_into_tbl(*args)
         assert {"k": "v"} == response["called"]
@@ -989,6 +1146,7 @@ class TestStorageClientAsync:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClientAsync(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == sc.base_url
@@ -1006,11 +1164,15 @@ class TestStorageClientAsync:
         assert "Data to update is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            args = "aTable", {"k": "v"}
+            args = "aTable", "blah", True
             await sc.update_tbl(*args)
         assert excinfo.type is TypeError
         assert "Provided data to update must be a valid JSON" in str(excinfo.value)
 
+        args = "aTable", {"k": "v"}
+        response = await sc.update_tbl(*args)
+        assert {"k": "v"} == response["called"]
+
         args = "aTable", json.dumps({"k": "v"})
         response = await sc.update_tbl(*args)
         assert {"k": "v"} == response["called"]
@@ -1036,6 +1198,134 @@ class TestStorageClientAsync:
 
         await fake_storage_srvr.stop()
 
+    @pytest.mark.asyncio
+    async def test_insert_many_update_many(self, event_loop):
+        # 'POST' / 'PUT', '/storage/table/{tbl_name}', JSON array of the payloads
+
+        fake_storage_srvr = FakeFoglampStorageSrvr(loop=event_loop)
+        await fake_storage_srvr.start()
+
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = HOST
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = PORT
+        mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
+
+        sc = StorageClientAsync(1, 2, mockServiceRecord)
+
+        with pytest.raises(ValueError) as excinfo:
+            await sc.insert_many("aTable", [])
+        assert "Rows to insert are missing" == str(excinfo.value)
+
+        with pytest.raises(ValueError) as excinfo:
+            await sc.update_many("aTable", [])
+        assert "Updates are missing" == str(excinfo.value)
+
+        response = await sc.insert_many("aTable", [{"k": "v1"}, json.dumps({"k": "v2"}), b'{"k": "v3"}'])
+        assert [{"k": "v1"}, {"k": "v2"}, {"k": "v3"}] == response["called"]
+
+        response = await sc.update_many("aTable", '[{"k": "v1"}, {"k": "v2"}]')
+        assert [{"k": "v1"}, {"k": "v2"}] == response["called"]
+
+        with patch.object(sc, "insert_into_tbl", wraps=sc.insert_into_tbl) as patch_insert:
+            with patch.object(sc, "update_tbl", wraps=sc.update_tbl) as patch_update:
+                responses = await sc.execute_batch([("aTable", "insert", {"k": 1}), ("aTable", "insert", {"k": 2}),
+                                                    ("aTable", "update", {"k": 3}), ("bTable", "update", {"k": 4}),
+                                                    ("aTable", "insert", {"k": 5})])
+        assert [[{"k": 1}, {"k": 2}], [{"k": 3}], [{"k": 4}], [{"k": 5}]] == [r["called"] for r in responses]
+        assert 2 == patch_insert.call_count
+        assert 2 == patch_update.call_count
+
+        with pytest.raises(ValueError) as excinfo:
+            await sc.execute_batch([("aTable", "insert", {"k": 1}), ("aTable", "delete", {"k": 2})])
+        assert "Batch operation must be one of insert, update" == str(excinfo.value)
+
+        await sc.close()
+        await fake_storage_srvr.stop()
+
+    @pytest.mark.asyncio
+    async def test_cached_table(self, event_loop):
+        fake_storage_srvr = FakeFoglampStorageSrvr(loop=event_loop)
+        await fake_storage_srvr.start()
+
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = HOST
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = PORT
+        mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
+
+        sc = StorageClientAsync(1, 2, mockServiceRecord)
+        storage_cache = StorageCache.get(sc.base_url)
+        storage_cache.configure("aTable", ttl=60)
+        try:
+            response = await sc.query_tbl("aTable")
+            response["called"] = 2
+            assert {"called": 1} == await sc.query_tbl("aTable")
+            assert {"called": 'foo passed'} == await sc.query_tbl("aTable", 'foo=v1')
+            assert {"called": {"k": "v"}} == await sc.query_tbl_with_payload("aTable", {"k": "v"})
+            assert {"called": {"k": "v"}} == await sc.query_tbl_with_payload("aTable", {"k": "v"})
+            assert (2, 3) == (storage_cache.stats()["aTable"]["hits"], storage_cache.stats()["aTable"]["misses"])
+
+            await sc.update_tbl("aTable", {"k": "v"})
+            assert 0 == storage_cache.stats()["aTable"]["entries"]
+            await sc.query_tbl("aTable")
+            assert 4 == storage_cache.stats()["aTable"]["misses"]
+
+            await sc.query_tbl("aTable")
+            with pytest.raises(Exception):
+                await sc.insert_into_tbl("aTable", {"bad_request": "v"})
+            assert 0 == storage_cache.stats()["aTable"]["entries"]
+        finally:
+            storage_cache.disable("aTable")
+            await sc.close()
+            await fake_storage_srvr.stop()
+
+    @pytest.mark.asyncio
+    async def test_single_flight(self, event_loop):
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = HOST
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = PORT
+        mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
+        sc = StorageClientAsync(1, 2, mockServiceRecord)
+
+        requests_sent = []
+
+        async def request():
+            requests_sent.append(1)
+            await asyncio.sleep(0.01)
+            return {"rows": [{"key": "READINGS"}]}
+
+        # identical concurrent reads share one request, each caller gets its own copy
+        results = await asyncio.gather(*[sc._single_flight("aTable", "k", request) for _ in range(5)])
+        assert 1 == len(requests_sent)
+        assert all({"rows": [{"key": "READINGS"}]} == r for r in results)
+        assert 5 == len(set(id(r) for r in results))
+        assert not sc._in_flight
+
+        # different reads are not shared
+        await asyncio.gather(sc._single_flight("aTable", "k1", request), sc._single_flight("aTable", "k2", request))
+        assert 3 == len(requests_sent)
+
+        # a read following a write to the table does not join the read sent before the write
+        before_write = asyncio.ensure_future(sc._single_flight("aTable", "k", request))
+        await asyncio.sleep(0)
+        sc._invalidate("aTable")
+        await asyncio.gather(before_write, sc._single_flight("aTable", "k", request))
+        assert 5 == len(requests_sent)
+
+        # the shared request goes on when the caller that sent it is cancelled
+        first = asyncio.ensure_future(sc._single_flight("aTable", "k", request))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(sc._single_flight("aTable", "k", request))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert {"rows": [{"key": "READINGS"}]} == await second
+        assert 6 == len(requests_sent)
+
     @pytest.mark.asyncio
     async def test_delete_from_tbl(self, event_loop):
         # 'DELETE', '/storage/table/{tbl_name}', condition (optional)
@@ -1048,6 +1338,7 @@ class TestStorageClientAsync:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClientAsync(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == sc.base_url
@@ -1062,11 +1353,15 @@ class TestStorageClientAsync:
         assert 1 == response["called"]
 
         with pytest.raises(Exception) as excinfo:
-            args = "aTable", {"condition": "v"}
+            args = "aTable", "blah", True
             await sc.delete_from_tbl(*args)
         assert excinfo.type is TypeError
         assert "condition payload must be a valid JSON" in str(excinfo.value)
 
+        args = "aTable", {"condition": "v"}
+        response = await sc.delete_from_tbl(*args)
+        assert {"condition": "v"} == response["called"]
+
         args = "aTable", json.dumps({"condition": "v"})
         response = await sc.delete_from_tbl(*args)
         assert {"condition": "v"} == response["called"]
@@ -1104,6 +1399,7 @@ class TestStorageClientAsync:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClientAsync(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == sc.base_url
@@ -1153,6 +1449,7 @@ class TestStorageClientAsync:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         sc = StorageClientAsync(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == sc.base_url
@@ -1170,11 +1467,15 @@ class TestStorageClientAsync:
         assert "Query payload is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            args = "aTable", {"k": "v"}
+            args = "aTable", "blah", True
             await sc.query_tbl_with_payload(*args)
         assert excinfo.type is TypeError
         assert "Query payload must be a valid JSON" in str(excinfo.value)
 
+        args = "aTable", {"k": "v"}
+        response = await sc.query_tbl_with_payload(*args)
+        assert {"k": "v"} == response["called"]
+
         args = "aTable", json.dumps({"k": "v"})
         response = await sc.query_tbl_with_payload(*args)
         assert {"k": "v"} == response["called"]
@@ -1201,6 +1502,85 @@ class TestStorageClientAsync:
 
         await fake_storage_srvr.stop()
 
+    @pytest.mark.asyncio
+    async def test_unix_socket_transport(self, event_loop):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            socket_path = os.path.join(tmp_dir, 'storage.sock')
+            fake_storage_srvr = FakeFoglampStorageSrvr(loop=event_loop)
+            await fake_storage_srvr.start(socket_path)
+
+            # nothing listens on the TCP port: the requests can only go through the unix domain socket
+            mockServiceRecord = MagicMock(ServiceRecord)
+            mockServiceRecord._address = HOST
+            mockServiceRecord._type = "Storage"
+            mockServiceRecord._port = 1
+            mockServiceRecord._management_port = 2000
+            mockServiceRecord._socket = socket_path
+
+            sc = StorageClientAsync(1, 2, mockServiceRecord)
+            response = await sc.query_tbl("aTable", None)
+            assert 1 == response["called"]
+            assert isinstance(sc._get_session().connector, aiohttp.UnixConnector)
+            await sc.close()
+
+            await fake_storage_srvr.stop()
+
+    @pytest.mark.asyncio
+    async def test_unix_socket_missing_falls_back_to_tcp(self, event_loop):
+        fake_storage_srvr = FakeFoglampStorageSrvr(loop=event_loop)
+        await fake_storage_srvr.start()
+
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = HOST
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = PORT
+        mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = '/nonexistent/storage.sock'
+
+        sc = StorageClientAsync(1, 2, mockServiceRecord)
+        with patch.object(_LOGGER, "warning") as log_w:
+            response = await sc.query_tbl("aTable", None)
+        assert 1 == response["called"]
+        log_w.assert_called_once_with("Storage service socket %s does not exist, falling back to TCP on %s",
+                                      '/nonexistent/storage.sock', "{}:{}".format(HOST, PORT))
+        assert isinstance(sc._get_session().connector, aiohttp.TCPConnector)
+        await sc.close()
+
+        await fake_storage_srvr.stop()
+
+    @pytest.mark.asyncio
+    async def test_unix_socket_stale_falls_back_to_tcp(self, event_loop):
+        fake_storage_srvr = FakeFoglampStorageSrvr(loop=event_loop)
+        await fake_storage_srvr.start()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # a socket file nothing listens on, as left behind by a storage service that is not running
+            socket_path = os.path.join(tmp_dir, 'storage.sock')
+            stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale.bind(socket_path)
+            stale.close()
+
+            mockServiceRecord = MagicMock(ServiceRecord)
+            mockServiceRecord._address = HOST
+            mockServiceRecord._type = "Storage"
+            mockServiceRecord._port = PORT
+            mockServiceRecord._management_port = 2000
+            mockServiceRecord._socket = socket_path
+
+            sc = StorageClientAsync(1, 2, mockServiceRecord)
+            with patch.object(_LOGGER, "warning") as log_w:
+                response = await sc.query_tbl("aTable", None)
+                assert 1 == response["called"]
+                response = await sc.query_tbl("aTable", None)
+                assert 1 == response["called"]
+            assert 1 == log_w.call_count
+            args, kwargs = log_w.call_args
+            assert "Unable to connect to the storage service over %s, %s; falling back to TCP on %s" == args[0]
+            assert (socket_path, "{}:{}".format(HOST, PORT)) == (args[1], args[3])
+            await sc.close()
+
+        await fake_storage_srvr.stop()
+
 
 @pytest.allure.feature("unit")
 @pytest.allure.story("common", "storage_client")
@@ -1212,6 +1592,7 @@ class TestReadingsStorageAsyncClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         rsc = ReadingsStorageClientAsync(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == rsc.base_url
@@ -1228,6 +1609,7 @@ class TestReadingsStorageAsyncClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         rsc = ReadingsStorageClientAsync(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == rsc.base_url
@@ -1238,10 +1620,13 @@ class TestReadingsStorageAsyncClient:
         assert "Readings payload is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            await rsc.append("blah")
+            await rsc.append("blah", validate=True)
         assert excinfo.type is TypeError
         assert "Readings payload must be a valid JSON" in str(excinfo.value)
 
+        response = await rsc.append({"readings": []})
+        assert {"readings": []} == response["appended"]
+
         with pytest.raises(Exception) as excinfo:
             with patch.object(_LOGGER, "error") as log_e:
                 readings_bad_payload = json.dumps({"Xreadings": []})
@@ -1277,6 +1662,7 @@ class TestReadingsStorageAsyncClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         rsc = ReadingsStorageClientAsync(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == rsc.base_url
@@ -1332,6 +1718,7 @@ class TestReadingsStorageAsyncClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         rsc = ReadingsStorageClientAsync(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == rsc.base_url
@@ -1342,10 +1729,13 @@ class TestReadingsStorageAsyncClient:
         assert "Query payload is missing" in str(excinfo.value)
 
         with pytest.raises(Exception) as excinfo:
-            await rsc.query("blah")
+            await rsc.query("blah", validate=True)
         assert excinfo.type is TypeError
         assert "Query payload must be a valid JSON" in str(excinfo.value)
 
+        response = await rsc.query({"k": "v"})
+        assert {"k": "v"} == response["called"]
+
         response = await rsc.query(json.dumps({"k": "v"}))
         assert {"k": "v"} == response["called"]
 
@@ -1365,6 +1755,106 @@ class TestReadingsStorageAsyncClient:
 
         await fake_storage_srvr.stop()
 
+    @pytest.mark.asyncio
+    async def test_fetch_iter(self, event_loop):
+        fake_storage_srvr = FakeFoglampStorageSrvr(loop=event_loop)
+        await fake_storage_srvr.start()
+
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = HOST
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = PORT
+        mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
+
+        rsc = ReadingsStorageClientAsync(1, 2, mockServiceRecord)
+
+        with pytest.raises(Exception) as excinfo:
+            rsc.fetch_iter(None, 3)
+        assert excinfo.type is ValueError
+        assert "first reading id to retrieve the readings block is required" in str(excinfo.value)
+
+        with pytest.raises(Exception) as excinfo:
+            rsc.fetch_iter(2, None)
+        assert excinfo.type is ValueError
+        assert "count is required to retrieve the readings block" in str(excinfo.value)
+
+        with pytest.raises(Exception) as excinfo:
+            with patch.object(streaming._LOGGER, "error") as log_e:
+                async for row in rsc.fetch_iter("bad_data", 3):
+                    pass
+            log_e.assert_called_once_with('GET url: %s, Error code: %d, reason: %s, details: %s',
+                                          'http://{}:{}/storage/reading?id=bad_data&count=3'.format(HOST, PORT),
+                                          400, 'bad data', {"key": "value"})
+        assert excinfo.type is aiohttp.client_exceptions.ContentTypeError
+
+        async with rsc.fetch_iter(2, 3) as rows:
+            async for row in rows:
+                assert False, "no rows expected"
+            assert {'readings': [], 'start': '2', 'count': '3'} == rows.members
+
+        await rsc.close()
+        await fake_storage_srvr.stop()
+
+    @pytest.mark.asyncio
+    async def test_query_iter(self, event_loop):
+        fake_storage_srvr = FakeFoglampStorageSrvr(loop=event_loop)
+        await fake_storage_srvr.start()
+
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = HOST
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = PORT
+        mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
+
+        rsc = ReadingsStorageClientAsync(1, 2, mockServiceRecord)
+
+        with pytest.raises(Exception) as excinfo:
+            rsc.query_iter(None)
+        assert excinfo.type is ValueError
+        assert "Query payload is missing" in str(excinfo.value)
+
+        with pytest.raises(Exception) as excinfo:
+            rsc.query_iter("blah", validate=True)
+        assert excinfo.type is TypeError
+        assert "Query payload must be a valid JSON" in str(excinfo.value)
+
+        rows = [{"id": i, "reading": {"rate": i / 10}} for i in range(1000)]
+        received = []
+        async with rsc.query_iter({"rows": rows}) as row_iterator:
+            async for row in row_iterator:
+                received.append(row)
+            assert {"count": 1000} == row_iterator.members
+        assert rows == received
+
+        await rsc.close()
+        await fake_storage_srvr.stop()
+
+    @pytest.mark.asyncio
+    async def test_fetch_page(self):
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = HOST
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = PORT
+        mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
+        rsc = ReadingsStorageClientAsync(1, 2, mockServiceRecord)
+
+        async def query(payload):
+            return {"count": 1, "rows": [{"id": 9, "asset_code": "A"}]}
+
+        with patch.object(rsc, 'query', side_effect=query) as patch_query:
+            page = await rsc.fetch_page(["A", "B"], cursor=(8,), limit=1, keys=("id",))
+        assert [{"id": 9, "asset_code": "A"}] == page["rows"]
+        assert (9,) == Utils.decode_cursor(page["next"])
+        payload = json.loads(patch_query.call_args[0][0])
+        assert {"column": "asset_code", "condition": "=", "value": "A",
+                "and": {"column": "id", "condition": ">", "value": 8,
+                        "or": {"column": "asset_code", "condition": "=", "value": "B",
+                               "and": {"column": "id", "condition": ">", "value": 8}}}} == payload["where"]
+        assert {"column": "id", "direction": "asc"} == payload["sort"]
+
     @pytest.mark.asyncio
     async def test_purge(self, event_loop):
         # 'PUT', url=put_url, /storage/reading/purge?age=&sent=&flags
@@ -1377,6 +1867,7 @@ class TestReadingsStorageAsyncClient:
         mockServiceRecord._type = "Storage"
         mockServiceRecord._port = PORT
         mockServiceRecord._management_port = 2000
+        mockServiceRecord._socket = None
 
         rsc = ReadingsStorageClientAsync(1, 2, mockServiceRecord)
         assert "{}:{}".format(HOST, PORT) == rsc.base_url
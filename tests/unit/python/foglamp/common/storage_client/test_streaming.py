@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test foglamp/common/storage_client/streaming.py """
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from foglamp.common.storage_client.exceptions import StorageServerError
+from foglamp.common.storage_client.streaming import _LOGGER, RowsParser, AsyncRowIterator
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+ROWS = [{"id": 1, "asset_code": "fogbench/luxometer", "reading": {"lux": 49.2}, "user_ts": "2018-04-16 16:32:55"},
+        {"id": 2, "asset_code": "fogbench/température", "reading": {"temp": [-12, 1e3]}, "user_ts": "2018-04-16"},
+        {"id": 1234567, "asset_code": "a]}\"{[,", "reading": {}, "user_ts": None}]
+
+DOCUMENT = json.dumps({"count": 3, "rows": ROWS}, ensure_ascii=False).encode()
+
+
+def _parse(parser, chunks):
+    rows = []
+    for chunk in chunks:
+        rows.extend(parser.feed(chunk))
+    parser.close()
+    return rows
+
+
+class FakeContent:
+    def __init__(self, data, chunk_size):
+        self._chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+    async def readany(self):
+        return self._chunks.pop(0) if self._chunks else b''
+
+
+class FakeResponse:
+    def __init__(self, data, status=200, chunk_size=16):
+        self.status = status
+        self.reason = 'OK' if status == 200 else 'bad data'
+        self.content = FakeContent(data, chunk_size)
+        self.release = MagicMock()
+        self.close = MagicMock()
+
+    async def json(self, loads=json.loads):
+        return loads(b''.join(self.content._chunks).decode())
+
+
+async def _request(resp):
+    return resp
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "storage_client")
+class TestRowsParser:
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, len(DOCUMENT)])
+    def test_feed_in_chunks(self, chunk_size):
+        parser = RowsParser()
+        chunks = [DOCUMENT[i:i + chunk_size] for i in range(0, len(DOCUMENT), chunk_size)]
+        assert ROWS == _parse(parser, chunks)
+        assert {"count": 3} == parser.members
+        assert parser.done
+
+    def test_rows_as_soon_as_complete(self):
+        parser = RowsParser()
+        first = json.dumps(ROWS[0])
+        assert [] == parser.feed('{"rows": [' + first[:-1])
+        assert [ROWS[0]] == parser.feed(first[-1] + ',')
+
+    @pytest.mark.parametrize("document, rows, members", [
+        ('{"rows": []}', [], {}),
+        (' { "rows" : [ ] , "count" : 0 } ', [], {"count": 0}),
+        ('{"rows": [{"a": 1}, {"b": 2}], "count": 2, "extra": {"k": [1, 2]}}', [{"a": 1}, {"b": 2}],
+         {"count": 2, "extra": {"k": [1, 2]}}),
+        ('{"message": "error", "retryable": false}', [], {"message": "error", "retryable": False}),
+        ('{"rows": null}', [], {"rows": None}),
+        ('{}', [], {})
+    ])
+    def test_documents(self, document, rows, members):
+        parser = RowsParser()
+        assert rows == _parse(parser, [document])
+        assert members == parser.members
+
+    def test_number_split_across_chunks(self):
+        parser = RowsParser()
+        assert [] == _parse(parser, ['{"count": 12', '34, "rows": []}'])
+        assert {"count": 1234} == parser.members
+
+    @pytest.mark.parametrize("document", ['[]', '{"rows": {]}', '{"rows" [] }', '{"rows": [] ]'])
+    def test_invalid_document(self, document):
+        with pytest.raises(ValueError) as excinfo:
+            _parse(RowsParser(), [document])
+        assert excinfo.type is ValueError
+
+    @pytest.mark.parametrize("document", ['', '{"rows": [{"a": 1}', '{"rows": [], "count": 1', '{"rows": [}]}'])
+    def test_incomplete_document(self, document):
+        with pytest.raises(ValueError) as excinfo:
+            _parse(RowsParser(), [document])
+        assert "Incomplete rows document" == str(excinfo.value)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "storage_client")
+class TestAsyncRowIterator:
+
+    @pytest.mark.asyncio
+    async def test_iterate(self):
+        resp = FakeResponse(DOCUMENT)
+        rows = []
+        async with AsyncRowIterator(_request(resp), '/storage/reading?id=1&count=3') as row_iterator:
+            async for row in row_iterator:
+                rows.append(row)
+            assert {"count": 3} == row_iterator.members
+        assert ROWS == rows
+        resp.release.assert_called_once_with()
+        assert 0 == resp.close.call_count
+
+    @pytest.mark.asyncio
+    async def test_break_closes_connection(self):
+        resp = FakeResponse(DOCUMENT)
+        async with AsyncRowIterator(_request(resp), '/storage/reading?id=1&count=3') as row_iterator:
+            async for row in row_iterator:
+                assert ROWS[0] == row
+                break
+        resp.close.assert_called_once_with()
+        assert 0 == resp.release.call_count
+
+    @pytest.mark.asyncio
+    async def test_not_iterated(self):
+        request = _request(FakeResponse(DOCUMENT))
+        async with AsyncRowIterator(request, '/storage/reading?id=1&count=3'):
+            pass
+        # the request coroutine was closed without being sent
+        with pytest.raises(RuntimeError):
+            await request
+
+    @pytest.mark.asyncio
+    async def test_incomplete_response(self):
+        resp = FakeResponse(DOCUMENT[:-10])
+        with pytest.raises(ValueError):
+            async with AsyncRowIterator(_request(resp), '/storage/reading?id=1&count=3') as row_iterator:
+                async for row in row_iterator:
+                    pass
+        resp.close.assert_called_once_with()
+
+    @pytest.mark.asyncio
+    async def test_error_response(self):
+        resp = FakeResponse(b'{"key": "value"}', status=400)
+        with pytest.raises(StorageServerError) as excinfo:
+            with patch.object(_LOGGER, "error") as log_e:
+                async for row in AsyncRowIterator(_request(resp), '/storage/reading/query', payload='{"k": "v"}'):
+                    pass
+        log_e.assert_called_once_with("PUT url %s with query payload: %s, Error code: %d, reason: %s, details: %s",
+                                      '/storage/reading/query', '{"k": "v"}', 400, 'bad data', {"key": "value"})
+        assert 400 == excinfo.value.code
+        assert {"key": "value"} == excinfo.value.error
+        resp.close.assert_called_once_with()
@@ -6,6 +6,7 @@
 
 """ Test common/storage_client/utils.py """
 
+import json
 import pytest
 from foglamp.common.storage_client.utils import Utils
 
@@ -45,3 +46,35 @@ class TestUtils:
     def test_is_json_return_false_with_invalid_json(self, test_input):
         ret_val = Utils.is_json(test_input)
         assert ret_val is False
+
+    @pytest.mark.parametrize("test_input", ['{"k": "v"}', b'{"k": "v"}', 'blah'])
+    def test_serialize_returns_serialized_payload_as_is(self, test_input):
+        assert test_input is Utils.serialize(test_input)
+
+    @pytest.mark.parametrize("test_input", [{"k": "v"}, [{"k": 1}], {}])
+    def test_serialize_dumps_object(self, test_input):
+        payload = Utils.serialize(test_input)
+        assert isinstance(payload, bytes)
+        assert test_input == json.loads(payload.decode())
+
+    def test_serialize_with_invalid_object(self):
+        with pytest.raises(TypeError):
+            Utils.serialize({"k": {"v"}})
+
+    def test_serialize_list(self):
+        payload = Utils.serialize_list(['{"k": 1}', b'{"k": 2}', {"k": 3}])
+        assert isinstance(payload, bytes)
+        assert [{"k": 1}, {"k": 2}, {"k": 3}] == json.loads(payload.decode())
+        assert b'[]' == Utils.serialize_list([])
+
+    @pytest.mark.parametrize("values", [("2018-03-08 15:00:00.025+00", 23), (7,), ["température", None]])
+    def test_cursor(self, values):
+        token = Utils.encode_cursor(values)
+        assert token == Utils.encode_cursor(iter(values))
+        assert tuple(values) == Utils.decode_cursor(token)
+
+    @pytest.mark.parametrize("token", ["", "not a cursor", "e30=", "W10=", "bnVsbA=="])
+    def test_decode_invalid_cursor(self, token):
+        with pytest.raises(ValueError) as excinfo:
+            Utils.decode_cursor(token)
+        assert "Invalid cursor {}".format(token) == str(excinfo.value)
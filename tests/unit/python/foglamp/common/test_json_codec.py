@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test foglamp/common/json_codec.py """
+
+import datetime
+import json
+import uuid
+from collections import OrderedDict
+
+import pytest
+
+from foglamp.common import json_codec
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_READINGS = {"readings": [{"asset_code": "TI sensorTag/luxometer",
+                           "read_key": "5b3be500-ff95-41ae-b5a4-cc99d08bef40",
+                           "reading": OrderedDict([("lux", 49.0), ("unit", "lx/m²"), ("id", 1 << 40)]),
+                           "user_ts": "2018-03-08 15:00:09.025655+00"}]}
+
+
+@pytest.fixture(params=json_codec.available_backends())
+def codec_backend(request):
+    default = json_codec.backend()
+    json_codec.set_backend(request.param)
+    yield request.param
+    json_codec.set_backend(default)
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "json_codec")
+class TestJsonCodec:
+
+    def test_default_backend(self):
+        assert 'json' in json_codec.available_backends()
+        assert json_codec.available_backends()[0] == json_codec.backend()
+
+    def test_set_invalid_backend(self):
+        with pytest.raises(ValueError) as excinfo:
+            json_codec.set_backend('simplejson')
+        assert "JSON backend must be one of orjson, ujson, json" == str(excinfo.value)
+
+    def test_dumps_dumpb(self, codec_backend):
+        s = json_codec.dumps(_READINGS)
+        b = json_codec.dumpb(_READINGS)
+        assert isinstance(s, str)
+        assert isinstance(b, bytes)
+        assert json.loads(s) == json.loads(b.decode()) == _READINGS
+
+    @pytest.mark.parametrize("data", [json.dumps(_READINGS), json.dumps(_READINGS).encode(),
+                                      bytearray(json.dumps(_READINGS).encode())])
+    def test_loads(self, codec_backend, data):
+        assert _READINGS == json_codec.loads(data)
+
+    def test_loads_invalid(self, codec_backend):
+        with pytest.raises(ValueError):
+            json_codec.loads(b'{"k": }')
+
+    def test_loads_not_strict(self, codec_backend):
+        data = '{"message": "line\nbreak"}'
+        with pytest.raises(ValueError):
+            json_codec.loads(data)
+        assert {"message": "line\nbreak"} == json_codec.loads(data, strict=False)
+        assert {"message": "line\nbreak"} == json_codec.loads(data.encode(), strict=False)
+
+    def test_dumps_falls_back_to_json(self, codec_backend):
+        obj = {"big": 1 << 70}
+        assert obj == json.loads(json_codec.dumps(obj))
+        assert obj == json.loads(json_codec.dumpb(obj).decode())
+
+    def test_dumps_datetime_uuid(self, codec_backend):
+        utc = datetime.datetime(2018, 3, 8, 15, 0, 9, 25655, tzinfo=datetime.timezone.utc)
+        obj = {"user_ts": utc, "ts": utc.replace(tzinfo=None, microsecond=0), "day": utc.date(), "time": utc.time(),
+               "key": uuid.UUID("5b3be500-ff95-41ae-b5a4-cc99d08bef40")}
+        expected = {"user_ts": "2018-03-08T15:00:09.025655+00:00", "ts": "2018-03-08T15:00:09", "day": "2018-03-08",
+                    "time": "15:00:09.025655", "key": "5b3be500-ff95-41ae-b5a4-cc99d08bef40"}
+        assert expected == json.loads(json_codec.dumps(obj))
+        assert expected == json.loads(json_codec.dumpb(obj).decode())
+
+    def test_dumps_not_serializable(self, codec_backend):
+        with pytest.raises(TypeError):
+            json_codec.dumpb({"k": {"v"}})
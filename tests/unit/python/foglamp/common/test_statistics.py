@@ -173,20 +173,57 @@ class TestStatistics:
                     await s.update('BUFFERED', 5)
             logger_exception.assert_called_once_with(*msg)
 
-    async def test_add_update(self):
-        stat_dict = {'FOGBENCH/TEMPERATURE': 1}
+    async def test_set(self):
         storage_client_mock = MagicMock(spec=StorageClient)
         s = statistics.Statistics(storage_client_mock)
-        payload = '{"where": {"column": "key", "condition": "=", "value": "FOGBENCH/TEMPERATURE"}, ' \
-                  '"expressions": [{"column": "value", "operator": "+", "value": 1}]}'
 
         async def mock_coro():
             return {"response": "updated", "rows_affected": 1}
 
+        payload = '{"values": {"value": 512}, "where": {"column": "key", "condition": "=", "value": "SOUTH_BATCH"}}'
         with patch.object(s._storage, 'update_tbl', return_value=mock_coro()) as stat_update:
-            await s.add_update(stat_dict)
+            await s.set('SOUTH_BATCH', 512)
         stat_update.assert_called_once_with('statistics', payload)
 
+    @pytest.mark.parametrize("key, value, exception_name, exception_message", [
+        (123456, 120, TypeError, "key must be a string"),
+        ('SOUTH_BATCH', '120', ValueError, "value must be an integer"),
+        ('SOUTH_BATCH', None, ValueError, "value must be an integer")
+    ])
+    async def test_set_with_invalid_params(self, key, value, exception_name, exception_message):
+        storage_client_mock = MagicMock(spec=StorageClient)
+        s = statistics.Statistics(storage_client_mock)
+
+        with pytest.raises(exception_name) as excinfo:
+            await s.set(key, value)
+        assert exception_message == str(excinfo.value)
+
+    async def test_add_update(self):
+        stat_dict = {'FOGBENCH/TEMPERATURE': 1, 'FOGBENCH/HUMIDITY': 2}
+        storage_client_mock = MagicMock(spec=StorageClient)
+        s = statistics.Statistics(storage_client_mock)
+        payloads = ['{"where": {"column": "key", "condition": "=", "value": "FOGBENCH/TEMPERATURE"}, '
+                    '"expressions": [{"column": "value", "operator": "+", "value": 1}]}',
+                    '{"where": {"column": "key", "condition": "=", "value": "FOGBENCH/HUMIDITY"}, '
+                    '"expressions": [{"column": "value", "operator": "+", "value": 2}]}']
+
+        async def mock_coro():
+            return {"response": "updated", "rows_affected": 2}
+
+        with patch.object(s._storage, 'update_many', return_value=mock_coro()) as stat_update:
+            await s.add_update(stat_dict)
+        assert 1 == stat_update.call_count
+        args, kwargs = stat_update.call_args
+        assert 'statistics' == args[0]
+        assert sorted(payloads) == sorted(args[1])
+
+    async def test_add_update_empty(self):
+        storage_client_mock = MagicMock(spec=StorageClient)
+        s = statistics.Statistics(storage_client_mock)
+        with patch.object(s._storage, 'update_many') as stat_update:
+            await s.add_update({})
+        assert 0 == stat_update.call_count
+
     async def test_insert_when_key_error(self):
         stat_dict = {'FOGBENCH/TEMPERATURE': 1}
         storage_client_mock = MagicMock(spec=StorageClient)
@@ -195,22 +232,21 @@ class TestStatistics:
         async def mock_coro():
             return {"response": "not updated", "rows_affected": 0}
 
-        with patch.object(s._storage, 'update_tbl', return_value=mock_coro()) as stat_update:
+        with patch.object(s._storage, 'update_many', return_value=mock_coro()) as stat_update:
             with patch.object(statistics._logger, 'exception') as logger_exception:
                 with pytest.raises(KeyError):
                     await s.add_update(stat_dict)
             args, kwargs = logger_exception.call_args
-            assert args[0] == 'Statistics key %s has not been registered'
-            assert args[1] == 'FOGBENCH/TEMPERATURE'
+            assert args[0] == 'Statistics keys %s have not all been registered'
+            assert args[1] == ['FOGBENCH/TEMPERATURE']
         assert stat_update.call_count == 1
 
     async def test_add_update_exception(self):
         stat_dict = {'FOGBENCH/TEMPERATURE': 1}
         storage_client_mock = MagicMock(spec=StorageClient)
         s = statistics.Statistics(storage_client_mock)
-        msg = 'Unable to update statistics value based on statistics_key %s and value_increment' \
-              ' %s, error %s', "FOGBENCH/TEMPERATURE", 1, ''
-        with patch.object(s._storage, 'update_tbl', side_effect=Exception()):
+        msg = 'Unable to update statistics values %s, error %s', stat_dict, ''
+        with patch.object(s._storage, 'update_many', side_effect=Exception()):
             with pytest.raises(Exception):
                 with patch.object(statistics._logger, 'exception') as logger_exception:
                     await s.add_update(stat_dict)
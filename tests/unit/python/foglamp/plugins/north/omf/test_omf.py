@@ -25,6 +25,7 @@ from foglamp.plugins.north.omf import omf
 import foglamp.tasks.north.sending_process as module_sp
 
 from foglamp.common.storage_client import payload_builder
+from foglamp.common import json_codec
 
 from foglamp.common.storage_client.storage_client import StorageClient, StorageClientAsync
 
@@ -1235,7 +1236,7 @@ class TestOmfNorthPlugin:
 
                 await fixture_omf_north.send_in_memory_data_to_picromf(p_type, p_test_data)
 
-        str_data = json.dumps(p_test_data)
+        str_data = json_codec.dumpb(p_test_data)
         assert patched_aiohttp.call_count == 1
         patched_aiohttp.assert_called_with(
                                             url=test_url,
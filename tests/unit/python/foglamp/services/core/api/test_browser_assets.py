@@ -14,7 +14,8 @@ import pytest
 
 from foglamp.services.core.api import browser
 from foglamp.services.core import connect
-from foglamp.common.storage_client.storage_client import ReadingsStorageClient
+from foglamp.common.storage_client.storage_client import ReadingsStorageClientAsync
+from foglamp.common.storage_client.utils import Utils
 
 __author__ = "Ashish Jabble"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -22,6 +23,10 @@ __license__ = "Apache 2.0"
 __version__ = "${VERSION}"
 
 
+async def mock_coro(result):
+    return result
+
+
 URLS = ['foglamp/asset',
         '/foglamp/asset/fogbench%2fhumidity',
         '/foglamp/asset/fogbench%2fhumidity/temperature',
@@ -94,9 +99,9 @@ class TestBrowserAssets:
 
     @pytest.mark.parametrize("request_url, payload, result", FIXTURE_1)
     async def test_end_points(self, client, request_url, payload, result):
-        readings_storage_client_mock = MagicMock(ReadingsStorageClient)
-        with patch.object(connect, 'get_readings', return_value=readings_storage_client_mock):
-            with patch.object(readings_storage_client_mock, 'query', return_value=result) as query_patch:
+        readings_storage_client_mock = MagicMock(ReadingsStorageClientAsync)
+        with patch.object(connect, 'get_readings_async', return_value=readings_storage_client_mock):
+            with patch.object(readings_storage_client_mock, 'query', return_value=mock_coro(result)) as query_patch:
                 resp = await client.get(request_url)
                 assert 200 == resp.status
                 r = await resp.text()
@@ -114,10 +119,10 @@ class TestBrowserAssets:
 
     @pytest.mark.parametrize("request_url, response_code, payload", FIXTURE_2)
     async def test_bad_request(self, client, request_url, response_code, payload):
-        readings_storage_client_mock = MagicMock(ReadingsStorageClient)
+        readings_storage_client_mock = MagicMock(ReadingsStorageClientAsync)
         result = {'message': 'ERROR: something went wrong', 'retryable': False, 'entryPoint': 'retrieve'}
-        with patch.object(connect, 'get_readings', return_value=readings_storage_client_mock):
-            with patch.object(readings_storage_client_mock, 'query', return_value=result) as query_patch:
+        with patch.object(connect, 'get_readings_async', return_value=readings_storage_client_mock):
+            with patch.object(readings_storage_client_mock, 'query', return_value=mock_coro(result)) as query_patch:
                 resp = await client.get(request_url)
                 assert response_code == resp.status
                 assert result['message'] == resp.reason
@@ -127,7 +132,7 @@ class TestBrowserAssets:
 
     @pytest.mark.parametrize("request_url", URLS)
     async def test_http_exception(self, client, request_url):
-        with patch.object(connect, 'get_readings', return_value=Exception):
+        with patch.object(connect, 'get_readings_async', return_value=Exception):
             resp = await client.get(request_url)
             assert 500 == resp.status
             assert 'Internal Server Error' == resp.reason
@@ -141,9 +146,9 @@ class TestBrowserAssets:
          {'count': 1, 'rows': [{'min': '9', 'average': '9', 'max': '9', 'timestamp': '2018-02-19 17'}]})
     ])
     async def test_asset_averages_with_valid_group_name(self, client, group_name, payload, result):
-        readings_storage_client_mock = MagicMock(ReadingsStorageClient)
-        with patch.object(connect, 'get_readings', return_value=readings_storage_client_mock):
-            with patch.object(readings_storage_client_mock, 'query', return_value=result) as query_patch:
+        readings_storage_client_mock = MagicMock(ReadingsStorageClientAsync)
+        with patch.object(connect, 'get_readings_async', return_value=readings_storage_client_mock):
+            with patch.object(readings_storage_client_mock, 'query', return_value=mock_coro(result)) as query_patch:
                 resp = await client.get('foglamp/asset/fogbench%2Fhumidity/temperature/series?group={}'
                                         .format(group_name))
                 assert 200 == resp.status
@@ -186,9 +191,9 @@ class TestBrowserAssets:
         ('?seconds=10&minutes=10&hours=1', '{"return": [{"alias": "timestamp", "column": "user_ts", "format": "YYYY-MM-DD HH24:MI:SS.MS"}, {"json": {"properties": "temperature", "column": "reading"}, "alias": "temperature"}], "where": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity", "and": {"column": "user_ts", "condition": "newer", "value": 10}}, "limit": 20, "sort": {"column": "timestamp", "direction": "desc"}}')
     ])
     async def test_limit_skip_time_units_payload(self, client, request_params, payload):
-        readings_storage_client_mock = MagicMock(ReadingsStorageClient)
-        with patch.object(connect, 'get_readings', return_value=readings_storage_client_mock):
-            with patch.object(readings_storage_client_mock, 'query', return_value={'count': 0, 'rows': []}) \
+        readings_storage_client_mock = MagicMock(ReadingsStorageClientAsync)
+        with patch.object(connect, 'get_readings_async', return_value=readings_storage_client_mock):
+            with patch.object(readings_storage_client_mock, 'query', return_value=mock_coro({'count': 0, 'rows': []})) \
                     as query_patch:
                 resp = await client.get('foglamp/asset/fogbench%2Fhumidity/temperature{}'.format(request_params))
                 assert 200 == resp.status
@@ -198,3 +203,38 @@ class TestBrowserAssets:
             args, kwargs = query_patch.call_args
             assert json.loads(payload) == json.loads(args[0])
             query_patch.assert_called_once_with(args[0])
+
+    @pytest.mark.parametrize("request_params, payload, next_cursor", [
+        ('?limit=2&cursor=', '{"return": [{"alias": "timestamp", "column": "user_ts", "format": "YYYY-MM-DD HH24:MI:SS.MS"}, {"json": {"properties": "temperature", "column": "reading"}, "alias": "temperature"}, "user_ts", "id"], "where": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity"}, "sort": [{"column": "user_ts", "direction": "desc"}, {"column": "id", "direction": "desc"}], "limit": 2}', ["2018-02-16 15:08:50.026+00", 4]),
+        ('?limit=2&seconds=60&cursor=WyIyMDE4LTAyLTE2IDE1OjA4OjUwLjAyNiswMCIsIDRd', '{"return": [{"alias": "timestamp", "column": "user_ts", "format": "YYYY-MM-DD HH24:MI:SS.MS"}, {"json": {"properties": "temperature", "column": "reading"}, "alias": "temperature"}, "user_ts", "id"], "where": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity", "and": {"column": "user_ts", "condition": "newer", "value": 60, "and": {"column": "user_ts", "condition": "<", "value": "2018-02-16 15:08:50.026+00", "or": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity", "and": {"column": "user_ts", "condition": "newer", "value": 60, "and": {"column": "user_ts", "condition": "=", "value": "2018-02-16 15:08:50.026+00", "and": {"column": "id", "condition": "<", "value": 4}}}}}}}, "sort": [{"column": "user_ts", "direction": "desc"}, {"column": "id", "direction": "desc"}], "limit": 2}', ["2018-02-16 15:08:50.026+00", 4]),
+        ('?limit=3&cursor=', '{"return": [{"alias": "timestamp", "column": "user_ts", "format": "YYYY-MM-DD HH24:MI:SS.MS"}, {"json": {"properties": "temperature", "column": "reading"}, "alias": "temperature"}, "user_ts", "id"], "where": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity"}, "sort": [{"column": "user_ts", "direction": "desc"}, {"column": "id", "direction": "desc"}], "limit": 3}', None)
+    ])
+    async def test_cursor_payload(self, client, request_params, payload, next_cursor):
+        rows = [{'temperature': 26, 'timestamp': '2018-02-16 15:08:51.026', 'user_ts': '2018-02-16 15:08:51.026+00', 'id': 5},
+                {'temperature': 25, 'timestamp': '2018-02-16 15:08:50.026', 'user_ts': '2018-02-16 15:08:50.026+00', 'id': 4}]
+        readings_storage_client_mock = MagicMock(ReadingsStorageClientAsync)
+        with patch.object(connect, 'get_readings_async', return_value=readings_storage_client_mock):
+            with patch.object(readings_storage_client_mock, 'query', return_value=mock_coro({'count': 2, 'rows': rows})) \
+                    as query_patch:
+                resp = await client.get('foglamp/asset/fogbench%2Fhumidity/temperature{}'.format(request_params))
+                assert 200 == resp.status
+                r = await resp.text()
+                json_response = json.loads(r)
+                assert [{'temperature': 26, 'timestamp': '2018-02-16 15:08:51.026'},
+                        {'temperature': 25, 'timestamp': '2018-02-16 15:08:50.026'}] == json_response
+                if next_cursor is None:
+                    assert 'X-Next-Cursor' not in resp.headers
+                else:
+                    assert next_cursor == list(Utils.decode_cursor(resp.headers['X-Next-Cursor']))
+            args, kwargs = query_patch.call_args
+            assert json.loads(payload) == json.loads(args[0])
+
+    @pytest.mark.parametrize("request_param, response_message", [
+        ('?cursor=invalid', "Invalid cursor"),
+        ('?cursor=WzFd', "Invalid cursor"),
+        ('?cursor=&skip=1', "Only one of skip and cursor can be given")
+    ])
+    async def test_bad_cursor(self, client, request_param, response_message):
+        resp = await client.get('foglamp/asset/fogbench%2Fhumidity{}'.format(request_param))
+        assert 400 == resp.status
+        assert response_message == resp.reason
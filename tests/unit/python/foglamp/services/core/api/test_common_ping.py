@@ -24,10 +24,14 @@ from foglamp.services.core import routes
 from foglamp.services.core import connect
 from foglamp.services.core.api.common import _logger
 from foglamp.common.web import middleware
-from foglamp.common.storage_client.storage_client import StorageClient
+from foglamp.common.storage_client.storage_client import StorageClient, StorageClientAsync
 from foglamp.common.configuration_manager import ConfigurationManager
 
 
+async def mock_coro(result):
+    return result
+
+
 @pytest.allure.feature("unit")
 @pytest.allure.story("api", "common")
 async def test_ping_http_allow_ping_true(test_server, test_client, loop):
@@ -45,9 +49,12 @@ async def test_ping_http_allow_ping_true(test_server, test_client, loop):
                ]}
 
     mockedStorageClient = MagicMock(StorageClient)
+    mockedStorageClientAsync = MagicMock(StorageClientAsync)
     with patch.object(middleware._logger, 'info') as logger_info:
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
-            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=result) as query_patch:
+        with patch.object(connect, 'get_storage', return_value=mockedStorageClient), \
+                patch.object(connect, 'get_storage_async', return_value=mockedStorageClientAsync):
+            with patch.object(mockedStorageClientAsync, 'query_tbl_with_payload',
+                              return_value=mock_coro(result)) as query_patch:
                 with patch.object(ConfigurationManager, "get_category_item", return_value=mock_get_category_item()) as mock_get_cat:
                     app = web.Application(loop=loop, middlewares=[middleware.optional_auth_middleware])
                     # fill route table
@@ -91,9 +98,12 @@ async def test_ping_http_allow_ping_false(test_server, test_client, loop):
     ]}
 
     mockedStorageClient = MagicMock(StorageClient)
+    mockedStorageClientAsync = MagicMock(StorageClientAsync)
     with patch.object(middleware._logger, 'info') as logger_info:
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
-            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=result) as query_patch:
+        with patch.object(connect, 'get_storage', return_value=mockedStorageClient), \
+                patch.object(connect, 'get_storage_async', return_value=mockedStorageClientAsync):
+            with patch.object(mockedStorageClientAsync, 'query_tbl_with_payload',
+                              return_value=mock_coro(result)) as query_patch:
                 with patch.object(ConfigurationManager, "get_category_item", return_value=mock_get_category_item()) as mock_get_cat:
                     app = web.Application(loop=loop, middlewares=[middleware.optional_auth_middleware])
                     # fill route table
@@ -137,9 +147,12 @@ async def test_ping_http_auth_required_allow_ping_true(test_server, test_client,
                ]}
 
     mockedStorageClient = MagicMock(StorageClient)
+    mockedStorageClientAsync = MagicMock(StorageClientAsync)
     with patch.object(middleware._logger, 'info') as logger_info:
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
-            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=result) as query_patch:
+        with patch.object(connect, 'get_storage', return_value=mockedStorageClient), \
+                patch.object(connect, 'get_storage_async', return_value=mockedStorageClientAsync):
+            with patch.object(mockedStorageClientAsync, 'query_tbl_with_payload',
+                              return_value=mock_coro(result)) as query_patch:
                 with patch.object(ConfigurationManager, "get_category_item", return_value=mock_get_category_item()) as mock_get_cat:
                     app = web.Application(loop=loop, middlewares=[middleware.auth_middleware])
                     # fill route table
@@ -183,9 +196,12 @@ async def test_ping_http_auth_required_allow_ping_false(test_server, test_client
     ]}
 
     mockedStorageClient = MagicMock(StorageClient)
+    mockedStorageClientAsync = MagicMock(StorageClientAsync)
     with patch.object(middleware._logger, 'info') as logger_info:
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
-            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=result) as query_patch:
+        with patch.object(connect, 'get_storage', return_value=mockedStorageClient), \
+                patch.object(connect, 'get_storage_async', return_value=mockedStorageClientAsync):
+            with patch.object(mockedStorageClientAsync, 'query_tbl_with_payload',
+                              return_value=mock_coro(result)) as query_patch:
                 with patch.object(ConfigurationManager, "get_category_item", return_value=mock_get_category_item()) as mock_get_cat:
                     with patch.object(_logger, 'warning') as logger_warn:
                         app = web.Application(loop=loop, middlewares=[middleware.auth_middleware])
@@ -238,9 +254,12 @@ async def test_ping_https_allow_ping_true(test_server, ssl_ctx, test_client, loo
                ]}
 
     mockedStorageClient = MagicMock(StorageClient)
+    mockedStorageClientAsync = MagicMock(StorageClientAsync)
     with patch.object(middleware._logger, 'info') as logger_info:
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
-            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=result) as query_patch:
+        with patch.object(connect, 'get_storage', return_value=mockedStorageClient), \
+                patch.object(connect, 'get_storage_async', return_value=mockedStorageClientAsync):
+            with patch.object(mockedStorageClientAsync, 'query_tbl_with_payload',
+                              return_value=mock_coro(result)) as query_patch:
                 with patch.object(ConfigurationManager, "get_category_item", return_value=mock_get_category_item()) as mock_get_cat:
                     app = web.Application(loop=loop, middlewares=[middleware.optional_auth_middleware])
                     # fill route table
@@ -297,9 +316,12 @@ async def test_ping_https_allow_ping_false(test_server, ssl_ctx, test_client, lo
     ]}
 
     mockedStorageClient = MagicMock(StorageClient)
+    mockedStorageClientAsync = MagicMock(StorageClientAsync)
     with patch.object(middleware._logger, 'info') as logger_info:
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
-            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=result) as query_patch:
+        with patch.object(connect, 'get_storage', return_value=mockedStorageClient), \
+                patch.object(connect, 'get_storage_async', return_value=mockedStorageClientAsync):
+            with patch.object(mockedStorageClientAsync, 'query_tbl_with_payload',
+                              return_value=mock_coro(result)) as query_patch:
                 with patch.object(ConfigurationManager, "get_category_item", return_value=mock_get_category_item()) as mock_get_cat:
                     app = web.Application(loop=loop, middlewares=[middleware.optional_auth_middleware])
                     # fill route table
@@ -349,9 +371,12 @@ async def test_ping_https_auth_required_allow_ping_true(test_server, ssl_ctx, te
                ]}
 
     mockedStorageClient = MagicMock(StorageClient)
+    mockedStorageClientAsync = MagicMock(StorageClientAsync)
     with patch.object(middleware._logger, 'info') as logger_info:
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
-            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=result) as query_patch:
+        with patch.object(connect, 'get_storage', return_value=mockedStorageClient), \
+                patch.object(connect, 'get_storage_async', return_value=mockedStorageClientAsync):
+            with patch.object(mockedStorageClientAsync, 'query_tbl_with_payload',
+                              return_value=mock_coro(result)) as query_patch:
                 with patch.object(ConfigurationManager, "get_category_item", return_value=mock_get_category_item()) as mock_get_cat:
                     app = web.Application(loop=loop, middlewares=[middleware.auth_middleware])
                     # fill route table
@@ -408,9 +433,12 @@ async def test_ping_https_auth_required_allow_ping_false(test_server, ssl_ctx, t
                ]}
 
     mockedStorageClient = MagicMock(StorageClient)
+    mockedStorageClientAsync = MagicMock(StorageClientAsync)
     with patch.object(middleware._logger, 'info') as logger_info:
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
-            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=result) as query_patch:
+        with patch.object(connect, 'get_storage', return_value=mockedStorageClient), \
+                patch.object(connect, 'get_storage_async', return_value=mockedStorageClientAsync):
+            with patch.object(mockedStorageClientAsync, 'query_tbl_with_payload',
+                              return_value=mock_coro(result)) as query_patch:
                 with patch.object(ConfigurationManager, "get_category_item", return_value=mock_get_category_item()) as mock_get_cat:
                     with patch.object(_logger, 'warning') as logger_warn:
                         app = web.Application(loop=loop, middlewares=[middleware.auth_middleware])
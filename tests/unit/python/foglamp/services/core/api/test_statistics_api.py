@@ -13,13 +13,18 @@ import json
 
 from foglamp.services.core import routes
 from foglamp.services.core import connect
-from foglamp.common.storage_client.storage_client import StorageClient
+from foglamp.common.storage_client.storage_client import StorageClientAsync
+from foglamp.common.storage_client.metrics import StorageMetrics
 
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
 __license__ = "Apache 2.0"
 __version__ = "${VERSION}"
 
 
+async def mock_coro(result):
+    return result
+
+
 @pytest.allure.feature("unit")
 @pytest.allure.story("api", "statistics")
 class TestStatistics:
@@ -37,9 +42,9 @@ class TestStatistics:
                            {"value": 1, "key": "READINGS", "description": "blah2"}]
                   }
 
-        mockedStorageClient = MagicMock(StorageClient)
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
-            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=result) as query_patch:
+        mockedStorageClient = MagicMock(StorageClientAsync)
+        with patch.object(connect, 'get_storage_async', return_value=mockedStorageClient):
+            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=mock_coro(result)) as query_patch:
                 resp = await client.get("/foglamp/statistics")
                 assert 200 == resp.status
                 r = await resp.text()
@@ -52,9 +57,9 @@ class TestStatistics:
     async def test_get_stats_exception(self, client):
         result = {"message": "error"}
 
-        mockedStorageClient = MagicMock(StorageClient)
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
-            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=result):
+        mockedStorageClient = MagicMock(StorageClientAsync)
+        with patch.object(connect, 'get_storage_async', return_value=mockedStorageClient):
+            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=mock_coro(result)):
                 resp = await client.get("/foglamp/statistics")
                 assert 500 == resp.status
                 assert "Internal Server Error" == resp.reason
@@ -92,7 +97,7 @@ class TestStatistics:
         p2 = {"return": ["schedule_interval"],
               "where": {"column": "process_name", "condition": "=", "value": "stats collector"}}
 
-        def q_result(*args):
+        async def q_result(*args):
             table = args[0]
             payload = args[1]
 
@@ -107,8 +112,8 @@ class TestStatistics:
                 assert p2 == json.loads(payload)
                 return {"rows": [{"schedule_interval": schedule_interval}]}
 
-        mockedStorageClient = MagicMock(StorageClient)
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
+        mockedStorageClient = MagicMock(StorageClientAsync)
+        with patch.object(connect, 'get_storage_async', return_value=mockedStorageClient):
             with patch.object(mockedStorageClient, 'query_tbl_with_payload', side_effect=q_result) as query_patch:
                 resp = await client.get("/foglamp/statistics/history")
             assert 200 == resp.status
@@ -127,7 +132,7 @@ class TestStatistics:
         p3 = {"return": ["schedule_interval"],
               "where": {"column": "process_name", "condition": "=", "value": "stats collector"}}
 
-        def q_result(*args):
+        async def q_result(*args):
             table = args[0]
             payload = args[1]
 
@@ -146,8 +151,8 @@ class TestStatistics:
                 assert p3 == json.loads(payload)
                 return {"rows": [{"schedule_interval": "00:01:00"}]}
 
-        mockedStorageClient = MagicMock(StorageClient)
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
+        mockedStorageClient = MagicMock(StorageClientAsync)
+        with patch.object(connect, 'get_storage_async', return_value=mockedStorageClient):
             with patch.object(mockedStorageClient, 'query_tbl_with_payload', side_effect=q_result) as query_patch:
                 resp = await client.get("/foglamp/statistics/history?limit=1")
             assert 200 == resp.status
@@ -158,10 +163,10 @@ class TestStatistics:
 
     @pytest.mark.parametrize("request_limit", [-1, 'blah'])
     async def test_get_statistics_history_bad_limit(self, client, request_limit):
-        mockedStorageClient = MagicMock(StorageClient)
+        mockedStorageClient = MagicMock(StorageClientAsync)
         result = {"rows": [{"schedule_interval": "00:01:00"}]}
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
-            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=result):
+        with patch.object(connect, 'get_storage_async', return_value=mockedStorageClient):
+            with patch.object(mockedStorageClient, 'query_tbl_with_payload', return_value=mock_coro(result)):
                 resp = await client.get("/foglamp/statistics/history?limit={}".format(request_limit))
             assert 400 == resp.status
             assert "Limit must be a positive integer" == resp.reason
@@ -170,7 +175,7 @@ class TestStatistics:
         p1 = {"return": ["schedule_interval"],
               "where": {"column": "process_name", "condition": "=", "value": "stats collector"}}
 
-        def q_result(*args):
+        async def q_result(*args):
             table = args[0]
             payload = args[1]
 
@@ -178,8 +183,8 @@ class TestStatistics:
                 assert p1 == json.loads(payload)
                 return {"rows": []}
 
-        mockedStorageClient = MagicMock(StorageClient)
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
+        mockedStorageClient = MagicMock(StorageClientAsync)
+        with patch.object(connect, 'get_storage_async', return_value=mockedStorageClient):
             with patch.object(mockedStorageClient, 'query_tbl_with_payload', side_effect=q_result) as query_patch:
                 resp = await client.get("/foglamp/statistics/history")
             assert 404 == resp.status
@@ -193,7 +198,7 @@ class TestStatistics:
         p2 = {"return": ["schedule_interval"],
               "where": {"column": "process_name", "condition": "=", "value": "stats collector"}}
 
-        def q_result(*args):
+        async def q_result(*args):
             table = args[0]
             payload = args[1]
 
@@ -205,8 +210,8 @@ class TestStatistics:
                 assert p2 == json.loads(payload)
                 return {"rows": [{"schedule_interval": "00:01:00"}]}
 
-        mockedStorageClient = MagicMock(StorageClient)
-        with patch.object(connect, 'get_storage', return_value=mockedStorageClient):
+        mockedStorageClient = MagicMock(StorageClientAsync)
+        with patch.object(connect, 'get_storage_async', return_value=mockedStorageClient):
             with patch.object(mockedStorageClient, 'query_tbl_with_payload', side_effect=q_result) as query_patch:
                 resp = await client.get("/foglamp/statistics/history")
             assert 500 == resp.status
@@ -214,3 +219,15 @@ class TestStatistics:
 
         assert query_patch.called
         assert 2 == query_patch.call_count
+
+    async def test_get_storage_metrics(self, client):
+        report = {"calls": [{"endpoint": "PUT /storage/table/query", "table": "statistics", "calls": 1, "errors": 0,
+                             "retryable": 0, "request_bytes": 10, "response_bytes": 20,
+                             "latency": {"total": 0.002, "max": 0.002, "buckets": {"0.0025": 1}}}],
+                  "cache": {}}
+        with patch.object(StorageMetrics, 'report', return_value=report) as report_patch:
+            resp = await client.get("/foglamp/statistics/storage")
+            assert 200 == resp.status
+            r = await resp.text()
+            assert report == json.loads(r)
+        report_patch.assert_called_once_with()
@@ -48,6 +48,15 @@ class TestServiceRegistry:
         assert args[0].endswith(': <A name, type=Southbound, protocol=http, address=127.0.0.1, service port=None,'
                                 ' management port=4321, status=1>')
 
+    def test_register_with_socket(self):
+        with patch.object(ServiceRegistry._logger, 'info') as log_info:
+            s_id = ServiceRegistry.register("A name", "Storage", "127.0.0.1", 1234, 4321, 'http',
+                                            socket='/tmp/storage.sock')
+        assert '/tmp/storage.sock' == ServiceRegistry.get(idx=s_id)[0]._socket
+        args, kwargs = log_info.call_args
+        assert args[0].endswith(': <A name, type=Storage, protocol=http, address=127.0.0.1, service port=1234,'
+                                ' management port=4321, status=1, socket=/tmp/storage.sock>')
+
     def test_register_with_same_name(self):
         """raise AlreadyExistsWithTheSameName"""
         with patch.object(ServiceRegistry._logger, 'info') as log_info1:
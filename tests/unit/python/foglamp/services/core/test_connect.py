@@ -10,7 +10,7 @@ import pytest
 from foglamp.services.core.service_registry.service_registry import ServiceRegistry
 from foglamp.services.core.service_registry.exceptions import DoesNotExist
 from foglamp.services.core import connect
-from foglamp.common.storage_client.storage_client import StorageClient
+from foglamp.common.storage_client.storage_client import StorageClient, StorageClientAsync, ReadingsStorageClientAsync
 
 __author__ = "Ashish Jabble"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -39,6 +39,22 @@ class TestConnect:
         assert args[0].endswith(': <FogLAMP Storage, type=Storage, protocol=http, address=127.0.0.1, service port=37449,'
                                 ' management port=37843, status=1>')
 
+    def test_get_storage_async_is_shared(self):
+        with patch.object(ServiceRegistry._logger, 'info'):
+            ServiceRegistry.register("FogLAMP Storage", "Storage", "127.0.0.1", 37449, 37843)
+            storage_client = connect.get_storage_async()
+            readings_client = connect.get_readings_async()
+            assert isinstance(storage_client, StorageClientAsync)
+            assert isinstance(readings_client, ReadingsStorageClientAsync)
+            assert storage_client is connect.get_storage_async()
+            assert readings_client is connect.get_readings_async()
+
+            # storage service restarted on another port
+            ServiceRegistry._registry = []
+            ServiceRegistry.register("FogLAMP Storage", "Storage", "127.0.0.1", 37450, 37843)
+            assert storage_client is not connect.get_storage_async()
+            assert "127.0.0.1:37450" == connect.get_storage_async().base_url
+
     @patch('foglamp.services.core.connect._logger')
     def test_exception_when_no_storage(self, mock_logger):
         with pytest.raises(DoesNotExist) as excinfo:
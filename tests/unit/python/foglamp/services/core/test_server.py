@@ -552,6 +552,7 @@ class TestServer:
             assert 'Service {} could not be registered'.format(request_data['name']) == resp.reason
         args, kwargs = patch_register.call_args
         assert (request_data['name'], request_data['type'], request_data['address'],  request_data['service_port'], request_data['management_port'], 'http') == args
+        assert {'socket': None} == kwargs
 
     async def test_register_service(self, client):
         async def async_mock(return_value):
@@ -571,6 +572,16 @@ class TestServer:
                 assert {'name': request_data['name']} == args[1]
         args, kwargs = patch_register.call_args
         assert (request_data['name'], request_data['type'], request_data['address'], request_data['service_port'], request_data['management_port'], 'http') == args
+        assert {'socket': None} == kwargs
+
+    async def test_register_service_with_socket(self, client):
+        request_data = {"type": "Storage", "name": "Storage Services", "address": "127.0.0.1", "service_port": 8090, "management_port": 1090, "socket": "/tmp/storage.sock"}
+        with patch.object(ServiceRegistry, 'register', return_value='1') as patch_register:
+            resp = await client.post('/foglamp/service', data=json.dumps(request_data))
+            assert 200 == resp.status
+        args, kwargs = patch_register.call_args
+        assert (request_data['name'], request_data['type'], request_data['address'], request_data['service_port'], request_data['management_port'], 'http') == args
+        assert {'socket': '/tmp/storage.sock'} == kwargs
 
     async def test_service_not_found_when_unregister(self, client):
         with patch.object(ServiceRegistry, 'get', side_effect=service_registry_exceptions.DoesNotExist) as patch_unregister:
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test services/south/batch_tuner.py """
+
+from unittest.mock import patch
+
+import pytest
+
+from foglamp.services.south import batch_tuner
+from foglamp.services.south.batch_tuner import BatchTuner
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "ingest")
+class TestBatchTuner:
+
+    def test_invalid_batch_size(self):
+        with pytest.raises(ValueError):
+            BatchTuner(0, 100, 1, 0.1)
+        with pytest.raises(ValueError):
+            BatchTuner(200, 100, 1, 0.1)
+
+    def test_additive_increase(self):
+        tuner = BatchTuner(64, 100, 1, 0.1)
+        tuner.inserted(64, 0.05)
+        assert 72 == tuner.batch_size
+        # a batch which was not full does not show more readings could be sent at once
+        tuner.inserted(10, 0.05)
+        assert 72 == tuner.batch_size
+        for _ in range(5):
+            tuner.inserted(tuner.batch_size, 0.05)
+        assert 100 == tuner.batch_size
+
+    def test_multiplicative_decrease(self):
+        tuner = BatchTuner(32, 100, 1, 0.1)
+        for _ in range(28):
+            tuner.inserted(tuner.batch_size, 0.05)
+        assert 100 == tuner.batch_size
+        tuner.inserted(100, 0.2)
+        assert 50 == tuner.batch_size
+        # not below the configured batch size
+        for _ in range(5):
+            tuner.failed()
+        assert 32 == tuner.batch_size
+
+    def test_timeout(self):
+        with patch.object(batch_tuner.time, 'monotonic', side_effect=[0, 1, 2]):
+            tuner = BatchTuner(64, 100, 1, 0.1)
+            assert 1 == tuner.timeout
+            # low rate: no longer than the target latency
+            tuner.arrived(2)
+            tuner.inserted(2, 0.01)
+            assert 0.1 == tuner.timeout
+            # high rate: the time to fill the batch
+            tuner.arrived(10002)
+            tuner.inserted(64, 0.01)
+            assert 72 / 2002 == pytest.approx(tuner.timeout)
+
+    def test_timeout_slow_storage(self):
+        with patch.object(batch_tuner.time, 'monotonic', side_effect=[0, 1, 2]):
+            tuner = BatchTuner(64, 100, 1, 0.1)
+            # no longer than an insert takes, up to the configured timeout
+            tuner.inserted(1, 0.5)
+            assert 0.5 == tuner.timeout
+            tuner.inserted(1, 5)
+            assert 1 == tuner.timeout
@@ -12,6 +12,14 @@ import pytest
 from unittest.mock import MagicMock
 from foglamp.services.south.ingest import *
 from foglamp.services.south import ingest
+from foglamp.services.south import reading_aggregator
+from foglamp.common import json_codec
+from foglamp.services.south.batch_tuner import BatchTuner
+from foglamp.services.south.ingest_metrics import IngestMetrics
+from foglamp.services.south.read_key_window import ReadKeyWindow
+from foglamp.services.south.ring_buffer import RingBuffer
+from foglamp.services.south.spill_journal import SpillJournal
+from foglamp.common.storage_client.exceptions import CircuitBreakerOpen, StorageServerError
 from foglamp.common.storage_client.storage_client import StorageClientAsync, ReadingsStorageClientAsync
 from foglamp.common.microservice_management_client.microservice_management_client import MicroserviceManagementClient
 
@@ -48,27 +56,44 @@ class TestIngest:
         Ingest.storage_async = None  # type: Storage
         Ingest._readings_stats = 0  # type: int
         Ingest._discarded_readings_stats = 0  # type: int
+        Ingest._duplicate_readings_stats = 0  # type: int
+        Ingest._read_keys = None
+        Ingest._filtered_readings_stats = 0  # type: int
+        Ingest._readings_filter = None
+        Ingest._readings_filter_config = None
+        Ingest._readings_aggregator = None
+        Ingest._readings_aggregation_config = None
+        Ingest._emit_aggregates_task = None
+        Ingest._emit_aggregates_sleep_task = None
+        Ingest._read_key_dedup_window_seconds = 0
+        Ingest._read_key_dedup_memory_kb = 4096
+        Ingest._read_key_dedup_expected_rate = 1000
         Ingest._sensor_stats = {}  # type: dict
         Ingest._write_statistics_task = None  # type: asyncio.Task
         Ingest._write_statistics_sleep_task = None  # type: asyncio.Task
         Ingest._stop = False
         Ingest._started = False
-        Ingest._readings_lists = None  # type: List
+        Ingest._readings_lists = None  # type: List[RingBuffer]
         Ingest._current_readings_list_index = 0
         Ingest._insert_readings_tasks = None  # type: List[asyncio.Task]
-        Ingest._readings_list_batch_size_reached = None  # type: List[asyncio.Event]
-        Ingest._readings_list_not_empty = None  # type: List[asyncio.Event]
-        Ingest._readings_lists_not_full = None  # type: asyncio.Event
-        Ingest._insert_readings_wait_tasks = None  # type: List[asyncio.Task]
+        Ingest._readings_lists_not_full_waiters = None  # type: collections.deque
+        Ingest._capacity_waiters = None  # type: collections.deque
         Ingest._last_insert_time = 0  # type: int
         Ingest._readings_list_size = 0  # type: int
         Ingest._write_statistics_frequency_seconds = 5
         Ingest._readings_buffer_size = 500
+        Ingest._readings_buffer_high_watermark_percent = 90
+        Ingest._readings_buffer_low_watermark_percent = 50
         Ingest._max_concurrent_readings_inserts = 5
         Ingest._readings_insert_batch_size = 100
         Ingest._readings_insert_batch_timeout_seconds = 1
         Ingest._max_readings_insert_batch_connection_idle_seconds = 60
         Ingest._max_readings_insert_batch_reconnect_wait_seconds = 10
+        Ingest._adaptive_readings_insert = False
+        Ingest._readings_insert_target_latency_ms = 100
+        Ingest._batch_tuner = None
+        Ingest._readings_spill_journal_size_mb = 0
+        Ingest._spill_journal = None
         Ingest.category = 'South'
         Ingest.default_config = {
             "write_statistics_frequency_seconds": {
@@ -82,6 +107,18 @@ class TestIngest:
                 "type": "integer",
                 "default": str(Ingest._readings_buffer_size)
             },
+            "readings_buffer_high_watermark_percent": {
+                "description": "Fill percentage of the readings buffers at which the South plugin pauses "
+                               "acquiring readings",
+                "type": "integer",
+                "default": str(Ingest._readings_buffer_high_watermark_percent)
+            },
+            "readings_buffer_low_watermark_percent": {
+                "description": "Fill percentage down to which the readings buffers are drained before the South "
+                               "plugin resumes acquiring readings",
+                "type": "integer",
+                "default": str(Ingest._readings_buffer_low_watermark_percent)
+            },
             "max_concurrent_readings_inserts": {
                 "description": "The maximum number of concurrent processes that send batches of "
                                "readings to storage",
@@ -94,10 +131,10 @@ class TestIngest:
                 "default": str(Ingest._readings_insert_batch_size)
             },
             "readings_insert_batch_timeout_seconds": {
-                "description": "The number of seconds to wait for a readings list to reach the "
-                               "minimum batch size",
-                "type": "integer",
-                "default": str(Ingest._readings_insert_batch_timeout_seconds)
+                "description": "The number of seconds, possibly a fraction, to wait for a readings list to reach "
+                               "the minimum batch size",
+                "type": "string",
+                "default": "0.25"
             },
             "max_readings_insert_batch_connection_idle_seconds": {
                 "description": "Close storage connections used to insert readings when idle for "
@@ -111,6 +148,43 @@ class TestIngest:
                 "type": "integer",
                 "default": str(Ingest._max_readings_insert_batch_reconnect_wait_seconds)
             },
+            "adaptive_readings_insert": {
+                "description": "Tune the readings insert batch size, from the configured batch size up to the "
+                               "buffer size, and the timeout, up to the configured timeout, from the insert latency "
+                               "and the readings rate",
+                "type": "boolean",
+                "default": "false"
+            },
+            "readings_insert_target_latency_ms": {
+                "description": "Milliseconds a readings insert should take, above which the adaptive batch "
+                               "size is decreased",
+                "type": "integer",
+                "default": str(Ingest._readings_insert_target_latency_ms)
+            },
+            "read_key_dedup_window_seconds": {
+                "description": "Number of seconds during which a reading with the same key as a reading received "
+                               "before is rejected as a duplicate, 0 to accept all the readings",
+                "type": "integer",
+                "default": str(Ingest._read_key_dedup_window_seconds)
+            },
+            "read_key_dedup_memory_kb": {
+                "description": "Maximum memory in KB holding the keys of the readings received within the "
+                               "deduplication window",
+                "type": "integer",
+                "default": str(Ingest._read_key_dedup_memory_kb)
+            },
+            "read_key_dedup_expected_rate": {
+                "description": "Expected number of readings with a key received per second, to size the "
+                               "deduplication window for",
+                "type": "integer",
+                "default": str(Ingest._read_key_dedup_expected_rate)
+            },
+            "readings_spill_journal_size_mb": {
+                "description": "Maximum size in MB of the journal on disk of the readings which can not be "
+                               "buffered or inserted, 0 to discard them instead",
+                "type": "integer",
+                "default": str(Ingest._readings_spill_journal_size_mb)
+            },
         }
 
     @pytest.mark.asyncio
@@ -136,13 +210,38 @@ class TestIngest:
         assert Ingest._max_concurrent_readings_inserts == \
                int(new_config['max_concurrent_readings_inserts']['value'])
         assert Ingest._readings_insert_batch_size == int(new_config['readings_insert_batch_size']['value'])
-        assert Ingest._readings_insert_batch_timeout_seconds == \
-               int(new_config['readings_insert_batch_timeout_seconds']['value'])
+        assert 0.25 == Ingest._readings_insert_batch_timeout_seconds
         assert Ingest._max_readings_insert_batch_connection_idle_seconds == \
                int(new_config['max_readings_insert_batch_connection_idle_seconds']['value'])
         assert Ingest._max_readings_insert_batch_reconnect_wait_seconds == \
                int(new_config['max_readings_insert_batch_reconnect_wait_seconds']['value'])
+        assert Ingest._adaptive_readings_insert is False
+        assert Ingest._readings_insert_target_latency_ms == \
+               int(new_config['readings_insert_target_latency_ms']['value'])
+        assert Ingest._read_key_dedup_window_seconds == int(new_config['read_key_dedup_window_seconds']['value'])
+        assert Ingest._read_key_dedup_memory_kb == int(new_config['read_key_dedup_memory_kb']['value'])
+        assert Ingest._read_key_dedup_expected_rate == int(new_config['read_key_dedup_expected_rate']['value'])
+        assert Ingest._readings_spill_journal_size_mb == int(new_config['readings_spill_journal_size_mb']['value'])
         
+    @pytest.mark.parametrize("timeout", ["0", "-0.5", "nan", "soon"])
+    @pytest.mark.asyncio
+    async def test_read_config_invalid_timeout(self, mocker, timeout):
+        # GIVEN
+        mocker.patch.object(MicroserviceManagementClient, "__init__", return_value=None)
+        mocker.patch.object(MicroserviceManagementClient, "create_configuration_category", return_value=None)
+        config = get_cat(Ingest.default_config)
+        config['readings_insert_batch_timeout_seconds']['value'] = timeout
+        mocker.patch.object(MicroserviceManagementClient, "get_configuration_category", return_value=config)
+        Ingest._parent_service = MagicMock(_core_microservice_management_client=MicroserviceManagementClient())
+        log_error = mocker.patch.object(ingest._LOGGER, "error")
+
+        # WHEN
+        await Ingest._read_config()
+
+        # THEN
+        assert 1 == Ingest._readings_insert_batch_timeout_seconds
+        assert 1 == log_error.call_count
+
     @pytest.mark.asyncio
     async def test_start(self, mocker):
         # GIVEN
@@ -154,7 +253,7 @@ class TestIngest:
         get_cfg = mocker.patch.object(MicroserviceManagementClient, "get_configuration_category", return_value=get_cat(Ingest.default_config))
         parent_service = MagicMock(_core_microservice_management_client=MicroserviceManagementClient())
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
-        mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
 
         # WHEN
         await Ingest.start(parent=parent_service)
@@ -167,12 +266,63 @@ class TestIngest:
         assert Ingest._readings_list_size == int(Ingest._readings_buffer_size / (
             Ingest._max_concurrent_readings_inserts))
         assert Ingest._last_insert_time is 0
-        assert Ingest._max_concurrent_readings_inserts == len(Ingest._insert_readings_wait_tasks)
-        assert Ingest._max_concurrent_readings_inserts == len(Ingest._readings_list_batch_size_reached)
-        assert Ingest._max_concurrent_readings_inserts == len(Ingest._readings_list_not_empty)
         assert Ingest._max_concurrent_readings_inserts == len(Ingest._readings_lists)
+        for readings_list in Ingest._readings_lists:
+            assert Ingest._readings_list_size == readings_list.capacity
+        assert 0 == len(Ingest._readings_lists_not_full_waiters)
+        assert Ingest._batch_tuner is None
+        assert Ingest._read_keys is None
         assert 0 == log_warning.call_count
 
+    @pytest.mark.asyncio
+    async def test_start_adaptive(self, mocker):
+        # GIVEN
+        mocker.patch.object(StorageClientAsync, "__init__", return_value=None)
+        mocker.patch.object(ReadingsStorageClientAsync, "__init__", return_value=None)
+        mocker.patch.object(MicroserviceManagementClient, "__init__", return_value=None)
+        mocker.patch.object(MicroserviceManagementClient, "create_configuration_category", return_value=None)
+        config = get_cat(Ingest.default_config)
+        config['adaptive_readings_insert']['value'] = 'true'
+        mocker.patch.object(MicroserviceManagementClient, "get_configuration_category", return_value=config)
+        parent_service = MagicMock(_core_microservice_management_client=MicroserviceManagementClient())
+        mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
+
+        # WHEN
+        await Ingest.start(parent=parent_service)
+
+        # THEN
+        assert isinstance(Ingest._batch_tuner, BatchTuner)
+        assert Ingest._readings_insert_batch_size == Ingest._batch_tuner.batch_size
+        assert Ingest._readings_insert_batch_timeout_seconds == Ingest._batch_tuner.timeout
+
+    @pytest.mark.asyncio
+    async def test_start_dedup(self, mocker):
+        # GIVEN
+        mocker.patch.object(StorageClientAsync, "__init__", return_value=None)
+        mocker.patch.object(ReadingsStorageClientAsync, "__init__", return_value=None)
+        mocker.patch.object(MicroserviceManagementClient, "__init__", return_value=None)
+        mocker.patch.object(MicroserviceManagementClient, "create_configuration_category", return_value=None)
+        config = get_cat(Ingest.default_config)
+        config['read_key_dedup_window_seconds']['value'] = '60'
+        mocker.patch.object(MicroserviceManagementClient, "get_configuration_category", return_value=config)
+        parent_service = MagicMock(_core_microservice_management_client=MicroserviceManagementClient())
+        mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
+
+        # WHEN
+        await Ingest.start(parent=parent_service)
+
+        # THEN
+        assert isinstance(Ingest._read_keys, ReadKeyWindow)
+
+    def test_batch_statistics_keys(self):
+        Ingest._parent_service = MagicMock(_name='CoAP ' + 'x' * 60)
+        batch_size_key, timeout_key = Ingest._batch_statistics_keys()
+        assert batch_size_key.startswith('COAP XXX') and batch_size_key.endswith('_INSERT_BATCH_SIZE')
+        assert timeout_key.startswith('COAP XXX') and timeout_key.endswith('_INSERT_TIMEOUT_MS')
+        assert 56 == len(batch_size_key) == len(timeout_key)
+
     @pytest.mark.asyncio
     async def test_stop(self, mocker):
         # GIVEN
@@ -183,8 +333,9 @@ class TestIngest:
         create_cfg = mocker.patch.object(MicroserviceManagementClient, "create_configuration_category", return_value=None)
         get_cfg = mocker.patch.object(MicroserviceManagementClient, "get_configuration_category", return_value=get_cat(Ingest.default_config))
         parent_service = MagicMock(_core_microservice_management_client=MicroserviceManagementClient())
+        parent_service._readings_storage_async.close.return_value = mock_coro()
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
-        mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
 
         # WHEN
         await Ingest.start(parent=parent_service)
@@ -196,12 +347,10 @@ class TestIngest:
         assert 1 == get_cfg.call_count
         assert Ingest._stop is True
         assert Ingest._started is False
-        assert Ingest._insert_readings_wait_tasks is None
         assert Ingest._insert_readings_tasks is None
         assert Ingest._readings_lists is None
-        assert Ingest._readings_list_batch_size_reached is None
-        assert Ingest._readings_list_not_empty is None
-        assert Ingest._readings_lists_not_full is None
+        assert Ingest._readings_lists_not_full_waiters is None
+        assert 1 == parent_service._readings_storage_async.close.call_count
         assert 0 == log_exception.call_count
 
     @pytest.mark.asyncio
@@ -218,7 +367,86 @@ class TestIngest:
     async def test__insert_readings(self, mocker):
         pass
 
+    @pytest.mark.asyncio
+    async def test__insert_readings_concurrently(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 2
+        Ingest._readings_list_size = 2
+        Ingest._readings_insert_batch_size = 2
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size) for _ in range(2)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        for i in range(4):
+            Ingest._readings_lists[i // 2].push(b'{"reading":%d}' % i)
+        Ingest.readings_storage_async = MagicMock(spec=ReadingsStorageClientAsync)
+        in_flight = []
+        storage_ready = asyncio.Event()
+
+        async def append(payload):
+            readings = json_codec.loads(payload)['readings']
+            in_flight.append(readings)
+            await storage_ready.wait()
+            if {"reading": 2} in readings:
+                raise StorageServerError(400, 'Bad Request', {"source": "append", "message": "bad readings",
+                                                              "retryable": False})
+            return {"response": "appended"}
+        Ingest.readings_storage_async.append.side_effect = append
+        mocker.patch.object(ingest._LOGGER, "info")
+        mocker.patch.object(ingest._LOGGER, "error")
+
+        # WHEN
+        tasks = [asyncio.ensure_future(Ingest._insert_readings(list_index)) for list_index in range(2)]
+        await asyncio.sleep(0.01)
+
+        # THEN
+        assert [[{"reading": 0}, {"reading": 1}], [{"reading": 2}, {"reading": 3}]] == in_flight
+        storage_ready.set()
+        await asyncio.sleep(0.01)
+        Ingest._stop = True
+        for readings_list in Ingest._readings_lists:
+            readings_list.release()
+        await asyncio.gather(*tasks)
+        assert 2 == Ingest._readings_stats
+        assert 2 == Ingest._discarded_readings_stats
+        assert [0, 0] == [len(readings_list) for readings_list in Ingest._readings_lists]
+
     @pytest.mark.skip(reason="This method uses a while True loop. Investigate as to how to write unit test for an infinite loop.")
+    @pytest.mark.asyncio
+    async def test_metrics(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 2
+        Ingest._readings_list_size = 4
+        Ingest._readings_insert_batch_size = 2
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size) for _ in range(2)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest._metrics = IngestMetrics()
+        Ingest._started = True
+        Ingest.readings_storage_async = MagicMock(spec=ReadingsStorageClientAsync)
+        Ingest.readings_storage_async.append.side_effect = [RuntimeError('reset'), mock_coro()]
+        mocker.patch.object(ingest._LOGGER, "exception")
+        mocker.patch.object(ingest, "backoff", return_value=0)
+
+        # WHEN
+        await Ingest.add_readings_batch([{'asset': 'pump1', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00',
+                                          'readings': {"velocity": i}} for i in range(3)])
+        task = asyncio.ensure_future(Ingest._insert_readings(0))
+        while not Ingest._metrics.inserts:
+            await asyncio.sleep(0.01)
+        Ingest._stop = True
+        Ingest._readings_lists[0].release()
+        await task
+        metrics = Ingest.metrics()
+
+        # THEN
+        assert 3 == metrics['readings']['added']
+        assert 2 == metrics['readings']['inserted']
+        assert 1 == metrics['inserts']['count']
+        assert 1 == metrics['inserts']['retries']
+        assert 2 == metrics['inserts']['batch_size']['last']
+        assert 2 == metrics['inserts']['batch_size']['current']
+        assert [{'readings': 0, 'capacity': 4}, {'readings': 1, 'capacity': 4}] == metrics['buffers']['lists']
+        assert 0.125 == metrics['buffers']['fill_ratio']
+
     @pytest.mark.asyncio
     async def test_write_statistics(self, mocker):
         pass
@@ -229,13 +457,12 @@ class TestIngest:
         Ingest._max_concurrent_readings_inserts = 1
         Ingest._readings_list_size = 2
         Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
         # Insert one task and leave room for more
-        Ingest._readings_lists[0].append(mock_coro())
+        Ingest._readings_lists[0].push(mock_coro())
         log_warning = mocker.patch.object(ingest._LOGGER, "warning")
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
-        mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
 
         # WHEN
         retval = Ingest.is_available()
@@ -250,13 +477,12 @@ class TestIngest:
         Ingest._max_concurrent_readings_inserts = 1
         Ingest._readings_list_size = 2
         Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_lists[0].append(mock_coro())
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
+        Ingest._readings_lists[0].push(mock_coro())
         log_warning = mocker.patch.object(ingest._LOGGER, "warning")
         Ingest._stop = True
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
-        mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
 
         # WHEN
         retval = Ingest.is_available()
@@ -271,14 +497,13 @@ class TestIngest:
         Ingest._max_concurrent_readings_inserts = 1
         Ingest._readings_list_size = 2
         Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
         # Insert two tasks
-        Ingest._readings_lists[0].append(mock_coro())
-        Ingest._readings_lists[0].append(mock_coro())
+        Ingest._readings_lists[0].push(mock_coro())
+        Ingest._readings_lists[0].push(mock_coro())
         log_warning = mocker.patch.object(ingest._LOGGER, "warning")
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
-        mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
 
         # WHEN
         retval = Ingest.is_available()
@@ -306,13 +531,10 @@ class TestIngest:
         Ingest._max_concurrent_readings_inserts = 1
         Ingest._readings_list_size = 2
         Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_list_not_empty = []
-        Ingest._readings_list_not_empty.append(asyncio.Event())
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
         Ingest._started = True
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
-        mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
         assert 0 == len(Ingest._readings_lists[0])
         assert 'PUMP1' not in list(Ingest._sensor_stats.keys())
 
@@ -325,6 +547,11 @@ class TestIngest:
         # THEN
         assert 1 == len(Ingest._readings_lists[0])
         assert 1 == Ingest._sensor_stats['PUMP1']
+        # buffered serialized, as sent to storage
+        row = Ingest._readings_lists[0].peek(1)[0]
+        assert isinstance(row, bytes)
+        assert {'asset_code': 'pump1', 'read_key': str(data['key']), 'reading': data['readings'],
+                'user_ts': data['timestamp']} == json_codec.loads(row)
 
     @pytest.mark.asyncio
     async def test_add_readings_if_stop(self, mocker):
@@ -344,14 +571,11 @@ class TestIngest:
         Ingest._max_concurrent_readings_inserts = 1
         Ingest._readings_list_size = 2
         Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_list_not_empty = []
-        Ingest._readings_list_not_empty.append(asyncio.Event())
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
         Ingest._stop = True
         log_warning = mocker.patch.object(ingest._LOGGER, "warning")
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
-        mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
         assert 0 == len(Ingest._readings_lists[0])
 
         # WHEN
@@ -383,13 +607,10 @@ class TestIngest:
         Ingest._max_concurrent_readings_inserts = 1
         Ingest._readings_list_size = 2
         Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_list_not_empty = []
-        Ingest._readings_list_not_empty.append(asyncio.Event())
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
         Ingest._started = False
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
-        mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
         assert 0 == len(Ingest._readings_lists[0])
 
         # WHEN
@@ -420,13 +641,10 @@ class TestIngest:
         Ingest._max_concurrent_readings_inserts = 1
         Ingest._readings_list_size = 2
         Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_list_not_empty = []
-        Ingest._readings_list_not_empty.append(asyncio.Event())
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
         Ingest._started = True
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
-        mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
         assert 0 == len(Ingest._readings_lists[0])
 
         # WHEN
@@ -464,6 +682,13 @@ class TestIngest:
                                       timestamp=data['timestamp'],
                                       key=data['key'],
                                       readings=123)
+
+        # Check for readings which can not be serialized
+        with pytest.raises(TypeError):
+            await Ingest.add_readings(asset=data['asset'],
+                                      timestamp=data['timestamp'],
+                                      key=data['key'],
+                                      readings={"velocity": object()})
         # THEN
         assert 0 == len(Ingest._readings_lists[0])
 
@@ -486,18 +711,10 @@ class TestIngest:
         Ingest._readings_list_size = 1
         Ingest._readings_insert_batch_size = 1
         Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_lists.append([])
-        Ingest._readings_list_not_empty = []
-        Ingest._readings_list_not_empty.append(asyncio.Event())
-        Ingest._readings_list_not_empty.append(asyncio.Event())
-        Ingest._readings_list_batch_size_reached = []
-        Ingest._readings_list_batch_size_reached.append(asyncio.Event())
-        Ingest._readings_list_batch_size_reached.append(asyncio.Event())
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size), RingBuffer(Ingest._readings_list_size)]
         Ingest._started = True
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
-        mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
+        mocker.patch.object(Ingest, "_insert_readings", side_effect=lambda list_index: mock_coro())
         assert 0 == len(Ingest._readings_lists[0])
         assert 'PUMP1' not in list(Ingest._sensor_stats.keys())
 
@@ -516,3 +733,436 @@ class TestIngest:
         assert 1 == len(Ingest._readings_lists[0])
         assert 1 == len(Ingest._readings_lists[1])
         assert 2 == Ingest._sensor_stats['PUMP1']
+
+    @pytest.mark.asyncio
+    async def test_add_readings_waits_for_room(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 1
+        Ingest._readings_insert_batch_size = 1
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest._started = True
+        mocker.patch.object(ingest._LOGGER, "warning")
+        await Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00', readings={})
+
+        # WHEN
+        waiting = asyncio.ensure_future(Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00',
+                                                            readings={"velocity": 10}))
+        await asyncio.sleep(0)
+        assert waiting.done() is False
+        assert 1 == len(Ingest._readings_lists_not_full_waiters)
+        # the insert loop removes a batch
+        Ingest._wake_add_readings(Ingest._readings_lists[0].drop(1))
+        await waiting
+
+        # THEN
+        assert 0 == len(Ingest._readings_lists_not_full_waiters)
+        assert [{"velocity": 10}] == [json_codec.loads(r)['reading'] for r in Ingest._readings_lists[0].peek(1)]
+        assert 2 == Ingest._sensor_stats['PUMP1']
+
+    @pytest.mark.asyncio
+    async def test_add_readings_waiting_when_stopped(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 1
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
+        Ingest._readings_lists[0].push({})
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest._started = True
+        mocker.patch.object(ingest._LOGGER, "warning")
+        waiting = asyncio.ensure_future(Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00'))
+        await asyncio.sleep(0)
+
+        # WHEN
+        Ingest._stop = True
+        Ingest._wake_add_readings(len(Ingest._readings_lists_not_full_waiters))
+
+        # THEN
+        with pytest.raises(RuntimeError):
+            await waiting
+        assert 1 == len(Ingest._readings_lists[0])
+
+    @pytest.mark.asyncio
+    async def test_wait_capacity(self, mocker):
+        # GIVEN
+        Ingest._readings_lists = [RingBuffer(5), RingBuffer(5)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest._capacity_waiters = collections.deque()
+        Ingest._started = True
+        Ingest._readings_lists[0].extend([b'{}'] * 5)
+        Ingest._readings_lists[1].extend([b'{}'] * 3)
+        assert 0.8 == Ingest.fill_ratio()
+        await Ingest.wait_capacity()
+
+        # WHEN
+        Ingest._readings_lists[1].push(b'{}')
+        waiting = [asyncio.ensure_future(Ingest.wait_capacity()) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert 0.9 == Ingest.fill_ratio()
+        assert not any(w.done() for w in waiting)
+        # Paused until drained to the low watermark, also for the calls made below the high watermark
+        Ingest._wake_add_readings(Ingest._readings_lists[1].drop(3))
+        late = asyncio.ensure_future(Ingest.wait_capacity())
+        await asyncio.sleep(0)
+        assert not any(w.done() for w in waiting + [late])
+        Ingest._wake_add_readings(Ingest._readings_lists[0].drop(1))
+        await asyncio.sleep(0)
+
+        # THEN
+        assert all(w.done() for w in waiting + [late])
+        assert 0.5 == Ingest.fill_ratio()
+        assert 0 == len(Ingest._capacity_waiters)
+
+    @pytest.mark.asyncio
+    async def test_wait_capacity_when_stopped(self, mocker):
+        # GIVEN
+        Ingest._readings_lists = [RingBuffer(1)]
+        Ingest._readings_lists[0].push(b'{}')
+        Ingest._capacity_waiters = collections.deque()
+        Ingest._started = True
+        waiting = asyncio.ensure_future(Ingest.wait_capacity())
+        await asyncio.sleep(0)
+        assert waiting.done() is False
+
+        # WHEN
+        Ingest._stop = True
+        Ingest._wake_wait_capacity()
+
+        # THEN
+        await waiting
+        await Ingest.wait_capacity()
+
+    @pytest.mark.asyncio
+    async def test_add_readings_duplicate(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 2
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest._read_keys = ReadKeyWindow(60, 64 * 1024, 1000)
+        Ingest._started = True
+        key = uuid.uuid4()
+
+        # WHEN
+        await Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00', key=key,
+                                  readings={"velocity": 1})
+        # the list is full but the duplicate does not wait for room
+        await Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00', key=str(key),
+                                  readings={"velocity": 1})
+        await Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00',
+                                  readings={"velocity": 2})
+        counts = await Ingest.add_readings_batch([
+            {'asset': 'pump1', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'key': str(key)},
+            {'asset': 'pump1', 'timestamp': None, 'key': str(uuid.uuid4())}])
+
+        # THEN
+        assert [{"velocity": 1}, {"velocity": 2}] == [json_codec.loads(r)['reading']
+                                                      for r in Ingest._readings_lists[0].peek(2)]
+        assert {'accepted': 0, 'discarded': 2} == counts
+        assert 2 == Ingest._duplicate_readings_stats
+        assert 1 == Ingest._discarded_readings_stats
+        assert 2 == Ingest._sensor_stats['PUMP1']
+
+    @pytest.mark.asyncio
+    async def test_add_readings_filtered(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 10
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest._started = True
+        Ingest.set_readings_filter('{"pump1": {"deadband": 1}}')
+
+        # WHEN
+        for velocity in (10, 10.5, 11):
+            await Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00',
+                                      readings={"velocity": velocity})
+        counts = await Ingest.add_readings_batch([
+            {'asset': 'pump1', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'readings': {"velocity": 11.5}},
+            {'asset': 'pump2', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'readings': {"velocity": 11.5}}])
+
+        # THEN
+        assert [("pump1", 10), ("pump1", 11), ("pump2", 11.5)] == [
+            (r['asset_code'], r['reading']['velocity'])
+            for r in (json_codec.loads(row) for row in Ingest._readings_lists[0].peek(10))]
+        assert {'accepted': 2, 'discarded': 0} == counts
+        assert 2 == Ingest._readings_filter.filtered
+        assert {'PUMP1': 2, 'PUMP2': 1} == Ingest._sensor_stats
+
+    @pytest.mark.asyncio
+    async def test_add_readings_aggregated(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 10
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest.set_readings_aggregation({'pump1': {'window': 10}, 'pump2': {'window': 10, 'keepOriginal': True}})
+        Ingest._started = True
+        mocker.patch.object(reading_aggregator.time, 'time', side_effect=[100, 101, 102, 105, 111])
+
+        # WHEN
+        await Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00',
+                                  readings={"velocity": 1})
+        counts = await Ingest.add_readings_batch([
+            {'asset': 'pump1', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'readings': {"velocity": 2}},
+            {'asset': 'pump2', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'readings': {"velocity": 5}},
+            {'asset': 'pump1', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'readings': {"velocity": 6}}])
+        await Ingest.add_readings(asset='pump2', timestamp='2017-01-02T01:02:03.23232Z-05:00',
+                                  readings={"velocity": 7})
+        await Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00',
+                                  readings={"velocity": 8})
+
+        # THEN
+        assert {'accepted': 3, 'discarded': 0} == counts
+        rows = [json_codec.loads(row) for row in Ingest._readings_lists[0].peek(10)]
+        assert [("pump2", {"velocity": 5}),
+                ("pump2", {"velocity": 7}),
+                ("pump1/aggregate", {"velocity_min": 1, "velocity_max": 6, "velocity_mean": 3.0,
+                                     "velocity_count": 3, "velocity_last": 6})] == [
+            (r['asset_code'], r['reading']) for r in rows]
+        assert {'PUMP2': 2, 'PUMP1/AGGREGATE': 1} == Ingest._sensor_stats
+
+    @pytest.mark.asyncio
+    async def test_emit_aggregates(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 10
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest._started = True
+        Ingest.set_readings_aggregation('{"pump1": {"window": 0.01}}')
+        await Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00',
+                                  readings={"velocity": 1})
+
+        # WHEN
+        await asyncio.sleep(0.05)
+
+        # THEN
+        assert ['pump1/aggregate'] == [json_codec.loads(row)['asset_code']
+                                       for row in Ingest._readings_lists[0].peek(10)]
+        Ingest._stop = True
+        Ingest._emit_aggregates_sleep_task.cancel()
+        await Ingest._emit_aggregates_task
+        assert Ingest._emit_aggregates_task.done()
+
+    def test_set_readings_filter(self, mocker):
+        log_error = mocker.patch.object(ingest._LOGGER, "error")
+        Ingest.set_readings_filter({'*': {'deadband': 1}})
+        readings_filter = Ingest._readings_filter
+        assert readings_filter is not None
+
+        # unchanged, or invalid, the filter is kept
+        Ingest.set_readings_filter({'*': {'deadband': 1}})
+        Ingest.set_readings_filter('{"*": {"deadband": "high"}}')
+        Ingest.set_readings_filter('not json')
+        assert readings_filter is Ingest._readings_filter
+        assert 2 == log_error.call_count
+
+        Ingest.set_readings_filter('{}')
+        assert Ingest._readings_filter is None
+
+    @pytest.mark.asyncio
+    async def test_add_readings_spilled_when_full(self, mocker, tmpdir):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 1
+        Ingest._readings_insert_batch_size = 1
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest._spill_journal = SpillJournal(str(tmpdir), 1024 * 1024, 64 * 1024)
+        Ingest._spill_journal_not_empty = asyncio.Event()
+        Ingest._started = True
+        mocker.patch.object(ingest._LOGGER, "warning")
+        await Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00', readings={})
+
+        # WHEN
+        await Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00',
+                                  readings={"velocity": 10})
+        counts = await Ingest.add_readings_batch([{'asset': 'pump2', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00',
+                                                   'readings': {"velocity": i}} for i in range(2)])
+
+        # THEN
+        assert {'accepted': 2, 'discarded': 0} == counts
+        assert 0 == len(Ingest._readings_lists_not_full_waiters)
+        assert 1 == len(Ingest._readings_lists[0])
+        assert Ingest._spill_journal_not_empty.is_set()
+        assert [{"velocity": 10}, {"velocity": 0}, {"velocity": 1}] == [
+            json_codec.loads(r)['reading'] for r in Ingest._spill_journal.peek(5)]
+        assert {'PUMP1': 2, 'PUMP2': 2} == Ingest._sensor_stats
+        Ingest._spill_journal.close()
+
+    def test_spill_or_discard(self, mocker, tmpdir):
+        # GIVEN
+        # 24 bytes of header and 14 bytes for each row: room for 4 rows
+        Ingest._spill_journal = SpillJournal(str(tmpdir), 80)
+        Ingest._spill_journal_not_empty = asyncio.Event()
+        log_warning = mocker.patch.object(ingest._LOGGER, "warning")
+
+        # WHEN
+        Ingest._spill_or_discard([b'{"reading":%d}' % i for i in range(6)])
+
+        # THEN
+        assert 4 == len(Ingest._spill_journal)
+        assert 2 == Ingest._discarded_readings_stats
+        log_warning.assert_called_once_with('%s readings discarded, the spill journal is disabled or full', 2)
+        Ingest._spill_journal.close()
+
+    def test_spill_or_discard_journal_disabled(self, mocker):
+        log_warning = mocker.patch.object(ingest._LOGGER, "warning")
+        Ingest._spill_or_discard([b'{"reading":%d}' % i for i in range(3)])
+        Ingest._spill_or_discard([])
+        assert 3 == Ingest._discarded_readings_stats
+        assert 1 == log_warning.call_count
+
+    @pytest.mark.asyncio
+    async def test_drain_spill_journal(self, mocker, tmpdir):
+        # GIVEN
+        Ingest._readings_insert_batch_size = 2
+        Ingest._spill_journal = SpillJournal(str(tmpdir), 1024 * 1024, 64 * 1024)
+        Ingest._spill_journal_not_empty = asyncio.Event()
+        Ingest._spill([b'{"reading":%d}' % i for i in range(3)])
+        Ingest.readings_storage_async = MagicMock(spec=ReadingsStorageClientAsync)
+        payloads = []
+
+        async def append(payload):
+            payloads.append(json_codec.loads(payload)['readings'])
+            if len(payloads) == 1:
+                raise CircuitBreakerOpen(retry_after=0.01)
+            return {"response": "appended"}
+        Ingest.readings_storage_async.append.side_effect = append
+        mocker.patch.object(ingest._LOGGER, "info")
+
+        # WHEN
+        task = asyncio.ensure_future(Ingest._drain_spill_journal())
+        while len(Ingest._spill_journal):
+            await asyncio.sleep(0.01)
+        Ingest._stop = True
+        Ingest._spill_journal_not_empty.set()
+        await task
+
+        # THEN
+        assert [[{"reading": 0}, {"reading": 1}], [{"reading": 0}, {"reading": 1}], [{"reading": 2}]] == payloads
+        assert 3 == Ingest._readings_stats
+        Ingest._spill_journal.close()
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 2
+        Ingest._readings_list_size = 3
+        Ingest._readings_insert_batch_size = 2
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size) for _ in range(2)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest._started = True
+        log_warning = mocker.patch.object(ingest._LOGGER, "warning")
+        batch = [{'asset': 'pump1', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'key': str(uuid.uuid4()),
+                  'readings': {"velocity": i}} for i in range(3)]
+        batch.append({'asset': 'pump2', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00'})
+        batch.append({'asset': 'pump1', 'timestamp': None, 'readings': {}})
+        batch.append({'asset': 'pump1', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'readings': 5})
+        batch.append({'timestamp': '2017-01-02T01:02:03.23232Z-05:00'})
+
+        # WHEN
+        counts = await Ingest.add_readings_batch(batch)
+
+        # THEN
+        assert {'accepted': 4, 'discarded': 3} == counts
+        assert 3 == Ingest._discarded_readings_stats
+        assert 1 == log_warning.call_count
+        # the batch fills a list up to the batch size, then the next one
+        rows = [[json_codec.loads(r) for r in readings_list.peek(3)] for readings_list in Ingest._readings_lists]
+        assert [{"velocity": 0}, {"velocity": 1}] == [r['reading'] for r in rows[0]]
+        assert [{"velocity": 2}, {}] == [r['reading'] for r in rows[1]]
+        assert 'None' == rows[1][1]['read_key']
+        assert {'PUMP1': 3, 'PUMP2': 1} == Ingest._sensor_stats
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch_waits_for_room(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 2
+        Ingest._readings_insert_batch_size = 2
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest._started = True
+        mocker.patch.object(ingest._LOGGER, "warning")
+        batch = [{'asset': 'pump1', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'readings': {"velocity": i}}
+                 for i in range(3)]
+
+        # WHEN
+        waiting = asyncio.ensure_future(Ingest.add_readings_batch(batch))
+        await asyncio.sleep(0)
+        assert waiting.done() is False
+        assert 2 == len(Ingest._readings_lists[0])
+        # the insert loop removes a batch
+        Ingest._wake_add_readings(Ingest._readings_lists[0].drop(2))
+        counts = await waiting
+
+        # THEN
+        assert {'accepted': 3, 'discarded': 0} == counts
+        assert 0 == len(Ingest._readings_lists_not_full_waiters)
+        assert [{"velocity": 2}] == [json_codec.loads(r)['reading'] for r in Ingest._readings_lists[0].peek(2)]
+        assert 3 == Ingest._sensor_stats['PUMP1']
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch_when_stopped(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 1
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest._started = True
+        mocker.patch.object(ingest._LOGGER, "warning")
+        batch = [{'asset': 'pump1', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00'} for _ in range(3)]
+        waiting = asyncio.ensure_future(Ingest.add_readings_batch(batch))
+        await asyncio.sleep(0)
+
+        # WHEN
+        Ingest._stop = True
+        Ingest._wake_add_readings(len(Ingest._readings_lists_not_full_waiters))
+
+        # THEN
+        assert {'accepted': 1, 'discarded': 2} == await waiting
+        assert 0 == Ingest._discarded_readings_stats
+        assert {'accepted': 0, 'discarded': 3} == await Ingest.add_readings_batch(batch)
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch_aggregated_when_stopped(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_list_size = 1
+        Ingest._current_readings_list_index = 0
+        Ingest._readings_lists = [RingBuffer(Ingest._readings_list_size)]
+        Ingest._readings_lists_not_full_waiters = collections.deque()
+        Ingest.set_readings_aggregation({'pump1': {'window': 10}, 'pump2': {'window': 10, 'keepOriginal': True}})
+        Ingest._readings_aggregator.add('pump1', {"velocity": 1}, 100)
+        Ingest._started = True
+        mocker.patch.object(reading_aggregator.time, 'time', return_value=111)
+        log_warning = mocker.patch.object(ingest._LOGGER, "warning")
+        # the readings of pump2, then the aggregate of the window of pump1 which ended
+        batch = [{'asset': 'pump2', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'readings': {"velocity": 2}},
+                 {'asset': 'pump2', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'readings': {"velocity": 3}},
+                 {'asset': 'pump1', 'timestamp': '2017-01-02T01:02:03.23232Z-05:00', 'readings': {"velocity": 4}}]
+        waiting = asyncio.ensure_future(Ingest.add_readings_batch(batch))
+        await asyncio.sleep(0)
+
+        # WHEN
+        Ingest._stop = True
+        Ingest._wake_add_readings(len(Ingest._readings_lists_not_full_waiters))
+
+        # THEN
+        # the second reading of pump2 is discarded, not the aggregate, nor the reading of pump1 folded into the window
+        assert {'accepted': 2, 'discarded': 1} == await waiting
+        log_warning.assert_called_with('The South Service is stopping, %s readings discarded', 1)
+        assert [{"velocity": 2}] == [json_codec.loads(row)['reading'] for row in Ingest._readings_lists[0].peek(1)]
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test services/south/ingest_metrics.py """
+
+from unittest.mock import patch
+
+import pytest
+
+from foglamp.services.south import ingest_metrics
+from foglamp.services.south.ingest_metrics import IngestMetrics
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "ingest")
+class TestIngestMetrics:
+
+    def test_record_insert(self):
+        metrics = IngestMetrics()
+        metrics.record_insert(100, 0.02)
+        metrics.record_insert(300, 0.3)
+        inserts = metrics.to_dict()['inserts']
+        assert 2 == inserts['count']
+        assert {'last': 300, 'max': 300, 'mean': 200.0} == {k: inserts['batch_size'][k]
+                                                             for k in ('last', 'max', 'mean')}
+        # cumulative
+        assert (0, 1, 2, 2) == tuple(inserts['batch_size']['buckets'][le] for le in ('64', '256', '1024', '+Inf'))
+        assert 0.3 == inserts['latency']['max']
+        assert (0, 1, 1, 2, 2) == tuple(inserts['latency']['buckets'][le]
+                                        for le in ('0.01', '0.025', '0.25', '0.5', '+Inf'))
+
+    def test_readings_rate(self):
+        with patch.object(ingest_metrics.time, 'monotonic', side_effect=[10, 10.5, 12, 12.5]):
+            metrics = IngestMetrics()
+            metrics.added = 50
+            # measured over a second at least
+            assert 0.0 == metrics.to_dict()['readings']['per_second']
+            metrics.added = 200
+            readings = metrics.to_dict()['readings']
+            assert 100.0 == readings['per_second']
+            assert 100.0 == readings['per_second_since_start']
+            metrics.added = 250
+            assert 100.0 == metrics.to_dict()['readings']['per_second']
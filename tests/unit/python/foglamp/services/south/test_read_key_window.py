@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test services/south/read_key_window.py """
+
+import uuid
+from unittest.mock import patch
+
+import pytest
+
+from foglamp.services.south import read_key_window
+from foglamp.services.south.read_key_window import ReadKeyWindow
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "ingest")
+class TestReadKeyWindow:
+
+    def test_invalid_window_or_rate(self):
+        with pytest.raises(ValueError):
+            ReadKeyWindow(0, 1024, 1000)
+        with pytest.raises(ValueError):
+            ReadKeyWindow(60, 1024, 0)
+
+    def test_seen(self):
+        window = ReadKeyWindow(60, 64 * 1024, 1000)
+        key = uuid.uuid4()
+        assert window.seen(key) is False
+        assert window.seen(key) is True
+        assert window.seen(str(key)) is True
+        assert window.seen(str(uuid.uuid4())) is False
+        assert 2 == len(window)
+
+    def test_invalid_key(self):
+        with pytest.raises(ValueError):
+            ReadKeyWindow(60, 64 * 1024, 1000).seen('not a uuid')
+
+    def test_expired(self):
+        with patch.object(read_key_window.time, 'monotonic', side_effect=[0, 0, 30, 61, 61]):
+            window = ReadKeyWindow(60, 64 * 1024, 1000)
+            key = uuid.uuid4()
+            assert window.seen(key) is False
+            assert window.seen(uuid.uuid4()) is False
+            assert window.seen(key) is False
+            assert window.seen(key) is True
+        assert 2 == len(window)
+
+    def test_memory_cap(self):
+        # room for 2 keys kept exactly, the older ones are in the Bloom filter
+        window = ReadKeyWindow(60, 2 * read_key_window._KEY_BYTES * 2, 1)
+        keys = [uuid.uuid4() for _ in range(4)]
+        assert [False] * 4 == [window.seen(key) for key in keys]
+        assert 2 == len(window)
+        assert [True] * 4 == [window.seen(key) for key in keys]
+
+    def test_bloom_rotated(self):
+        with patch.object(read_key_window.time, 'monotonic', side_effect=[0, 1, 2, 3, 70, 71, 140, 141]):
+            window = ReadKeyWindow(60, 2 * read_key_window._KEY_BYTES * 2, 1)
+            keys = [uuid.uuid4() for _ in range(3)]
+            assert [False] * 3 == [window.seen(key) for key in keys]
+            # in the previous generation after a window
+            assert window.seen(keys[0]) is True
+            assert window.seen(uuid.uuid4()) is False
+            # forgotten after two windows
+            assert window.seen(keys[0]) is False
+
+    def test_bloom_sized_for_rate(self):
+        window = ReadKeyWindow(60, 4096 * 1024, 1000)
+        # about 20 bits for each of the 60000 keys of a window
+        assert 1225712 == window._bloom_bits
+        assert 60000 == window._bloom_max_keys
+        # no more than half of the memory for the two generations
+        assert 1024 * 1024 * 8 == ReadKeyWindow(60, 4096 * 1024, 100000)._bloom_bits
+
+    def test_bloom_fails_open(self):
+        with patch.object(read_key_window.time, 'monotonic', return_value=0):
+            # room for 2 keys kept exactly and for 3 keys in a generation of the Bloom filter at the target rate
+            window = ReadKeyWindow(1, 2 * read_key_window._KEY_BYTES * 2, 3)
+            assert 3 == window._bloom_max_keys
+            keys = [uuid.uuid4() for _ in range(5)]
+            assert [False] * 5 == [window.seen(key) for key in keys]
+            assert [True] * 3 == [window.seen(key) for key in keys[:3]]
+            # past the keys the filter holds at the target false positive rate, its hits are taken as new keys
+            window.seen(uuid.uuid4())
+            assert window.seen(keys[0]) is False
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test services/south/reading.py """
+
+import uuid
+
+import pytest
+
+from foglamp.common import json_codec
+from foglamp.services.south.reading import reading_row
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "ingest")
+class TestReading:
+
+    def test_reading_row(self):
+        key = uuid.uuid4()
+        row = reading_row('pump "1"', key, {"velocity": 500, "temperature": {"value": 32.5}},
+                          '2017-01-02 01:02:03.23232+05:00')
+        assert isinstance(row, bytes)
+        assert {'asset_code': 'pump "1"', 'read_key': str(key), 'reading': {"velocity": 500, "temperature": {
+            "value": 32.5}}, 'user_ts': '2017-01-02 01:02:03.23232+05:00'} == json_codec.loads(row)
+
+    def test_no_key(self):
+        assert 'None' == json_codec.loads(reading_row('pump1', None, {}, 'now()'))['read_key']
+
+    def test_not_serializable(self):
+        with pytest.raises(TypeError):
+            reading_row('pump1', None, {"velocity": object()}, 'now()')
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test services/south/reading_aggregator.py """
+
+import datetime
+import json
+from unittest.mock import patch
+
+import pytest
+
+from foglamp.services.south import reading_aggregator
+from foglamp.services.south.reading_aggregator import ReadingAggregator
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_MOVEMENT = 'TI Sensortag CC2650/movement'
+
+
+def _readings(rows):
+    return [(asset, json.loads(row.decode())['reading']) for asset, row in rows]
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "ingest")
+class TestReadingAggregator:
+
+    def test_add(self):
+        aggregator = ReadingAggregator({_MOVEMENT: {'window': 1}})
+        assert 1 == aggregator.min_window
+        assert not aggregator.keeps_original(_MOVEMENT)
+        assert aggregator.keeps_original('TI Sensortag CC2650/temperature')
+        assert [] == aggregator.add('TI Sensortag CC2650/temperature', {'object': 20}, 100.5)
+
+        assert [] == aggregator.add(_MOVEMENT, {'x': 1, 'state': 'idle'}, 100.1)
+        assert [] == aggregator.add(_MOVEMENT, {'x': 3, 'state': 'moving'}, 100.9)
+        rows = aggregator.add(_MOVEMENT, {'x': 10}, 101.0)
+
+        assert [(_MOVEMENT + '/aggregate', {'x_min': 1, 'x_max': 3, 'x_mean': 2.0, 'x_count': 2, 'x_last': 3,
+                                            'state_count': 2, 'state_last': 'moving'})] == _readings(rows)
+        # timestamped at the end of the window
+        assert str(datetime.datetime.fromtimestamp(101, datetime.timezone.utc).astimezone()) == json.loads(
+            rows[0][1].decode())['user_ts']
+        assert [] == aggregator.expired(101.5)
+        assert [(_MOVEMENT + '/aggregate', {'x_min': 10, 'x_max': 10, 'x_mean': 10.0, 'x_count': 1,
+                                            'x_last': 10})] == _readings(aggregator.expired(102.0))
+        assert [] == aggregator.flush()
+
+    @pytest.mark.parametrize("use_numpy", [False, True])
+    def test_add_many(self, use_numpy):
+        if use_numpy:
+            pytest.importorskip('numpy')
+        readings = [{'x': i, 'y': -i} for i in range(100)]
+        aggregator = ReadingAggregator({'*': {'window': 5, 'keepOriginal': True}})
+        assert aggregator.keeps_original(_MOVEMENT)
+        with patch.object(reading_aggregator, '_NUMPY_MIN_VALUES', 64 if use_numpy else 1000):
+            assert [] == aggregator.add_many(_MOVEMENT, readings[:50], 10)
+            assert [] == aggregator.add_many(_MOVEMENT, readings[50:], 12)
+        assert [(_MOVEMENT + '/aggregate', {'x_min': 0, 'x_max': 99, 'x_mean': 49.5, 'x_count': 100, 'x_last': 99,
+                                            'y_min': -99, 'y_max': 0, 'y_mean': -49.5, 'y_count': 100,
+                                            'y_last': -99})] == _readings(aggregator.flush(15))
+
+    def test_flush_partial(self):
+        aggregator = ReadingAggregator({'*': {'window': 10}})
+        aggregator.add(_MOVEMENT, {'x': 1}, 101)
+        aggregator.add('pump1', {'x': 2}, 95)
+        rows = aggregator.flush(103.5)
+        # the ended window as expired, the other one timestamped at the flush
+        assert [(_MOVEMENT + '/aggregate', {'x_min': 1, 'x_max': 1, 'x_mean': 1.0, 'x_count': 1, 'x_last': 1,
+                                            'partial': True}),
+                ('pump1/aggregate', {'x_min': 2, 'x_max': 2, 'x_mean': 2.0, 'x_count': 1,
+                                     'x_last': 2})] == _readings(rows)
+        assert str(datetime.datetime.fromtimestamp(103.5, datetime.timezone.utc).astimezone()) == json.loads(
+            dict(rows)[_MOVEMENT + '/aggregate'].decode())['user_ts']
+        assert [] == aggregator.flush(104)
+
+    def test_aggregates_not_aggregated(self):
+        aggregator = ReadingAggregator({'*': {'window': 1}})
+        assert aggregator.keeps_original(_MOVEMENT + '/aggregate')
+        assert [] == aggregator.add(_MOVEMENT + '/aggregate', {'x_min': 1}, 10)
+        assert [] == aggregator.flush()
+
+    @pytest.mark.parametrize("config", [
+        {'pump': 1},
+        {'pump': {}},
+        {'pump': {'window': 0}},
+        {'pump': {'window': 1, 'size': 10}},
+        {'pump': {'window': 1, 'keepOriginal': 'yes'}},
+    ])
+    def test_invalid_config(self, config):
+        with pytest.raises(ValueError):
+            ReadingAggregator(config)
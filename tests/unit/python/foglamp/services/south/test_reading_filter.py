@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test services/south/reading_filter.py """
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from foglamp.services.south import reading_filter
+from foglamp.services.south.reading_filter import ReadingFilter
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def _filter(readings_filter, values, asset='pump'):
+    """ Filters a reading a second for each value, returns the values of the rows to buffer """
+    rows = []
+    with patch.object(reading_filter.time, 'monotonic', side_effect=range(len(values))):
+        for value in values:
+            rows.extend(readings_filter.filter(asset, {'velocity': value}, json.dumps(value)))
+    return [json.loads(row) for row in rows]
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "ingest")
+class TestReadingFilter:
+
+    def test_not_filtered(self):
+        readings_filter = ReadingFilter({'pump': {'deadband': 1}})
+        assert ['row'] == readings_filter.filter('fan', {'speed': 1}, 'row')
+        assert not ReadingFilter({})
+
+    def test_deadband(self):
+        readings_filter = ReadingFilter({'*': {'deadband': 1}})
+        assert [10, 11, 9.5, 8] == _filter(readings_filter, [10, 10.5, 10.9, 11, 10.5, 9.5, 9, 8])
+        assert 4 == readings_filter.filtered
+
+    def test_max_interval(self):
+        readings_filter = ReadingFilter({'pump': {'deadband': 1, 'maxInterval': 3}})
+        assert [10, 10, 10] == _filter(readings_filter, [10] * 7)
+
+    def test_swinging_door(self):
+        readings_filter = ReadingFilter({'pump': {'compression': 0.5}})
+        # A ramp, a plateau, then a drop: the turning points are stored
+        values = [0, 1, 2, 3, 4, 4, 4, 4, 0]
+        assert [0, 4, 4] == _filter(readings_filter, values)
+        assert ['0'] == readings_filter.flush()
+        assert 5 == readings_filter.filtered
+
+    def test_datapoints_changed(self):
+        readings_filter = ReadingFilter({'pump': {'compression': 0.5}})
+        readings_filter.filter('pump', {'velocity': 1}, 'first')
+        readings_filter.filter('pump', {'velocity': 1}, 'held')
+        assert ['held', 'status'] == readings_filter.filter('pump', {'velocity': 1, 'status': 'off'}, 'status')
+        assert [] == readings_filter.filter('pump', {'velocity': 1, 'status': 'off'}, 'same status')
+        assert ['same status', 'on'] == readings_filter.filter('pump', {'velocity': 1, 'status': 'on'}, 'on')
+
+    @pytest.mark.parametrize("config", [
+        {'pump': 1},
+        {'pump': {'threshold': 1}},
+        {'pump': {'deadband': -1}},
+        {'pump': {'compression': 'high'}},
+        {'pump': {'maxInterval': True}},
+    ])
+    def test_invalid_config(self, config):
+        with pytest.raises(ValueError):
+            ReadingFilter(config)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test services/south/ring_buffer.py """
+
+import asyncio
+
+import pytest
+
+from foglamp.services.south.ring_buffer import RingBuffer
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "ingest")
+class TestRingBuffer:
+
+    def test_push_peek_drop(self):
+        ring = RingBuffer(3)
+        ring.push(1)
+        ring.push(2)
+        assert (2, 1) == (len(ring), ring.free)
+        assert [1, 2] == ring.peek(5)
+        assert 1 == ring.drop(1)
+        assert [2] == ring.peek(3)
+
+    def test_wraps_around(self):
+        ring = RingBuffer(3)
+        for i in range(3):
+            ring.push(i)
+        assert ring.is_full()
+        assert [0, 1] == ring.pop(2)
+        ring.push(3)
+        ring.push(4)
+        assert [2, 3, 4] == ring.peek(3)
+        assert 3 == ring.drop(10)
+        assert 0 == len(ring)
+        ring.push(5)
+        assert [5] == ring.pop(1)
+
+    def test_drop_releases_items(self):
+        ring = RingBuffer(2)
+        ring.push(0)
+        ring.push(1)
+        ring.drop(1)
+        ring.push(2)
+        ring.drop(2)
+        assert [None, None] == ring._slots
+
+    def test_push_full(self):
+        ring = RingBuffer(1)
+        ring.push(1)
+        with pytest.raises(IndexError) as excinfo:
+            ring.push(2)
+        assert "push to a full ring buffer" == str(excinfo.value)
+        assert [1] == ring.peek(1)
+
+    def test_extend(self):
+        ring = RingBuffer(4)
+        ring.extend([0, 1, 2])
+        assert [0, 1] == ring.pop(2)
+        ring.extend([3, 4, 5])
+        assert ring.is_full()
+        assert [2, 3, 4, 5] == ring.peek(4)
+        with pytest.raises(IndexError) as excinfo:
+            ring.extend([6])
+        assert "extend beyond the free room of a ring buffer" == str(excinfo.value)
+        assert [2, 3, 4, 5] == ring.pop(4)
+
+    def test_bad_capacity(self):
+        with pytest.raises(ValueError) as excinfo:
+            RingBuffer(0)
+        assert "Ring buffer capacity must be at least 1" == str(excinfo.value)
+
+    @pytest.mark.asyncio
+    async def test_level_reached(self):
+        ring = RingBuffer(4)
+        ring.push(1)
+        level = ring.level_reached(3)
+        ring.push(2)
+        assert level.done() is False
+        ring.push(3)
+        assert level.done() is True
+        assert ring.level_reached(3).done() is True
+
+    @pytest.mark.asyncio
+    async def test_level_reached_timeout(self):
+        ring = RingBuffer(4)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(ring.level_reached(2), 0.01)
+        ring.push(1)
+        ring.push(2)
+        assert ring.level_reached(2).done() is True
+
+    @pytest.mark.asyncio
+    async def test_release(self):
+        ring = RingBuffer(4)
+        level = ring.level_reached(2)
+        ring.release()
+        await level
+        assert 0 == len(ring)
+        # a new level future replaces, and releases, the pending one
+        first = ring.level_reached(2)
+        second = ring.level_reached(2)
+        assert first.done() is True
+        assert second.done() is False
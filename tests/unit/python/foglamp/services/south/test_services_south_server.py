@@ -6,6 +6,7 @@
 
 import asyncio
 import copy
+import json
 import sys
 from unittest.mock import MagicMock, Mock, call, patch
 import pytest
@@ -26,6 +27,18 @@ _TEST_CONFIG = {
         'description': 'Python module name of the plugin to load',
         'type': 'string',
         'default': 'test'
+    },
+    'readingsFilter': {
+        'description': 'Readings filter of each asset',
+        'type': 'JSON',
+        'default': '{}',
+        'value': '{}'
+    },
+    'readingsAggregation': {
+        'description': 'Readings aggregation of each asset',
+        'type': 'JSON',
+        'default': '{}',
+        'value': '{}'
     }
 }
 plugin_attrs = {
@@ -309,6 +322,32 @@ class TestServicesSouthServer:
                  call('Failed to poll for plugin test, retry count: 2')]
         log_exception.assert_has_calls(calls, any_order=True)
 
+    @pytest.mark.asyncio
+    async def test__exec_plugin_poll_adds_readings_batch(self, loop, mocker):
+        # GIVEN
+        cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
+        readings = [{'asset': 'pump{}'.format(i), 'timestamp': '2017-01-02T01:02:03.23232Z-05:00',
+                     'key': None, 'readings': {'velocity': i}} for i in range(2)]
+        south_server._plugin = MagicMock()
+        south_server._plugin.plugin_poll.side_effect = [readings, readings[0]]
+        south_server._plugin_handle = {'pollInterval': {'value': '1'}}
+        batches = []
+
+        async def add_readings_batch(batch):
+            batches.append(batch)
+            if len(batches) == 2:
+                south_server._plugin = None
+            return {'accepted': len(batch), 'discarded': 0}
+
+        mocker.patch.object(Ingest, 'add_readings_batch', side_effect=add_readings_batch)
+
+        # WHEN
+        await south_server._exec_plugin_poll()
+
+        # THEN
+        # A list polled is added as one batch, a single reading as a batch of one
+        assert [readings, [readings[0]]] == batches
+
     @pytest.mark.asyncio
     async def test_run(self, mocker):
         """Not fit for Unit test"""
@@ -399,6 +438,20 @@ class TestServicesSouthServer:
         assert 1 == log_exception.call_count
         log_exception.assert_called_with('Error in stopping South Service plugin {}, '.format(south_server._name))
 
+    @pytest.mark.asyncio
+    async def test_get_ingest_metrics(self, loop, mocker):
+        # GIVEN
+        cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
+        metrics = {'readings': {'added': 10}, 'buffers': {'fill_ratio': 0.5}}
+        mocker.patch.object(Ingest, 'metrics', return_value=metrics)
+
+        # WHEN
+        response = await south_server.get_ingest_metrics(request=None)
+
+        # THEN
+        assert 200 == response.status
+        assert metrics == json.loads(response.text)
+
     @pytest.mark.asyncio
     async def test_change(self, loop, mocker):
         # GIVEN
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test services/south/spill_journal.py """
+
+import os
+
+import pytest
+
+from foglamp.services.south.spill_journal import SpillJournal
+
+__author__ = "agent"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def _rows(start, stop):
+    return [b'{"reading":%d}' % i for i in range(start, stop)]
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "ingest")
+class TestSpillJournal:
+
+    def test_append_peek_drop(self, tmpdir):
+        journal = SpillJournal(str(tmpdir), 1024)
+        assert 3 == journal.append(_rows(0, 3))
+        assert 3 == len(journal)
+        assert _rows(0, 2) == journal.peek(2)
+        assert 2 == journal.drop(2)
+        assert _rows(2, 3) == journal.peek(5)
+        assert 1 == journal.drop(5)
+        assert 0 == len(journal)
+        assert [] == journal.peek(1)
+        journal.close()
+
+    def test_segments_rotated_and_removed(self, tmpdir):
+        # 24 bytes of header and 14 bytes for each row: 4 rows per segment
+        journal = SpillJournal(str(tmpdir), 1024, 80)
+        assert 10 == journal.append(_rows(0, 10))
+        assert 3 == len(tmpdir.listdir())
+        assert _rows(0, 6) == journal.peek(6)
+        assert 6 == journal.drop(6)
+        assert 2 == len(tmpdir.listdir())
+        assert _rows(6, 10) == journal.peek(10)
+        journal.close()
+
+    def test_size_bounded(self, tmpdir):
+        journal = SpillJournal(str(tmpdir), 160, 80)
+        assert 8 == journal.append(_rows(0, 10))
+        assert 0 == journal.append(_rows(10, 11))
+        assert 2 == len(tmpdir.listdir())
+        journal.drop(4)
+        assert 1 == journal.append(_rows(10, 11))
+        assert _rows(4, 8) + _rows(10, 11) == journal.peek(10)
+        journal.close()
+
+    def test_segment_no_larger_than_max_size(self, tmpdir):
+        journal = SpillJournal(str(tmpdir), 80)
+        assert 4 == journal.append(_rows(0, 5))
+        assert [80] == [path.size() for path in tmpdir.listdir()]
+        journal.close()
+
+    def test_max_size_too_small(self, tmpdir):
+        with pytest.raises(ValueError):
+            SpillJournal(str(tmpdir), 16, 80)
+
+    def test_row_larger_than_segment(self, tmpdir):
+        journal = SpillJournal(str(tmpdir), 1024, 80)
+        assert 1 == journal.append(_rows(0, 1) + [b'x' * 80] + _rows(1, 2))
+        assert _rows(0, 1) == journal.peek(5)
+        journal.close()
+
+    def test_reopened(self, tmpdir):
+        journal = SpillJournal(str(tmpdir), 1024, 80)
+        journal.append(_rows(0, 6))
+        journal.drop(1)
+        journal.close()
+
+        journal = SpillJournal(str(tmpdir), 1024, 80)
+        assert 5 == len(journal)
+        assert _rows(1, 6) == journal.peek(10)
+        journal.append(_rows(6, 8))
+        assert _rows(1, 8) == journal.peek(10)
+        journal.close()
+
+    def test_not_a_segment_ignored(self, tmpdir):
+        tmpdir.join('0000000000000000.seg').write_binary(b'not a segment of the spill journal')
+        tmpdir.join('readme.txt').write('not a segment')
+        journal = SpillJournal(str(tmpdir), 1024, 80)
+        assert 0 == len(journal)
+        assert 1 == journal.append(_rows(0, 1))
+        assert os.path.exists(str(tmpdir.join('0000000000000001.seg')))
+        journal.close()
@@ -32,6 +32,28 @@ async def mock_async_call():
     return True
 
 
+class MockRowIterator:
+    """ Stands for the AsyncRowIterator returned by ReadingsStorageClientAsync.fetch_iter """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
 async def mock_audit_failure():
     """ mocks audit.failure """
 
@@ -452,10 +474,6 @@ class TestSendingProcess:
                                             expected_rows):
         """Test _load_data_into_memory handling and transformations for the readings """
 
-        async def mock_coroutine():
-            """" mock_coroutine """
-            return p_rows
-
         # Checks the Readings handling
         with patch.object(asyncio, 'get_event_loop', return_value=event_loop):
             sp = SendingProcess()
@@ -465,12 +483,46 @@ class TestSendingProcess:
         sp._readings = MagicMock(spec=ReadingsStorageClientAsync)
 
         # Checks the transformations and especially the adding of the UTC timezone
-        with patch.object(sp._readings, 'fetch', return_value=mock_coroutine()):
+        with patch.object(sp._readings, 'fetch_iter', return_value=MockRowIterator(p_rows['rows'])) as patch_fetch:
 
             generated_rows = await sp._load_data_into_memory_readings(5)
 
             assert len(generated_rows) == 1
             assert generated_rows == expected_rows
+        patch_fetch.assert_called_once_with(6, sp._config['blockSize'])
+
+    @pytest.mark.asyncio
+    async def test_load_data_into_memory_readings_of_assets(self, event_loop):
+        """Test _load_data_into_memory_readings fetches a keyset page of the configured assets only """
+
+        with patch.object(asyncio, 'get_event_loop', return_value=event_loop):
+            sp = SendingProcess()
+
+        sp._config['source'] = sp._DATA_SOURCE_READINGS
+        sp._config['assets'] = ['test_asset_code', 'other_asset_code']
+        sp._readings = MagicMock(spec=ReadingsStorageClientAsync)
+
+        async def fetch_page(*args, **kwargs):
+            return {"count": 1, "next": None,
+                    "rows": [{"id": 7, "asset_code": "test_asset_code",
+                              "read_key": "ef6e1368-4182-11e8-842f-0ed5f89f718b",
+                              "reading": {"humidity": "11"}, "user_ts": "16/04/2018 16:32:55"}]}
+
+        with patch.object(sp._readings, 'fetch_page', side_effect=fetch_page) as patch_fetch:
+            generated_rows = await sp._load_data_into_memory_readings(5)
+
+        assert [{"id": 7, "asset_code": "test_asset_code", "read_key": "ef6e1368-4182-11e8-842f-0ed5f89f718b",
+                 "reading": {"humidity": 11}, "user_ts": "16/04/2018 16:32:55.000000+00"}] == generated_rows
+        patch_fetch.assert_called_once_with(['test_asset_code', 'other_asset_code'], cursor=(5,),
+                                            limit=sp._config['blockSize'], keys=('id',))
+
+    @pytest.mark.parametrize("value, expected", [
+        ("", []),
+        ("fogbench/humidity", ["fogbench/humidity"]),
+        (" fogbench/humidity, TI sensorTag/luxometer ,", ["fogbench/humidity", "TI sensorTag/luxometer"])
+    ])
+    def test_asset_codes(self, value, expected):
+        assert expected == SendingProcess._asset_codes(value)
 
     @pytest.mark.parametrize(
         "p_rows, "
@@ -2114,6 +2166,7 @@ class TestSendingProcess:
                     "memory_buffer_size": {"value": "10"},
                     "sleepInterval": {"value": "10"},
                     "plugin": {"value": "omf"},
+                    "assets": {"value": "fogbench/humidity,fogbench/temperature"},
 
                 },
                 # expected_config
@@ -2125,6 +2178,7 @@ class TestSendingProcess:
                     "memory_buffer_size": 10,
                     "sleepInterval": 10,
                     "north": "omf",
+                    "assets": ["fogbench/humidity", "fogbench/temperature"],
 
                 },
             ),
@@ -2149,6 +2203,7 @@ class TestSendingProcess:
         assert sp._config['memory_buffer_size'] == expected_config['memory_buffer_size']
         assert sp._config['sleepInterval'] == expected_config['sleepInterval']
         assert sp._config['north'] == expected_config['north']
+        assert sp._config['assets'] == expected_config['assets']
 
     def test_start_stream_not_valid(self, event_loop):
         """ Unit tests - _start - stream_id is not valid """
@@ -36,55 +36,44 @@ class TestStatisticsHistory:
             log.assert_called_once_with("StatisticsHistory")
         mock_process.assert_called_once_with()
 
-    def test_stats_keys(self):
-        storage_return = {'count': 10,
-                          'rows': [{'key': 'PURGED'}, {'key': 'SENT_4'}, {'key': 'UNSENT'}, {'key': 'SENT_2'},
-                                   {'key': 'SENT_1'}, {'key': 'READINGS'}, {'key': 'BUFFERED'}, {'key': 'UNSNPURGED'},
-                                   {'key': 'SENT_3'}, {'key': 'DISCARDED'}]}
-        mockStorageClient = MagicMock(spec=StorageClient)
-        with patch.object(FoglampProcess, '__init__'):
-            with patch.object(logger, "setup"):
-                sh = StatisticsHistory()
-                sh._storage = mockStorageClient
-                with patch.object(sh._storage, "query_tbl_with_payload", return_value=storage_return) as patch_storage:
-                    assert sh._stats_keys() == ['PURGED', 'SENT_4', 'UNSENT', 'SENT_2', 'SENT_1',
-                                                'READINGS', 'BUFFERED', 'UNSNPURGED', 'SENT_3', 'DISCARDED']
-
-                    patch_storage.assert_called_once_with('statistics', '{"modifier": "distinct", "return": ["key"]}')
-
     def test_insert_into_stats_history(self):
         mockStorageClient = MagicMock(spec=StorageClient)
+        rows = [{'key': 'Bla', 'value': 5, 'previous_value': 4}, {'key': 'Foo', 'value': 3, 'previous_value': 3}]
         with patch.object(FoglampProcess, '__init__'):
             with patch.object(logger, "setup"):
                 sh = StatisticsHistory()
                 sh._storage = mockStorageClient
-                with patch.object(sh._storage, "insert_into_tbl", return_value=None) as patch_storage:
+                with patch.object(sh._storage, "insert_many", return_value=None) as patch_storage:
                     ts = datetime.now()
-                    sh._insert_into_stats_history(key='Bla', value=1, history_ts=ts)
+                    sh._insert_into_stats_history(rows, history_ts=ts)
                     args, kwargs = patch_storage.call_args
                     assert args[0] == "statistics_history"
-                    payload = ast.literal_eval(args[1])
-                    assert payload["key"] == "Bla"
-                    assert payload["value"] == 1
-                    try:
-                        datetime.strptime(payload["history_ts"], "%Y-%m-%d %H:%M:%S.%f")
-                        assert True
-                    except ValueError:
-                        assert False
+                    payloads = [ast.literal_eval(p) for p in args[1]]
+                    assert ["Bla", "Foo"] == [p["key"] for p in payloads]
+                    assert [1, 0] == [p["value"] for p in payloads]
+                    for payload in payloads:
+                        try:
+                            datetime.strptime(payload["history_ts"], "%Y-%m-%d %H:%M:%S.%f")
+                            assert True
+                        except ValueError:
+                            assert False
+                patch_storage.assert_called_once_with("statistics_history", args[1])
 
     def test_update_previous_value(self):
         mockStorageClient = MagicMock(spec=StorageClient)
+        rows = [{'key': 'Bla', 'value': 1, 'previous_value': 0}, {'key': 'Foo', 'value': 7, 'previous_value': 3}]
         with patch.object(FoglampProcess, '__init__'):
             with patch.object(logger, "setup"):
                 sh = StatisticsHistory()
                 sh._storage = mockStorageClient
-                with patch.object(sh._storage, "update_tbl", return_value=None) as patch_storage:
-                    sh._update_previous_value(key='Bla', value=1)
+                with patch.object(sh._storage, "update_many", return_value=None) as patch_storage:
+                    sh._update_previous_value(rows)
                     args, kwargs = patch_storage.call_args
                     assert args[0] == "statistics"
-                    payload = ast.literal_eval(args[1])
-                    assert payload["where"]["value"] == "Bla"
-                    assert payload["values"]["previous_value"] == 1
+                    payloads = [ast.literal_eval(p) for p in args[1]]
+                    assert ["Bla", "Foo"] == [p["where"]["value"] for p in payloads]
+                    assert [1, 7] == [p["values"]["previous_value"] for p in payloads]
+                assert 1 == patch_storage.call_count
 
     def test_select_from_statistics(self):
         mockStorageClient = MagicMock(spec=StorageClient)
@@ -93,12 +82,10 @@ class TestStatisticsHistory:
                 sh = StatisticsHistory()
                 sh._storage = mockStorageClient
                 with patch.object(sh._storage, "query_tbl_with_payload", return_value={"a": 1}) as patch_storage:
-                    val = sh._select_from_statistics(key='Bla')
+                    val = sh._select_from_statistics()
                     assert val == {"a": 1}
-                    args, kwargs = patch_storage.call_args
-                    assert args[0] == "statistics"
-                    payload = ast.literal_eval(args[1])
-                    assert payload["where"]["value"] == "Bla"
+                patch_storage.assert_called_once_with(
+                    'statistics', '{"return": ["key", "value", "previous_value"]}')
 
     def test_run(self):
         with patch.object(FoglampProcess, '__init__'):
@@ -106,13 +93,22 @@ class TestStatisticsHistory:
                 sh = StatisticsHistory()
                 retval = {'rows': [
                     {'previous_value': 1, 'value': 5, 'key': 'PURGED'}], 'count': 1}
-                with patch.object(sh, "_stats_keys", return_value=['PURGED']) as mock_keys:
-                    with patch.object(sh, "_select_from_statistics", return_value=retval) as mock_select_stat:
-                        with patch.object(sh, "_insert_into_stats_history", return_value=None) as mock_insert_history:
-                            with patch.object(sh, "_update_previous_value", return_value=None) as mock_update:
-                                sh.run()
-                            mock_update.assert_called_once_with(key='PURGED', value=5)
-                        args, kwargs = mock_insert_history.call_args
-                        assert kwargs["key"] == "PURGED"
-                    mock_select_stat.assert_called_once_with(key='PURGED')
-                mock_keys.assert_called_once_with()
+                with patch.object(sh, "_select_from_statistics", return_value=retval) as mock_select_stat:
+                    with patch.object(sh, "_insert_into_stats_history", return_value=None) as mock_insert_history:
+                        with patch.object(sh, "_update_previous_value", return_value=None) as mock_update:
+                            sh.run()
+                        mock_update.assert_called_once_with(retval['rows'])
+                    args, kwargs = mock_insert_history.call_args
+                    assert args[0] == retval['rows']
+                mock_select_stat.assert_called_once_with()
+
+    def test_run_no_statistics(self):
+        with patch.object(FoglampProcess, '__init__'):
+            with patch.object(logger, "setup"):
+                sh = StatisticsHistory()
+                with patch.object(sh, "_select_from_statistics", return_value={'rows': [], 'count': 0}):
+                    with patch.object(sh, "_insert_into_stats_history") as mock_insert_history:
+                        with patch.object(sh, "_update_previous_value") as mock_update:
+                            sh.run()
+                        assert 0 == mock_update.call_count
+                    assert 0 == mock_insert_history.call_count